@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .main import ffmpeg_reconnect_args
+from .metrics import FFMPEG_RESTARTS, FFMPEG_TIMEOUTS, WATCHDOG_KILLS
+
+# Threads für blockierende Arbeit nach einem Segment (Umbenennen, Segment-Index, Einreihen).
+DEFAULT_IO_THREADS = 4
+# Wartezeit vor dem ersten Neustart einer Verbindung, verdoppelt je Fehlschlag, höchstens BACKOFF_MAX.
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 300.0
+# Zufälliger Anteil der Wartezeit, damit nach einem Netzausfall nicht alle Sender gleichzeitig neu verbinden.
+BACKOFF_JITTER = 0.2
+# Eine Verbindung, die so lange lief oder ein Segment geliefert hat, gilt als gesund; der Backoff beginnt von vorn.
+HEALTHY_SECONDS = 60.0
+# Abstand zwischen den ersten Starts, damit nicht hunderte ffmpeg-Prozesse im selben Moment verbinden.
+START_SPREAD = 0.05
+# So lange darf ffmpeg nach SIGTERM das laufende Segment abschließen.
+SHUTDOWN_TIMEOUT = 10.0
+# Aufschlag auf segment_time, nach dem ein ausbleibendes Segment als Hänger gilt.
+SEGMENT_MARGIN = 0.05
+RECONNECT_DELAY_MAX = 15
+# Auflösung, mit der Stillstand, Timeouts und das Beenden geprüft werden.
+TICK = 1.0
+
+
+def segment_timeout(segment_time, reconnect_delay_max=RECONNECT_DELAY_MAX):
+    """
+    Sekunden, nach denen eine Verbindung ohne fertiges Segment beendet wird.
+
+    Ersetzt RadioRecorder._get_timeout: ffmpeg verbindet sich selbst bis zu
+    reconnect_delay_max Sekunden lang neu, alles darüber hinaus gilt als Hänger.
+    """
+    return segment_time * (1 + SEGMENT_MARGIN) + reconnect_delay_max
+
+
+class AsyncRecordingSupervisor:
+    """
+    Überwacht die ffmpeg-Prozesse vieler Sender aus einer einzigen asyncio-Schleife.
+
+    Jeder Sender nimmt wie mit --continuous über eine dauerhafte Verbindung mit dem
+    segment-Muxer auf. Statt eines Aufnahme-Threads je Sender liest die Schleife
+    die Segmentliste und den -progress aller ffmpeg-Prozesse. Bleibt der Fortschritt länger als
+    stall_timeout aus oder kommt kein Segment mehr, wird ffmpeg beendet und mit
+    exponentiellem Backoff neu gestartet. Die Anzahl der Threads hängt nicht von
+    der Anzahl der Sender ab.
+    """
+    def __init__(self, recorders, io_threads=DEFAULT_IO_THREADS, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 start_spread=START_SPREAD, shutdown_timeout=SHUTDOWN_TIMEOUT, logger=None):
+        """
+        Args:
+            recorders (list): RadioRecorder mit segmenter (continuous=True).
+            io_threads (int, optional): Threads für die Arbeit nach einem Segment. Standard: 4.
+            backoff_base (float, optional): Wartezeit vor dem ersten Neustart in Sekunden.
+            backoff_max (float, optional): Längste Wartezeit zwischen zwei Neustarts.
+            start_spread (float, optional): Abstand der ersten Starts in Sekunden.
+            shutdown_timeout (float, optional): Frist für ffmpeg nach SIGTERM.
+            logger (logging.Logger, optional): Logger für Neustarts und Hänger.
+        """
+        self.recorders = list(recorders)
+        self.io_threads = io_threads
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.start_spread = start_spread
+        self.shutdown_timeout = shutdown_timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.restarts = {recorder.sender: 0 for recorder in self.recorders}
+        self._loop = None
+        self._stopping = None
+        self._stop_requested = False
+        self._lock = threading.Lock()
+
+    def backoff(self, failures):
+        """Wartezeit vor dem nächsten Start nach failures Fehlschlägen in Folge."""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** max(0, failures - 1)) if failures else self.backoff_base
+        return delay * (1 + random.uniform(-BACKOFF_JITTER, BACKOFF_JITTER))
+
+    def run(self):
+        """Startet die Schleife und kehrt erst nach stop() zurück."""
+        asyncio.run(self._main())
+
+    def stop(self):
+        """Beendet alle Aufnahmen; ffmpeg schließt das laufende Segment sauber ab. Aus jedem Thread aufrufbar."""
+        with self._lock:
+            self._stop_requested = True
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._stopping.set)
+
+    async def _main(self):
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(self.io_threads, thread_name_prefix="record-io")
+        loop.set_default_executor(executor)
+        with self._lock:
+            self._loop = loop
+            self._stopping = asyncio.Event()
+            if self._stop_requested:
+                self._stopping.set()
+        self.logger.info("Überwache %d Sender in einer asyncio-Schleife.", len(self.recorders))
+        try:
+            await asyncio.gather(*(self._supervise(recorder, index * self.start_spread)
+                                   for index, recorder in enumerate(self.recorders)))
+        finally:
+            with self._lock:
+                self._loop = None
+            executor.shutdown(wait=True)
+
+    async def _sleep(self, seconds):
+        """Wartet seconds Sekunden; True, wenn währenddessen stop() aufgerufen wurde."""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _finish_leftovers(self, recorder):
+        loop = asyncio.get_running_loop()
+        for final_output_file in await loop.run_in_executor(None, recorder.segmenter.finalize_leftovers):
+            await loop.run_in_executor(None, recorder._on_segment_finished, final_output_file)
+
+    async def _supervise(self, recorder, delay):
+        if await self._sleep(delay):
+            return
+        await self._finish_leftovers(recorder)
+        failures = 0
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            try:
+                produced = await self._record(recorder)
+            except Exception as e:
+                recorder.logger.error(f"Fehler bei der Aufnahme von {recorder.sender}: {e}", exc_info=True)
+                produced = 0
+            await self._finish_leftovers(recorder)
+            if self._stopping.is_set():
+                break
+            healthy = produced or time.monotonic() - started >= HEALTHY_SECONDS
+            failures = 0 if healthy else failures + 1
+            wait = self.backoff(failures)
+            FFMPEG_RESTARTS.inc(sender=recorder.sender)
+            self.restarts[recorder.sender] += 1
+            recorder.logger.warning("Verbindung zu %s beendet, neuer Versuch in %.1f Sekunden.", recorder.sender, wait)
+            if await self._sleep(wait):
+                break
+
+    async def _record(self, recorder):
+        """
+        Nimmt über eine ffmpeg-Verbindung auf, bis ffmpeg endet, hängt oder gestoppt wird.
+
+        Returns:
+            int: Anzahl der fertigen Segmente dieser Verbindung.
+        """
+        loop = asyncio.get_running_loop()
+        segmenter = recorder.segmenter
+        segmenter.reset_stream()
+        command = segmenter.build_command(recorder.ffmpeg_path, recorder.stream_url, recorder.quality,
+                                          ffmpeg_reconnect_args(reconnect_delay_max=RECONNECT_DELAY_MAX), progress=True)
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=None if recorder.verbose else subprocess.DEVNULL)
+        recorder.ffmpeg_process = process
+        reader = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), process.stdout)
+        recorder.logger.info("Starte fortlaufende Aufnahme für %s mit Segmenten von %d Sekunden",
+                             recorder.sender, recorder.segment_time)
+
+        stall_timeout = recorder.stall_timeout if recorder.use_monitor else None
+        timeout = segment_timeout(recorder.segment_time)
+        last_output = last_segment = time.monotonic()
+        kill_at = None
+        produced = 0
+        try:
+            while True:
+                now = time.monotonic()
+                if self._stopping.is_set() and kill_at is None:
+                    # ffmpeg schließt bei SIGTERM das laufende Segment sauber ab.
+                    process.terminate()
+                    kill_at = now + self.shutdown_timeout
+                if kill_at is not None and now > kill_at:
+                    recorder.logger.warning("ffmpeg für %s reagiert nicht auf SIGTERM, wird beendet.", recorder.sender)
+                    process.kill()
+                    break
+                if kill_at is None and stall_timeout is not None and now - last_output > stall_timeout:
+                    recorder.logger.warning("FFmpeg meldet seit %s Sekunden keinen Fortschritt – beende ffmpeg.", stall_timeout)
+                    WATCHDOG_KILLS.inc(sender=recorder.sender)
+                    process.kill()
+                    break
+                if kill_at is None and now - last_segment > timeout:
+                    recorder.logger.error("FFmpeg lieferte %.0f Sekunden lang kein fertiges Segment, beende Verbindung.", timeout)
+                    FFMPEG_TIMEOUTS.inc(sender=recorder.sender)
+                    process.kill()
+                    break
+                try:
+                    line = await asyncio.wait_for(reader.readline(), timeout=TICK)
+                except asyncio.TimeoutError:
+                    continue
+                if not line:
+                    break
+                last_output = time.monotonic()
+                final_output_file = segmenter.handle_line(line.decode("utf-8", errors="replace"))
+                if final_output_file:
+                    produced += 1
+                    last_segment = last_output
+                    await loop.run_in_executor(None, recorder._on_segment_finished, final_output_file)
+        finally:
+            transport.close()
+            await self._reap(process)
+        return produced
+
+    async def _reap(self, process):
+        deadline = time.monotonic() + self.shutdown_timeout
+        while process.poll() is None:
+            if time.monotonic() > deadline:
+                process.kill()
+                deadline = float("inf")
+            await asyncio.sleep(0.1)
@@ -1,23 +1,73 @@
 import contextlib
-import torch
-import whisper
-import torchaudio
 import os
-import tempfile
 import logging
-from pyannote.audio import Pipeline
+import heapq
+import threading
+import time
+
+from .checkpoint import Checkpoint, KIND_DIARIZATION, KIND_PIECES, KIND_WINDOW
+from .fingerprint import FingerprintIndex, fingerprint, subtract_spans
+from .speech_gate import SpeechGate, concatenate_regions, map_to_original
+from .tracing import SLOWEST_TURNS
+from .stage_cache import StageCache, stage_key, DEFAULT_MAX_BYTES, STAGE_DECODED, STAGE_DIARIZATION, STAGE_WHISPER
 
 logging.getLogger("pyannote").setLevel(logging.WARNING)
 logging.getLogger("speechbrain").setLevel(logging.WARNING)
 logging.getLogger("whisper").setLevel(logging.WARNING)
 
+# Wie whisper.audio.SAMPLE_RATE und N_SAMPLES. torch, Whisper und PyAnnote werden
+# erst in den Methoden importiert, damit reine Aufnahmeprozesse sie nie laden.
+SAMPLE_RATE = 16000
+N_SAMPLES = 30 * SAMPLE_RATE
+# Abstand der Zeitstempel-Tokens in Sekunden (wie in whisper.transcribe()).
+TIMESTAMP_PRECISION = 0.02
+
+# Schwellwerte wie in whisper.transcribe(), für die gebatchte Dekodierung.
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+DIARIZATION_MODEL = "pyannote/speaker-diarization-3.1"
+DEFAULT_BEAM_SIZE = 5
+TRANSCRIPTION_ERROR = "[Transkriptionsfehler]"
+
+RESULT_KEYS = ("speaker", "start", "end", "text")
+SEGMENT_FIELDS = ("avg_logprob", "no_speech_prob", "words")
+
+
+def turn_fields(segments, offset):
+    """
+    Fasst Konfidenz und Wortzeiten der Whisper-Segmente eines Turns zusammen.
+
+    Args:
+        segments (list): Segmente aus whisper transcribe().
+        offset (float): Startzeit des Turns in der Datei.
+
+    Returns:
+        dict: avg_logprob und no_speech_prob (nach Dauer gewichtetes Mittel, None ohne
+              Angaben) und words mit start, end, word und probability, Zeiten relativ zur Datei.
+    """
+    weights = [max(segment.get("end", 0.0) - segment.get("start", 0.0), 1e-3) for segment in segments]
+
+    def weighted(key):
+        pairs = [(segment[key], weight) for segment, weight in zip(segments, weights) if segment.get(key) is not None]
+        return sum(value * weight for value, weight in pairs) / sum(weight for _, weight in pairs) if pairs else None
+
+    return {
+        "avg_logprob": weighted("avg_logprob"),
+        "no_speech_prob": weighted("no_speech_prob"),
+        "words": [{"word": word["word"].strip(), "start": offset + word["start"], "end": offset + word["end"],
+                   "probability": word.get("probability")}
+                  for segment in segments for word in segment.get("words", [])],
+    }
+
 class AudioTranscriber:
     """
     Eine Klasse zur Transkription von Audiodateien mit Sprecherdiarisierung.
 
     Verwendet Whisper für die Transkription und PyAnnote für die Sprecherdiarisierung.
     """
-    def __init__(self, whisper_model_size="small", token=None, verbose=False):
+    def __init__(self, whisper_model_size="small", token=None, verbose=False, batch_size=1, speech_gate=False, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES, fingerprint_db=None, structured=False, checkpoint_dir=None, fallback_model=None):
         """
         Initialisiert den AudioTranscriber.
 
@@ -27,17 +77,58 @@ class AudioTranscriber:
             token (str, optional): Authentifizierungstoken für das PyAnnote-Modell.
                                    Erforderlich für den Download des Modells.
             verbose (bool, optional): Aktiviert ausführliche Ausgaben. Standardmäßig False.                       
+            batch_size (int, optional): Anzahl der 30-Sekunden-Fenster, die gemeinsam durch
+                                        Whisper laufen. Bei 1 wird jedes Segment einzeln
+                                        mit transcribe() verarbeitet. Standardmäßig 1.
+            speech_gate (bool, optional): Klassifiziert das Audio vorab in Sprache und
+                                          Musik/Stille und gibt nur Sprache an Whisper
+                                          und PyAnnote weiter. Standardmäßig False.
+            cache_dir (str, optional): Verzeichnis für den Cache der Zwischenergebnisse
+                                       (dekodiertes Audio, Diarisierung, Whisper-Ausgabe).
+                                       Ohne Angabe wird nichts zwischengespeichert.
+            cache_max_bytes (int, optional): Obergrenze der Cache-Größe. Standardmäßig 10 GiB.
+            fingerprint_db (str, optional): Pfad des Fingerabdruck-Index. Bereiche, die einem
+                                            bereits transkribierten Clip (Werbung, Jingle)
+                                            entsprechen, übernehmen dessen Transkript.
+                                            Ohne Angabe wird jedes Segment vollständig transkribiert.
+            structured (bool, optional): Ermittelt Wortzeitstempel und Konfidenz (avg_logprob,
+                                         no_speech_prob) je Abschnitt für pop_details()["segments"].
+                                         Standardmäßig False.
+            checkpoint_dir (str, optional): Verzeichnis für Zwischenstände laufender Transkriptionen.
+                                            Fertige Turns, Fenster und Bereiche werden sofort
+                                            gespeichert; nach einem Abbruch setzt die nächste
+                                            Transkription derselben Datei dort fort. Ohne Angabe
+                                            keine Zwischenstände.
+            fallback_model (str, optional): Kleineres Whisper-Modell, das gleich mit geladen wird,
+                                            damit Aufrufe mit settings={"model": ...} (Lastabwurf)
+                                            es ohne Ladezeit nutzen. Andere Modelle werden bei
+                                            Bedarf nachgeladen.
         
         Raises:
             ValueError: Wenn kein Token für das PyAnnote-Modell bereitgestellt wird.
         """
+        import torch
+        import whisper
+
         self.verbose = verbose
+        self.batch_size = max(1, int(batch_size))
         if torch.cuda.is_available():
             self.device = "cuda"
         else:
             self.device = "cpu"
         self._verbose_print(f"AudioTranscriber verwendet Gerät: {self.device}")
         self.token = token
+        self.speech_gate = SpeechGate() if speech_gate else None
+        self._details = {}
+        self.whisper_model_size = whisper_model_size
+        self.cache = StageCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.fingerprints = FingerprintIndex(fingerprint_db) if fingerprint_db else None
+        self._fingerprint_state = {}
+        self.structured = structured
+        self.checkpoint_dir = checkpoint_dir
+        self._checkpoints = {}
+        self._local = threading.local()
+        self._fallback_models = {}
 
         self.whisper_device = self.device
         if self.device == "mps":
@@ -47,112 +138,871 @@ class AudioTranscriber:
             self._verbose_print(f"Whisper wird auf Gerät ausgeführt: {self.whisper_device}")
 
         if self.token is not None:
+            from pyannote.audio import Pipeline
             with open(os.devnull, 'w') as fnull:
                 with contextlib.redirect_stdout(fnull), contextlib.redirect_stderr(fnull):
                     self.diarization_pipeline = Pipeline.from_pretrained(
-                                "pyannote/speaker-diarization-3.1",
+                                DIARIZATION_MODEL,
                                 use_auth_token=self.token)
                     self.diarization_pipeline.to(torch.device(self.device))
                     
         with open(os.devnull, 'w') as fnull:
             with contextlib.redirect_stdout(fnull), contextlib.redirect_stderr(fnull):
                 self.whisper_model = whisper.load_model(whisper_model_size, device=self.whisper_device)
-        self.temp_dir = tempfile.gettempdir()
+                if fallback_model and fallback_model != whisper_model_size:
+                    self._fallback_models[fallback_model] = whisper.load_model(fallback_model, device=self.whisper_device)
+        # Whisper installiert beim Dekodieren Hooks am Modell, daher darf immer
+        # nur ein Thread gleichzeitig mit den geladenen Modellen arbeiten.
+        self._model_lock = threading.Lock()
 
     def _verbose_print(self, *args, **kwargs):
         """Gibt nur aus, wenn self.verbose True ist."""
         if self.verbose:
             print(*args, **kwargs)
 
+    def _load_audio(self, audio_path):
+        """
+        Dekodiert eine Audiodatei einmalig in ein 16-kHz-Mono-Array.
+
+        Args:
+            audio_path (str): Der Pfad zur Audiodatei.
+
+        Returns:
+            numpy.ndarray: Die Samples als float32 im Bereich [-1, 1].
+        """
+        import whisper
+
+        with self._stage(audio_path, "decode"):
+            if self.cache is None:
+                audio = whisper.load_audio(audio_path, sr=SAMPLE_RATE)
+            else:
+                key = stage_key(self.cache.content_hash(audio_path), STAGE_DECODED, {"sr": SAMPLE_RATE})
+                audio = self.cache.get(STAGE_DECODED, key)
+                if audio is None:
+                    audio = whisper.load_audio(audio_path, sr=SAMPLE_RATE)
+                    self.cache.put(STAGE_DECODED, key, audio)
+        self._details[audio_path]["duration"] = len(audio) / SAMPLE_RATE
+        return audio
+
+    @contextlib.contextmanager
+    def _stage(self, audio_path, stage):
+        """Addiert die Dauer des Blocks unter details["stages"][stage] der Datei."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages = self._details.setdefault(audio_path, {}).setdefault("stages", {})
+            stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - start
+
+    @contextlib.contextmanager
+    def _turn(self, audio_path, start, end, speaker=None):
+        """
+        Misst einen Whisper-Aufruf für einen Turn (bzw. Bereich ohne Diarisierung).
+
+        Zählt die Turns der Datei und behält die SLOWEST_TURNS langsamsten in
+        details["slowest_turns"].
+        """
+        began = time.perf_counter()
+        try:
+            with self._stage(audio_path, "whisper"):
+                yield
+        finally:
+            details = self._details[audio_path]
+            details["turns"] = details.get("turns", 0) + 1
+            turn = {"start": round(start, 2), "end": round(end, 2), "speaker": speaker,
+                    "seconds": time.perf_counter() - began}
+            slowest = details.setdefault("slowest_turns", [])
+            slowest.append(turn)
+            details["slowest_turns"] = heapq.nlargest(SLOWEST_TURNS, slowest, key=lambda t: t["seconds"])
+
+    def _resolve_settings(self, settings):
+        settings = settings or {}
+        return {"model": settings.get("model", self.whisper_model_size),
+                "diarize": self.token is not None and settings.get("diarize", True),
+                "beam_size": settings.get("beam_size", DEFAULT_BEAM_SIZE)}
+
+    def _settings(self):
+        """Einstellungen des laufenden Aufrufs in diesem Thread (siehe transcribe_audio)."""
+        settings = getattr(self._local, "settings", None)
+        return settings if settings is not None else self._resolve_settings(None)
+
+    @contextlib.contextmanager
+    def _using(self, settings):
+        previous = getattr(self._local, "settings", None)
+        self._local.settings = self._resolve_settings(settings)
+        try:
+            yield self._local.settings
+        finally:
+            self._local.settings = previous
+
+    def _model(self):
+        """Das Whisper-Modell des laufenden Aufrufs; andere als das Hauptmodell werden bei Bedarf geladen."""
+        import whisper
+
+        size = self._settings()["model"]
+        if size == self.whisper_model_size:
+            return self.whisper_model
+        if size not in self._fallback_models:
+            with open(os.devnull, 'w') as fnull:
+                with contextlib.redirect_stdout(fnull), contextlib.redirect_stderr(fnull):
+                    self._fallback_models[size] = whisper.load_model(size, device=self.whisper_device)
+        return self._fallback_models[size]
+
+    def _record_settings(self, audio_path, settings):
+        self._details.setdefault(audio_path, {})["settings"] = dict(settings)
+
+    def _whisper_params(self):
+        # Alle Einstellungen, die die Ausgabe verändern; die Diarisierung ist über "diarized" erfasst.
+        settings = self._settings()
+        params = {
+            "model": settings["model"],
+            "diarized": settings["diarize"],
+            "diarization_model": DIARIZATION_MODEL if settings["diarize"] else None,
+            "speech_gate": self.speech_gate is not None,
+            "fingerprints": self.fingerprints is not None,
+            "batched": self.batch_size > 1,
+            "beam_size": settings["beam_size"],
+        }
+        if self.structured:
+            params["structured"] = True
+        if not settings["diarize"] and (self.checkpoint_dir is not None or self.batch_size > 1):
+            # Ohne Diarisierung wird mit Zwischenständen (_transcribe_windows) oder gebatcht
+            # (_transcribe_streams) fensterweise transkribiert.
+            params["windowed"] = True
+        return params
+
+    def _whisper_key(self, audio_path):
+        return stage_key(self.cache.content_hash(audio_path), STAGE_WHISPER, self._whisper_params())
+
+    def _checkpoint(self, audio_path):
+        """Zwischenstand der Datei, oder None ohne checkpoint_dir."""
+        if self.checkpoint_dir is None or audio_path is None:
+            return None
+        checkpoint = self._checkpoints.get(audio_path)
+        if checkpoint is None:
+            checkpoint = self._checkpoints[audio_path] = Checkpoint(self.checkpoint_dir, audio_path, self._whisper_params())
+            if len(checkpoint):
+                self._verbose_print(f"Setze Transkription mit {len(checkpoint)} fertigen Einheiten fort: {audio_path}")
+        return checkpoint
+
+    def _finish_checkpoint(self, audio_path):
+        checkpoint = self._checkpoints.pop(audio_path, None)
+        if checkpoint is not None:
+            checkpoint.discard()
+
+    def _checkpoint_chunk(self, chunk):
+        checkpoint = chunk.get("checkpoint")
+        if checkpoint is not None and chunk["text"] != TRANSCRIPTION_ERROR:
+            checkpoint.put(KIND_PIECES, (chunk["start"], chunk["end"], chunk.get("speaker")),
+                           {key: chunk[key] for key in ("text",) + SEGMENT_FIELDS if key in chunk})
+
+    def _cached_result(self, audio_path):
+        if self.cache is None:
+            return None
+        entry = self.cache.get(STAGE_WHISPER, self._whisper_key(audio_path))
+        if entry is None:
+            return None
+        if entry.get("details") is not None:
+            self._details[audio_path] = entry["details"]
+        self._verbose_print(f"Transkription aus dem Cache: {audio_path}")
+        return entry["result"]
+
+    def _store_result(self, audio_path, result):
+        if self.cache is None:
+            return
+        texts = [result] if isinstance(result, str) else [r["text"] for r in result]
+        if any(TRANSCRIPTION_ERROR in text for text in texts):
+            return
+        # Zeiten und Turns gelten nur für diesen Durchlauf.
+        details = {key: value for key, value in self._details.get(audio_path, {}).items()
+                   if key not in ("stages", "turns", "slowest_turns")}
+        self.cache.put(STAGE_WHISPER, self._whisper_key(audio_path), {"result": result, "details": details or None})
+
+    def _speech_regions(self, audio, audio_path):
+        """
+        Bestimmt die Bereiche, die transkribiert werden, und merkt sich die übersprungene Zeit.
+
+        Returns:
+            list: Tupel (start, end) in Sekunden, oder None ohne Speech-Gate (ganze Datei).
+        """
+        if self.speech_gate is None:
+            return None
+        duration = len(audio) / SAMPLE_RATE
+        with self._stage(audio_path, "speech_gate"):
+            regions = self.speech_gate.speech_regions(audio, SAMPLE_RATE)
+        speech_seconds = sum(end - start for start, end in regions)
+        self._details.setdefault(audio_path, {}).update({
+            "duration": duration,
+            "speech_seconds": speech_seconds,
+            "skipped_seconds": duration - speech_seconds,
+        })
+        self._verbose_print(f"Speech-Gate: {duration - speech_seconds:.1f} von {duration:.1f} Sekunden übersprungen ({audio_path})")
+        return regions
+
+    def _fingerprint_profile(self):
+        settings = self._settings()
+        return f"{settings['model']}|{'diarized' if settings['diarize'] else 'basic'}"
+
+    def _regions(self, audio, audio_path):
+        """
+        Bestimmt die Bereiche, die noch an die Modelle gehen: Sprache laut Speech-Gate
+        ohne die Stellen, die bereits bekannte Clips abdecken.
+
+        Returns:
+            list: Tupel (start, end) in Sekunden, oder None für die ganze Datei.
+        """
+        regions = self._speech_regions(audio, audio_path)
+        if self.fingerprints is None:
+            return regions
+        duration = len(audio) / SAMPLE_RATE
+        with self._stage(audio_path, "fingerprint"):
+            hashes, frames = fingerprint(audio)
+            matches = self.fingerprints.match(hashes, frames, self._fingerprint_profile())
+            reused, spans = self.fingerprints.reuse(matches)
+        self._fingerprint_state[audio_path] = (hashes, frames, reused, spans)
+        skipped = sum(end - start for start, end in spans)
+        self._details.setdefault(audio_path, {}).update(
+            {"duration": duration, "fingerprint_hits": len(spans), "fingerprint_seconds": skipped})
+        if spans:
+            self._verbose_print(f"Fingerabdruck: {len(spans)} bekannte Clips, {skipped:.1f} Sekunden übernommen ({audio_path})")
+            regions = subtract_spans([(0.0, duration)] if regions is None else regions, spans)
+        return regions
+
+    def _merge_fingerprints(self, audio_path, pieces):
+        """
+        Fügt die übernommenen Stücke ein und nimmt das Segment als Clip in den Index auf.
+
+        Args:
+            pieces (list): Neu transkribierte Stücke mit start, end und text (ggf. speaker).
+
+        Returns:
+            list: Alle Stücke der Datei, nach Startzeit sortiert.
+        """
+        state = self._fingerprint_state.pop(audio_path, None)
+        if state is None:
+            return pieces
+        hashes, frames, reused, spans = state
+        merged = sorted(pieces + reused, key=lambda piece: piece["start"])
+        if not any(TRANSCRIPTION_ERROR in piece["text"] for piece in pieces):
+            with self._stage(audio_path, "fingerprint"):
+                self.fingerprints.add_clip(audio_path, hashes, frames, merged, self._fingerprint_profile(), spans)
+        details = self._details[audio_path]
+        self.fingerprints.record(audio_path, details["duration"], details["fingerprint_hits"], details["fingerprint_seconds"])
+        return merged
+
+    def pop_details(self, audio_path):
+        """
+        Liefert Zusatzinformationen zur letzten Transkription einer Datei und vergisst sie.
+
+        Returns:
+            dict: duration, stages (Sekunden je Verarbeitungsstufe), turns und
+                  slowest_turns, mit Speech-Gate speech_seconds und skipped_seconds, mit Fingerabdruck-Index
+                  fingerprint_hits und fingerprint_seconds, die Abschnitte (segments) mit
+                  start, end und text (mit structured samt Konfidenz und Wortzeiten) und settings
+                  (model, diarize, beam_size des Aufrufs); None, wenn die Datei
+                  nicht transkribiert wurde.
+        """
+        return self._details.pop(audio_path, None)
+
+    def _keep_segments(self, audio_path, pieces):
+        # Zeiten je Abschnitt braucht auch der Suchindex; Konfidenz und Wörter nur mit structured.
+        self._details.setdefault(audio_path, {})["segments"] = pieces
+
+    def _diarize_regions(self, audio, regions, audio_path=None):
+        """
+        Diarisiert nur die Sprachbereiche; die Zeiten beziehen sich auf das Original.
+
+        Mit Cache wird das Ergebnis je Audioinhalt wiederverwendet, auch wenn
+        sich das Whisper-Modell ändert.
+        """
+        checkpoint = self._checkpoint(audio_path)
+        turns = checkpoint.get(KIND_DIARIZATION, regions or []) if checkpoint else None
+        if turns is not None:
+            return [tuple(turn) for turn in turns]
+        with self._stage(audio_path, "diarization"):
+            turns = self._diarize_cached(audio, regions, audio_path)
+        if checkpoint is not None:
+            checkpoint.put(KIND_DIARIZATION, regions or [], [list(turn) for turn in turns])
+        return turns
+
+    def _diarize_cached(self, audio, regions, audio_path):
+        if self.cache is None or audio_path is None:
+            return self._diarize_uncached(audio, regions)
+        params = {"model": DIARIZATION_MODEL,
+                  "regions": None if regions is None else [[round(a, 3), round(b, 3)] for a, b in regions]}
+        key = stage_key(self.cache.content_hash(audio_path), STAGE_DIARIZATION, params)
+        turns = self.cache.get(STAGE_DIARIZATION, key)
+        if turns is None:
+            turns = self._diarize_uncached(audio, regions)
+            self.cache.put(STAGE_DIARIZATION, key, [list(turn) for turn in turns])
+        return [tuple(turn) for turn in turns]
+
+    def _diarize_uncached(self, audio, regions):
+        if regions is None:
+            return self._diarize(audio)
+        speech_audio, offsets = concatenate_regions(audio, regions, SAMPLE_RATE)
+        if len(speech_audio) == 0:
+            return []
+        return [(piece_start, piece_end, speaker)
+                for start, end, speaker in self._diarize(speech_audio)
+                for piece_start, piece_end in map_to_original(offsets, start, end)]
+
     def _extract_segment(self, waveform, sr, start, end):
         """
         Extrahiert ein Audiosegment aus einer Wellenform.
 
         Args:
-            waveform (torch.Tensor): Die Audio-Wellenform.
+            waveform (numpy.ndarray | torch.Tensor): Die Audio-Wellenform, Samples in der letzten Dimension.
             sr (int): Die Abtastrate der Wellenform.
             start (float): Die Startzeit des Segments in Sekunden.
             end (float): Die Endzeit des Segments in Sekunden.
 
         Returns:
-            torch.Tensor: Das extrahierte Audiosegment.
+            numpy.ndarray | torch.Tensor: Das extrahierte Audiosegment (ohne Kopie).
         """
         start_frame = int(start * sr)
         end_frame   = int(end   * sr)
-        return waveform[:, start_frame:end_frame]
+        return waveform[..., start_frame:end_frame]
     
-    def transcribe_audio(self, audio_path):
+    def transcribe_audio(self, audio_path, settings=None):
         """
         Transkribiert eine Audiodatei und führt eine Sprecherdiarisierung durch.
 
         Args:
             audio_path (str): Der Pfad zur Audiodatei.
+            settings (dict, optional): Abweichende Einstellungen für diesen Aufruf (Lastabwurf):
+                                       model (Whisper-Modell), diarize (False überspringt PyAnnote)
+                                       und beam_size. Die tatsächlich verwendeten Einstellungen
+                                       stehen in pop_details()["settings"].
 
         Returns:
             list: Eine Liste von Dictionaries, die die Transkriptionsergebnisse
                   für jedes Segment enthalten, einschließlich Sprecher, Startzeit,
-                  Endzeit und transkribiertem Text.
+                  Endzeit und transkribiertem Text (ohne Diarisierung der Text als str).
         """
-        if self.token is None:
-            return self._transcribe_audio_basic(audio_path)
+        with self._using(settings) as active:
+            cached = self._cached_result(audio_path)
+            if cached is not None:
+                self._record_settings(audio_path, active)
+                return cached
 
-        return self._transcribe_audio_diarization(audio_path)
-    
+            if self.batch_size > 1:
+                return self.transcribe_many([audio_path], settings)[0]
 
-    def _transcribe_audio_diarization(self, audio_path):
-        waveform, sample_rate = torchaudio.load(audio_path)
-        waveform = waveform.to(self.device)
+            with self._model_lock:
+                if not active["diarize"]:
+                    result = self._transcribe_audio_basic(audio_path)
+                else:
+                    result = self._transcribe_audio_diarization(audio_path)
+            self._record_settings(audio_path, active)
+            self._store_result(audio_path, result)
+            self._finish_checkpoint(audio_path)
+            return result
 
-        diarization_result = self.diarization_pipeline({"waveform": waveform, "sample_rate": sample_rate})
+    def transcribe_many(self, audio_paths, settings=None):
+        """
+        Transkribiert mehrere Audiodateien mit gebatchter Whisper-Inferenz.
 
-        results = []
+        Die Diarisierungs-Turns aller Dateien (ohne Token: 30-Sekunden-Fenster)
+        werden in Batches von batch_size Mel-Fenstern gemeinsam durch Encoder
+        und Decoder geschickt. Turns über 30 Sekunden sowie Fenster, bei denen
+        der gebatchte Durchlauf unsicher ist, laufen einzeln über transcribe().
 
-        for turn, _, speaker in diarization_result.itertracks(yield_label=True):
-            segment = self._extract_segment(waveform, sample_rate, turn.start, turn.end)
-            
-            tmp_filename = f"segment_{speaker}_{turn.start:.2f}_{turn.end:.2f}.mp3"
-            tmp_path = os.path.join(self.temp_dir, tmp_filename)
-            
-            if segment.numel() == 0:
-                print(f"Skipping empty segment for speaker {speaker} from {turn.start:.2f} to {turn.end:.2f}")
-                continue
-            
+        Args:
+            audio_paths (list): Die Pfade der Audiodateien.
+            settings (dict, optional): Abweichende Einstellungen wie bei transcribe_audio.
+
+        Returns:
+            list: Ein Ergebnis je Datei in derselben Reihenfolge und im Format von transcribe_audio.
+        """
+        with self._using(settings) as active:
+            results = self._transcribe_many(audio_paths, active)
+        return results
+
+    def _transcribe_many(self, audio_paths, active):
+        results = {audio_path: self._cached_result(audio_path) for audio_path in audio_paths}
+        missing = [audio_path for audio_path in audio_paths if results[audio_path] is None]
+
+        with self._model_lock:
+            if active["diarize"]:
+                jobs = [self._prepare_chunks(audio_path) for audio_path in missing]
+            else:
+                jobs = [self._prepare_streams(audio_path) for audio_path in missing]
+            start = time.perf_counter()
+            if active["diarize"]:
+                # Aus einem Zwischenstand übernommene Chunks haben bereits ihren Text.
+                self._transcribe_chunks([chunk for chunks in jobs for chunk in chunks if "text" not in chunk])
+            else:
+                self._transcribe_streams([stream for streams in jobs for stream in streams])
+            elapsed = time.perf_counter() - start
+
+        # Die gemeinsame Whisper-Zeit wird nach Audiolänge auf die Dateien verteilt.
+        samples = [sum(unit["audio"].shape[-1] for unit in units) for units in jobs]
+        for audio_path, units, count in zip(missing, jobs, samples):
+            details = self._details.setdefault(audio_path, {})
+            details.setdefault("stages", {})["whisper"] = elapsed * count / sum(samples) if sum(samples) else 0.0
+            details["turns"] = sum(unit.get("windows", 1) for unit in units)
+
+        for audio_path, units in zip(missing, jobs):
+            if active["diarize"]:
+                keys = RESULT_KEYS + tuple(key for key in SEGMENT_FIELDS if self.structured)
+                pieces = [{key: chunk[key] for key in keys if key in chunk} for chunk in units]
+            else:
+                pieces = [piece for stream in units for piece in stream["pieces"]]
+            pieces = self._merge_fingerprints(audio_path, pieces)
+            self._keep_segments(audio_path, pieces)
+            if not active["diarize"]:
+                result = "\n".join(piece["text"] for piece in pieces if piece["text"])
+            else:
+                result = [{key: piece[key] for key in RESULT_KEYS} for piece in pieces]
+            self._store_result(audio_path, result)
+            self._finish_checkpoint(audio_path)
+            results[audio_path] = result
+        for audio_path in audio_paths:
+            self._record_settings(audio_path, active)
+        return [results[audio_path] for audio_path in audio_paths]
+
+    def transcribe_words(self, audio, initial_prompt=None):
+        """
+        Transkribiert ein Audiofenster im Speicher mit Zeitstempeln je Wort.
+
+        Wird vom Streaming-Modus für die überlappenden Fenster verwendet und
+        läuft ohne Beam-Search, damit der Text möglichst schnell vorliegt.
+
+        Args:
+            audio (numpy.ndarray): Mono-Audio mit 16 kHz als float32.
+            initial_prompt (str, optional): Bereits bestätigter Text als Kontext.
+
+        Returns:
+            list: Tupel (start, end, word) mit Zeiten in Sekunden relativ zum Fensteranfang.
+        """
+        with self._model_lock:
             with open(os.devnull, 'w') as fnull:
                 with contextlib.redirect_stdout(fnull), contextlib.redirect_stderr(fnull):
-                    torchaudio.save(tmp_path, segment.cpu(), sample_rate)
-            
+                    result = self.whisper_model.transcribe(audio, task="transcribe", word_timestamps=True,
+                                                           condition_on_previous_text=False,
+                                                           initial_prompt=initial_prompt,
+                                                           fp16=self.whisper_device == "cuda")
+        return [(word["start"], word["end"], word["word"])
+                for segment in result["segments"] for word in segment.get("words", [])]
+
+    def _diarize(self, audio):
+        """
+        Führt die Sprecherdiarisierung auf dem dekodierten Audio aus.
+
+        Returns:
+            list: Tupel (start, end, speaker) je Sprecherwechsel.
+        """
+        import torch
+
+        waveform = torch.from_numpy(audio).unsqueeze(0).to(self.device)
+        diarization_result = self.diarization_pipeline({"waveform": waveform, "sample_rate": SAMPLE_RATE})
+        return [(turn.start, turn.end, speaker) for turn, _, speaker in diarization_result.itertracks(yield_label=True)]
+
+    def _whisper_transcribe(self, audio, **options):
+        if self.structured:
+            options["word_timestamps"] = True
+        with open(os.devnull, 'w') as fnull:
+            with contextlib.redirect_stdout(fnull), contextlib.redirect_stderr(fnull):
+                return self._model().transcribe(audio, task="transcribe", beam_size=self._settings()["beam_size"], **options)
+
+    def _transcribe_segment(self, segment, fields=None, offset=0.0):
+        """
+        Transkribiert einen Turn mit transcribe().
+
+        Args:
+            fields (dict, optional): Erhält bei structured Konfidenz und Wortzeiten des Turns.
+            offset (float, optional): Startzeit des Turns in der Datei.
+
+        Returns:
+            str: Der Text des Turns.
+        """
+        res = self._whisper_transcribe(segment)
+        if fields is not None and self.structured:
+            fields.update(turn_fields(res.get("segments", []), offset))
+        return res["text"].strip()
+
+    def _prepare_chunks(self, audio_path):
+        chunks = self._split_chunks(audio_path)
+        checkpoint = self._checkpoint(audio_path)
+        if checkpoint is not None:
+            for chunk in chunks:
+                chunk["checkpoint"] = checkpoint
+                chunk.update(checkpoint.get(KIND_PIECES, (chunk["start"], chunk["end"], chunk.get("speaker"))) or {})
+        return chunks
+
+    def _split_chunks(self, audio_path):
+        audio = self._load_audio(audio_path)
+        regions = self._regions(audio, audio_path)
+        chunks = []
+        for start, end, speaker in self._diarize_regions(audio, regions, audio_path):
+            segment = self._extract_segment(audio, SAMPLE_RATE, start, end)
+            if segment.shape[-1] == 0:
+                print(f"Skipping empty segment for speaker {speaker} from {start:.2f} to {end:.2f}")
+                continue
+            chunks.append({"speaker": speaker, "start": start, "end": end, "audio": segment})
+        return chunks
+
+    def _transcribe_chunks(self, chunks):
+        """
+        Setzt chunk["text"] für alle Chunks, gebatcht wo möglich.
+        """
+        batchable = []
+        for chunk in chunks:
+            if chunk["audio"].shape[-1] <= N_SAMPLES:
+                batchable.append(chunk)
+                continue
             try:
-                with open(os.devnull, 'w') as fnull:
-                    with contextlib.redirect_stdout(fnull), contextlib.redirect_stderr(fnull):
-                        res = self.whisper_model.transcribe(tmp_path, task="transcribe", beam_size=5)
-                        text = res["text"].strip()
+                chunk["text"] = self._transcribe_segment(chunk["audio"], chunk, chunk["start"])
             except Exception as e:
-                print(f"Error transcribing segment {tmp_path}: {e}")
-                text = "[Transkriptionsfehler]"
+                print(f"Error transcribing segment {chunk['start']:.2f}-{chunk['end']:.2f}: {e}")
+                chunk["text"] = TRANSCRIPTION_ERROR
+            self._checkpoint_chunk(chunk)
+
+        for i in range(0, len(batchable), self.batch_size):
+            batch = batchable[i:i + self.batch_size]
+            try:
+                decoded = self._decode_batch([chunk["audio"] for chunk in batch])
+            except Exception as e:
+                print(f"Error transcribing batch of {len(batch)} segments: {e}")
+                decoded = [None] * len(batch)
+
+            for chunk, result in zip(batch, decoded):
+                if result is None:
+                    chunk["text"] = TRANSCRIPTION_ERROR
+                elif result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                    chunk["text"] = ""
+                elif result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD:
+                    # Gleiche Rückfallstrategie wie transcribe(): mit Temperatur-Fallback neu dekodieren.
+                    try:
+                        chunk["text"] = self._transcribe_segment(chunk["audio"], chunk, chunk["start"])
+                    except Exception as e:
+                        print(f"Error transcribing segment {chunk['start']:.2f}-{chunk['end']:.2f}: {e}")
+                        chunk["text"] = TRANSCRIPTION_ERROR
+                else:
+                    chunk["text"] = result.text.strip()
+                    if self.structured:
+                        chunk.update(self._window_fields(chunk["audio"], result, chunk["start"]))
+                self._checkpoint_chunk(chunk)
+
+    def _prepare_streams(self, audio_path):
+        """
+        Bereitet die Bereiche einer Datei für _transcribe_streams vor; bereits gesicherte
+        Fenster werden aus dem Zwischenstand übernommen.
+        """
+        checkpoint = self._checkpoint(audio_path)
+        streams = []
+        for offset, region in self._basic_parts(audio_path):
+            stream = {"offset": offset, "audio": region, "seek": 0, "prompt": None, "pieces": [], "windows": 0}
+            while checkpoint is not None and stream["seek"] < region.shape[-1]:
+                saved = checkpoint.get(KIND_WINDOW, (offset + stream["seek"] / SAMPLE_RATE,))
+                if saved is None:
+                    break
+                self._advance_stream(stream, saved)
+            stream["checkpoint"] = checkpoint
+            streams.append(stream)
+        return streams
+
+    def _transcribe_streams(self, streams):
+        """
+        Transkribiert Bereiche ohne Diarisierung fensterweise, gebatcht über Dateien hinweg.
+
+        Wie in _transcribe_windows endet ein Fenster nach dem letzten vollständigen
+        Whisper-Segment, und dort beginnt das nächste Fenster desselben Bereichs;
+        Wörter an der Fenstergrenze werden so nicht zerschnitten. Je Durchlauf wird
+        das jeweils nächste Fenster von bis zu batch_size Bereichen gemeinsam dekodiert.
+        Whispers gebatchte Dekodierung kennt nur einen Prompt für alle Fenster; den Text
+        des vorigen Fensters erhält daher nur der Rückfall auf transcribe().
+        """
+        while True:
+            batch = [stream for stream in streams if stream["seek"] < stream["audio"].shape[-1]][:self.batch_size]
+            if not batch:
+                return
+            windows = [stream["audio"][stream["seek"]:stream["seek"] + N_SAMPLES] for stream in batch]
+            try:
+                decoded = self._decode_batch(windows, timestamps=True)
+            except Exception as e:
+                print(f"Error transcribing batch of {len(batch)} windows: {e}")
+                decoded = [None] * len(batch)
+            for stream, window, result in zip(batch, windows, decoded):
+                self._finish_window(stream, window, result)
+
+    def _finish_window(self, stream, window, result):
+        start = stream["offset"] + stream["seek"] / SAMPLE_RATE
+        stream["windows"] += 1
+        if result is None:
+            segments = None
+        elif result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+            segments = []
+        elif result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD:
+            # Gleiche Rückfallstrategie wie transcribe(): mit Temperatur-Fallback neu dekodieren.
+            try:
+                segments = self._whisper_transcribe(window, initial_prompt=stream["prompt"]).get("segments", [])
+            except Exception as e:
+                print(f"Error transcribing segment {start:.2f}-{start + window.shape[-1] / SAMPLE_RATE:.2f}: {e}")
+                segments = None
+        else:
+            segments = self._timestamp_segments(window, result, start)
+
+        if segments is None:
+            # Fehler werden nicht gesichert, damit ein Neustart das Fenster wiederholt.
+            self._advance_stream(stream, {"pieces": [{"start": start, "end": start + window.shape[-1] / SAMPLE_RATE,
+                                                      "text": TRANSCRIPTION_ERROR}],
+                                          "next": stream["seek"] + window.shape[-1]})
+            return
+        segments, next_seek = self._cut_window(segments, stream["seek"], window.shape[-1], stream["audio"].shape[-1])
+        saved = {"pieces": self._segment_pieces(segments, start, start + (next_seek - stream["seek"]) / SAMPLE_RATE),
+                 "next": next_seek}
+        if stream["checkpoint"] is not None:
+            stream["checkpoint"].put(KIND_WINDOW, (start,), saved)
+        self._advance_stream(stream, saved)
+
+    @staticmethod
+    def _advance_stream(stream, window):
+        stream["pieces"].extend(window["pieces"])
+        stream["seek"] = window["next"]
+        stream["prompt"] = " ".join(piece["text"] for piece in window["pieces"] if piece["text"]) or stream["prompt"]
+
+    @staticmethod
+    def _cut_window(segments, seek, window_samples, length):
+        """
+        Bestimmt, wo das nächste Fenster beginnt.
+
+        Returns:
+            tuple: (segments, next_seek). Das letzte Segment kann am Fensterende abgeschnitten
+                   sein; außer im letzten Fenster entfällt es und das nächste Fenster beginnt mit ihm.
+        """
+        next_seek = seek + window_samples
+        cut = int(segments[-1].get("start", 0.0) * SAMPLE_RATE) if len(segments) > 1 else 0
+        if next_seek < length and cut > 0:
+            return segments[:-1], seek + cut
+        return segments, next_seek
+
+    def _tokenizer(self, language):
+        from whisper.tokenizer import get_tokenizer
+
+        model = self._model()
+        return get_tokenizer(model.is_multilingual, num_languages=model.num_languages, language=language, task="transcribe")
+
+    def _timestamp_segments(self, window, result, offset):
+        """
+        Zerlegt ein mit Zeitstempeln dekodiertes Fenster in Segmente wie transcribe().
+
+        Args:
+            window (numpy.ndarray): Das Fenster (max. 30 Sekunden).
+            result (whisper.DecodingResult): Ergebnis aus _decode_batch(timestamps=True).
+            offset (float): Startzeit des Fensters in der Datei (für Fehlermeldungen).
+
+        Returns:
+            list: Segmente mit start und end relativ zum Fenster; ein Text ohne schließenden
+                  Zeitstempel reicht bis zum Fensterende.
+        """
+        tokenizer = self._tokenizer(result.language)
+        duration = window.shape[-1] / SAMPLE_RATE
+        segments = []
+        begin, text_tokens = None, []
+
+        def close(end):
+            segments.append({"seek": 0, "start": begin or 0.0, "end": end, "text": tokenizer.decode(text_tokens),
+                             "tokens": text_tokens, "avg_logprob": result.avg_logprob,
+                             "no_speech_prob": result.no_speech_prob})
+
+        for token in result.tokens:
+            if token >= tokenizer.timestamp_begin:
+                time_ = (token - tokenizer.timestamp_begin) * TIMESTAMP_PRECISION
+                if begin is not None and text_tokens:
+                    close(time_)
+                    begin, text_tokens = None, []
+                else:
+                    begin = time_
+            elif token < tokenizer.eot:
+                text_tokens.append(token)
+        if text_tokens:
+            close(duration)
+        if self.structured and segments:
+            self._align_words(window, segments, tokenizer, offset)
+        return segments
+
+    def _align_words(self, audio, segments, tokenizer, offset):
+        """
+        Ergänzt Wortzeiten wie transcribe(word_timestamps=True) über die Ausrichtung der
+        Tokens per Cross-Attention; schlägt sie fehl, bleiben die Segmente ohne Wörter.
+        """
+        import whisper
+        from whisper.audio import HOP_LENGTH
+        from whisper.timing import add_word_timestamps
+
+        try:
+            model = self._model()
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels)
+            add_word_timestamps(segments=segments, model=model, tokenizer=tokenizer, mel=mel.to(self.whisper_device),
+                                num_frames=audio.shape[-1] // HOP_LENGTH, last_speech_timestamp=0.0)
+        except Exception as e:
+            print(f"Error aligning words {offset:.2f}-{offset + audio.shape[-1] / SAMPLE_RATE:.2f}: {e}")
+
+    def _window_fields(self, audio, result, offset):
+        """
+        Bestimmt Konfidenz und Wortzeiten eines gebatcht dekodierten Fensters.
+
+        Der Batch wird ohne Zeitstempel dekodiert. Die Wortzeiten liefert wie bei
+        transcribe(word_timestamps=True) die Ausrichtung der Tokens über die Cross-Attention.
+
+        Args:
+            audio (numpy.ndarray): Das Fenster (max. 30 Sekunden).
+            result (whisper.DecodingResult): Ergebnis aus _decode_batch().
+            offset (float): Startzeit des Fensters in der Datei.
+
+        Returns:
+            dict: Felder wie turn_fields(); ohne Wortzeiten, wenn die Ausrichtung fehlschlägt.
+        """
+        segment = {"seek": 0, "start": 0.0, "end": audio.shape[-1] / SAMPLE_RATE, "text": result.text,
+                   "tokens": list(result.tokens), "avg_logprob": result.avg_logprob,
+                   "no_speech_prob": result.no_speech_prob}
+        try:
+            tokenizer = self._tokenizer(result.language)
+        except Exception as e:
+            print(f"Error aligning words {offset:.2f}-{offset + segment['end']:.2f}: {e}")
+        else:
+            self._align_words(audio, [segment], tokenizer, offset)
+        return turn_fields([segment], offset)
+
+    def _decode_batch(self, segments, timestamps=False):
+        """
+        Dekodiert bis zu batch_size Segmente (je max. 30 Sekunden) in einem Encoder-/Decoder-Durchlauf.
+
+        Args:
+            timestamps (bool, optional): Mit Zeitstempel-Tokens dekodieren (für _timestamp_segments).
+
+        Returns:
+            list: Ein whisper.DecodingResult je Segment.
+        """
+        import torch
+        import whisper
+
+        model = self._model()
+        n_mels = model.dims.n_mels
+        mel = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(segment), n_mels=n_mels) for segment in segments])
+        # Greedy-Dekodierung: Whispers Beam Search wiederholt die Encoder-Ausgabe nicht
+        # für die Beam-Gruppen und bricht bei mehr als einem Fenster pro Batch ab.
+        # Unsichere Fenster werden einzeln mit Beam Search wiederholt.
+        options = whisper.DecodingOptions(task="transcribe", without_timestamps=not timestamps,
+                                          fp16=self.whisper_device == "cuda")
+        with open(os.devnull, 'w') as fnull:
+            with contextlib.redirect_stdout(fnull), contextlib.redirect_stderr(fnull):
+                return whisper.decode(model, mel.to(self.whisper_device), options)
+
+    def _transcribe_audio_diarization(self, audio_path):
+        audio = self._load_audio(audio_path)
+        regions = self._regions(audio, audio_path)
+        checkpoint = self._checkpoint(audio_path)
+
+        results = []
+
+        for start, end, speaker in self._diarize_regions(audio, regions, audio_path):
+            segment = self._extract_segment(audio, SAMPLE_RATE, start, end)
+
+            if segment.shape[-1] == 0:
+                print(f"Skipping empty segment for speaker {speaker} from {start:.2f} to {end:.2f}")
+                continue
+
+            saved = checkpoint.get(KIND_PIECES, (start, end, speaker)) if checkpoint else None
+            if saved is not None:
+                results.append({"speaker": speaker, "start": start, "end": end, **saved})
+                continue
+
+            fields = {}
+            try:
+                with self._turn(audio_path, start, end, speaker):
+                    text = self._transcribe_segment(segment, fields, start)
+            except Exception as e:
+                print(f"Error transcribing segment {speaker} {start:.2f}-{end:.2f}: {e}")
+                text = TRANSCRIPTION_ERROR
+            if checkpoint is not None and text != TRANSCRIPTION_ERROR:
+                checkpoint.put(KIND_PIECES, (start, end, speaker), {"text": text, **fields})
             
             results.append({
                 "speaker": speaker,
-                "start": turn.start,
-                "end": turn.end,
-                "text": text
+                "start": start,
+                "end": end,
+                "text": text,
+                **fields
             })
-            
-            try:
-                os.remove(tmp_path)
-            except OSError as e:
-                print(f"Error deleting temporary file {tmp_path}: {e}")
 
+        pieces = self._merge_fingerprints(audio_path, results)
+        self._keep_segments(audio_path, pieces)
+        return [{key: piece[key] for key in RESULT_KEYS} for piece in pieces]
 
-        return results
+    def _basic_parts(self, audio_path):
+        """
+        Returns:
+            list: Tupel (offset, audio) der zu transkribierenden Bereiche ohne Diarisierung.
+        """
+        audio = self._load_audio(audio_path)
+        regions = self._regions(audio, audio_path)
+        parts = [(0.0, audio)] if regions is None else \
+            [(start, self._extract_segment(audio, SAMPLE_RATE, start, end)) for start, end in regions]
+        return [(offset, region) for offset, region in parts if region.shape[-1] != 0]
 
     def _transcribe_audio_basic(self, audio_path):
-        with open(os.devnull, 'w') as fnull:
-            with contextlib.redirect_stdout(fnull), contextlib.redirect_stderr(fnull):
-                result = self.whisper_model.transcribe(audio_path, task="transcribe", beam_size=5)
-        
-        segments = result.get("segments", [])
-        transcription = "\n".join(segment["text"].strip() for segment in segments)
+        checkpoint = self._checkpoint(audio_path)
+        pieces = []
+        for offset, region in self._basic_parts(audio_path):
+            if checkpoint is not None:
+                pieces.extend(self._transcribe_windows(audio_path, checkpoint, offset, region))
+                continue
+            end = offset + region.shape[-1] / SAMPLE_RATE
+            with self._turn(audio_path, offset, end):
+                result = self._whisper_transcribe(region)
+            pieces.extend(self._segment_pieces(result.get("segments", []), offset, end))
+
+        pieces = self._merge_fingerprints(audio_path, pieces)
+        self._keep_segments(audio_path, pieces)
+        transcription = "\n".join(piece["text"] for piece in pieces)
         return transcription
+
+    def _segment_pieces(self, segments, offset, end):
+        pieces = []
+        for segment in segments:
+            piece = {"start": offset + segment.get("start", 0.0),
+                     "end": offset + segment["end"] if "end" in segment else end,
+                     "text": segment["text"].strip()}
+            if self.structured:
+                piece.update(turn_fields([segment], offset))
+            pieces.append(piece)
+        return pieces
+
+    def _transcribe_windows(self, audio_path, checkpoint, offset, region):
+        """
+        Transkribiert einen Bereich in 30-Sekunden-Fenstern und sichert jedes Fenster sofort.
+
+        Wie Whispers eigene Schleife endet ein Fenster nach dem letzten vollständigen
+        Whisper-Segment; dort beginnt das nächste, und der Text des vorigen Fensters
+        geht als initial_prompt mit. Nach einem Abbruch wird ab dem ersten nicht
+        gesicherten Fenster fortgesetzt.
+
+        Returns:
+            list: Die Stücke des Bereichs mit Zeiten in der Datei.
+        """
+        length = region.shape[-1]
+        seek = 0
+        prompt = None
+        pieces = []
+        while seek < length:
+            start = offset + seek / SAMPLE_RATE
+            saved = checkpoint.get(KIND_WINDOW, (start,))
+            if saved is None:
+                window = region[seek:seek + N_SAMPLES]
+                end = start + window.shape[-1] / SAMPLE_RATE
+                with self._turn(audio_path, start, end):
+                    result = self._whisper_transcribe(window, initial_prompt=prompt)
+                segments, next_seek = self._cut_window(result.get("segments", []), seek, window.shape[-1], length)
+                end = start + (next_seek - seek) / SAMPLE_RATE
+                saved = {"pieces": self._segment_pieces(segments, start, end), "next": next_seek}
+                checkpoint.put(KIND_WINDOW, (start,), saved)
+            pieces.extend(saved["pieces"])
+            seek = saved["next"]
+            prompt = " ".join(piece["text"] for piece in saved["pieces"] if piece["text"]) or prompt
+        return pieces
            
 
 def save_results_to_file(results, output_filepath):
@@ -0,0 +1,268 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+from .segment_index import TIMESTAMP_FORMAT, parse_segment_filename
+
+BACKFILL_DB = "backfill.db"
+
+ORDER_OLDEST = "oldest"
+ORDER_NEWEST = "newest"
+ORDER_SHORTEST = "shortest"
+ORDERS = (ORDER_OLDEST, ORDER_NEWEST, ORDER_SHORTEST)
+
+STATE_PENDING = "pending"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+# Nach so vielen abgebrochenen Versuchen (Absturz oder Fehler während der
+# Transkription) wird ein Segment übersprungen, damit es den Backfill nicht blockiert.
+MAX_ATTEMPTS = 3
+
+
+def parse_shard(value):
+    """
+    Zerlegt eine Shard-Angabe der Form K/N.
+
+    Returns:
+        tuple: (K, N) mit 1 <= K <= N.
+
+    Raises:
+        ValueError: Bei ungültiger Angabe.
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Ungültiger Shard {value!r}, erwartet K/N (z.B. 1/4).") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"Ungültiger Shard {value!r}: K muss zwischen 1 und N liegen.")
+    return index, count
+
+
+def in_shard(name, shard):
+    """
+    Prüft, ob ein Segment zum Shard gehört.
+
+    Die Zuordnung hängt nur vom Dateinamen ab und ist damit über Aufrufe und
+    Rechner hinweg stabil; N Aufrufe mit 1/N bis N/N decken alle Segmente genau einmal ab.
+    """
+    if shard is None:
+        return True
+    index, count = shard
+    return zlib.crc32(os.path.basename(name).encode("utf-8")) % count == index - 1
+
+
+def _duration(name):
+    parsed = parse_segment_filename(name)
+    if parsed is None or parsed[2] is None:
+        return None
+    return (parsed[2] - parsed[1]).total_seconds()
+
+
+def _format_eta(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressBar:
+    """
+    Fortschrittsanzeige für den Backfill mit ETA nach Audiodauer.
+
+    Die ETA ergibt sich aus der bisher in diesem Lauf pro Sekunde Rechenzeit
+    transkribierten Audiodauer. Auf einem Terminal wird die Zeile überschrieben,
+    sonst (cron, Logdatei) je Segment eine neue Zeile geschrieben.
+    """
+    WIDTH = 30
+
+    def __init__(self, label, total_files, total_seconds, stream=None, clock=time.monotonic):
+        self.label = label
+        self.total_files = total_files
+        self.total_seconds = total_seconds
+        self.done_files = 0
+        self.done_seconds = 0.0
+        self.stream = stream or sys.stderr
+        self.clock = clock
+        self.started = clock()
+        self._lock = threading.Lock()
+
+    def eta(self):
+        """
+        Returns:
+            float: Verbleibende Sekunden, oder None, solange noch nichts erledigt ist.
+        """
+        elapsed = self.clock() - self.started
+        if self.total_seconds and self.done_seconds:
+            return (self.total_seconds - self.done_seconds) * elapsed / self.done_seconds
+        if not self.total_seconds and self.done_files:
+            return (self.total_files - self.done_files) * elapsed / self.done_files
+        return None
+
+    def render(self):
+        if self.total_seconds:
+            fraction = self.done_seconds / self.total_seconds
+        else:
+            fraction = self.done_files / self.total_files if self.total_files else 1.0
+        filled = int(self.WIDTH * min(1.0, fraction))
+        eta = self.eta()
+        return (f"{self.label} [{'#' * filled}{'.' * (self.WIDTH - filled)}] {fraction:5.1%} "
+                f"{self.done_files}/{self.total_files} Segmente, "
+                f"{self.done_seconds / 3600:.1f}/{self.total_seconds / 3600:.1f} h Audio, "
+                f"ETA {_format_eta(eta) if eta is not None else '-'}")
+
+    def update(self, audio_seconds):
+        """Verbucht ein fertiges Segment und gibt die Anzeige aus."""
+        with self._lock:
+            self.done_files += 1
+            self.done_seconds += audio_seconds or 0.0
+            line = self.render()
+            if self.stream.isatty():
+                end = "\n" if self.done_files >= self.total_files else ""
+                self.stream.write("\r" + line + end)
+            else:
+                self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class Backfill:
+    """
+    Persistentes Auftragsjournal für --transcribe-only (SQLite unter dem Senderverzeichnis).
+
+    Jedes Segment des Zeitraums wird als Auftrag mit Zustand pending, running,
+    done oder failed geführt. Ein abgebrochener Lauf hinterlässt seine laufenden
+    Aufträge als running; der nächste Aufruf setzt sie zurück und macht genau dort
+    weiter. Mehrere Aufrufe mit verschiedenen Shards können dasselbe Journal nutzen.
+    """
+    def __init__(self, db_path, order=ORDER_OLDEST, shard=None, logger=None, stream=None):
+        """
+        Args:
+            db_path (str): Pfad der Journal-Datenbank.
+            order (str, optional): Reihenfolge: oldest, newest oder shortest. Standardmäßig oldest.
+            shard (tuple, optional): (K, N), um nur den K-ten von N Teilen zu bearbeiten.
+            logger (logging.Logger, optional): Logger für Zusammenfassungen.
+            stream (file, optional): Ziel der Fortschrittsanzeige. Standardmäßig stderr.
+        """
+        if order not in ORDERS:
+            raise ValueError(f"Unbekannte Reihenfolge {order!r}, erlaubt: {', '.join(ORDERS)}.")
+        self.db_path = db_path
+        self.order = order
+        self.shard = shard
+        self.logger = logger
+        self.stream = stream
+        self.progress = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    name TEXT PRIMARY KEY,
+                    start_time TEXT NOT NULL,
+                    duration REAL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    started REAL,
+                    finished REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _ordered(self, jobs):
+        if self.order == ORDER_NEWEST:
+            return sorted(jobs, key=lambda job: (job[1], job[0]), reverse=True)
+        if self.order == ORDER_SHORTEST:
+            return sorted(jobs, key=lambda job: (job[2] if job[2] is not None else float("inf"), job[1], job[0]))
+        return sorted(jobs, key=lambda job: (job[1], job[0]))
+
+    def plan(self, candidates):
+        """
+        Trägt die offenen Segmente ins Journal ein und legt die Reihenfolge fest.
+
+        Args:
+            candidates (list): Tupel (audio_file, start_time) aus SegmentIndex.pending().
+
+        Returns:
+            list: Die zu bearbeitenden Pfade dieses Shards in der gewählten Reihenfolge.
+        """
+        paths = {}
+        jobs = []
+        for audio_file, start_time in candidates:
+            name = os.path.basename(audio_file)
+            if not in_shard(name, self.shard):
+                continue
+            paths[name] = audio_file
+            jobs.append((name, start_time.strftime(TIMESTAMP_FORMAT), _duration(name)))
+
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT OR IGNORE INTO jobs (name, start_time, duration, state) VALUES (?, ?, ?, ?)",
+                                 [job + (STATE_PENDING,) for job in jobs])
+                # Laufende Aufträge stammen aus einem abgebrochenen Lauf, erledigte ohne
+                # Transkription wurden seither gelöscht; beide kommen erneut an die Reihe.
+                conn.executemany("UPDATE jobs SET state = ? WHERE name = ? AND state = ?",
+                                 [(STATE_PENDING, name, STATE_RUNNING) for name in paths])
+                conn.executemany("UPDATE jobs SET state = ?, attempts = 0 WHERE name = ? AND state = ?",
+                                 [(STATE_PENDING, name, STATE_DONE) for name in paths])
+                conn.execute("UPDATE jobs SET state = ? WHERE state = ? AND attempts >= ?",
+                             (STATE_FAILED, STATE_PENDING, MAX_ATTEMPTS))
+                states = dict(conn.execute("SELECT name, state FROM jobs").fetchall())
+                done, done_seconds = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(duration), 0) FROM jobs WHERE state = ?", (STATE_DONE,)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        failed = [name for name in paths if states.get(name) == STATE_FAILED]
+        jobs = self._ordered([job for job in jobs if states.get(job[0]) == STATE_PENDING])
+        total_seconds = sum(job[2] or 0 for job in jobs)
+        if self.logger:
+            shard = f" (Shard {self.shard[0]}/{self.shard[1]})" if self.shard else ""
+            self.logger.info("Backfill%s: %d Segmente offen (%.1f h Audio), %d bereits erledigt (%.1f h), Reihenfolge: %s",
+                             shard, len(jobs), total_seconds / 3600, done, done_seconds / 3600, self.order)
+            for name in failed:
+                self.logger.warning("Backfill: %s nach %d Versuchen übersprungen.", name, MAX_ATTEMPTS)
+        label = f"Shard {self.shard[0]}/{self.shard[1]}" if self.shard else "Backfill"
+        self.progress = ProgressBar(label, len(jobs), total_seconds, stream=self.stream)
+        return [paths[job[0]] for job in jobs]
+
+    def start(self, audio_file):
+        """Markiert einen Auftrag als laufend und zählt den Versuch."""
+        with self._lock:
+            self._connection().execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, started = ? WHERE name = ?",
+                (STATE_RUNNING, time.time(), os.path.basename(audio_file)))
+
+    def complete(self, audio_file):
+        """Markiert einen Auftrag als erledigt und aktualisiert die Fortschrittsanzeige."""
+        name = os.path.basename(audio_file)
+        with self._lock:
+            self._connection().execute("UPDATE jobs SET state = ?, finished = ? WHERE name = ?",
+                                       (STATE_DONE, time.time(), name))
+        if self.progress is not None:
+            self.progress.update(_duration(name))
+
+    def counts(self):
+        """
+        Returns:
+            dict: Anzahl der Aufträge je Zustand.
+        """
+        with self._lock:
+            return dict(self._connection().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
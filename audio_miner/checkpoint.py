@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+
+CHECKPOINT_DIR = "checkpoints"
+
+KIND_DIARIZATION = "diarization"
+KIND_PIECES = "pieces"
+KIND_WINDOW = "window"
+
+
+def _rounded(value):
+    if isinstance(value, float):
+        return round(value, 3)
+    if isinstance(value, (list, tuple)):
+        return [_rounded(item) for item in value]
+    return value
+
+
+def _round_key(key):
+    return json.dumps(_rounded(key))
+
+
+class Checkpoint:
+    """
+    Zwischenstände einer laufenden Transkription, als JSON-Zeilen unter <directory>/<segment>.jsonl.
+
+    Jede fertige Einheit (Diarisierung, ein Turn, ein 30-Sekunden-Fenster oder ein
+    Sprachbereich) wird sofort angehängt und auf die Platte geschrieben. Wird der
+    Prozess abgebrochen, übernimmt der nächste Durchlauf die gespeicherten Einheiten
+    und rechnet nur die fehlenden. Die erste Zeile hält Größe und Änderungszeit der
+    Audiodatei und die Einstellungen des Transcribers; passen sie nicht mehr, wird
+    der Zwischenstand verworfen.
+    """
+    def __init__(self, directory, audio_path, params):
+        """
+        Args:
+            directory (str): Verzeichnis der Zwischenstände.
+            audio_path (str): Pfad der Audiodatei.
+            params (dict): Einstellungen, die das Ergebnis beeinflussen.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, os.path.splitext(os.path.basename(audio_path))[0] + ".jsonl")
+        stat = os.stat(audio_path)
+        self.header = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "params": params}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+        entries = {}
+        valid = False
+        damaged = False
+        for number, line in enumerate(lines):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Beim Abbruch nur teilweise geschriebene letzte Zeile.
+                damaged = True
+                continue
+            if number == 0:
+                valid = record == self.header
+                if not valid:
+                    break
+                continue
+            entries[(record["kind"], record["key"])] = record["value"]
+        if valid:
+            self._entries = entries
+            if damaged:
+                # Sonst hinge put() die nächste Einheit an die unvollständige Zeile an.
+                self._rewrite()
+        else:
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self.header) + "\n")
+
+    def _rewrite(self):
+        """Schreibt Kopfzeile und alle gültigen Einheiten neu und ersetzt die Datei atomar."""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.header) + "\n")
+            for (kind, key), value in self._entries.items():
+                f.write(json.dumps({"kind": kind, "key": key, "value": value}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, kind, key):
+        """
+        Liefert eine gespeicherte Einheit.
+
+        Args:
+            kind (str): KIND_DIARIZATION oder KIND_PIECES.
+            key (tuple): Zeiten (und Sprecher) der Einheit; Sekunden werden auf ms gerundet.
+
+        Returns:
+            Der gespeicherte Wert, oder None.
+        """
+        return self._entries.get((kind, _round_key(key)))
+
+    def put(self, kind, key, value):
+        """Speichert eine fertige Einheit und schreibt sie sofort auf die Platte."""
+        key = _round_key(key)
+        line = json.dumps({"kind": kind, "key": key, "value": value}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._entries[(kind, key)] = value
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def discard(self):
+        """Entfernt den Zwischenstand, sobald das Ergebnis vollständig vorliegt."""
+        with self._lock:
+            self._entries = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -1,11 +1,18 @@
 import argparse
+import sys
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in SUBCOMMANDS:
+        return SUBCOMMANDS[argv[0]](argv[1:])
 
-def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--stream-url', required=False,
                     help='URL des Radiosenders (optional bei --transcribe-only)')
-    parser.add_argument('--sender', required=True,
-                        help='Name des Radiosenders')
+    parser.add_argument('--sender', required=False,
+                        help='Name des Radiosenders (optional bei --stations)')
+    parser.add_argument('--stations', default=None,
+                        help='JSON-Datei mit einer Senderliste. Alle Sender laufen in einem Prozess und teilen sich die Transkriptionsmodelle.')
     parser.add_argument('--segment-time', type=int, default=3600,
                         help='Länge eines Segments in Sekunden')
     parser.add_argument('--base-dir', default=None,
@@ -16,6 +23,10 @@ def main():
                         help='Whisper Modell (z.B. TURBO, BASE, etc.)')
     parser.add_argument('--quality', default=None,
                         help='Audio-Qualität für die Aufnahme (z.B. 32k, 64k). Standard ist die Qualität des Streams beizubehalten.')
+    parser.add_argument('--continuous', action='store_true',
+                        help='Hält eine einzige ffmpeg-Verbindung offen und schneidet die Segmente lückenlos mit dem segment-Muxer.')
+    parser.add_argument('--async-recording', action='store_true',
+                        help='Mit --stations: überwacht die ffmpeg-Prozesse aller Sender aus einer asyncio-Schleife statt mit einem Thread je Sender (fortlaufende Aufnahme wie --continuous). Für Hunderte Sender in einem Prozess.')
     parser.add_argument('--record-only', action='store_true',
                         help='Nur aufzeichnen, ohne Transkription.')
     parser.add_argument('--transcribe-only', action='store_true',
@@ -24,13 +35,128 @@ def main():
                         help='Startzeitpunkt für die Transkription (Format: YYYYMMDD_HHMMSS), nur relevant bei --transcribe-only.')
     parser.add_argument('--end-time', type=str, default=None,
                         help='Endzeitpunkt für die Transkription (Format: YYYYMMDD_HHMMSS), nur relevant bei --transcribe-only.')
+    parser.add_argument('--backfill-order', choices=['oldest', 'newest', 'shortest'], default='oldest',
+                        help='Reihenfolge bei --transcribe-only: älteste, neueste oder kürzeste Segmente zuerst. Standard: oldest.')
+    parser.add_argument('--shard', default=None,
+                        help='Bei --transcribe-only nur den K-ten von N Teilen bearbeiten (Format K/N), um den Backfill auf mehrere Aufrufe zu verteilen.')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='Anzahl der 30-Sekunden-Fenster, die Whisper gemeinsam verarbeitet. Bei mehr als 1 werden auch wartende Segmente gemeinsam transkribiert.')
+    parser.add_argument('--transcription-workers', type=int, default=1,
+                        help='Anzahl der Transkriptions-Prozesse. Die Modelle werden einmal geladen und per fork() mit allen Workern geteilt.')
+    parser.add_argument('--torch-threads', type=int, default=None,
+                        help='torch-Threads je Transkriptions-Worker. Standard: verfügbare Kerne geteilt durch --transcription-workers.')
+    parser.add_argument('--reserve-recording-cores', type=int, default=0,
+                        help='Anzahl der CPU-Kerne, die der Aufnahme (ffmpeg) vorbehalten bleiben. Die Transkription wird auf die übrigen Kerne gepinnt. Standard: 0.')
+    parser.add_argument('--transcription-nice', type=int, default=0,
+                        help='nice-Wert der Transkriptions-Threads und -Worker (0 bis 19), damit die Aufnahme Vorrang hat. Standard: 0.')
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help='Baut den Segment-Index (segments.db) beim Start einmal neu aus dem audio-Verzeichnis auf.')
+    parser.add_argument('--stall-timeout', type=float, default=120,
+                        help='Sekunden ohne neue Audiodaten, nach denen ffmpeg als hängend gilt und neu gestartet wird. Standard: 120.')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Live-Transkription: ffmpeg liefert zusätzlich 16 kHz PCM, der Text erscheint nach wenigen Sekunden. Setzt --continuous voraus und aktiviert es automatisch.')
+    parser.add_argument('--streaming-step', type=float, default=2.0,
+                        help='Sekunden neues Audio je Live-Transkriptionsdurchlauf. Standard: 2.0.')
+    parser.add_argument('--speech-gate', action='store_true',
+                        help='Erkennt Musik und Stille vorab und gibt nur Sprachabschnitte an Whisper und PyAnnote weiter.')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Verzeichnis für den Cache der Zwischenergebnisse (dekodiertes Audio, Diarisierung, Whisper-Ausgabe). Ohne Angabe kein Cache.')
+    parser.add_argument('--cache-size', type=float, default=10,
+                        help='Maximale Größe des Caches in GiB. Standard: 10.')
+    parser.add_argument('--fingerprints', action='store_true',
+                        help='Erkennt wiederholte Werbung und Jingles über akustische Fingerabdrücke (fingerprints.db im Basisverzeichnis) und übernimmt deren Transkript.')
+    parser.add_argument('--checkpoints', action='store_true',
+                        help='Speichert fertige Turns und Fenster laufender Transkriptionen (checkpoints/ im Basisverzeichnis); nach einem Abbruch wird mitten im Segment fortgesetzt.')
+    parser.add_argument('--job-queue', action='store_true',
+                        help='Führt die Transkriptionsaufträge dauerhaft in jobs.db im Senderverzeichnis, mit Leases, Wiederholungen mit Backoff und Quarantäne. Mehrere Prozesse können dieselbe Warteschlange abarbeiten; mit --record-only werden die Segmente nur eingereiht.')
+    parser.add_argument('--follow', action='store_true',
+                        help='Mit --transcribe-only --job-queue auf neue Aufträge warten, statt nach dem Abarbeiten zu beenden.')
+    parser.add_argument('--load-shedding', nargs='?', const='30,60,120,240', default=None, metavar='MINUTEN',
+                        help='Senkt bei Rückstand der Live-Transkription stufenweise die Qualität: ab den angegebenen Minuten Rückstand Greedy-Dekodierung, keine Diarisierung, --fallback-model und zuletzt Zurückstellen für den Backfill. Standard: 30,60,120,240.')
+    parser.add_argument('--fallback-model', default='BASE',
+                        help='Whisper Modell für die dritte Stufe von --load-shedding. Standard: BASE.')
+    parser.add_argument('--upgrade-degraded', action='store_true',
+                        help='Transkribiert bei --transcribe-only auch die unter --load-shedding reduziert transkribierten Segmente erneut in voller Qualität.')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Stellt Metriken im Prometheus-Format unter http://<host>:<port>/metrics bereit. Ohne Angabe kein Endpunkt.')
+    parser.add_argument('--metrics-host', default="127.0.0.1",
+                        help='Adresse für den Metrik-Endpunkt. Standard: 127.0.0.1.')
+    parser.add_argument('--output-format', nargs='+', choices=['txt', 'jsonl', 'parquet'], default=['txt'],
+                        help='Ausgabeformate der Transkripte, z.B. "txt jsonl". jsonl und parquet enthalten Sender, Uhrzeiten, Sprecher, Konfidenz und Wortzeitstempel. Standard: txt.')
+    parser.add_argument('--search-index', action='store_true',
+                        help='Nimmt jedes Transkript in den Volltextindex (search.db im Basisverzeichnis) für "audio_miner search" auf.')
+    parser.add_argument('--compact', action='store_true',
+                        help='Verdichtet transkribierte Segmente im Hintergrund zu Mono-Opus (.opus) und löscht das Original nach erfolgreicher Prüfung.')
+    parser.add_argument('--compaction-bitrate', default='16k',
+                        help='Opus-Bitrate für --compact. Standard: 16k.')
+    parser.add_argument('--compaction-rate', type=float, default=None,
+                        help='Höchstens so viele MB/s an Originalen für --compact lesen. Ohne Angabe keine Begrenzung.')
+    parser.add_argument('--compaction-nice', type=int, default=10,
+                        help='nice-Wert für die ffmpeg-Prozesse von --compact. Standard: 10.')
+    parser.add_argument('--daemon-socket', default=None,
+                        help='Transkribiert über einen laufenden "audio_miner daemon" an diesem Unix-Socket, statt die Modelle selbst zu laden.')
     parser.add_argument('--token', type=str, default=None,
                         help='Huggingface Token für PyAnnote, wenn benötigt.')
     parser.add_argument('--ffmpeg-path', default=None,
                         help='Pafd zur ffmpeg-Binary. Ansonsnten wird ffmpeg im PATH gesucht.')
     parser.add_argument('--verbose', action='store_true',
                         help='Ausführliche Ausgabe')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+
+    if args.streaming and (args.record_only or args.transcribe_only):
+        parser.error("--streaming kann nicht mit --record-only oder --transcribe-only kombiniert werden.")
+
+    if args.async_recording and (not args.stations or args.transcribe_only or args.streaming):
+        parser.error("--async-recording ist nur mit --stations möglich, nicht mit --transcribe-only oder --streaming.")
+
+    if 'parquet' in args.output_format:
+        from .structured_output import PYARROW_MISSING
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error(PYARROW_MISSING)
+
+    shard = None
+    if args.shard:
+        if not args.transcribe_only:
+            parser.error("--shard ist nur mit --transcribe-only möglich.")
+        from .backfill import parse_shard
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
+    load_shedding = None
+    if args.load_shedding:
+        if args.record_only or args.transcribe_only:
+            parser.error("--load-shedding gilt nur für die Live-Transkription, nicht mit --record-only oder --transcribe-only.")
+        from .load_shedding import parse_thresholds
+        try:
+            load_shedding = parse_thresholds(args.load_shedding)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.follow and not (args.transcribe_only and args.job_queue):
+        parser.error("--follow ist nur mit --transcribe-only und --job-queue möglich.")
+
+    if args.upgrade_degraded and not args.transcribe_only:
+        parser.error("--upgrade-degraded ist nur mit --transcribe-only möglich.")
+
+    if args.reserve_recording_cores or args.transcription_nice:
+        if args.record_only:
+            parser.error("--reserve-recording-cores und --transcription-nice betreffen die Transkription, nicht --record-only.")
+        from .resources import ResourceBudget
+        try:
+            ResourceBudget(args.reserve_recording_cores, args.transcription_nice)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.stations:
+        run_stations(args, shard, load_shedding)
+        return
+
+    if not args.sender:
+        parser.error("--sender ist erforderlich, wenn nicht --stations genutzt wird.")
 
     if not args.transcribe_only and not args.stream_url:
         parser.error("--stream-url ist erforderlich, wenn nicht --transcribe-only genutzt wird.")
@@ -54,8 +180,146 @@ def main():
         token=args.token,
         ffmpeg_path=args.ffmpeg_path,
         verbose=args.verbose,
+        continuous=args.continuous,
+        batch_size=args.batch_size,
+        transcription_workers=args.transcription_workers,
+        torch_threads=args.torch_threads,
+        rebuild_index=args.rebuild_index,
+        stall_timeout=args.stall_timeout,
+        streaming=args.streaming,
+        streaming_step=args.streaming_step,
+        speech_gate=args.speech_gate,
+        cache_dir=args.cache_dir,
+        cache_size=int(args.cache_size * 1024 ** 3),
+        fingerprints=args.fingerprints,
+        daemon_socket=args.daemon_socket,
+        backfill_order=args.backfill_order,
+        shard=shard,
+        output_formats=tuple(args.output_format),
+        search_index=args.search_index,
+        compaction=args.compact,
+        compaction_bitrate=args.compaction_bitrate,
+        compaction_rate=args.compaction_rate * 1e6 if args.compaction_rate else None,
+        compaction_nice=args.compaction_nice,
+        checkpoints=args.checkpoints,
+        load_shedding=load_shedding,
+        fallback_model=WhisperModel[args.fallback_model.upper()],
+        upgrade_degraded=args.upgrade_degraded,
+        job_queue=args.job_queue,
+        follow=args.follow,
+        reserve_recording_cores=args.reserve_recording_cores,
+        transcription_nice=args.transcription_nice,
     )
+    start_metrics(args)
     recorder.run()
 
+def start_metrics(args):
+    """
+    Startet den Metrik-Endpunkt, falls --metrics-port gesetzt ist.
+
+    Erst aufrufen, wenn der Recorder gebaut ist: Dessen Worker-Pool forkt im
+    Konstruktor, und ein bereits laufender Server-Thread könnte beim fork()
+    Sperren der Registry oder des Servers halten.
+    """
+    if args.metrics_port is not None:
+        from .metrics import start_metrics_server
+        start_metrics_server(args.metrics_port, args.metrics_host)
+
+def run_stations(args, shard=None, load_shedding=None):
+    from .main import WhisperModel
+    from .multi_station import MultiStationRecorder, load_stations
+
+    stations = load_stations(args.stations)
+    recorder = MultiStationRecorder(
+        stations,
+        base_dir=args.base_dir,
+        whisper_model=WhisperModel[args.whisper_model.upper()],
+        record_only=args.record_only,
+        transcribe_only=args.transcribe_only,
+        start_time_str=args.start_time if args.transcribe_only else None,
+        end_time_str=args.end_time if args.transcribe_only else None,
+        token=args.token,
+        ffmpeg_path=args.ffmpeg_path,
+        verbose=args.verbose,
+        segment_time=args.segment_time,
+        poll_interval=args.poll_interval,
+        quality=args.quality,
+        continuous=args.continuous,
+        batch_size=args.batch_size,
+        transcription_workers=args.transcription_workers,
+        torch_threads=args.torch_threads,
+        rebuild_index=args.rebuild_index,
+        stall_timeout=args.stall_timeout,
+        streaming=args.streaming,
+        streaming_step=args.streaming_step,
+        speech_gate=args.speech_gate,
+        cache_dir=args.cache_dir,
+        cache_size=int(args.cache_size * 1024 ** 3),
+        fingerprints=args.fingerprints,
+        daemon_socket=args.daemon_socket,
+        backfill_order=args.backfill_order,
+        shard=shard,
+        output_formats=tuple(args.output_format),
+        search_index=args.search_index,
+        compaction=args.compact,
+        compaction_bitrate=args.compaction_bitrate,
+        compaction_rate=args.compaction_rate * 1e6 if args.compaction_rate else None,
+        compaction_nice=args.compaction_nice,
+        checkpoints=args.checkpoints,
+        load_shedding=load_shedding,
+        fallback_model=WhisperModel[args.fallback_model.upper()],
+        upgrade_degraded=args.upgrade_degraded,
+        job_queue=args.job_queue,
+        follow=args.follow,
+        async_recording=args.async_recording,
+        reserve_recording_cores=args.reserve_recording_cores,
+        transcription_nice=args.transcription_nice,
+    )
+    start_metrics(args)
+    recorder.run()
+
+def run_cache(argv):
+    from .stage_cache import cache_main
+    cache_main(argv)
+
+def run_fingerprints(argv):
+    from .fingerprint import fingerprints_main
+    fingerprints_main(argv)
+
+def run_compact(argv):
+    from .compaction import compact_main
+    compact_main(argv)
+
+def run_daemon(argv):
+    from .daemon import daemon_main
+    daemon_main(argv)
+
+def run_export(argv):
+    from .structured_output import export_main
+    export_main(argv)
+
+def run_jobs(argv):
+    from .job_queue import jobs_main
+    jobs_main(argv)
+
+def run_search(argv):
+    from .search_index import search_main
+    search_main(argv)
+
+def run_traces(argv):
+    from .tracing import traces_main
+    traces_main(argv)
+
+SUBCOMMANDS = {
+    "cache": run_cache,
+    "compact": run_compact,
+    "daemon": run_daemon,
+    "export": run_export,
+    "fingerprints": run_fingerprints,
+    "jobs": run_jobs,
+    "search": run_search,
+    "traces": run_traces,
+}
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
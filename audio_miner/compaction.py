@@ -0,0 +1,208 @@
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+COMPACT_EXTENSION = ".opus"
+DEFAULT_BITRATE = "16k"
+DEFAULT_NICE = 10
+COMPACTION_INTERVAL = 60
+
+# Zulässige Abweichung der Dauer zwischen Original und verdichteter Fassung:
+# eine Sekunde oder ein Prozent, je nachdem, was größer ist.
+DURATION_TOLERANCE_SECONDS = 1.0
+DURATION_TOLERANCE_RATIO = 0.01
+
+
+def ffprobe_path_for(ffmpeg_path):
+    """Sucht ffprobe neben der verwendeten ffmpeg-Binary, sonst im PATH."""
+    directory = os.path.dirname(ffmpeg_path or "")
+    if directory:
+        candidate = os.path.join(directory, "ffprobe")
+        if os.path.exists(candidate):
+            return candidate
+    return shutil.which("ffprobe") or "ffprobe"
+
+
+def probe_duration(ffprobe_path, audio_file):
+    """
+    Ermittelt die Dauer einer Audiodatei mit ffprobe.
+
+    Returns:
+        float: Dauer in Sekunden, oder None, wenn die Datei nicht lesbar ist.
+    """
+    try:
+        result = subprocess.run(
+            [ffprobe_path, "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", audio_file],
+            capture_output=True, text=True, timeout=120)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def compact_command(ffmpeg_path, source, target, bitrate=DEFAULT_BITRATE):
+    """Baut den ffmpeg-Aufruf für die Umwandlung in Mono-Opus mit Sprachprofil."""
+    return [ffmpeg_path, "-hide_banner", "-loglevel", "error", "-y", "-i", source,
+            "-vn", "-map_metadata", "0", "-ac", "1",
+            "-c:a", "libopus", "-b:a", bitrate, "-application", "voip",
+            "-f", "opus", target]
+
+
+class Compactor:
+    """
+    Verdichtet transkribierte Segmente zu Mono-Opus mit niedriger Bitrate.
+
+    Die neue Datei behält den Namen des Segments mit der Endung .opus und wird
+    erst nach einer Prüfung (lesbar, Dauer wie das Original) an ihren Platz
+    gebracht; danach wird der Segment-Index umgestellt und das Original gelöscht.
+    ffmpeg läuft mit erhöhtem nice-Wert, der Durchsatz lässt sich begrenzen,
+    damit Aufnahme und Transkription nicht ausgebremst werden.
+    """
+    def __init__(self, segment_index, ffmpeg_path="ffmpeg", bitrate=DEFAULT_BITRATE, nice=DEFAULT_NICE,
+                 max_bytes_per_second=None, logger=None, sleep=time.sleep, clock=time.monotonic):
+        """
+        Args:
+            segment_index (SegmentIndex): Index des Senders; liefert die Kandidaten.
+            ffmpeg_path (str, optional): Pfad zur ffmpeg-Binary.
+            bitrate (str, optional): Opus-Bitrate, z.B. "16k". Standard: 16k.
+            nice (int, optional): nice-Wert für ffmpeg. Standard: 10.
+            max_bytes_per_second (float, optional): Höchster Lesedurchsatz über die Originale.
+                                                    Ohne Angabe keine Begrenzung.
+            logger (logging.Logger, optional): Logger des Recorders.
+        """
+        self.segment_index = segment_index
+        self.ffmpeg_path = ffmpeg_path
+        self.ffprobe_path = ffprobe_path_for(ffmpeg_path)
+        self.bitrate = bitrate
+        self.nice = nice
+        self.max_bytes_per_second = max_bytes_per_second
+        self.logger = logger or logging.getLogger(__name__)
+        self._sleep = sleep
+        self._clock = clock
+
+    def _preexec(self):
+        if self.nice:
+            os.nice(self.nice)
+
+    def _verify(self, source_duration, target):
+        if not os.path.exists(target) or os.path.getsize(target) == 0:
+            return False
+        duration = probe_duration(self.ffprobe_path, target)
+        if duration is None:
+            return False
+        tolerance = max(DURATION_TOLERANCE_SECONDS, source_duration * DURATION_TOLERANCE_RATIO)
+        return abs(duration - source_duration) <= tolerance
+
+    def compact(self, audio_file):
+        """
+        Verdichtet ein Segment.
+
+        Returns:
+            int: Eingesparte Bytes, oder None, wenn das Original unverändert bleibt.
+        """
+        target = os.path.splitext(audio_file)[0] + COMPACT_EXTENSION
+        part_file = target + ".part"
+        source_duration = probe_duration(self.ffprobe_path, audio_file)
+        if source_duration is None:
+            self.logger.warning("Verdichtung übersprungen, Segment nicht lesbar: %s", audio_file)
+            return None
+        try:
+            result = subprocess.run(compact_command(self.ffmpeg_path, audio_file, part_file, self.bitrate),
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                    preexec_fn=self._preexec if os.name == "posix" else None)
+            ok = result.returncode == 0 and self._verify(source_duration, part_file)
+        except OSError as e:
+            self.logger.error("ffmpeg für die Verdichtung nicht ausführbar: %s", e)
+            ok = False
+        if not ok:
+            if os.path.exists(part_file):
+                os.remove(part_file)
+            self.logger.warning("Verdichtung fehlgeschlagen, Original bleibt erhalten: %s", audio_file)
+            return None
+
+        source_size = os.path.getsize(audio_file)
+        os.replace(part_file, target)
+        self.segment_index.replace_segment(audio_file, target)
+        os.remove(audio_file)
+        saved = source_size - os.path.getsize(target)
+        self.logger.info("Segment verdichtet (%.1f → %.1f MB): %s", source_size / 1e6,
+                         (source_size - saved) / 1e6, target)
+        return saved
+
+    def run_once(self, should_continue=None):
+        """
+        Verdichtet alle transkribierten, noch nicht verdichteten Segmente.
+
+        Args:
+            should_continue (callable, optional): Wird vor jedem Segment gefragt; False bricht ab.
+
+        Returns:
+            tuple: (Anzahl verdichteter Segmente, eingesparte Bytes).
+        """
+        count = saved = 0
+        for audio_file in self.segment_index.compactable():
+            if should_continue is not None and not should_continue():
+                break
+            if not os.path.exists(audio_file):
+                continue
+            size = os.path.getsize(audio_file)
+            start = self._clock()
+            result = self.compact(audio_file)
+            if result is not None:
+                count += 1
+                saved += result
+            if self.max_bytes_per_second:
+                # Ratenbegrenzung über die gelesenen Bytes, damit das NAS nicht ausgelastet wird.
+                self._sleep(max(0.0, size / self.max_bytes_per_second - (self._clock() - start)))
+        return count, saved
+
+
+def compact_main(argv):
+    """
+    Unterbefehl "audio_miner compact": verdichtet die bereits transkribierten Segmente eines Archivs.
+    """
+    import argparse
+
+    from .segment_index import SegmentIndex
+
+    parser = argparse.ArgumentParser(prog="audio_miner compact")
+    parser.add_argument('--base-dir', default=os.getcwd(),
+                        help='Basisverzeichnis mit den Sender-Verzeichnissen.')
+    parser.add_argument('--sender', nargs='+', default=None,
+                        help='Nur diese Sender. Standard: alle im Basisverzeichnis.')
+    parser.add_argument('--bitrate', default=DEFAULT_BITRATE,
+                        help=f'Opus-Bitrate. Standard: {DEFAULT_BITRATE}.')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Höchstens so viele MB/s an Originalen lesen. Ohne Angabe keine Begrenzung.')
+    parser.add_argument('--nice', type=int, default=DEFAULT_NICE,
+                        help=f'nice-Wert für ffmpeg. Standard: {DEFAULT_NICE}.')
+    parser.add_argument('--ffmpeg-path', default=None,
+                        help='Pfad zur ffmpeg-Binary. Ansonsten wird ffmpeg im PATH gesucht.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    senders = args.sender or sorted(name for name in os.listdir(args.base_dir)
+                                    if os.path.isdir(os.path.join(args.base_dir, name, "audio")))
+    total_count = total_saved = 0
+    for sender in senders:
+        sender_dir = os.path.join(args.base_dir, sender)
+        index = SegmentIndex(os.path.join(sender_dir, "segments.db"), os.path.join(sender_dir, "audio"),
+                             os.path.join(sender_dir, "transkriptionen"))
+        try:
+            index.ensure_built()
+            compactor = Compactor(index, ffmpeg_path=args.ffmpeg_path or shutil.which("ffmpeg") or "ffmpeg",
+                                  bitrate=args.bitrate, nice=args.nice,
+                                  max_bytes_per_second=args.rate * 1e6 if args.rate else None)
+            count, saved = compactor.run_once()
+        finally:
+            index.close()
+        total_count += count
+        total_saved += saved
+    print(f"{total_count} Segmente verdichtet, {total_saved / 1e9:.2f} GB eingespart.")
@@ -0,0 +1,334 @@
+import base64
+import json
+import logging
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+
+from .worker_pool import WorkerPoolBroken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "audio_miner.sock")
+# Erlaubte Schlüsselwortargumente je Methode; alles andere weist der Daemon ab.
+METHODS = {
+    "transcribe_audio": ("settings",),
+    "transcribe_many": ("settings",),
+    "transcribe_words": ("initial_prompt",),
+}
+SETTINGS_KEYS = ("beam_size", "diarize", "model")
+
+
+def _encode(value):
+    # numpy-Arrays (Live-Transkription) gehen als Base64 über den Socket.
+    if hasattr(value, "tobytes") and hasattr(value, "dtype"):
+        return {"__ndarray__": base64.b64encode(value.tobytes()).decode("ascii"), "dtype": str(value.dtype)}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and "__ndarray__" in value:
+        import numpy as np
+        return np.frombuffer(base64.b64decode(value["__ndarray__"]), dtype=value["dtype"])
+    return value
+
+
+def _send(sock_file, message):
+    sock_file.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+    sock_file.flush()
+
+
+def _receive(sock_file):
+    line = sock_file.readline()
+    if not line:
+        raise ConnectionError("Verbindung zum Transkriptions-Daemon unterbrochen.")
+    return json.loads(line)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # Eine Verbindung kann mehrere Aufträge nacheinander senden.
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            try:
+                response = self.server.daemon.handle(json.loads(line))
+            except WorkerPoolBroken as e:
+                # Der Daemon beendet sich, damit ihn der Dienst-Manager mit frischen Workern neu startet.
+                logger.critical("Transkriptions-Worker abgestürzt, beende den Daemon.")
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                response = {"error": f"{type(e).__name__}: {e}"}
+            except Exception as e:
+                logger.exception("Auftrag fehlgeschlagen.")
+                response = {"error": f"{type(e).__name__}: {e}"}
+            _send(self.wfile, response)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TranscriptionDaemon:
+    """
+    Hält einen geladenen Transcriber im Speicher und nimmt Aufträge über einen
+    Unix-Domain-Socket entgegen.
+
+    Jeder Auftrag ist eine JSON-Zeile mit method (transcribe_audio, transcribe_many,
+    transcribe_words oder ping) und args. Die Antwort enthält result und die Details
+    des Transcribers je Datei, oder error. Transkripte schreibt der Client selbst; der
+    Daemon schreibt keine Dateien, deren Pfad ein Client vorgibt. Über settings darf
+    ein Client nur das Hauptmodell oder das beim Start angegebene Ersatzmodell wählen,
+    damit er den Daemon keine beliebigen Modelle oder Dateien laden lässt.
+    """
+    def __init__(self, transcriber, socket_path=DEFAULT_SOCKET, fallback_model=None):
+        """
+        Args:
+            transcriber (AudioTranscriber): Der bereits geladene Transcriber (oder ein ForkedTranscriberPool).
+            socket_path (str, optional): Pfad des Sockets.
+            fallback_model (str, optional): Ersatzmodell, das Clients über settings={"model": ...} anfordern dürfen.
+        """
+        self.transcriber = transcriber
+        self.socket_path = socket_path
+        self.models = {model for model in (getattr(transcriber, "whisper_model_size", None), fallback_model) if model}
+        self.server = None
+
+    def handle(self, request):
+        """
+        Führt einen Auftrag aus.
+
+        Returns:
+            dict: Die Antwort mit result und details.
+        """
+        method = request.get("method")
+        if method == "ping":
+            return {"result": "pong", "details": {}}
+        if method not in METHODS:
+            raise ValueError(f"Unbekannte Methode: {method}")
+        args = [_decode(arg) for arg in request.get("args", [])]
+        kwargs = request.get("kwargs", {})
+        self._check_kwargs(method, kwargs)
+        result = getattr(self.transcriber, method)(*args, **kwargs)
+        paths = [args[0]] if method == "transcribe_audio" else args[0] if method == "transcribe_many" else []
+        pop_details = getattr(self.transcriber, "pop_details", None)
+        details = {path: pop_details(path) for path in paths} if pop_details else {}
+        return {"result": result, "details": {path: value for path, value in details.items() if value is not None}}
+
+    def _check_kwargs(self, method, kwargs):
+        """
+        Prüft die Schlüsselwortargumente eines Auftrags.
+
+        Raises:
+            ValueError: Bei unbekannten Argumenten oder settings-Schlüsseln und bei nicht zugelassenen Modellen.
+        """
+        unknown = set(kwargs) - set(METHODS[method])
+        if unknown:
+            raise ValueError(f"Unzulässige Argumente für {method}: {', '.join(sorted(unknown))}")
+        settings = kwargs.get("settings")
+        if settings is None:
+            return
+        if not isinstance(settings, dict):
+            raise ValueError("settings muss ein Objekt sein.")
+        unknown = set(settings) - set(SETTINGS_KEYS)
+        if unknown:
+            raise ValueError(f"Unzulässige Einstellungen: {', '.join(sorted(unknown))}")
+        if "model" in settings and settings["model"] not in self.models:
+            raise ValueError(f"Modell {settings['model']!r} ist nicht zugelassen; erlaubt: {', '.join(sorted(self.models))}")
+
+    def serve_forever(self):
+        """Bindet den Socket und bearbeitet Aufträge, bis shutdown() aufgerufen wird."""
+        self.start()
+        self.server.serve_forever()
+
+    def start(self):
+        """Bindet den Socket, ohne die Schleife zu starten (für Tests und eigene Threads)."""
+        if os.path.exists(self.socket_path):
+            # Ein verwaister Socket eines beendeten Daemons; ein laufender antwortet.
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.connect(self.socket_path)
+                raise RuntimeError(f"Unter {self.socket_path} läuft bereits ein Daemon.")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.socket_path)
+        self.server = _UnixServer(self.socket_path, _RequestHandler)
+        self.server.daemon = self
+        os.chmod(self.socket_path, 0o660)
+        logger.info("Transkriptions-Daemon lauscht auf %s.", self.socket_path)
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class DaemonTranscriber:
+    """
+    Client für den TranscriptionDaemon mit denselben Methoden wie AudioTranscriber.
+
+    Damit transkribieren RadioRecorder und die CLI über die warmen Modelle des
+    Daemons, ohne selbst torch oder Whisper zu laden. Jeder Thread nutzt eine
+    eigene Verbindung. Die Audiodateien müssen für den Daemon unter demselben
+    Pfad erreichbar sein.
+    """
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=None):
+        """
+        Args:
+            socket_path (str, optional): Pfad des Daemon-Sockets.
+            timeout (float, optional): Zeitlimit je Auftrag in Sekunden. Standardmäßig keines.
+
+        Raises:
+            ConnectionError: Wenn kein Daemon unter socket_path erreichbar ist.
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._details = {}
+        try:
+            self._request("ping")
+        except OSError as e:
+            raise ConnectionError(f"Kein Transkriptions-Daemon unter {socket_path} erreichbar: {e}") from e
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            conn = self._local.conn = (sock, sock.makefile("rwb"))
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+            self._local.conn = None
+
+    def _request(self, method, *args, **kwargs):
+        message = {"method": method, "args": [_encode(arg) for arg in args], "kwargs": kwargs}
+        try:
+            _, sock_file = self._connection()
+            _send(sock_file, message)
+            response = _receive(sock_file)
+        except (OSError, ValueError):
+            self._close()
+            raise
+        if "error" in response:
+            raise RuntimeError(f"Transkriptions-Daemon: {response['error']}")
+        self._details.update(response.get("details", {}))
+        return response["result"]
+
+    def transcribe_audio(self, audio_path, settings=None):
+        kwargs = {"settings": settings} if settings else {}
+        return self._request("transcribe_audio", os.path.abspath(audio_path), **kwargs)
+
+    def transcribe_many(self, audio_paths, settings=None):
+        paths = [os.path.abspath(path) for path in audio_paths]
+        kwargs = {"settings": settings} if settings else {}
+        results = self._request("transcribe_many", paths, **kwargs)
+        # Details kommen unter dem absoluten Pfad zurück.
+        for path, absolute in zip(audio_paths, paths):
+            if path != absolute and absolute in self._details:
+                self._details[path] = self._details.pop(absolute)
+        return results
+
+    def pop_details(self, audio_path):
+        return self._details.pop(audio_path, None) or self._details.pop(os.path.abspath(audio_path), None)
+
+    def transcribe_words(self, audio, initial_prompt=None):
+        return [tuple(word) for word in self._request("transcribe_words", audio, initial_prompt=initial_prompt)]
+
+    def shutdown(self):
+        self._close()
+
+
+def daemon_main(argv):
+    """
+    Unterbefehl "audio_miner daemon": lädt die Modelle einmal und nimmt Aufträge entgegen.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="audio_miner daemon")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET,
+                        help=f'Pfad des Unix-Sockets. Standard: {DEFAULT_SOCKET}.')
+    parser.add_argument('--whisper-model', default='TURBO',
+                        help='Whisper Modell (z.B. TURBO, BASE, etc.)')
+    parser.add_argument('--token', type=str, default=None,
+                        help='Huggingface Token für PyAnnote, wenn benötigt.')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='Anzahl der 30-Sekunden-Fenster, die Whisper gemeinsam verarbeitet.')
+    parser.add_argument('--transcription-workers', type=int, default=1,
+                        help='Anzahl der Transkriptions-Prozesse; Aufträge verschiedener Clients laufen dann parallel.')
+    parser.add_argument('--torch-threads', type=int, default=None,
+                        help='torch-Threads je Transkriptions-Worker.')
+    parser.add_argument('--reserve-recording-cores', type=int, default=0,
+                        help='Anzahl der CPU-Kerne, die der Daemon nicht nutzt, damit Aufnahmen auf demselben Rechner nicht ins Stocken geraten. Standard: 0.')
+    parser.add_argument('--transcription-nice', type=int, default=0,
+                        help='nice-Wert des Daemons und seiner Worker (0 bis 19). Standard: 0.')
+    parser.add_argument('--speech-gate', action='store_true',
+                        help='Gibt nur Sprachabschnitte an Whisper und PyAnnote weiter.')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Verzeichnis für den Cache der Zwischenergebnisse. Ohne Angabe kein Cache.')
+    parser.add_argument('--cache-size', type=float, default=10,
+                        help='Maximale Größe des Caches in GiB. Standard: 10.')
+    parser.add_argument('--fingerprint-db', default=None,
+                        help='Pfad des Fingerabdruck-Index (fingerprints.db). Ohne Angabe keine Fingerabdrücke.')
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help='Verzeichnis für Zwischenstände laufender Transkriptionen. Ohne Angabe keine Zwischenstände.')
+    parser.add_argument('--fallback-model', default=None,
+                        help='Lädt zusätzlich dieses Whisper Modell für Clients mit --load-shedding (z.B. BASE). Clients dürfen nur dieses Modell oder --whisper-model anfordern.')
+    parser.add_argument('--structured', action='store_true',
+                        help='Ermittelt Wortzeitstempel und Konfidenz für Clients mit --output-format jsonl oder parquet.')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Ausführliche Ausgabe')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    from .audio_transcriber import AudioTranscriber
+    from .main import WhisperModel
+    from .worker_pool import ForkedTranscriberPool
+
+    resources = None
+    if args.reserve_recording_cores or args.transcription_nice:
+        from .resources import ResourceBudget
+        try:
+            resources = ResourceBudget(args.reserve_recording_cores, args.transcription_nice,
+                                       torch_threads=args.torch_threads, workers=args.transcription_workers)
+        except ValueError as e:
+            parser.error(str(e))
+        # Vor dem Laden der Modelle, damit alle Threads des Daemons das Budget erben.
+        resources.apply()
+        logger.info(resources.describe())
+
+    fallback_model = WhisperModel[args.fallback_model.upper()].value if args.fallback_model else None
+    transcriber = AudioTranscriber(whisper_model_size=WhisperModel[args.whisper_model.upper()].value, token=args.token,
+                                   verbose=args.verbose, batch_size=args.batch_size, speech_gate=args.speech_gate,
+                                   cache_dir=args.cache_dir, cache_max_bytes=int(args.cache_size * 1024 ** 3),
+                                   fingerprint_db=args.fingerprint_db, structured=args.structured,
+                                   checkpoint_dir=args.checkpoint_dir,
+                                   fallback_model=fallback_model)
+    if resources is not None:
+        # Jetzt ist torch geladen und erhält die Zahl seiner Threads.
+        resources.apply()
+    if args.transcription_workers > 1:
+        transcriber = ForkedTranscriberPool(transcriber, args.transcription_workers, args.torch_threads,
+                                            resources=resources)
+
+    daemon = TranscriptionDaemon(transcriber, args.socket, fallback_model=fallback_model)
+    try:
+        daemon.serve_forever()
+        if getattr(transcriber, "broken", False):
+            raise SystemExit("Transkriptions-Worker abgestürzt; der Daemon muss neu gestartet werden.")
+    except KeyboardInterrupt:
+        logger.info("Interrupt erhalten, beende Daemon...")
+    finally:
+        daemon.shutdown()
+        if isinstance(transcriber, ForkedTranscriberPool):
+            transcriber.shutdown()
@@ -0,0 +1,433 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .segment_index import parse_segment_filename
+
+FINGERPRINT_DB = "fingerprints.db"
+
+N_FFT = 1024
+HOP_LENGTH = 512
+# Frequenzbänder (FFT-Bins bei 16 kHz) für die Spitzen, etwa 150 Hz bis 4 kHz.
+BANDS = ((10, 25), (25, 50), (50, 100), (100, 180), (180, 256))
+PEAK_NEIGHBORHOOD = 3
+MIN_PEAK_DB = -60.0
+FAN_OUT = 3
+MAX_DELTA_FRAMES = 63
+BLOCK_FRAMES = 4096
+
+MIN_VOTES = 20
+MAX_GAP_SECONDS = 2.0
+MIN_MATCH_SECONDS = 2.0
+PIECE_TOLERANCE = 1.0
+
+DEFAULT_RETENTION = 24 * 3600
+PRUNE_INTERVAL = 3600
+
+Match = namedtuple("Match", ["clip_id", "start", "end", "offset", "votes"])
+
+
+def frame_seconds(frames):
+    """Rechnet Spektrogramm-Frames in Sekunden um."""
+    return frames * HOP_LENGTH / 16000
+
+
+def _band_peaks(audio):
+    """
+    Bestimmt je Frame und Frequenzband den lautesten Bin, sofern er ein lokales Maximum in der Zeit ist.
+
+    Returns:
+        tuple: (frames, bins) als numpy-Arrays, nach Zeit sortiert.
+    """
+    n_frames = 1 + (len(audio) - N_FFT) // HOP_LENGTH if len(audio) >= N_FFT else 0
+    if n_frames <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    window = np.hanning(N_FFT).astype(np.float32)
+    frames_view = np.lib.stride_tricks.sliding_window_view(audio, N_FFT)[::HOP_LENGTH]
+    values = np.empty((n_frames, len(BANDS)), dtype=np.float32)
+    bins = np.empty((n_frames, len(BANDS)), dtype=np.int64)
+    for first in range(0, n_frames, BLOCK_FRAMES):
+        block = frames_view[first:first + BLOCK_FRAMES] * window
+        spectrum = 20 * np.log10(np.abs(np.fft.rfft(block, axis=1)) + 1e-6) - 20 * np.log10(N_FFT / 4)
+        for index, (low, high) in enumerate(BANDS):
+            band = spectrum[:, low:high]
+            best = np.argmax(band, axis=1)
+            bins[first:first + len(block), index] = best + low
+            values[first:first + len(block), index] = band[np.arange(len(block)), best]
+
+    padded = np.pad(values, ((PEAK_NEIGHBORHOOD, PEAK_NEIGHBORHOOD), (0, 0)), constant_values=-np.inf)
+    neighborhood = np.lib.stride_tricks.sliding_window_view(padded, 2 * PEAK_NEIGHBORHOOD + 1, axis=0)
+    keep = (values >= neighborhood.max(axis=-1)) & (values > MIN_PEAK_DB)
+    frames, band_index = np.nonzero(keep)
+    return frames.astype(np.int64), bins[frames, band_index]
+
+
+def fingerprint(audio):
+    """
+    Berechnet die Landmark-Hashes eines Audiosignals.
+
+    Jede Spektralspitze wird mit den nächsten FAN_OUT späteren Spitzen zu
+    einem Hash aus beiden Frequenzen und dem Zeitabstand verbunden.
+
+    Args:
+        audio (numpy.ndarray): Mono-Audio mit 16 kHz als float32.
+
+    Returns:
+        tuple: (hashes, frames) als int64-Arrays; frames ist der Frame der Ankerspitze.
+    """
+    frames, bins = _band_peaks(audio)
+    hashes, anchors = [], []
+    for step in range(1, FAN_OUT + 1):
+        delta = frames[step:] - frames[:-step]
+        valid = (delta > 0) & (delta <= MAX_DELTA_FRAMES)
+        hashes.append((bins[:-step][valid] << 15) | (bins[step:][valid] << 6) | delta[valid])
+        anchors.append(frames[:-step][valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hashes), np.concatenate(anchors)
+
+
+def _runs(times, max_gap):
+    """Teilt sortierte Zeitpunkte an Lücken größer max_gap in zusammenhängende Läufe."""
+    if len(times) == 0:
+        return []
+    breaks = np.nonzero(np.diff(times) > max_gap)[0] + 1
+    return np.split(times, breaks)
+
+
+def subtract_spans(regions, spans):
+    """
+    Entfernt Zeitspannen aus einer Liste von Bereichen.
+
+    Args:
+        regions (list): Tupel (start, end) in Sekunden, sortiert.
+        spans (list): Zu entfernende Tupel (start, end).
+
+    Returns:
+        list: Die verbleibenden Bereiche.
+    """
+    result = []
+    for start, end in regions:
+        pieces = [(start, end)]
+        for span_start, span_end in spans:
+            next_pieces = []
+            for a, b in pieces:
+                if span_end <= a or span_start >= b:
+                    next_pieces.append((a, b))
+                    continue
+                if span_start > a:
+                    next_pieces.append((a, span_start))
+                if span_end < b:
+                    next_pieces.append((span_end, b))
+            pieces = next_pieces
+        result.extend(pieces)
+    return result
+
+
+def _shift(piece, offset):
+    shifted = dict(piece, start=piece["start"] + offset, end=piece["end"] + offset)
+    if piece.get("words"):
+        shifted["words"] = [dict(word, start=word["start"] + offset, end=word["end"] + offset) for word in piece["words"]]
+    return shifted
+
+
+class FingerprintIndex:
+    """
+    Lokaler Index akustischer Fingerabdrücke bereits transkribierter Segmente.
+
+    Jedes transkribierte Segment wird als Clip mit seinen Landmark-Hashes und
+    den Transkript-Stücken (mit Zeiten) abgelegt. Werbung, Jingles und
+    Senderkennungen, die erneut laufen, werden in neuen Segmenten über die
+    Hashes gefunden; ihr Transkript wird an die neue Position verschoben
+    übernommen, statt erneut dekodiert zu werden. Clips ohne Treffer werden
+    nach retention Sekunden verworfen, Clips mit Treffern bleiben erhalten.
+    """
+    def __init__(self, db_path, retention=DEFAULT_RETENTION):
+        """
+        Args:
+            db_path (str): Pfad der SQLite-Datenbank.
+            retention (float, optional): Lebensdauer ungenutzter Clips in Sekunden. Standardmäßig 24 Stunden.
+        """
+        self.db_path = db_path
+        self.retention = retention
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def _connection(self):
+        # Eigene Verbindung je Prozess, damit geforkte Worker keine Verbindung teilen.
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS clips (
+                    id INTEGER PRIMARY KEY,
+                    profile TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    pieces TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS hashes (
+                    hash INTEGER NOT NULL,
+                    clip_id INTEGER NOT NULL,
+                    frame INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_hashes_hash ON hashes(hash);
+                CREATE INDEX IF NOT EXISTS idx_hashes_clip ON hashes(clip_id);
+                CREATE TABLE IF NOT EXISTS stations (
+                    sender TEXT PRIMARY KEY,
+                    segments INTEGER NOT NULL DEFAULT 0,
+                    segments_with_hits INTEGER NOT NULL DEFAULT 0,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    seconds REAL NOT NULL DEFAULT 0,
+                    skipped_seconds REAL NOT NULL DEFAULT 0
+                );
+                CREATE TEMP TABLE IF NOT EXISTS query (hash INTEGER NOT NULL, frame INTEGER NOT NULL);
+            """)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def match(self, hashes, frames, profile):
+        """
+        Sucht bekannte Clips im Fingerabdruck eines neuen Segments.
+
+        Ein Treffer braucht mindestens MIN_VOTES Hashes mit gleichem Zeitversatz
+        (±1 Frame) zu einem Clip, die ohne größere Lücke aufeinander folgen.
+
+        Args:
+            hashes (numpy.ndarray): Hashes aus fingerprint().
+            frames (numpy.ndarray): Anker-Frames aus fingerprint().
+            profile (str): Modell-Einstellungen; nur Clips mit gleichem Profil passen.
+
+        Returns:
+            list: Nicht überlappende Match-Tupel, Zeiten in Sekunden im neuen Segment.
+        """
+        if len(hashes) == 0:
+            return []
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("INSERT INTO query VALUES (?, ?)", zip(hashes.tolist(), frames.tolist()))
+                rows = conn.execute(
+                    "SELECT h.clip_id, q.frame - h.frame, q.frame FROM query q "
+                    "JOIN hashes h ON h.hash = q.hash JOIN clips c ON c.id = h.clip_id "
+                    "WHERE c.profile = ?", (profile,)).fetchall()
+                conn.execute("DELETE FROM query")
+                conn.execute("COMMIT")
+            except Exception:
+                # Liegengebliebene query-Zeilen würden beim nächsten Abgleich mitstimmen.
+                conn.execute("ROLLBACK")
+                raise
+        if not rows:
+            return []
+
+        votes = np.array(rows, dtype=np.int64)
+        keys, counts = np.unique(votes[:, :2], axis=0, return_counts=True)
+        count_of = {(clip_id, offset): count for (clip_id, offset), count in zip(keys.tolist(), counts.tolist())}
+        candidates = []
+        for (clip_id, offset), count in count_of.items():
+            total = count + count_of.get((clip_id, offset - 1), 0) + count_of.get((clip_id, offset + 1), 0)
+            if total >= MIN_VOTES and count >= count_of.get((clip_id, offset - 1), 0) \
+                    and count > count_of.get((clip_id, offset + 1), 0):
+                candidates.append((total, clip_id, offset))
+
+        max_gap = MAX_GAP_SECONDS * 16000 / HOP_LENGTH
+        matches = []
+        for total, clip_id, offset in sorted(candidates, reverse=True):
+            selected = votes[(votes[:, 0] == clip_id) & (np.abs(votes[:, 1] - offset) <= 1)]
+            for run in _runs(np.sort(selected[:, 2]), max_gap):
+                start = frame_seconds(int(run[0]))
+                end = frame_seconds(int(run[-1]) + MAX_DELTA_FRAMES)
+                if len(run) < MIN_VOTES or end - start < MIN_MATCH_SECONDS:
+                    continue
+                if any(start < other.end and other.start < end for other in matches):
+                    continue
+                matches.append(Match(clip_id, start, end, frame_seconds(offset), len(run)))
+        return sorted(matches, key=lambda m: m.start)
+
+    def reuse(self, matches):
+        """
+        Holt die Transkript-Stücke der getroffenen Clips, verschoben an die neue Position.
+
+        Übernommen werden nur Stücke, die (bis auf PIECE_TOLERANCE) vollständig
+        im getroffenen Bereich liegen.
+
+        Returns:
+            tuple: (pieces, spans) – die verschobenen Stücke und die Zeitspannen,
+                   die nicht mehr transkribiert werden müssen.
+        """
+        pieces, spans = [], []
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            for match in matches:
+                row = conn.execute("SELECT pieces FROM clips WHERE id = ?", (match.clip_id,)).fetchone()
+                if row is None:
+                    continue
+                clip_start, clip_end = match.start - match.offset, match.end - match.offset
+                stored = json.loads(row[0])
+                inside = [p for p in stored
+                          if p["start"] >= clip_start - PIECE_TOLERANCE and p["end"] <= clip_end + PIECE_TOLERANCE]
+                overlapping = [p for p in stored if p["start"] < clip_end and p["end"] > clip_start]
+                if inside:
+                    shifted = [_shift(p, match.offset) for p in inside]
+                    pieces.extend(shifted)
+                    spans.append((min(p["start"] for p in shifted), max(p["end"] for p in shifted)))
+                elif not overlapping:
+                    # Der Clip enthält an dieser Stelle keinen Text (z.B. ein Jingle).
+                    spans.append((match.start, match.end))
+                else:
+                    continue
+                conn.execute("UPDATE clips SET hits = hits + 1, last_used = ? WHERE id = ?", (now, match.clip_id))
+        return sorted(pieces, key=lambda p: p["start"]), sorted(spans)
+
+    def add_clip(self, source, hashes, frames, pieces, profile, skip_spans=()):
+        """
+        Nimmt ein transkribiertes Segment als Clip in den Index auf.
+
+        Hashes aus bereits erkannten Bereichen werden nicht erneut gespeichert.
+
+        Args:
+            source (str): Pfad des Segments.
+            hashes (numpy.ndarray): Hashes aus fingerprint().
+            frames (numpy.ndarray): Anker-Frames aus fingerprint().
+            pieces (list): Transkript-Stücke als Dictionaries mit start, end und text.
+            profile (str): Modell-Einstellungen, mit denen die Stücke entstanden sind.
+            skip_spans (list, optional): Bereiche (start, end) in Sekunden ohne neue Hashes.
+        """
+        keep = np.ones(len(hashes), dtype=bool)
+        seconds = frame_seconds(frames)
+        for start, end in skip_spans:
+            keep &= (seconds < start) | (seconds >= end)
+        if not keep.any():
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                cursor = conn.execute(
+                    "INSERT INTO clips (profile, source, pieces, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (profile, os.path.basename(source), json.dumps(pieces), now, now))
+                clip_id = cursor.lastrowid
+                conn.executemany("INSERT INTO hashes VALUES (?, ?, ?)",
+                                 ((h, clip_id, f) for h, f in zip(hashes[keep].tolist(), frames[keep].tolist())))
+                conn.execute("COMMIT")
+            except Exception:
+                # Ein Clip mit nur einem Teil seiner Hashes würde falsche Treffer liefern.
+                conn.execute("ROLLBACK")
+                raise
+        if now - self._last_prune >= PRUNE_INTERVAL:
+            self._last_prune = now
+            self.prune()
+
+    def record(self, source, seconds, hits, skipped_seconds):
+        """
+        Zählt ein verarbeitetes Segment in der Statistik seines Senders.
+
+        Args:
+            source (str): Pfad des Segments; der Sender wird aus dem Dateinamen gelesen.
+            seconds (float): Dauer des Segments.
+            hits (int): Anzahl der übernommenen Clips.
+            skipped_seconds (float): Nicht erneut transkribierte Zeit.
+        """
+        parsed = parse_segment_filename(source)
+        sender = parsed[0] if parsed else "unbekannt"
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO stations (sender) VALUES (?) ON CONFLICT(sender) DO NOTHING", (sender,))
+            self._connection().execute(
+                "UPDATE stations SET segments = segments + 1, segments_with_hits = segments_with_hits + ?, "
+                "hits = hits + ?, seconds = seconds + ?, skipped_seconds = skipped_seconds + ? WHERE sender = ?",
+                (1 if hits else 0, hits, seconds, skipped_seconds, sender))
+
+    def stats(self):
+        """
+        Returns:
+            dict: Je Sender segments, segments_with_hits, hits, seconds, skipped_seconds und hit_rate
+                  (Anteil der Segmente mit mindestens einem Treffer).
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT sender, segments, segments_with_hits, hits, seconds, skipped_seconds "
+                "FROM stations ORDER BY sender").fetchall()
+        return {
+            sender: {
+                "segments": segments,
+                "segments_with_hits": with_hits,
+                "hits": hits,
+                "seconds": seconds,
+                "skipped_seconds": skipped,
+                "hit_rate": with_hits / segments if segments else 0.0,
+            }
+            for sender, segments, with_hits, hits, seconds, skipped in rows
+        }
+
+    def clip_count(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM clips").fetchone()[0]
+
+    def prune(self, retention=None):
+        """
+        Löscht Clips, die seit retention Sekunden nicht mehr getroffen wurden.
+
+        Returns:
+            int: Anzahl der gelöschten Clips.
+        """
+        cutoff = time.time() - (self.retention if retention is None else retention)
+        with self._lock:
+            conn = self._connection()
+            ids = [row[0] for row in conn.execute("SELECT id FROM clips WHERE last_used < ?", (cutoff,))]
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("DELETE FROM hashes WHERE clip_id = ?", ((i,) for i in ids))
+                conn.executemany("DELETE FROM clips WHERE id = ?", ((i,) for i in ids))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return len(ids)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def fingerprints_main(argv):
+    """
+    Unterbefehl "audio_miner fingerprints": Trefferstatistik anzeigen oder alte Clips löschen.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="audio_miner fingerprints")
+    parser.add_argument('action', choices=['stats', 'prune'],
+                        help='stats zeigt Treffer und übersprungene Zeit je Sender, prune löscht ungenutzte Clips.')
+    parser.add_argument('--base-dir', default=os.getcwd(),
+                        help=f'Basisverzeichnis mit der Datei {FINGERPRINT_DB}.')
+    parser.add_argument('--max-age', type=float, default=DEFAULT_RETENTION / 3600,
+                        help='Clips ohne Treffer seit so vielen Stunden löschen (bei prune). Standard: 24.')
+    args = parser.parse_args(argv)
+
+    index = FingerprintIndex(os.path.join(args.base_dir, FINGERPRINT_DB))
+    if args.action == "stats":
+        for sender, entry in index.stats().items():
+            share = entry["skipped_seconds"] / entry["seconds"] if entry["seconds"] else 0.0
+            print(f"{sender:<16} {entry['segments']:>6} Segmente  {entry['hit_rate']:>6.1%} mit Treffern  "
+                  f"{entry['hits']:>6} Treffer  {entry['skipped_seconds']:>10.0f} s übersprungen ({share:.1%})")
+        print(f"{index.clip_count()} Clips im Index.")
+    else:
+        removed = index.prune(args.max_age * 3600)
+        print(f"{removed} Clips gelöscht.")
+    index.close()
@@ -0,0 +1,434 @@
+import logging
+import os
+import queue
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from .segment_index import parse_segment_filename
+
+JOB_DB = "jobs.db"
+QUARANTINE_DIR = "quarantine"
+
+STATE_PENDING = "pending"
+STATE_LEASED = "leased"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+# Ein Lease gilt so lange; der haltende Prozess verlängert ihn regelmäßig.
+LEASE_SECONDS = 300
+# Nach so vielen Versuchen (Fehler oder Absturz während der Transkription) kommt die Datei in Quarantäne.
+MAX_ATTEMPTS = 3
+# Wartezeit vor dem nächsten Versuch, verdoppelt je Versuch, höchstens BACKOFF_MAX.
+BACKOFF_BASE = 60
+BACKOFF_MAX = 3600
+
+
+def _duration(audio_file):
+    parsed = parse_segment_filename(audio_file)
+    if parsed is None or parsed[2] is None:
+        return None
+    return (parsed[2] - parsed[1]).total_seconds()
+
+
+def _owner_dead(owner):
+    # Leases eines beendeten Prozesses auf diesem Rechner müssen nicht erst ablaufen.
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        return False
+    return False
+
+
+class JobQueue:
+    """
+    Persistente Warteschlange der Transkriptionsaufträge eines Senders (SQLite unter dem Senderverzeichnis).
+
+    Jeder Auftrag hat einen der Zustände pending, leased, done oder failed. Ein
+    Prozess, der einen Auftrag entnimmt, hält ihn als Lease und verlängert ihn,
+    solange er daran arbeitet. Stirbt der Prozess, läuft der Lease ab (bei einem
+    toten Prozess auf demselben Rechner sofort) und der Auftrag kommt mit Backoff
+    zurück in die Warteschlange. Nach MAX_ATTEMPTS Versuchen wird die Datei nach
+    quarantine/ verschoben, damit sie die Warteschlange nicht blockiert. Mehrere
+    Prozesse können dieselbe Warteschlange befüllen und abarbeiten.
+
+    Die Methoden put, get, get_nowait, qsize und empty entsprechen queue.Queue.
+    """
+    def __init__(self, db_path, quarantine_dir=None, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 backoff=BACKOFF_BASE, logger=None, clock=time.time, sleep=time.sleep):
+        """
+        Args:
+            db_path (str): Pfad der Datenbank.
+            quarantine_dir (str, optional): Ziel für Dateien, die MAX_ATTEMPTS-mal gescheitert sind.
+                                            Ohne Angabe bleiben sie liegen und sind nur als failed markiert.
+            lease_seconds (float, optional): Gültigkeit eines Leases. Standard: 300.
+            max_attempts (int, optional): Versuche bis zur Quarantäne. Standard: 3.
+            backoff (float, optional): Wartezeit nach dem ersten Fehlversuch in Sekunden. Standard: 60.
+            logger (logging.Logger, optional): Logger für Wiederholungen und Quarantäne.
+        """
+        self.db_path = db_path
+        self.quarantine_dir = quarantine_dir
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.logger = logger or logging.getLogger(__name__)
+        self.clock = clock
+        self.sleep = sleep
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._held = set()
+        self._waits = {}
+        self._heartbeat = None
+        self._stopped = threading.Event()
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Die Verbindung wird erst bei Bedarf geöffnet, damit sie nicht in
+        # geforkte Worker-Prozesse vererbt wird.
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    path TEXT NOT NULL,
+                    duration REAL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL DEFAULT 0,
+                    owner TEXT,
+                    lease_until REAL,
+                    error TEXT,
+                    updated REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, available_at, seq);
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _transaction(self, work):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def _retry_delay(self, attempts):
+        return min(BACKOFF_MAX, self.backoff * 2 ** max(0, attempts - 1))
+
+    def _settle(self, conn, name, attempts, error, now):
+        # Nach einem Fehlversuch: mit Backoff zurück in die Warteschlange oder in Quarantäne.
+        if attempts >= self.max_attempts:
+            conn.execute("UPDATE jobs SET state = ?, owner = NULL, lease_until = NULL, error = ?, updated = ? WHERE name = ?",
+                         (STATE_FAILED, error, now, name))
+            return True
+        conn.execute("UPDATE jobs SET state = ?, owner = NULL, lease_until = NULL, error = ?, available_at = ?, "
+                     "updated = ? WHERE name = ?",
+                     (STATE_PENDING, error, now + self._retry_delay(attempts), now, name))
+        return False
+
+    def _quarantine(self, names):
+        for name, path, error in names:
+            self.logger.error("Auftrag nach %d Versuchen in Quarantäne (%s): %s", self.max_attempts, error, path)
+            if self.quarantine_dir is None or not os.path.exists(path):
+                continue
+            os.makedirs(self.quarantine_dir, exist_ok=True)
+            shutil.move(path, os.path.join(self.quarantine_dir, name))
+
+    def put(self, audio_file, block=True, timeout=None):
+        """
+        Reiht ein Segment ein. Bereits eingereihte, laufende oder in Quarantäne
+        befindliche Aufträge bleiben unverändert; ein erledigter kommt erneut an
+        die Reihe (z.B. wenn sein Transkript gelöscht wurde).
+
+        Returns:
+            bool: True, wenn der Auftrag neu eingereiht wurde.
+        """
+        name = os.path.basename(audio_file)
+        now = self.clock()
+
+        def work(conn):
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO jobs (name, path, duration, state, updated) VALUES (?, ?, ?, ?, ?)",
+                (name, audio_file, _duration(audio_file), STATE_PENDING, now)).rowcount
+            if inserted:
+                return True
+            return conn.execute("UPDATE jobs SET state = ?, attempts = 0, available_at = 0, error = NULL, updated = ? "
+                                "WHERE name = ? AND state = ?", (STATE_PENDING, now, name, STATE_DONE)).rowcount > 0
+
+        return self._transaction(work)
+
+    def lease(self, limit=1):
+        """
+        Entnimmt bis zu limit fällige Aufträge in Einreihungsreihenfolge.
+
+        Abgelaufene Leases und Leases beendeter Prozesse werden dabei zuerst
+        zurückgeholt und als Fehlversuch gezählt.
+
+        Returns:
+            list: Pfade der Segmente, jetzt von diesem Prozess gehalten.
+        """
+        now = self.clock()
+
+        def work(conn):
+            quarantined = []
+            for name, path, owner, lease_until, attempts in conn.execute(
+                    "SELECT name, path, owner, lease_until, attempts FROM jobs WHERE state = ? AND owner != ?",
+                    (STATE_LEASED, self.owner)).fetchall():
+                if lease_until < now or _owner_dead(owner):
+                    self.logger.warning("Lease von %s abgelaufen, Auftrag wird wiederholt: %s", owner, path)
+                    if self._settle(conn, name, attempts, "Lease abgelaufen", now):
+                        quarantined.append((name, path, "Lease abgelaufen"))
+            rows = conn.execute("SELECT name, path, MAX(updated, available_at) FROM jobs "
+                                "WHERE state = ? AND available_at <= ? ORDER BY seq LIMIT ?",
+                                (STATE_PENDING, now, limit)).fetchall()
+            conn.executemany("UPDATE jobs SET state = ?, owner = ?, lease_until = ?, attempts = attempts + 1, "
+                             "updated = ? WHERE name = ?",
+                             [(STATE_LEASED, self.owner, now + self.lease_seconds, now, name) for name, _, _ in rows])
+            return rows, quarantined
+
+        rows, quarantined = self._transaction(work)
+        self._quarantine(quarantined)
+        if rows:
+            self._held.update(name for name, _, _ in rows)
+            self._waits.update((name, max(0.0, now - (due or now))) for name, _, due in rows)
+            self._start_heartbeat()
+        return [path for _, path, _ in rows]
+
+    def wait_seconds(self, audio_file):
+        """
+        Returns:
+            float: Sekunden, die ein gehaltener Auftrag seit seiner Fälligkeit auf die
+                   Entnahme gewartet hat, oder None für einen nicht gehaltenen Auftrag.
+        """
+        return self._waits.get(os.path.basename(audio_file))
+
+    def get(self, block=True, timeout=None):
+        """
+        Entnimmt den nächsten fälligen Auftrag; wartet wie queue.Queue.get.
+
+        Raises:
+            queue.Empty: Wenn bis zum Timeout kein Auftrag fällig wurde.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            leased = self.lease(1)
+            if leased:
+                return leased[0]
+            if not block or (deadline is not None and self.clock() >= deadline):
+                raise queue.Empty
+            self.sleep(1.0 if deadline is None else max(0.0, min(1.0, deadline - self.clock())))
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def _finish(self, audio_file, update):
+        name = os.path.basename(audio_file)
+        now = self.clock()
+
+        def work(conn):
+            row = conn.execute("SELECT path, attempts FROM jobs WHERE name = ? AND state = ? AND owner = ?",
+                               (name, STATE_LEASED, self.owner)).fetchone()
+            return update(conn, name, row, now) if row else None
+
+        self._held.discard(name)
+        self._waits.pop(name, None)
+        return self._transaction(work)
+
+    def complete(self, audio_file):
+        """Markiert einen gehaltenen Auftrag als erledigt."""
+        self._finish(audio_file, lambda conn, name, row, now: conn.execute(
+            "UPDATE jobs SET state = ?, owner = NULL, lease_until = NULL, error = NULL, updated = ? WHERE name = ?",
+            (STATE_DONE, now, name)))
+
+    def fail(self, audio_file, error):
+        """
+        Verbucht einen Fehlversuch. Der Auftrag wird mit Backoff wiederholt oder
+        nach MAX_ATTEMPTS Versuchen in Quarantäne verschoben.
+
+        Returns:
+            bool: True, wenn die Datei in Quarantäne kam.
+        """
+        quarantined = self._finish(audio_file, lambda conn, name, row, now: (name, row[0])
+                                   if self._settle(conn, name, row[1], str(error), now) else None)
+        if quarantined:
+            self._quarantine([quarantined + (str(error),)])
+            return True
+        self.logger.warning("Transkription fehlgeschlagen (%s), neuer Versuch später: %s", error, audio_file)
+        return False
+
+    def release(self):
+        """Gibt die gehaltenen Aufträge beim Beenden ohne Fehlversuch zurück."""
+        now = self.clock()
+
+        def work(conn):
+            return conn.execute("UPDATE jobs SET state = ?, owner = NULL, lease_until = NULL, attempts = attempts - 1, "
+                                "updated = ? WHERE state = ? AND owner = ?",
+                                (STATE_PENDING, now, STATE_LEASED, self.owner)).rowcount
+
+        self._held.clear()
+        self._waits.clear()
+        return self._transaction(work)
+
+    def renew(self):
+        """Verlängert alle Leases dieses Prozesses."""
+        with self._lock:
+            self._connection().execute("UPDATE jobs SET lease_until = ? WHERE state = ? AND owner = ?",
+                                       (self.clock() + self.lease_seconds, STATE_LEASED, self.owner))
+
+    def _start_heartbeat(self):
+        # Ein Thread für die gesamte Lebensdauer der Warteschlange, gestartet beim ersten Lease.
+        # Würde er bei leerem _held enden, könnte ein gleichzeitiger lease() ihn noch als
+        # lebendig sehen und der neue Lease liefe ohne Verlängerung ab.
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat = threading.Thread(target=self._renew_leases, name="JobQueueHeartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _renew_leases(self):
+        while not self._stopped.wait(self.lease_seconds / 3):
+            if not self._held:
+                continue
+            try:
+                self.renew()
+            except sqlite3.Error as e:
+                self.logger.warning("Leases nicht verlängert: %s", e)
+
+    def qsize(self):
+        """Anzahl der fälligen Aufträge."""
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM jobs WHERE state = ? AND available_at <= ?",
+                                              (STATE_PENDING, self.clock())).fetchone()[0]
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def outstanding(self):
+        """Anzahl der offenen Aufträge einschließlich derer, die auf einen neuen Versuch warten."""
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM jobs WHERE state = ?",
+                                              (STATE_PENDING,)).fetchone()[0]
+
+    def oldest_pending(self):
+        """
+        Returns:
+            str: Pfad des wartenden Auftrags mit der frühesten Startzeit im Dateinamen, oder None.
+        """
+        with self._lock:
+            row = self._connection().execute("SELECT path FROM jobs WHERE state = ? ORDER BY name LIMIT 1",
+                                             (STATE_PENDING,)).fetchone()
+        return row[0] if row else None
+
+    def pending_seconds(self, default=0.0):
+        """
+        Sekunden Audio, die auf die Transkription warten, über alle Prozesse.
+
+        Args:
+            default (float, optional): Dauer für Segmente ohne Endzeit im Namen.
+        """
+        with self._lock:
+            known, unknown = self._connection().execute(
+                "SELECT COALESCE(SUM(duration), 0), COUNT(*) - COUNT(duration) FROM jobs WHERE state IN (?, ?)",
+                (STATE_PENDING, STATE_LEASED)).fetchone()
+        return known + unknown * default
+
+    def counts(self):
+        """
+        Returns:
+            dict: Anzahl der Aufträge je Zustand.
+        """
+        with self._lock:
+            return dict(self._connection().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def quarantined(self):
+        """
+        Returns:
+            list: Tupel (name, attempts, error) der Aufträge in Quarantäne.
+        """
+        with self._lock:
+            return self._connection().execute("SELECT name, attempts, error FROM jobs WHERE state = ? ORDER BY seq",
+                                              (STATE_FAILED,)).fetchall()
+
+    def requeue(self):
+        """
+        Holt alle Dateien aus der Quarantäne zurück und reiht sie erneut ein.
+
+        Returns:
+            int: Anzahl der zurückgeholten Aufträge.
+        """
+        now = self.clock()
+
+        def work(conn):
+            rows = conn.execute("SELECT name, path FROM jobs WHERE state = ?", (STATE_FAILED,)).fetchall()
+            conn.execute("UPDATE jobs SET state = ?, attempts = 0, available_at = 0, error = NULL, updated = ? "
+                         "WHERE state = ?", (STATE_PENDING, now, STATE_FAILED))
+            return rows
+
+        rows = self._transaction(work)
+        for name, path in rows:
+            quarantined = os.path.join(self.quarantine_dir, name) if self.quarantine_dir else None
+            if quarantined and os.path.exists(quarantined) and not os.path.exists(path):
+                shutil.move(quarantined, path)
+        return len(rows)
+
+    def close(self):
+        self._stopped.set()
+        if self._heartbeat is not None and self._heartbeat is not threading.current_thread():
+            self._heartbeat.join()
+        if self._held:
+            try:
+                self.release()
+            except sqlite3.Error as e:
+                self.logger.warning("Leases nicht zurückgegeben: %s", e)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def jobs_main(argv):
+    """
+    Unterbefehl "audio_miner jobs": zeigt den Stand der Auftragswarteschlangen und holt Dateien aus der Quarantäne.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="audio_miner jobs")
+    parser.add_argument('--base-dir', default=os.getcwd(),
+                        help='Basisverzeichnis mit den Sender-Verzeichnissen.')
+    parser.add_argument('--sender', nargs='+', default=None,
+                        help='Nur diese Sender. Standard: alle im Basisverzeichnis.')
+    parser.add_argument('--requeue', action='store_true',
+                        help='Holt alle Dateien aus der Quarantäne zurück und reiht sie erneut ein.')
+    args = parser.parse_args(argv)
+
+    senders = args.sender or sorted(name for name in os.listdir(args.base_dir)
+                                    if os.path.exists(os.path.join(args.base_dir, name, JOB_DB)))
+    for sender in senders:
+        sender_dir = os.path.join(args.base_dir, sender)
+        jobs = JobQueue(os.path.join(sender_dir, JOB_DB), quarantine_dir=os.path.join(sender_dir, QUARANTINE_DIR))
+        try:
+            if args.requeue:
+                print(f"{sender}: {jobs.requeue()} Aufträge aus der Quarantäne zurückgeholt.")
+            counts = jobs.counts()
+            print(f"{sender}: " + ", ".join(f"{state} {counts.get(state, 0)}"
+                                            for state in (STATE_PENDING, STATE_LEASED, STATE_DONE, STATE_FAILED)))
+            for name, attempts, error in jobs.quarantined():
+                print(f"  Quarantäne: {name} ({attempts} Versuche): {error}")
+        finally:
+            jobs.close()
@@ -0,0 +1,116 @@
+import logging
+import threading
+
+LEVEL_NORMAL = 0
+LEVEL_GREEDY = 1
+LEVEL_NO_DIARIZATION = 2
+LEVEL_SMALL_MODEL = 3
+LEVEL_DEFER = 4
+LEVEL_NAMES = ("normal", "greedy", "no_diarization", "small_model", "defer")
+
+# Rückstand in Sekunden (wartendes Audio mal Echtzeitfaktor), ab dem die jeweilige Stufe greift.
+DEFAULT_THRESHOLDS = (30 * 60, 60 * 60, 120 * 60, 240 * 60)
+DEFAULT_FALLBACK_MODEL = "base"
+
+# Eine Stufe zurück erst, wenn der Rückstand unter diesen Anteil ihrer Schwelle fällt.
+HYSTERESIS = 0.5
+# Gewicht der letzten Messung im gleitenden Mittel des Echtzeitfaktors.
+SMOOTHING = 0.3
+
+
+def parse_thresholds(value):
+    """
+    Liest die Schwellen aus "30,60,120,240" (Minuten Rückstand je Stufe).
+
+    Returns:
+        tuple: Vier aufsteigende Schwellen in Sekunden.
+
+    Raises:
+        ValueError: Bei einer anderen Anzahl oder nicht aufsteigenden Werten.
+    """
+    try:
+        minutes = [float(part) for part in value.split(",")]
+    except ValueError:
+        raise ValueError(f"Ungültige Schwellen: {value}. Erwartet z.B. 30,60,120,240 (Minuten).") from None
+    if len(minutes) != len(DEFAULT_THRESHOLDS) or any(m <= 0 for m in minutes) or minutes != sorted(minutes):
+        raise ValueError(f"Ungültige Schwellen: {value}. Erwartet vier aufsteigende Minutenwerte, z.B. 30,60,120,240.")
+    return tuple(m * 60 for m in minutes)
+
+
+class LoadShedder:
+    """
+    Senkt die Transkriptionsqualität stufenweise, wenn die Transkription zurückfällt.
+
+    Der Rückstand ist das wartende Audio mal dem gemessenen Echtzeitfaktor, also die
+    Zeit, bis die Warteschlange abgearbeitet wäre. Mit jeder überschrittenen Schwelle
+    kommt eine Stufe hinzu: Greedy-Dekodierung statt Beam-Search, keine Diarisierung,
+    ein kleineres Whisper-Modell und zuletzt das Zurückstellen der ältesten Segmente
+    für einen späteren Backfill. Zurück geht es erst mit Abstand zur Schwelle, damit
+    die Stufe nicht bei jedem Segment wechselt.
+    """
+    def __init__(self, backlog, thresholds=DEFAULT_THRESHOLDS, fallback_model=DEFAULT_FALLBACK_MODEL, logger=None):
+        """
+        Args:
+            backlog (callable): Liefert die Sekunden Audio, die auf die Transkription warten.
+            thresholds (tuple, optional): Rückstand in Sekunden je Stufe.
+            fallback_model (str, optional): Whisper-Modell ab LEVEL_SMALL_MODEL. Standard: base.
+            logger (logging.Logger, optional): Logger für Stufenwechsel.
+        """
+        self.backlog = backlog
+        self.thresholds = tuple(thresholds)
+        self.fallback_model = fallback_model
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = LEVEL_NORMAL
+        self.rtf = None
+        self._lock = threading.Lock()
+
+    def observe(self, audio_seconds, elapsed):
+        """Nimmt die Rechenzeit einer Transkription in den Echtzeitfaktor auf."""
+        if not audio_seconds:
+            return
+        rtf = elapsed / audio_seconds
+        with self._lock:
+            self.rtf = rtf if self.rtf is None else SMOOTHING * rtf + (1 - SMOOTHING) * self.rtf
+
+    def lag(self):
+        """Geschätzte Sekunden, bis das wartende Audio transkribiert ist."""
+        return self.backlog() * (self.rtf if self.rtf is not None else 1.0)
+
+    def update(self):
+        """
+        Bestimmt die Stufe für das nächste Segment.
+
+        Returns:
+            int: Die Stufe (LEVEL_NORMAL bis LEVEL_DEFER).
+        """
+        lag = self.lag()
+        with self._lock:
+            target = sum(lag >= threshold for threshold in self.thresholds)
+            level = self.level
+            if target > level:
+                level = target
+            while level > target and lag < self.thresholds[level - 1] * HYSTERESIS:
+                level -= 1
+            if level != self.level:
+                self.logger.warning("Lastabwurf: Stufe %s → %s (Rückstand %.0f min, Echtzeitfaktor %s).",
+                                    LEVEL_NAMES[self.level], LEVEL_NAMES[level], lag / 60,
+                                    f"{self.rtf:.2f}" if self.rtf is not None else "unbekannt")
+                self.level = level
+            return level
+
+    def settings(self, level):
+        """
+        Einstellungen des Transcribers für eine Stufe.
+
+        Returns:
+            dict: Abweichungen von den vollen Einstellungen (beam_size, diarize, model);
+                  leer bei LEVEL_NORMAL.
+        """
+        settings = {}
+        if level >= LEVEL_GREEDY:
+            settings["beam_size"] = 1
+        if level >= LEVEL_NO_DIARIZATION:
+            settings["diarize"] = False
+        if level >= LEVEL_SMALL_MODEL:
+            settings["model"] = self.fallback_model
+        return settings
@@ -1,11 +1,11 @@
 import subprocess
-import whisper
 import os
 import time
 import threading
 import logging
 import queue
 import socket
+import sqlite3
 import contextlib
 from datetime import datetime
 from enum import Enum
@@ -13,6 +13,25 @@ import colorama
 import shutil
 
 from audio_miner.audio_transcriber import AudioTranscriber, save_results_to_file
+from .segmenter import ContinuousSegmenter
+from .worker_pool import ForkedTranscriberPool, WorkerPoolBroken
+from .daemon import DaemonTranscriber
+from .compaction import COMPACTION_INTERVAL, DEFAULT_BITRATE, DEFAULT_NICE, Compactor
+from .backfill import BACKFILL_DB, ORDER_OLDEST, Backfill
+from .search_index import SEARCH_DB, SearchIndex
+from .segment_index import SegmentIndex, is_recording, transcript_exists
+from .structured_output import FORMAT_TXT, STRUCTURED_FORMATS, build_records, write_structured
+from .stall_watchdog import get_watchdog
+from .streaming import StreamingSession, ffmpeg_pcm_output
+from .stage_cache import DEFAULT_MAX_BYTES
+from .fingerprint import FINGERPRINT_DB
+from .checkpoint import CHECKPOINT_DIR
+from .job_queue import JOB_DB, QUARANTINE_DIR, JobQueue
+from .resources import ResourceBudget
+from .load_shedding import LEVEL_DEFER, LEVEL_NAMES, LoadShedder
+from .metrics import (track_recorder, observe_transcription, segment_seconds, STAGE_DURATION, FFMPEG_RESTARTS,
+                      FFMPEG_TIMEOUTS, WATCHDOG_KILLS, RECORDED_BYTES)
+from .tracing import TRACE_FILE, build_trace, write_trace
 from .version import __version__
 colorama.init()
 
@@ -33,6 +52,17 @@ class ColoredFormatter(logging.Formatter):
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def create_logger(name, verbose=False):
+    logger = logging.getLogger(name)
+    handler = logging.StreamHandler()
+    formatter_str = '%(asctime)s - %(levelname)s - %(message)s' if verbose else '%(message)s'
+    formatter = ColoredFormatter(formatter_str)
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+    return logger
+
 class WhisperModel(Enum):
     TINY = "tiny"
     BASE = "base"
@@ -41,48 +71,24 @@ class WhisperModel(Enum):
     LARGE = "large"
     TURBO = "turbo"
 
+def ffmpeg_reconnect_args(reconnect=1, reconnect_on_network_error=1, reconnect_on_http_error=1, reconnect_streamed=1, reconnect_delay_max=15):
+    """Eingabeoptionen, mit denen ffmpeg eine abgerissene Verbindung selbst wieder aufbaut."""
+    return [
+        '-reconnect', str(reconnect),
+        '-reconnect_on_network_error', str(reconnect_on_network_error),
+        '-reconnect_on_http_error', str(reconnect_on_http_error),
+        '-reconnect_streamed', str(reconnect_streamed),
+        '-reconnect_delay_max', str(reconnect_delay_max),
+    ]
+
 class ProcessResult:
     def __init__(self, returncode):
         self.returncode = returncode
 
-class FileMonitor(threading.Thread):
-    def __init__(self, file_path, callback, interval=10, check_duration=5, run_once=False):
-        super().__init__(daemon=True)
-        self.file_path = file_path
-        self.callback = callback
-        self.interval = interval
-        self.check_duration = check_duration
-        self.running = True
-        self.last_size = 0
-        self.run_once = run_once
-
-    def run(self):
-        idle_seconds = 0
-        while self.running:
-            if not os.path.exists(self.file_path):
-                time.sleep(self.interval)
-                continue
-
-            current_size = os.path.getsize(self.file_path)
-            if current_size > self.last_size:
-                self.last_size = current_size
-                idle_seconds = 0
-            else:
-                idle_seconds += self.interval
-                if idle_seconds >= self.check_duration:
-                    self.callback()
-                    idle_seconds = 0
-                    if self.run_once:
-                        self.running = False
-            time.sleep(self.interval)
-
-    def stop(self):
-        self.running = False
-
 class RadioRecorder:
     five_percent = 5
 
-    def __init__(self, stream_url, sender, segment_time=60, base_dir=None, poll_interval=5, whisper_model=WhisperModel.TURBO, quality=None, record_only=False, transcribe_only=False, start_time_str=None, end_time_str=None, token=None, verbose=False, ffmpeg_path=None, run_once=False, use_monitor=True):
+    def __init__(self, stream_url, sender, segment_time=60, base_dir=None, poll_interval=5, whisper_model=WhisperModel.TURBO, quality=None, record_only=False, transcribe_only=False, start_time_str=None, end_time_str=None, token=None, verbose=False, ffmpeg_path=None, run_once=False, use_monitor=True, transcriber=None, continuous=False, batch_size=1, transcription_workers=1, torch_threads=None, rebuild_index=False, stall_timeout=120, streaming=False, streaming_step=2.0, speech_gate=False, cache_dir=None, cache_size=None, fingerprints=False, daemon_socket=None, backfill_order=ORDER_OLDEST, shard=None, output_formats=(FORMAT_TXT,), search_index=False, compaction=False, compaction_bitrate=DEFAULT_BITRATE, compaction_rate=None, compaction_nice=DEFAULT_NICE, checkpoints=False, load_shedding=None, fallback_model=WhisperModel.BASE, upgrade_degraded=False, job_queue=False, follow=False, reserve_recording_cores=0, transcription_nice=0):
         if base_dir is None:
             base_dir = os.getcwd()
         
@@ -97,16 +103,40 @@ class RadioRecorder:
         self.whisper_model = whisper_model
         self.quality = quality
         self.record_only = record_only
+        self.output_formats = tuple(output_formats)
         self.transcribe_only = transcribe_only
         self.verbose = verbose
         self.running = True
         self.segment_queue = queue.Queue()
         self.queued_files = set()
+        self._enqueued_at = {}
+        self._queue_lock = threading.Lock()
         self.ffmpeg_path = ffmpeg_path or shutil.which("ffmpeg")
         self.run_once = run_once
-        self.monitor = None
         self.use_monitor = use_monitor
         self.token = token
+        # Der Streaming-Modus archiviert über den segment-Muxer und setzt daher --continuous voraus.
+        self.streaming = streaming and not record_only and not transcribe_only
+        self.streaming_step = streaming_step
+        self.continuous = continuous or self.streaming
+        self.streaming_session = None
+        self._stream_latency = {}
+        self._stream_lock = threading.Lock()
+        self._stream_words = []
+        self._stream_segments = []
+        self.batch_size = batch_size
+        self.transcription_workers = max(1, transcription_workers)
+        self.rebuild_index = rebuild_index
+        self.stall_timeout = stall_timeout
+        self.upgrade_degraded = upgrade_degraded and transcribe_only
+        self._shed_levels = {}
+        self.worker_pool_broken = False
+        self.resources = None
+        if (reserve_recording_cores or transcription_nice) and not record_only:
+            # Die Transkription bleibt von den reservierten Kernen fern und läuft mit niedrigerer Priorität,
+            # damit ffmpeg auch bei einem Rückstand nicht ins Stocken gerät.
+            self.resources = ResourceBudget(reserve_recording_cores, transcription_nice, torch_threads=torch_threads,
+                                            workers=self.transcription_workers)
 
         self.start_time = None
         if start_time_str and transcribe_only:
@@ -129,28 +159,83 @@ class RadioRecorder:
             raise ValueError("Fehler: record-only und transcribe-only können nicht gleichzeitig True sein.")
         
 
-        self.transcriber = AudioTranscriber(whisper_model_size=self.whisper_model.value, token=self.token)
+        if transcriber is not None:
+            self.transcriber = transcriber
+        elif self.record_only:
+            # Ohne Transkription werden torch, Whisper und PyAnnote nie importiert.
+            self.transcriber = None
+        elif daemon_socket:
+            # Die Modelle liegen warm im Transkriptions-Daemon.
+            self.transcriber = DaemonTranscriber(daemon_socket)
+        else:
+            self.transcriber = AudioTranscriber(whisper_model_size=self.whisper_model.value, token=self.token, batch_size=self.batch_size, speech_gate=speech_gate,
+                                                cache_dir=cache_dir, cache_max_bytes=cache_size or DEFAULT_MAX_BYTES,
+                                                fingerprint_db=os.path.join(base_dir, FINGERPRINT_DB) if fingerprints else None,
+                                                structured=any(output_format in STRUCTURED_FORMATS for output_format in self.output_formats),
+                                                checkpoint_dir=os.path.join(base_dir, CHECKPOINT_DIR) if checkpoints else None,
+                                                fallback_model=fallback_model.value if load_shedding else None)
+            if self.transcription_workers > 1 and not self.record_only:
+                self.transcriber = ForkedTranscriberPool(self.transcriber, self.transcription_workers, torch_threads,
+                                                         resources=self.resources)
 
         os.makedirs(self.audio_dir, exist_ok=True)
         os.makedirs(self.transcription_dir, exist_ok=True)
         
-        self.logger = logging.getLogger(f"RadioRecorder:{self.sender}")
-        handler = logging.StreamHandler()
-        formatter_str = '%(asctime)s - %(levelname)s - %(message)s' if self.verbose else '%(message)s'
-        formatter = ColoredFormatter(formatter_str)
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
-        self.logger.propagate = False
-        self.logger.setLevel(logging.DEBUG if self.verbose else logging.INFO)
+        self.logger = create_logger(f"RadioRecorder:{self.sender}", self.verbose)
+        if self.resources is not None:
+            self.logger.info(self.resources.describe())
+
+        # Eine Datei ohne Endzeit, die länger als ein ffmpeg-Aufruf ruht, stammt von einer abgebrochenen Aufnahme.
+        self.segment_index = SegmentIndex(os.path.join(sender_dir, "segments.db"), self.audio_dir, self.transcription_dir,
+                                          logger=self.logger, recording_timeout=self._get_timeout())
+        self.job_queue = None
+        if job_queue:
+            # Die Aufträge liegen in jobs.db statt nur im Speicher; mehrere Prozesse
+            # können sie gemeinsam abarbeiten, und nach einem Neustart geht nichts verloren.
+            self.job_queue = JobQueue(os.path.join(sender_dir, JOB_DB), quarantine_dir=os.path.join(sender_dir, QUARANTINE_DIR),
+                                      logger=self.logger)
+            self.segment_queue = self.job_queue
+        self.follow = follow and self.transcribe_only and self.job_queue is not None
+        self.backfill = None
+        if self.transcribe_only:
+            self.backfill = Backfill(os.path.join(sender_dir, BACKFILL_DB), order=backfill_order, shard=shard, logger=self.logger)
+        self.compactor = None
+        if compaction and not self.record_only:
+            # Transkribierte Segmente werden im Hintergrund zu Opus verdichtet.
+            self.compactor = Compactor(self.segment_index, ffmpeg_path=self.ffmpeg_path, bitrate=compaction_bitrate,
+                                       nice=compaction_nice, max_bytes_per_second=compaction_rate, logger=self.logger)
+        self.load_shedder = None
+        if load_shedding and not self.record_only and not self.transcribe_only:
+            # Fällt die Live-Transkription zurück, werden Beam-Search, Diarisierung und Modell
+            # stufenweise reduziert; ein Backfill mit --upgrade-degraded holt die volle Qualität nach.
+            self.load_shedder = LoadShedder(self.queued_audio_seconds, thresholds=load_shedding,
+                                            fallback_model=fallback_model.value, logger=self.logger)
+        # Ein gemeinsamer Suchindex für alle Sender im Basisverzeichnis.
+        self.search_index = SearchIndex(os.path.join(base_dir, SEARCH_DB)) if search_index else None
+        track_recorder(self)
+
+        self.segmenter = None
+        if self.continuous:
+            self.segmenter = ContinuousSegmenter(self.audio_dir, self.sender, self.segment_time, logger=self.logger)
 
         self.logger.debug(f"RadioRecorder für {self.sender} gestartet. Logging-Level: {self.logger.level}")
 
     def record_stream(self):
         while self.running:
+            if self.continuous and not self.transcribe_only:
+                self._record_continuous()
+                if self.running:
+                    FFMPEG_RESTARTS.inc(sender=self.sender)
+                    time.sleep(self.poll_interval)
+                continue
+
             if not self.transcribe_only:
                 final_output_file = self._record_segment()
                 if not final_output_file:
                     continue
+                self._count_recorded_bytes(final_output_file)
+                if not self.segment_index.add_segment(final_output_file):
+                    continue
 
             if self.record_only:
                 continue
@@ -176,11 +261,14 @@ class RadioRecorder:
     def _record_segment(self, reconnect=1, reconnect_on_network_error=1, reconnect_on_http_error=1, reconnect_streamed=1, reconnect_delay_max=15):
         max_retries = 8
         for attempt in range(max_retries):
+            if attempt:
+                FFMPEG_RESTARTS.inc(sender=self.sender)
             try:
                 final_output_file = self._attempt_record_segment(reconnect, reconnect_on_network_error, reconnect_on_http_error, reconnect_streamed, reconnect_delay_max, attempt, max_retries)
                 if final_output_file:
                     return final_output_file
             except subprocess.TimeoutExpired as e:
+                FFMPEG_TIMEOUTS.inc(sender=self.sender)
                 timeout_sec = self._get_timeout(5, reconnect_delay_max, max_retries)
                 temp_output_file = os.path.join(self.audio_dir, f"{self.sender}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp3")
                 self.logger.error("FFmpeg-Aufruf überschritt Timeout von %s Sekunden für Segment: %s.", timeout_sec, temp_output_file)
@@ -194,28 +282,187 @@ class RadioRecorder:
         self.logger.error("Maximale Anzahl von Versuchen erreicht, Segment konnte nicht aufgenommen werden.")
         return None
 
-    def _on_tempfile_inactive(self):
-        self.logger.warning("temp_output_file wächst nicht mehr – beende ffmpeg.")
-        if self.ffmpeg_process:
-            self.ffmpeg_process.kill()
+    def _record_continuous(self, reconnect=1, reconnect_on_network_error=1, reconnect_on_http_error=1, reconnect_streamed=1, reconnect_delay_max=15):
+        """
+        Nimmt über eine einzige ffmpeg-Verbindung fortlaufend Segmente auf.
+
+        Kehrt zurück, wenn ffmpeg endet, kein Segment mehr liefert oder der
+        Recorder gestoppt wird. Fertige Segmente werden sofort umbenannt und
+        zur Transkription eingereiht.
+        """
+        for final_output_file in self.segmenter.finalize_leftovers():
+            self._on_segment_finished(final_output_file)
+
+        reconnect_args = ffmpeg_reconnect_args(reconnect, reconnect_on_network_error, reconnect_on_http_error,
+                                               reconnect_streamed, reconnect_delay_max)
+        self.segmenter.reset_stream()
+        pcm_read = pcm_write = None
+        extra_output = None
+        if self.streaming:
+            # Zweite Ausgabe: 16 kHz PCM über eine eigene Pipe für die Live-Transkription.
+            pcm_read, pcm_write = os.pipe()
+            extra_output = ffmpeg_pcm_output(pcm_write)
+        command = self.segmenter.build_command(self.ffmpeg_path, self.stream_url, self.quality, reconnect_args,
+                                               progress=self.use_monitor, extra_output=extra_output)
+        timeout_sec = self._get_timeout(RadioRecorder.five_percent, reconnect_delay_max)
+
+        self.logger.info("Starte fortlaufende Aufnahme für %s mit Segmenten von %d Sekunden", self.sender, self.segment_time)
+        try:
+            self.ffmpeg_process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=None if self.verbose else subprocess.DEVNULL,
+                pass_fds=(pcm_write,) if self.streaming else ()
+            )
+        except Exception:
+            if pcm_read is not None:
+                os.close(pcm_read)
+            raise
+        finally:
+            if pcm_write is not None:
+                os.close(pcm_write)
+        process = self.ffmpeg_process
+        if self.streaming:
+            self.streaming_session = StreamingSession(self.transcriber, pcm_read, self._on_stream_commit,
+                                                      step_seconds=self.streaming_step, logger=self.logger)
+            self.streaming_session.start()
+        stdout = process.stdout
+        # Der gemeinsame Watchdog liest stdout (Segmentliste und -progress) und
+        # meldet, wenn ffmpeg keinen Fortschritt mehr liefert.
+        lines = queue.Queue()
+        watchdog = get_watchdog()
+        handle = watchdog.watch_pipe(
+            stdout,
+            callback=lambda: self._on_stream_stalled(process),
+            stall_timeout=self.stall_timeout if self.use_monitor else None,
+            on_line=lines.put,
+            on_eof=lambda: lines.put(None),
+        )
+        stopping = False
+        last_activity = time.monotonic()
+        try:
+            while True:
+                if not self.running and not stopping:
+                    # ffmpeg schließt bei SIGTERM das laufende Segment sauber ab.
+                    process.terminate()
+                    stopping = True
+                    timeout_sec = 10
+                    last_activity = time.monotonic()
+
+                if time.monotonic() - last_activity > timeout_sec:
+                    self.logger.error("FFmpeg lieferte %s Sekunden lang kein fertiges Segment, beende Verbindung.", timeout_sec)
+                    FFMPEG_TIMEOUTS.inc(sender=self.sender)
+                    process.kill()
+                    break
+
+                try:
+                    line = lines.get(timeout=1)
+                except queue.Empty:
+                    continue
+                if line is None:
+                    break
+                final_output_file = self.segmenter.handle_line(line)
+                if final_output_file:
+                    last_activity = time.monotonic()
+                    self._on_segment_finished(final_output_file)
+        finally:
+            watchdog.unwatch(handle)
+            process.wait()
+            stdout.close()
+
+        for final_output_file in self.segmenter.finalize_leftovers():
+            self._on_segment_finished(final_output_file)
+
+        if self.streaming_session:
+            self.streaming_session.join()
+            self._stream_latency = self.streaming_session.latency_stats()
+            self.streaming_session = None
+            self._write_stream_transcripts(final=True)
+
+    def _on_segment_finished(self, final_output_file):
+        self.logger.info("Segment abgeschlossen: %s", final_output_file)
+        self._count_recorded_bytes(final_output_file)
+        if not self.segment_index.add_segment(final_output_file):
+            return
+        if self.record_only:
+            if self.job_queue is not None:
+                # Transkribiert wird von anderen Prozessen mit --transcribe-only --job-queue.
+                self._queue_segment_for_transcription(final_output_file)
+            return
+        span = self.segmenter.spans.pop(final_output_file, None)
+        if self.streaming_session is not None and self.token is None and span is not None:
+            # Der Text kommt aus der Live-Transkription; queued_files verhindert,
+            # dass das Segment zusätzlich regulär eingereiht wird.
+            with self._stream_lock:
+                self._stream_segments.append((final_output_file, span[0], span[1]))
+                self.queued_files.add(final_output_file)
+            self._write_stream_transcripts()
+        else:
+            self._queue_segment_for_transcription(final_output_file)
+        self.check_and_queue_old_files(datetime.now())
+
+    def _on_stream_commit(self, words, latency):
+        text = "".join(word.text for word in words).strip()
+        self.logger.info("Live [%s] (Latenz %.1f s): %s", self.sender, latency, text)
+        with open(os.path.join(self.transcription_dir, "live.txt"), "a", encoding="utf-8") as f:
+            f.write(text + "\n")
+        with self._stream_lock:
+            self._stream_words.extend(words)
+        self._write_stream_transcripts()
+
+    def _write_stream_transcripts(self, final=False):
+        """
+        Schreibt die .txt-Dateien der Segmente, deren Audio vollständig live transkribiert ist.
 
+        Args:
+            final (bool): Am Ende einer Verbindung alle offenen Segmente mit dem vorhandenen Text schreiben.
+        """
+        committed_until = self.streaming_session.committed_until if self.streaming_session else float("inf")
+        with self._stream_lock:
+            ready = [seg for seg in self._stream_segments if final or seg[2] <= committed_until]
+            self._stream_segments = [seg for seg in self._stream_segments if seg not in ready]
+            done = [(audio_file, "".join(w.text for w in self._stream_words if start <= w.start < end).strip())
+                    for audio_file, start, end in ready]
+            keep_from = min((start for _, start, _ in self._stream_segments), default=committed_until)
+            self._stream_words = [] if final else [w for w in self._stream_words if w.end > keep_from]
+        for audio_file, text in done:
+            self._write_transcription(audio_file, text)
+            self.queued_files.discard(audio_file)
+
+    def streaming_latency(self):
+        """
+        Ende-zu-Ende-Latenz der Live-Transkription in Sekunden.
+
+        Returns:
+            dict: last, mean und max, leer wenn (noch) kein Text bestätigt wurde.
+        """
+        if self.streaming_session is None:
+            return self._stream_latency
+        return self.streaming_session.latency_stats()
+
+    def _on_tempfile_inactive(self, process=None):
+        self.logger.warning("temp_output_file wächst seit %s Sekunden nicht mehr – beende ffmpeg.", self.stall_timeout)
+        process = process or self.ffmpeg_process
+        if process:
+            WATCHDOG_KILLS.inc(sender=self.sender)
+            process.kill()
+
+    def _on_stream_stalled(self, process):
+        self.logger.warning("FFmpeg meldet seit %s Sekunden keinen Fortschritt – beende ffmpeg.", self.stall_timeout)
+        WATCHDOG_KILLS.inc(sender=self.sender)
+        process.kill()
+
+    def _count_recorded_bytes(self, audio_file):
+        try:
+            RECORDED_BYTES.inc(os.path.getsize(audio_file), sender=self.sender)
+        except OSError:
+            pass
 
     def _attempt_record_segment(self, reconnect, reconnect_on_network_error, reconnect_on_http_error, reconnect_streamed, reconnect_delay_max, attempt, max_retries):
         start_time = datetime.now()
         start_timestamp = start_time.strftime("%Y%m%d_%H%M%S")
         temp_output_file = os.path.join(self.audio_dir, f"{self.sender}_{start_timestamp}.mp3")
 
-        if self.use_monitor:
-            monitor = FileMonitor(
-                file_path=temp_output_file,
-                callback=self._on_tempfile_inactive,
-                interval=5,
-                check_duration=120,
-                run_once=True
-            )
-            self.monitor = monitor
-            self.monitor.start()
-
         timeout_sec = self._get_timeout(RadioRecorder.five_percent, reconnect_delay_max, max_retries)
         command = [
             self.ffmpeg_path, '-y',
@@ -241,14 +488,18 @@ class RadioRecorder:
             stdout=None if self.verbose else subprocess.DEVNULL,
             stderr=None if self.verbose else subprocess.DEVNULL
         )
+        process = self.ffmpeg_process
+        handle = None
+        if self.use_monitor:
+            handle = get_watchdog().watch_file(temp_output_file, lambda: self._on_tempfile_inactive(process), self.stall_timeout)
         try:
-            self.ffmpeg_process.wait(timeout=timeout_sec)
+            process.wait(timeout=timeout_sec)
         except subprocess.TimeoutExpired:
-            self.ffmpeg_process.kill()
-            
-        if self.monitor:
-            self.monitor.stop()
-            self.monitor.join()
+            FFMPEG_TIMEOUTS.inc(sender=self.sender)
+            process.kill()
+        finally:
+            if handle is not None:
+                get_watchdog().unwatch(handle)
 
         return self._finalize_segment(0, temp_output_file, start_timestamp)
 
@@ -264,98 +515,325 @@ class RadioRecorder:
             return None
 
     def _queue_segment_for_transcription(self, final_output_file):
-        if final_output_file and final_output_file not in self.queued_files:
-            self.segment_queue.put(final_output_file)
-            self.queued_files.add(final_output_file)
+        if final_output_file and self._put_segment(final_output_file):
             self.logger.info("Segment fertiggestellt und zur Transkription bereit: %s", final_output_file)
         else:
             self.logger.info("Segment bereits in der Warteschlange: %s", final_output_file)
 
     def check_and_queue_old_files(self, reference_time):
-        for file in os.listdir(self.audio_dir):
-            if file.endswith(".mp3"):
-                audio_file = os.path.join(self.audio_dir, file)
-                if os.path.getsize(audio_file) == 0:
-                    self.logger.info("Leere Datei gefunden und gelöscht: %s", audio_file)
-                    os.remove(audio_file)
-                    continue
-                
-                parts = file.replace(".mp3", "").split('_')
-                file_start_timestamp_str = None
-                if len(parts) >= 2:
-                    potential_timestamp_str = parts[1]
-                    if len(parts) > 2 and len(parts[2]) == 6:
-                         potential_timestamp_str = f"{parts[1]}_{parts[2]}"
-                    elif len(parts) > 3 and len(parts[1]) == 8 and len(parts[2]) == 6:
-                        potential_timestamp_str = f"{parts[1]}_{parts[2]}"
-
-                file_start_time = None
-                if potential_timestamp_str:
-                    try:
-                        file_start_time = datetime.strptime(potential_timestamp_str, "%Y%m%d_%H%M%S")
-                    except ValueError:
-                        self.logger.debug(f"Konnte keinen gültigen Start-Timestamp aus Dateinamen extrahieren: {file}")
-                        file_start_time = datetime.fromtimestamp(os.path.getmtime(audio_file))
-                else:
-                    file_start_time = datetime.fromtimestamp(os.path.getmtime(audio_file))
-
-
-                transcription_file = os.path.join(self.transcription_dir, file.replace(".mp3", ".txt"))
-                
-                should_queue = False
-                if self.transcribe_only:
-                    if os.path.exists(transcription_file):
-                        continue
-
-                    within_start_time = True
-                    if self.start_time:
-                        within_start_time = file_start_time >= self.start_time
-                    
-                    within_end_time = True
-                    if self.end_time:
-                        within_end_time = file_start_time < self.end_time
-                    
-                    if within_start_time and within_end_time:
-                        should_queue = True
-                elif file_start_time < reference_time and not os.path.exists(transcription_file):
-                    should_queue = True
-
-
-                if should_queue:
-                    if audio_file not in self.queued_files:
-                        self.logger.info("Requeue Datei basierend auf Zeitkriterium: %s (Datei-Startzeit: %s)", audio_file, file_start_time.strftime("%Y%m%d_%H%M%S"))
-                        self.segment_queue.put(audio_file)
-                        self.queued_files.add(audio_file)
-
-    def transcribe_audio(self, audio_file):
+        """
+        Reiht alle noch nicht transkribierten Segmente ein.
+
+        Bei --transcribe-only zählt der Zeitraum aus --start-time/--end-time,
+        sonst alle Segmente, die vor reference_time begonnen haben. Die Auswahl
+        erfolgt über den Segment-Index, nicht über einen Verzeichnisscan.
+        """
+        if self.rebuild_index:
+            self.segment_index.rebuild()
+            self.rebuild_index = False
+        else:
+            self.segment_index.ensure_built()
+
+        upgrades = set()
+        if self.transcribe_only:
+            # Der Backfill holt auch die vom Lastabwurf zurückgestellten Segmente nach.
+            candidates = self.segment_index.pending(self.start_time, self.end_time, include_deferred=True)
+            if self.upgrade_degraded:
+                degraded = self.segment_index.degraded(self.start_time, self.end_time)
+                upgrades = {audio_file for audio_file, _ in degraded}
+                candidates = sorted(candidates + degraded, key=lambda candidate: candidate[1])
+        else:
+            candidates = self.segment_index.pending(end=reference_time)
+
+        pending = []
+        for audio_file, file_start_time in candidates:
+            if audio_file in self.queued_files:
+                continue
+            if not self.transcribe_only and self._is_recording(audio_file):
+                continue
+            if audio_file not in upgrades and transcript_exists(self.transcription_dir, audio_file):
+                # Von einem anderen Prozess transkribiert, ohne dass der Index aktualisiert wurde.
+                self.segment_index.mark_transcribed(audio_file)
+                continue
+            pending.append((audio_file, file_start_time))
+
+        if self.backfill is not None:
+            # Reihenfolge und Shard legt das Backfill-Journal fest.
+            start_times = dict(pending)
+            pending = [(audio_file, start_times[audio_file]) for audio_file in self.backfill.plan(pending)]
+
+        for audio_file, file_start_time in pending:
+            if self._put_segment(audio_file):
+                self.logger.info("Requeue Datei basierend auf Zeitkriterium: %s (Datei-Startzeit: %s)", audio_file, file_start_time.strftime("%Y%m%d_%H%M%S"))
+
+    def _is_recording(self, audio_file):
+        # <sender>_<start>.mp3 ohne Endzeit schreibt ffmpeg gerade; umbenannt wird erst am Segmentende.
+        return is_recording(audio_file, self.segment_index.recording_timeout)
+
+    def _put_segment(self, audio_file):
+        """
+        Reiht ein Segment ein, sofern es nicht schon wartet.
+
+        Returns:
+            bool: True, wenn das Segment neu eingereiht wurde.
+        """
+        if self.job_queue is not None:
+            # Die Warteschlange ist prozessübergreifend; ob ein Auftrag schon existiert, weiß nur jobs.db.
+            return self.job_queue.put(audio_file)
+        with self._queue_lock:
+            if audio_file in self.queued_files:
+                return False
+            self._enqueued_at[audio_file] = time.monotonic()
+            self.queued_files.add(audio_file)
+        self.segment_queue.put(audio_file)
+        return True
+
+    def _finish_segment(self, audio_file):
+        """Nimmt ein bearbeitetes (oder zurückgestelltes) Segment aus der Warteschlange."""
+        if self.job_queue is not None:
+            self.job_queue.complete(audio_file)
+        else:
+            self.segment_queue.task_done()
+        with self._queue_lock:
+            self.queued_files.discard(audio_file)
+
+    def _segment_failed(self, audio_file, error):
+        """
+        Verbucht eine fehlgeschlagene Transkription. Mit --job-queue wird sie mit Backoff
+        wiederholt und die Datei nach wiederholtem Scheitern in Quarantäne verschoben.
+        """
+        self.logger.error(f"Fehler bei der Transkription von {audio_file}: {error}", exc_info=True)
+        self._enqueued_at.pop(audio_file, None)
+        self._shed_levels.pop(audio_file, None)
+        if self.job_queue is not None:
+            self.job_queue.fail(audio_file, error)
+        else:
+            self.segment_queue.task_done()
+        with self._queue_lock:
+            self.queued_files.discard(audio_file)
+
+    def _queue_wait(self, audio_file, start):
+        """Sekunden zwischen Einreihen und Beginn der Transkription eines Segments."""
+        if self.job_queue is not None:
+            # Der Auftrag kann von einem anderen Prozess eingereiht worden sein; die Zeit steht in jobs.db.
+            return self.job_queue.wait_seconds(audio_file)
+        return start - self._enqueued_at.pop(audio_file, start)
+
+    def transcribe_audio(self, audio_file, settings=None):
         self.logger.debug("Lade Whisper Modell: %s", self.whisper_model)
-        transcription = self.transcriber.transcribe_audio(audio_file)
+        # Ohne Lastabwurf bleibt der Aufruf unverändert (auch für Transcriber ohne settings).
+        kwargs = {"settings": settings} if settings else {}
+        transcription = self.transcriber.transcribe_audio(audio_file, **kwargs)
         
         return transcription
 
+    def queued_audio_seconds(self):
+        """Sekunden Audio, die auf die Transkription warten (laut Dateiname, sonst segment_time)."""
+        if self.job_queue is not None:
+            return self.job_queue.pending_seconds(default=self.segment_time)
+        return sum(segment_seconds(audio_file) or self.segment_time for audio_file in list(self.queued_files))
+
+    def _shed_load(self, audio_files):
+        """
+        Bestimmt die Stufe des Lastabwurfs für die nächsten Segmente.
+
+        Returns:
+            tuple: (level, settings) oder (None, None) ohne Lastabwurf.
+        """
+        if self.load_shedder is None:
+            return None, None
+        level = self.load_shedder.update()
+        for audio_file in audio_files:
+            self._shed_levels[audio_file] = level
+        return level, self.load_shedder.settings(level)
+
+    def _defer_segment(self, audio_file):
+        """Stellt ein Segment für einen späteren Backfill mit --transcribe-only zurück."""
+        self._enqueued_at.pop(audio_file, None)
+        self._shed_levels.pop(audio_file, None)
+        self.segment_index.mark_deferred(audio_file)
+        self._finish_segment(audio_file)
+        self.logger.warning("Lastabwurf: Segment zurückgestellt, nachholen mit --transcribe-only: %s", audio_file)
+
+    def process_segment(self, audio_file):
+        """
+        Transkribiert ein Segment und schreibt das Ergebnis nach transkriptionen/.
+        """
+        self.logger.info("Empfange Nachricht zur Transkription: %s", audio_file)
+        level, settings = self._shed_load([audio_file])
+        if level == LEVEL_DEFER:
+            self._defer_segment(audio_file)
+            return
+        start = time.monotonic()
+        queue_wait = self._queue_wait(audio_file, start)
+        if self.backfill is not None:
+            self.backfill.start(audio_file)
+        kwargs = {"settings": settings} if settings else {}
+        transcription = self.transcribe_audio(audio_file, **kwargs)
+        elapsed = time.monotonic() - start
+        observe_transcription(self.sender, elapsed, segment_seconds(audio_file))
+        if self.load_shedder is not None:
+            self.load_shedder.observe(segment_seconds(audio_file) or self.segment_time, elapsed)
+        self._save_transcription(audio_file, transcription, {"queue_wait": queue_wait, "transcribe": elapsed})
+
+    def process_segments(self, audio_files):
+        """
+        Transkribiert mehrere Segmente gemeinsam mit gebatchter Whisper-Inferenz.
+        """
+        self.logger.info("Empfange %d Segmente zur gebatchten Transkription: %s", len(audio_files), ", ".join(audio_files))
+        level, settings = self._shed_load(audio_files)
+        if level == LEVEL_DEFER:
+            for audio_file in audio_files:
+                self._defer_segment(audio_file)
+            return
+        start = time.monotonic()
+        queue_waits = [self._queue_wait(audio_file, start) for audio_file in audio_files]
+        if self.backfill is not None:
+            for audio_file in audio_files:
+                self.backfill.start(audio_file)
+        kwargs = {"settings": settings} if settings else {}
+        transcriptions = self.transcriber.transcribe_many(audio_files, **kwargs)
+        elapsed = time.monotonic() - start
+        durations = [segment_seconds(audio_file) or 0 for audio_file in audio_files]
+        observe_transcription(self.sender, elapsed, sum(durations))
+        if self.load_shedder is not None:
+            self.load_shedder.observe(sum(durations) or self.segment_time * len(audio_files), elapsed)
+        for audio_file, transcription, queue_wait, duration in zip(audio_files, transcriptions, queue_waits, durations):
+            # Die gemeinsame Rechenzeit des Batches wird nach Audiodauer aufgeteilt.
+            share = duration / sum(durations) if sum(durations) else 1 / len(audio_files)
+            self._save_transcription(audio_file, transcription, {"queue_wait": queue_wait, "transcribe": elapsed * share})
+
+    def _write_transcription(self, audio_file, transcription, timings=None):
+        """
+        Schreibt die Transkription, aktualisiert den Segment-Index und, mit timings, den Trace.
+
+        Args:
+            audio_file (str): Pfad des Segments.
+            transcription (str | list): Ergebnis des Transcribers.
+            timings (dict, optional): queue_wait und transcribe in Sekunden; ohne Angabe
+                                      (Live-Transkription) wird kein Trace geschrieben.
+        """
+        write_start = time.perf_counter()
+        details = self._pop_transcription_details(audio_file)
+        level = self._shed_levels.pop(audio_file, None)
+        if level is not None:
+            # Die Stufe gehört zu den Einstellungen, damit ein Backfill das Segment später nachholen kann.
+            details = dict(details or {})
+            details["settings"] = dict(details.get("settings") or {}, level=level)
+            if level:
+                self.logger.info("Lastabwurf (%s): %s", LEVEL_NAMES[level], audio_file)
+        base_name = os.path.splitext(os.path.basename(audio_file))[0] + ".txt"
+        transcription_file = os.path.join(self.transcription_dir, base_name)
+        if FORMAT_TXT in self.output_formats:
+            if not isinstance(transcription, str):
+                save_results_to_file(transcription, transcription_file)
+            else:
+                with open(transcription_file, "w", encoding="utf-8") as f:
+                    f.write(transcription)
+        records = None
+        if any(output_format in STRUCTURED_FORMATS for output_format in self.output_formats):
+            records = build_records(self.sender, audio_file, transcription, details)
+            write_structured(transcription_file[:-len(".txt")], self.output_formats, records)
+        if self.search_index is not None:
+            self._index_transcription(audio_file, transcription, details, records)
+        self.logger.info("Transkription abgeschlossen: %s (%s)", transcription_file[:-len(".txt")], ", ".join(self.output_formats))
+        write_seconds = time.perf_counter() - write_start
+        for stage, seconds in (details or {}).get("stages", {}).items():
+            STAGE_DURATION.observe(seconds, stage=stage)
+        if details and "skipped_seconds" in details:
+            self.logger.info("Speech-Gate: %.0f von %.0f Sekunden ohne Sprache übersprungen: %s",
+                             details["skipped_seconds"], details["duration"], audio_file)
+        if details and details.get("fingerprint_hits"):
+            self.logger.info("Fingerabdruck: %d bekannte Clips, %.0f Sekunden nicht erneut transkribiert: %s",
+                             details["fingerprint_hits"], details["fingerprint_seconds"], audio_file)
+        self.segment_index.mark_transcribed(audio_file, details)
+        if self.backfill is not None:
+            self.backfill.complete(audio_file)
+        if timings is not None:
+            trace = build_trace(audio_file, details, dict(timings, write=write_seconds))
+            write_trace(os.path.join(self.transcription_dir, TRACE_FILE), trace)
+
+    def _index_transcription(self, audio_file, transcription, details, records=None):
+        if records is None:
+            records = build_records(self.sender, audio_file, transcription, details)
+        base_path = os.path.join(self.transcription_dir, os.path.splitext(os.path.basename(audio_file))[0])
+        # Mit der Änderungszeit der Datei überspringt "search --update" das Segment später.
+        written = [base_path + ext for ext in (".jsonl", ".txt") if os.path.exists(base_path + ext)]
+        try:
+            self.search_index.add(self.sender, audio_file, records, os.path.getmtime(written[0]) if written else None)
+        except sqlite3.Error as e:
+            self.logger.warning("Suchindex nicht aktualisiert (%s), nachholen mit 'audio_miner search --update': %s", e, audio_file)
+
+    def _pop_transcription_details(self, audio_file):
+        pop_details = getattr(self.transcriber, "pop_details", None)
+        details = pop_details(audio_file) if pop_details else None
+        return details if isinstance(details, dict) else None
+
+    def _save_transcription(self, audio_file, transcription, timings=None):
+        self._write_transcription(audio_file, transcription, timings)
+        self._finish_segment(audio_file)
+
+    def _drain_queue(self, max_items):
+        audio_files = []
+        while len(audio_files) < max_items:
+            try:
+                audio_files.append(self.segment_queue.get_nowait())
+            except queue.Empty:
+                break
+        return audio_files
+
     def transcription_worker(self, run_once=False):
         while self.running or run_once:
             try:
                 audio_file = self.segment_queue.get(timeout=self.poll_interval)
-                self.logger.info("Empfange Nachricht zur Transkription: %s", audio_file)
-                transcription = self.transcribe_audio(audio_file)
-                base_name = os.path.basename(audio_file).replace(".mp3", ".txt")
-                transcription_file = os.path.join(self.transcription_dir, base_name)
-                if self.token is not None:
-                    save_results_to_file(transcription, transcription_file)
-                else:
-                    with open(transcription_file, "w", encoding="utf-8") as f:
-                        f.write(transcription)
-                self.logger.info("Transkription abgeschlossen: %s", transcription_file)
-                self.segment_queue.task_done()
-                self.queued_files.remove(audio_file)
             except queue.Empty:
-                if run_once or self.transcribe_only:
+                if run_once or (self.transcribe_only and not self.follow and not self._jobs_outstanding()):
                     break
                 continue
+            audio_files = [audio_file] + (self._drain_queue(self.batch_size - 1) if self.batch_size > 1 else [])
+            try:
+                if self.batch_size > 1:
+                    self.process_segments(audio_files)
+                else:
+                    self.process_segment(audio_file)
+            except WorkerPoolBroken:
+                # Kein Fehlversuch: Die Segmente bleiben offen und werden nach dem Neustart erneut eingereiht.
+                self.worker_pool_broken = True
+                break
+            except Exception as e:
+                if self.job_queue is None:
+                    raise
+                for failed in audio_files:
+                    self._segment_failed(failed, e)
             if run_once:
                 break
 
+    def _transcription_thread(self):
+        # Affinität und nice gelten je Thread; der Aufnahme-Thread und ffmpeg bleiben unberührt.
+        if self.resources is not None:
+            self.resources.apply()
+        self.transcription_worker()
+
+    def _jobs_outstanding(self):
+        # Aufträge, die auf einen neuen Versuch warten, hält --transcribe-only noch ab.
+        return self.job_queue is not None and self.job_queue.outstanding() > 0
+
+    def compaction_worker(self, run_once=False):
+        """
+        Verdichtet regelmäßig die transkribierten Segmente. Bei --transcribe-only endet der
+        Thread nach dem letzten Durchlauf, sobald keine Transkription mehr läuft.
+        """
+        while self.running or run_once:
+            transcribing = any(t.is_alive() for t in getattr(self, 'transcription_threads', []))
+            count, saved = self.compactor.run_once(should_continue=lambda: self.running or run_once)
+            if count:
+                self.logger.info("%d Segmente verdichtet, %.1f MB eingespart.", count, saved / 1e6)
+            if run_once or (self.transcribe_only and not transcribing):
+                break
+            deadline = time.monotonic() + COMPACTION_INTERVAL
+            while self.running and time.monotonic() < deadline:
+                time.sleep(1)
+
     def run(self):
         art = f"""
                  _ _                    _                 
@@ -377,17 +855,27 @@ class RadioRecorder:
         if self.transcribe_only:
             self.logger.info("Starte Thread für Transkriptionen...")
         
-        self.transcription_thread = threading.Thread(target=self.transcription_worker, daemon=True)
-        self.transcription_thread.start()
+        self.transcription_threads = []
+        for _ in range(self.transcription_workers):
+            thread = threading.Thread(target=self._transcription_thread, daemon=True)
+            thread.start()
+            self.transcription_threads.append(thread)
+        self.transcription_thread = self.transcription_threads[0]
+
+        if self.compactor is not None:
+            self.compaction_thread = threading.Thread(target=self.compaction_worker, daemon=True)
+            self.compaction_thread.start()
        
         self.logger.info("RadioRecorder läuft.")
         try:
             while self.running:
                 time.sleep(1)
-                if not self.record_thread.is_alive() and not self.transcription_thread.is_alive():
-                    if self.monitor:
-                        self.monitor.stop()
-                        self.monitor.join()
+                if self.worker_pool_broken:
+                    self.logger.critical("Transkriptions-Worker abgestürzt, beende den Prozess für einen Neustart.")
+                    self.stop()
+                    raise WorkerPoolBroken("Transkriptions-Worker abgestürzt; der Prozess muss neu gestartet werden.")
+                if not self.record_thread.is_alive() and not any(t.is_alive() for t in self.transcription_threads) \
+                        and not (hasattr(self, 'compaction_thread') and self.compaction_thread.is_alive()):
                     self.logger.info("Verarbeitung beendet.")
                     self.running = False
         except KeyboardInterrupt:
@@ -401,4 +889,16 @@ class RadioRecorder:
             self.record_thread.join()
         if hasattr(self, 'transcription_thread') and self.transcription_thread.is_alive():
             self.transcription_thread.join()
+        for thread in getattr(self, 'transcription_threads', []):
+            if thread.is_alive():
+                thread.join()
+        if hasattr(self, 'compaction_thread') and self.compaction_thread.is_alive():
+            self.compaction_thread.join()
+        if isinstance(self.transcriber, (ForkedTranscriberPool, DaemonTranscriber)):
+            self.transcriber.shutdown()
+        if self.search_index is not None:
+            self.search_index.close()
+        if self.job_queue is not None:
+            # Noch gehaltene Aufträge gehen ohne Fehlversuch an andere Prozesse zurück.
+            self.job_queue.close()
         self.logger.info("Anwendung beendet.")
\ No newline at end of file
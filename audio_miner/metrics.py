@@ -0,0 +1,266 @@
+import math
+import shutil
+import threading
+import weakref
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .segment_index import parse_segment_filename
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+STAGE_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} erwartet die Labels {', '.join(self.labelnames)}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, list(zip(self.labelnames, key)), value) for key, value in items]
+
+    def value(self, **labels):
+        """Aktueller Wert für die Labels (für Tests und Auswertungen)."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Counter(_Metric):
+    """Monoton steigender Zähler."""
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Ein Counter kann nur steigen.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Wert, der steigen und fallen kann."""
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Verteilung von Messwerten in festen Buckets, mit Summe und Anzahl."""
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts = [count + (value <= bound) for count, bound in zip(counts, self.buckets)]
+            self._values[key] = (counts, total + value)
+
+    def value(self, **labels):
+        """Returns: tuple (Anzahl, Summe) der Beobachtungen."""
+        with self._lock:
+            counts, total = self._values.get(self._key(labels), ([0] * len(self.buckets), 0.0))
+        return counts[-1], total
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        result = []
+        for key, (counts, total) in items:
+            labels = list(zip(self.labelnames, key))
+            for count, bound in zip(counts, self.buckets):
+                result.append((f"{self.name}_bucket", labels + [("le", _format_value(float(bound)))], count))
+            result.append((f"{self.name}_sum", labels, total))
+            result.append((f"{self.name}_count", labels, counts[-1]))
+        return result
+
+
+class Registry:
+    """
+    Sammlung von Metriken, ausgegeben im Prometheus-Textformat.
+
+    Neben registrierten Metriken können Collector-Funktionen Werte erst beim
+    Abruf bestimmen; sie liefern Gauge-Objekte.
+    """
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def exposition(self):
+        """
+        Returns:
+            str: Alle Metriken im Prometheus-Textformat (Version 0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        for collector in collectors:
+            metrics.extend(collector())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for name, labels, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+TRANSCRIPTION_SECONDS = REGISTRY.register(Counter(
+    "audio_miner_transcription_seconds_total", "Rechenzeit der Transkription in Sekunden.", ["sender"]))
+TRANSCRIBED_AUDIO_SECONDS = REGISTRY.register(Counter(
+    "audio_miner_transcribed_audio_seconds_total", "Transkribierte Audiodauer in Sekunden.", ["sender"]))
+TRANSCRIPTION_RTF = REGISTRY.register(Gauge(
+    "audio_miner_transcription_realtime_factor", "Echtzeitfaktor der letzten Transkription (Rechenzeit / Audiodauer).", ["sender"]))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "audio_miner_stage_duration_seconds", "Dauer der Verarbeitungsstufen je Segment.", ["stage"]))
+FFMPEG_RESTARTS = REGISTRY.register(Counter(
+    "audio_miner_ffmpeg_restarts_total", "Neustarts von ffmpeg nach Fehlern oder Verbindungsabbrüchen.", ["sender"]))
+FFMPEG_TIMEOUTS = REGISTRY.register(Counter(
+    "audio_miner_ffmpeg_timeouts_total", "ffmpeg-Aufrufe, die ihr Zeitlimit überschritten haben.", ["sender"]))
+WATCHDOG_KILLS = REGISTRY.register(Counter(
+    "audio_miner_watchdog_kills_total", "Vom Watchdog beendete ffmpeg-Prozesse ohne Fortschritt.", ["sender"]))
+RECORDED_BYTES = REGISTRY.register(Counter(
+    "audio_miner_recorded_bytes_total", "Größe der fertig aufgenommenen Segmente in Bytes.", ["sender"]))
+
+_recorders = weakref.WeakSet()
+
+
+def track_recorder(recorder):
+    """Nimmt einen RadioRecorder in die Warteschlangen- und Speicherplatz-Metriken auf."""
+    _recorders.add(recorder)
+
+
+def segment_seconds(audio_file):
+    """
+    Dauer eines Segments laut Dateiname.
+
+    Returns:
+        float: Sekunden zwischen Start- und Endzeit, oder None ohne Endzeit im Namen.
+    """
+    parsed = parse_segment_filename(audio_file)
+    if parsed is None or parsed[2] is None:
+        return None
+    return (parsed[2] - parsed[1]).total_seconds()
+
+
+def _queue_metrics():
+    depth = Gauge("audio_miner_segment_queue_depth", "Segmente, die auf die Transkription warten.", ["sender"])
+    oldest = Gauge("audio_miner_segment_queue_oldest_age_seconds",
+                   "Alter des ältesten wartenden Segments seit Ende seiner Aufnahme.", ["sender"])
+    disk_free = Gauge("audio_miner_disk_free_bytes", "Freier Speicherplatz im Audio-Verzeichnis.", ["sender"])
+    now = datetime.now()
+    for recorder in list(_recorders):
+        depth.set(recorder.segment_queue.qsize(), sender=recorder.sender)
+        if recorder.job_queue is not None:
+            # Mit --job-queue wartet das Segment in jobs.db, nicht in queued_files.
+            waiting = [recorder.job_queue.oldest_pending()]
+        else:
+            waiting = list(recorder.queued_files)
+        ages = []
+        for audio_file in filter(None, waiting):
+            parsed = parse_segment_filename(audio_file)
+            if parsed is not None:
+                ages.append((now - (parsed[2] or parsed[1])).total_seconds())
+        oldest.set(max(ages, default=0.0), sender=recorder.sender)
+        try:
+            disk_free.set(shutil.disk_usage(recorder.audio_dir).free, sender=recorder.sender)
+        except OSError:
+            pass
+    return [depth, oldest, disk_free]
+
+
+REGISTRY.register_collector(_queue_metrics)
+
+
+def observe_transcription(sender, wall_seconds, audio_seconds):
+    """Verbucht eine Transkription für Echtzeitfaktor und Durchsatz."""
+    TRANSCRIPTION_SECONDS.inc(wall_seconds, sender=sender)
+    if audio_seconds:
+        TRANSCRIBED_AUDIO_SECONDS.inc(audio_seconds, sender=sender)
+        TRANSCRIPTION_RTF.set(wall_seconds / audio_seconds, sender=sender)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1", registry=REGISTRY):
+    """
+    Startet den HTTP-Endpunkt /metrics in einem Hintergrund-Thread.
+
+    Args:
+        port (int): TCP-Port; 0 wählt einen freien Port.
+        host (str, optional): Adresse, an die der Server gebunden wird. Standardmäßig nur lokal.
+        registry (Registry, optional): Auszugebende Metriken.
+
+    Returns:
+        ThreadingHTTPServer: Der laufende Server (server_address enthält den Port, shutdown() beendet ihn).
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
+
@@ -0,0 +1,332 @@
+import json
+import os
+import queue
+import threading
+import time
+
+from audio_miner.audio_transcriber import AudioTranscriber
+from .main import RadioRecorder, WhisperModel, create_logger
+from .worker_pool import ForkedTranscriberPool, WorkerPoolBroken
+from .daemon import DaemonTranscriber
+from .stage_cache import DEFAULT_MAX_BYTES
+from .fingerprint import FINGERPRINT_DB
+from .checkpoint import CHECKPOINT_DIR
+from .load_shedding import LoadShedder
+from .resources import ResourceBudget
+from .async_supervisor import AsyncRecordingSupervisor
+from .backfill import ORDER_OLDEST
+from .compaction import COMPACTION_INTERVAL, DEFAULT_BITRATE, DEFAULT_NICE
+from .structured_output import FORMAT_TXT, STRUCTURED_FORMATS
+
+STATION_KEYS = {"sender", "stream_url", "segment_time", "quality", "poll_interval"}
+
+
+def load_stations(path):
+    """
+    Liest eine Senderliste im JSON-Format ein.
+
+    Erwartet wird eine Liste von Objekten, z.B.
+    [{"sender": "swr3", "stream_url": "https://...", "segment_time": 300}].
+    Erlaubte Schlüssel sind sender, stream_url, segment_time, quality und poll_interval.
+
+    Args:
+        path (str): Pfad zur JSON-Datei.
+
+    Returns:
+        list: Die Liste der Sender-Konfigurationen.
+
+    Raises:
+        ValueError: Wenn die Senderliste ungültig ist.
+    """
+    with open(path, encoding="utf-8") as f:
+        stations = json.load(f)
+
+    if not isinstance(stations, list) or not stations:
+        raise ValueError(f"Senderliste {path} muss eine nicht-leere JSON-Liste sein.")
+
+    senders = set()
+    for station in stations:
+        if not isinstance(station, dict) or not station.get("sender"):
+            raise ValueError(f"Ungültiger Eintrag in der Senderliste: {station}")
+        unknown = set(station) - STATION_KEYS
+        if unknown:
+            raise ValueError(f"Unbekannte Schlüssel für Sender {station['sender']}: {', '.join(sorted(unknown))}")
+        if station["sender"] in senders:
+            raise ValueError(f"Sender {station['sender']} ist mehrfach in der Senderliste enthalten.")
+        senders.add(station["sender"])
+
+    return stations
+
+
+class TranscriptionPool:
+    """
+    Gemeinsamer Pool von Transkriptions-Workern für mehrere Sender.
+
+    Jeder Sender behält seine eigene segment_queue. Die Worker entnehmen die
+    Segmente reihum (Round-Robin), damit ein Sender mit großem Rückstand die
+    anderen nicht aushungert.
+    """
+    def __init__(self, recorders, workers=1, poll_interval=5, resources=None):
+        self.recorders = list(recorders)
+        self.resources = resources
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.running = False
+        self.threads = []
+        self.active = 0
+        self.broken = False
+        self._next_index = 0
+        self._lock = threading.Lock()
+        self.logger = create_logger("TranscriptionPool", any(r.verbose for r in self.recorders))
+
+    def next_segment(self):
+        """
+        Liefert das nächste Segment im Round-Robin über alle Sender.
+
+        Returns:
+            tuple: (RadioRecorder, audio_file) oder (None, None), wenn alle Warteschlangen leer sind.
+        """
+        with self._lock:
+            count = len(self.recorders)
+            for offset in range(count):
+                index = (self._next_index + offset) % count
+                recorder = self.recorders[index]
+                try:
+                    audio_file = recorder.segment_queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self._next_index = (index + 1) % count
+                self.active += 1
+                return recorder, audio_file
+        return None, None
+
+    def next_batch(self):
+        """
+        Wie next_segment, nimmt aber vom nächsten Sender bis zu dessen batch_size
+        wartende Segmente für eine gemeinsame Transkription mit transcribe_many.
+
+        Returns:
+            tuple: (RadioRecorder, Liste der Segmente) oder (None, []), wenn alle Warteschlangen leer sind.
+        """
+        recorder, audio_file = self.next_segment()
+        if recorder is None:
+            return None, []
+        audio_files = [audio_file]
+        while len(audio_files) < recorder.batch_size:
+            try:
+                audio_files.append(recorder.segment_queue.get_nowait())
+            except queue.Empty:
+                break
+        return recorder, audio_files
+
+    def worker(self):
+        # Die Worker-Threads laufen auf den Transkriptions-Kernen, die Aufnahme-Threads nicht.
+        if self.resources is not None:
+            self.resources.apply()
+        while self.running:
+            recorder, audio_files = self.next_batch()
+            if recorder is None:
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                if recorder.batch_size > 1:
+                    recorder.process_segments(audio_files)
+                else:
+                    recorder.process_segment(audio_files[0])
+            except WorkerPoolBroken:
+                # Kein Fehlversuch: Die Segmente bleiben offen und werden nach dem Neustart erneut eingereiht.
+                self.broken = True
+                self.running = False
+            except Exception as e:
+                for audio_file in audio_files:
+                    recorder._segment_failed(audio_file, e)
+            finally:
+                with self._lock:
+                    self.active -= 1
+
+    def backlog(self):
+        """
+        Returns:
+            dict: Anzahl wartender Segmente je Sender.
+        """
+        return {recorder.sender: recorder.segment_queue.qsize() for recorder in self.recorders}
+
+    def is_idle(self):
+        with self._lock:
+            return self.active == 0 and all(r.segment_queue.empty() and not r._jobs_outstanding() for r in self.recorders)
+
+    def start(self):
+        self.running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.worker, name=f"TranscriptionPool-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        self.logger.info("Transkriptions-Pool mit %d Worker(n) für %d Sender gestartet.", self.workers, len(self.recorders))
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+
+class MultiStationRecorder:
+    """
+    Zeichnet mehrere Sender in einem Prozess auf und transkribiert sie mit
+    einem gemeinsamen Satz geladener Modelle.
+    """
+    def __init__(self, stations, base_dir=None, whisper_model=WhisperModel.TURBO, record_only=False, transcribe_only=False, start_time_str=None, end_time_str=None, token=None, ffmpeg_path=None, verbose=False, segment_time=3600, poll_interval=5, quality=None, continuous=False, batch_size=1, transcription_workers=1, torch_threads=None, rebuild_index=False, stall_timeout=120, streaming=False, streaming_step=2.0, speech_gate=False, cache_dir=None, cache_size=None, fingerprints=False, backlog_interval=300, daemon_socket=None, backfill_order=ORDER_OLDEST, shard=None, output_formats=(FORMAT_TXT,), search_index=False, compaction=False, compaction_bitrate=DEFAULT_BITRATE, compaction_rate=None, compaction_nice=DEFAULT_NICE, checkpoints=False, load_shedding=None, fallback_model=WhisperModel.BASE, upgrade_degraded=False, job_queue=False, follow=False, async_recording=False, reserve_recording_cores=0, transcription_nice=0):
+        self.record_only = record_only
+        self.transcribe_only = transcribe_only
+        self.backlog_interval = backlog_interval
+        # Alle Aufnahmen laufen dann in einer asyncio-Schleife statt in je einem Thread.
+        self.async_recording = async_recording and not transcribe_only
+        self.supervisor = None
+        self.running = True
+        self.logger = create_logger("MultiStationRecorder", verbose)
+        self.resources = None
+        if (reserve_recording_cores or transcription_nice) and not record_only:
+            self.resources = ResourceBudget(reserve_recording_cores, transcription_nice, torch_threads=torch_threads,
+                                            workers=max(1, transcription_workers))
+            self.logger.info(self.resources.describe())
+
+        transcriber = None
+        if daemon_socket and not record_only:
+            transcriber = DaemonTranscriber(daemon_socket)
+        elif not record_only:
+            transcriber = AudioTranscriber(whisper_model_size=whisper_model.value, token=token, batch_size=batch_size, speech_gate=speech_gate,
+                                           cache_dir=cache_dir, cache_max_bytes=cache_size or DEFAULT_MAX_BYTES,
+                                           fingerprint_db=os.path.join(base_dir or os.getcwd(), FINGERPRINT_DB) if fingerprints else None,
+                                           structured=any(output_format in STRUCTURED_FORMATS for output_format in output_formats),
+                                           checkpoint_dir=os.path.join(base_dir or os.getcwd(), CHECKPOINT_DIR) if checkpoints else None,
+                                           fallback_model=fallback_model.value if load_shedding else None)
+            if transcription_workers > 1:
+                transcriber = ForkedTranscriberPool(transcriber, transcription_workers, torch_threads, resources=self.resources)
+        self.transcriber = transcriber
+
+        self.recorders = []
+        for station in stations:
+            self.recorders.append(RadioRecorder(
+                stream_url=station.get("stream_url"),
+                sender=station["sender"],
+                segment_time=station.get("segment_time", segment_time),
+                base_dir=base_dir,
+                poll_interval=station.get("poll_interval", poll_interval),
+                whisper_model=whisper_model,
+                quality=station.get("quality", quality),
+                record_only=record_only,
+                transcribe_only=transcribe_only,
+                start_time_str=start_time_str,
+                end_time_str=end_time_str,
+                token=token,
+                ffmpeg_path=ffmpeg_path,
+                verbose=verbose,
+                transcriber=transcriber,
+                continuous=continuous or self.async_recording,
+                rebuild_index=rebuild_index,
+                stall_timeout=stall_timeout,
+                streaming=streaming,
+                streaming_step=streaming_step,
+                backfill_order=backfill_order,
+                shard=shard,
+                output_formats=output_formats,
+                search_index=search_index,
+                compaction=compaction,
+                compaction_bitrate=compaction_bitrate,
+                compaction_rate=compaction_rate,
+                compaction_nice=compaction_nice,
+                load_shedding=load_shedding,
+                fallback_model=fallback_model,
+                upgrade_degraded=upgrade_degraded,
+                job_queue=job_queue,
+                follow=follow,
+            ))
+
+        if any(recorder.load_shedder is not None for recorder in self.recorders):
+            # Die Sender teilen sich die Modelle, also zählt der Rückstand über alle Sender.
+            shedder = LoadShedder(lambda: sum(recorder.queued_audio_seconds() for recorder in self.recorders),
+                                  thresholds=load_shedding, fallback_model=fallback_model.value, logger=self.logger)
+            for recorder in self.recorders:
+                recorder.load_shedder = shedder
+
+        self.pool = None
+        if not record_only:
+            self.pool = TranscriptionPool(self.recorders, workers=max(1, transcription_workers),
+                                          poll_interval=min(r.poll_interval for r in self.recorders),
+                                          resources=self.resources)
+
+    def log_backlog(self):
+        if self.pool is None:
+            return
+        backlog = self.pool.backlog()
+        summary = ", ".join(f"{sender}={count}" for sender, count in backlog.items())
+        self.logger.info("Rückstand je Sender: %s (gesamt %d)", summary, sum(backlog.values()))
+
+    def compaction_worker(self):
+        """Verdichtet die transkribierten Segmente aller Sender nacheinander in einem Thread."""
+        while self.running:
+            for recorder in self.recorders:
+                if recorder.compactor is not None:
+                    recorder.compactor.run_once(should_continue=lambda: self.running)
+            deadline = time.monotonic() + COMPACTION_INTERVAL
+            while self.running and time.monotonic() < deadline:
+                time.sleep(1)
+
+    def run(self):
+        self.logger.info("Starte %d Sender in einem Prozess...", len(self.recorders))
+        self.record_threads = []
+        if self.async_recording:
+            self.supervisor = AsyncRecordingSupervisor(self.recorders, logger=self.logger)
+            thread = threading.Thread(target=self.supervisor.run, name="record-async", daemon=True)
+            thread.start()
+            self.record_threads.append(thread)
+        else:
+            for recorder in self.recorders:
+                thread = threading.Thread(target=recorder.record_stream, name=f"record-{recorder.sender}", daemon=True)
+                thread.start()
+                self.record_threads.append(thread)
+
+        if self.pool:
+            self.pool.start()
+
+        if any(recorder.compactor is not None for recorder in self.recorders):
+            self.compaction_thread = threading.Thread(target=self.compaction_worker, name="compaction", daemon=True)
+            self.compaction_thread.start()
+
+        last_report = time.monotonic()
+        try:
+            while self.running:
+                time.sleep(1)
+                if time.monotonic() - last_report >= self.backlog_interval:
+                    self.log_backlog()
+                    last_report = time.monotonic()
+                if self.pool is not None and self.pool.broken:
+                    self.logger.critical("Transkriptions-Worker abgestürzt, beende den Prozess für einen Neustart.")
+                    self.stop()
+                    raise WorkerPoolBroken("Transkriptions-Worker abgestürzt; der Prozess muss neu gestartet werden.")
+                if not any(t.is_alive() for t in self.record_threads) and (self.pool is None or self.pool.is_idle()) \
+                        and not any(recorder.follow for recorder in self.recorders):
+                    self.logger.info("Verarbeitung beendet.")
+                    self.stop()
+        except KeyboardInterrupt:
+            self.logger.info("Interrupt erhalten, beende Anwendung...")
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        for recorder in self.recorders:
+            recorder.running = False
+        if self.supervisor is not None:
+            self.supervisor.stop()
+        for thread in getattr(self, "record_threads", []):
+            thread.join()
+        if self.pool:
+            self.pool.stop()
+        if hasattr(self, "compaction_thread"):
+            self.compaction_thread.join()
+        if isinstance(self.transcriber, (ForkedTranscriberPool, DaemonTranscriber)):
+            self.transcriber.shutdown()
+        for recorder in self.recorders:
+            if recorder.job_queue is not None:
+                recorder.job_queue.close()
+        self.logger.info("Alle Sender beendet.")
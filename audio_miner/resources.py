@@ -0,0 +1,86 @@
+import os
+import sys
+
+# Ohne Angabe bleibt die Transkription auf allen Kernen und mit normaler Priorität.
+DEFAULT_RESERVED_CORES = 0
+DEFAULT_TRANSCRIPTION_NICE = 0
+MAX_NICE = 19
+
+
+def available_cpus():
+    """
+    Returns:
+        list: Die Kerne, auf denen der aufrufende Thread laufen darf.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class ResourceBudget:
+    """
+    Teilt die CPU zwischen Aufnahme und Transkription auf.
+
+    Die ersten reserve_recording_cores Kerne bleiben für ffmpeg frei. Threads und
+    Worker-Prozesse der Transkription werden auf die übrigen Kerne gepinnt,
+    erhalten eine feste Zahl torch-Threads und laufen mit dem nice-Wert
+    transcription_nice. Unter Linux gelten Affinität und nice je Thread, daher
+    bleiben Aufnahme-Threads und die von ihnen gestarteten ffmpeg-Prozesse
+    unberührt, während alles, was ein Transkriptions-Thread startet, die
+    Einschränkung erbt.
+    """
+    def __init__(self, reserve_recording_cores=DEFAULT_RESERVED_CORES, transcription_nice=DEFAULT_TRANSCRIPTION_NICE,
+                 torch_threads=None, workers=1, cpus=None):
+        """
+        Args:
+            reserve_recording_cores (int, optional): Anzahl der Kerne, die die Transkription nicht nutzt.
+            transcription_nice (int, optional): nice-Wert der Transkription (0 bis 19).
+            torch_threads (int, optional): torch-Threads je Worker. Standardmäßig die
+                                           Transkriptions-Kerne geteilt durch workers.
+            workers (int, optional): Anzahl der Transkriptions-Worker, die sich die Kerne teilen.
+            cpus (list, optional): Verfügbare Kerne. Standardmäßig die Affinität des Prozesses.
+
+        Raises:
+            ValueError: Wenn für die Transkription kein Kern übrig bleibt oder der nice-Wert ungültig ist.
+        """
+        cpus = sorted(cpus) if cpus is not None else available_cpus()
+        if not 0 <= reserve_recording_cores < len(cpus):
+            raise ValueError(f"Von {len(cpus)} Kernen können 0 bis {len(cpus) - 1} für die Aufnahme reserviert werden, "
+                             f"nicht {reserve_recording_cores}.")
+        if not 0 <= transcription_nice <= MAX_NICE:
+            raise ValueError(f"Der nice-Wert der Transkription muss zwischen 0 und {MAX_NICE} liegen.")
+        self.recording_cpus = cpus[:reserve_recording_cores]
+        self.transcription_cpus = cpus[reserve_recording_cores:]
+        self.nice = transcription_nice
+        self.workers = max(1, workers)
+        self.torch_threads = torch_threads or max(1, len(self.transcription_cpus) // self.workers)
+
+    def __repr__(self):
+        return (f"ResourceBudget(recording_cpus={self.recording_cpus}, transcription_cpus={self.transcription_cpus}, "
+                f"nice={self.nice}, torch_threads={self.torch_threads})")
+
+    def describe(self):
+        """Kurze Beschreibung für das Log."""
+        reserved = ",".join(map(str, self.recording_cpus)) or "keine"
+        return (f"Transkription auf {len(self.transcription_cpus)} Kernen mit je {self.torch_threads} torch-Threads "
+                f"und nice {self.nice}; für die Aufnahme reserviert: {reserved}.")
+
+    def apply(self):
+        """
+        Beschränkt den aufrufenden Thread auf das Transkriptions-Budget.
+
+        Mehrfaches Aufrufen ist unschädlich: Die Priorität wird nur gesenkt, nie angehoben.
+        """
+        if self.recording_cpus and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.transcription_cpus)
+        if self.nice and hasattr(os, "setpriority"):
+            os.setpriority(os.PRIO_PROCESS, 0, max(os.getpriority(os.PRIO_PROCESS, 0), self.nice))
+        # torch wird nur eingestellt, wenn es bereits geladen ist; --record-only importiert es nie.
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.set_num_threads(self.torch_threads)
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                # Lässt sich nur setzen, bevor torch zum ersten Mal parallel gerechnet hat.
+                pass
@@ -0,0 +1,282 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from .segment_index import AUDIO_EXTENSIONS, find_audio_file, parse_segment_filename
+from .structured_output import build_records, read_jsonl
+
+SEARCH_DB = "search.db"
+
+_DIARIZED_LINE = re.compile(r"^\[(?P<speaker>.+?) \| (?P<start>\d+(?:\.\d+)?)-(?P<end>\d+(?:\.\d+)?)\] (?P<text>.*)$")
+
+
+def parse_transcript_text(text):
+    """
+    Zerlegt eine .txt-Transkription in Abschnitte.
+
+    Zeilen der Form "[SPEAKER | start-end] text" behalten Sprecher und Zeiten;
+    Transkriptionen ohne Diarisierung enthalten keine Zeiten (start None).
+
+    Returns:
+        list: Dictionaries mit speaker, start, end und text.
+    """
+    pieces = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = _DIARIZED_LINE.match(line)
+        if match:
+            pieces.append({"speaker": match.group("speaker"), "start": float(match.group("start")),
+                           "end": float(match.group("end")), "text": match.group("text")})
+        else:
+            pieces.append({"speaker": None, "start": None, "end": None, "text": line})
+    return pieces
+
+
+def _fts_query(query):
+    # Jeder Begriff wird als Phrase gesucht, damit Satzzeichen und Bindestriche
+    # keine FTS5-Syntaxfehler auslösen; "*" am Ende bleibt als Präfixsuche erhalten.
+    terms = []
+    for term in query.split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """
+    Volltextindex über die Transkripte aller Sender (SQLite FTS5 im Basisverzeichnis).
+
+    Jeder Abschnitt eines Transkripts wird mit Sender, Segment, Versatz und
+    Uhrzeit gespeichert. Der RadioRecorder ergänzt den Index nach jeder
+    Transkription; update_from_files() nimmt bestehende Transkripte nach
+    Änderungszeit inkrementell auf. Mehrere Prozesse können ihn gleichzeitig nutzen.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Erst bei Bedarf öffnen, damit die Verbindung nicht in geforkte Worker vererbt wird.
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS pieces (
+                    id INTEGER PRIMARY KEY,
+                    station TEXT NOT NULL,
+                    file TEXT NOT NULL,
+                    offset REAL,
+                    end_offset REAL,
+                    time TEXT,
+                    speaker TEXT,
+                    text TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_pieces_file ON pieces(file);
+                CREATE INDEX IF NOT EXISTS idx_pieces_station_time ON pieces(station, time);
+                CREATE VIRTUAL TABLE IF NOT EXISTS pieces_fts USING fts5(
+                    text, content='pieces', content_rowid='id', tokenize='unicode61 remove_diacritics 2');
+                CREATE TRIGGER IF NOT EXISTS pieces_ai AFTER INSERT ON pieces BEGIN
+                    INSERT INTO pieces_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS pieces_ad AFTER DELETE ON pieces BEGIN
+                    INSERT INTO pieces_fts(pieces_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+                CREATE TABLE IF NOT EXISTS files (
+                    file TEXT PRIMARY KEY,
+                    station TEXT NOT NULL,
+                    mtime REAL
+                );
+            """)
+            self._conn = conn
+        return self._conn
+
+    def add(self, station, audio_file, records, mtime=None):
+        """
+        Nimmt die Abschnitte eines Segments auf und ersetzt frühere Einträge desselben Segments.
+
+        Args:
+            station (str): Name des Senders.
+            audio_file (str): Pfad oder Name des Segments.
+            records (list): Datensätze aus build_records() (start, end, abs_start, speaker, text).
+            mtime (float, optional): Änderungszeit der Transkriptdatei für update_from_files().
+        """
+        name = os.path.basename(audio_file)
+        rows = [(station, name, record["start"], record["end"],
+                 record["abs_start"][:19] if record.get("abs_start") else record.get("segment_start"),
+                 record.get("speaker"), record["text"])
+                for record in records if record["text"]]
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Einträge unter der anderen Endung (.mp3 vor, .opus nach der Verdichtung) mit ersetzen.
+                names = [os.path.splitext(name)[0] + extension for extension in AUDIO_EXTENSIONS]
+                placeholders = ", ".join("?" for _ in names)
+                conn.execute(f"DELETE FROM pieces WHERE file IN ({placeholders})", names)
+                conn.execute(f"DELETE FROM files WHERE file IN ({placeholders})", names)
+                conn.executemany("INSERT INTO pieces (station, file, offset, end_offset, time, speaker, text) "
+                                 "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (name, station, mtime))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def update_from_files(self, base_dir, senders=None):
+        """
+        Nimmt neue oder geänderte Transkripte (.jsonl, sonst .txt) aus <sender>/transkriptionen/ auf.
+
+        Returns:
+            int: Anzahl der (neu) indizierten Segmente.
+        """
+        with self._lock:
+            known = {os.path.splitext(name)[0]: mtime
+                     for name, mtime in self._connection().execute("SELECT file, mtime FROM files")}
+        senders = senders or sorted(name for name in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, name)))
+        count = 0
+        for sender in senders:
+            transcription_dir = os.path.join(base_dir, sender, "transkriptionen")
+            if not os.path.isdir(transcription_dir):
+                continue
+            names = set(os.listdir(transcription_dir))
+            for name in sorted(names):
+                base, extension = os.path.splitext(name)
+                if extension == ".txt" and base + ".jsonl" in names:
+                    continue
+                if extension not in (".txt", ".jsonl") or parse_segment_filename(base + ".mp3") is None:
+                    continue
+                path = os.path.join(transcription_dir, name)
+                mtime = os.path.getmtime(path)
+                if known.get(base) == mtime:
+                    continue
+                if extension == ".jsonl":
+                    records = read_jsonl(path)
+                else:
+                    with open(path, encoding="utf-8") as f:
+                        records = build_records(sender, base + ".mp3", parse_transcript_text(f.read()))
+                self.add(sender, base + ".mp3", records, mtime)
+                count += 1
+        return count
+
+    def search(self, query, stations=None, start=None, end=None, limit=50, order="time"):
+        """
+        Sucht Abschnitte, die alle Begriffe der Anfrage enthalten.
+
+        Args:
+            query (str): Suchbegriffe; "wort*" sucht nach Präfixen.
+            stations (list, optional): Nur diese Sender.
+            start (datetime, optional): Nur Abschnitte ab dieser Uhrzeit.
+            end (datetime, optional): Nur Abschnitte vor dieser Uhrzeit.
+            limit (int, optional): Maximale Anzahl der Treffer. Standardmäßig 50.
+            order (str, optional): "time" (neueste zuerst) oder "rank" (beste Übereinstimmung zuerst).
+
+        Returns:
+            list: Treffer als Dictionaries mit station, file, offset, end, time, speaker,
+                  text und snippet (Fundstelle mit [ ] markiert).
+        """
+        fts_query = _fts_query(query)
+        if not fts_query:
+            return []
+        sql = ("SELECT p.station, p.file, p.offset, p.end_offset, p.time, p.speaker, p.text, "
+               "snippet(pieces_fts, 0, '[', ']', '…', 12) "
+               "FROM pieces_fts JOIN pieces p ON p.id = pieces_fts.rowid WHERE pieces_fts MATCH ?")
+        params = [fts_query]
+        if stations:
+            sql += f" AND p.station IN ({', '.join('?' for _ in stations)})"
+            params.extend(stations)
+        if start is not None:
+            sql += " AND p.time >= ?"
+            params.append(start.isoformat(timespec="seconds"))
+        if end is not None:
+            sql += " AND p.time < ?"
+            params.append(end.isoformat(timespec="seconds"))
+        sql += " ORDER BY rank" if order == "rank" else " ORDER BY p.time DESC"
+        sql += " LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        keys = ("station", "file", "offset", "end", "time", "speaker", "text", "snippet")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _parse_time(value):
+    return datetime.strptime(value, "%Y%m%d_%H%M%S") if value else None
+
+
+def _format_offset(seconds):
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def search_main(argv):
+    """
+    Unterbefehl "audio_miner search": Volltextsuche über die Transkripte aller Sender.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="audio_miner search")
+    parser.add_argument('query', nargs='?', default=None,
+                        help='Suchbegriffe; alle müssen vorkommen, "wort*" sucht nach Präfixen.')
+    parser.add_argument('--base-dir', default=os.getcwd(),
+                        help='Basisverzeichnis mit den Sender-Verzeichnissen und search.db.')
+    parser.add_argument('--sender', nargs='+', default=None,
+                        help='Nur diese Sender.')
+    parser.add_argument('--start-time', default=None,
+                        help='Treffer ab dieser Uhrzeit (YYYYMMDD_HHMMSS).')
+    parser.add_argument('--end-time', default=None,
+                        help='Treffer vor dieser Uhrzeit (YYYYMMDD_HHMMSS).')
+    parser.add_argument('--limit', type=int, default=50,
+                        help='Maximale Anzahl der Treffer. Standard: 50.')
+    parser.add_argument('--order', choices=['time', 'rank'], default='time',
+                        help='Sortierung: time (neueste zuerst) oder rank (beste Übereinstimmung). Standard: time.')
+    parser.add_argument('--update', action='store_true',
+                        help='Nimmt vorher neue oder geänderte Transkripte aus den Sender-Verzeichnissen auf.')
+    parser.add_argument('--json', action='store_true',
+                        help='Treffer als JSON-Zeilen ausgeben.')
+    args = parser.parse_args(argv)
+
+    if not args.query and not args.update:
+        parser.error("Suchbegriffe oder --update angeben.")
+    try:
+        start, end = _parse_time(args.start_time), _parse_time(args.end_time)
+    except ValueError:
+        parser.error("Zeitangaben im Format YYYYMMDD_HHMMSS erwartet.")
+
+    index = SearchIndex(os.path.join(args.base_dir, SEARCH_DB))
+    try:
+        if args.update:
+            count = index.update_from_files(args.base_dir, args.sender)
+            print(f"{count} Transkripte in den Suchindex aufgenommen.")
+        if not args.query:
+            return
+        hits = index.search(args.query, args.sender, start, end, args.limit, args.order)
+    finally:
+        index.close()
+
+    for hit in hits:
+        if args.json:
+            audio_dir = os.path.join(args.base_dir, hit["station"], "audio")
+            audio_file = find_audio_file(audio_dir, hit["file"]) or os.path.join(audio_dir, hit["file"])
+            print(json.dumps(dict(hit, audio_file=audio_file), ensure_ascii=False))
+        else:
+            speaker = f" {hit['speaker']}" if hit["speaker"] else ""
+            print(f"{hit['time'] or '-'} {hit['station']} {hit['file']} @ {_format_offset(hit['offset'])}{speaker}: {hit['snippet']}")
+    if not args.json:
+        print(f"{len(hits)} Treffer.")
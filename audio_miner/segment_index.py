@@ -0,0 +1,393 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+STATE_RECORDED = "recorded"
+STATE_TRANSCRIBED = "transcribed"
+# Vom Lastabwurf für einen späteren Backfill zurückgestellt.
+STATE_DEFERRED = "deferred"
+# <sender>_<start>.mp3 ohne Endzeit: wird gerade aufgenommen und erst am Segmentende umbenannt.
+STATE_RECORDING = "recording"
+# So lange darf eine Datei ohne Endzeit unverändert bleiben, bevor sie als Rest einer
+# abgebrochenen Aufnahme gilt. Standard: ein Segment von 3600 s samt ffmpeg-Timeout.
+RECORDING_TIMEOUT = 3900
+
+_ROW_COLUMNS = "name, start_time, end_time, size, state, updated"
+
+# Endungen der Transkriptdateien (--output-format); eine davon genügt als "transkribiert".
+TRANSCRIPT_EXTENSIONS = (".txt", ".jsonl", ".parquet")
+
+# Segmente werden als .mp3 aufgezeichnet und nach der Transkription ggf. zu .opus verdichtet.
+AUDIO_EXTENSIONS = (".mp3", ".opus")
+
+_SEGMENT_NAME = re.compile(r"^(?P<sender>.+?)_(?P<start>\d{8}_\d{6})(?:_(?P<end>\d{8}_\d{6}))?\.(?:mp3|opus)$")
+
+
+def parse_segment_filename(filename):
+    """
+    Zerlegt einen Segment-Dateinamen der Form <sender>_<start>[_<ende>].mp3 (oder .opus).
+
+    Args:
+        filename (str): Dateiname oder Pfad des Segments.
+
+    Returns:
+        tuple: (sender, start, end) mit datetime-Werten (end kann None sein),
+               oder None, wenn der Name nicht dem Schema entspricht.
+    """
+    match = _SEGMENT_NAME.match(os.path.basename(filename))
+    if not match:
+        return None
+    try:
+        start = datetime.strptime(match.group("start"), TIMESTAMP_FORMAT)
+        end = datetime.strptime(match.group("end"), TIMESTAMP_FORMAT) if match.group("end") else None
+    except ValueError:
+        return None
+    return match.group("sender"), start, end
+
+
+def is_recording(audio_file, timeout=RECORDING_TIMEOUT):
+    """
+    Prüft, ob ffmpeg eine Segmentdatei noch schreibt.
+
+    Nur Dateien ohne Endzeit im Namen werden noch aufgenommen. Wurde eine solche
+    Datei länger als timeout nicht verändert, hat sie eine abgebrochene Aufnahme
+    hinterlassen; sie gilt dann als fertig und wird transkribiert.
+
+    Args:
+        audio_file (str): Pfad des Segments.
+        timeout (float, optional): Sekunden ohne Änderung, nach denen die Aufnahme als abgebrochen gilt.
+    """
+    parsed = parse_segment_filename(audio_file)
+    if parsed is None or parsed[2] is not None:
+        return False
+    try:
+        return time.time() - os.path.getmtime(audio_file) < timeout
+    except OSError:
+        return False
+
+
+def transcript_exists(transcription_dir, name):
+    """
+    Prüft, ob zu einem Segment bereits eine Transkription in einem der Ausgabeformate vorliegt.
+
+    Args:
+        transcription_dir (str): Das Verzeichnis transkriptionen/.
+        name (str): Dateiname oder Pfad des Segments.
+    """
+    base = os.path.join(transcription_dir, os.path.splitext(os.path.basename(name))[0])
+    return any(os.path.exists(base + extension) for extension in TRANSCRIPT_EXTENSIONS)
+
+
+def find_audio_file(audio_dir, name):
+    """
+    Sucht die Audiodatei eines Segments unabhängig von der Endung (.mp3 oder verdichtet .opus).
+
+    Args:
+        audio_dir (str): Das Verzeichnis audio/.
+        name (str): Dateiname des Segments mit beliebiger Endung.
+
+    Returns:
+        str: Pfad der vorhandenen Datei, oder None.
+    """
+    base = os.path.join(audio_dir, os.path.splitext(os.path.basename(name))[0])
+    for extension in AUDIO_EXTENSIONS:
+        if os.path.exists(base + extension):
+            return base + extension
+    return None
+
+
+class SegmentIndex:
+    """
+    Persistenter Index aller Segmente eines Senders (SQLite unter dem Senderverzeichnis).
+
+    Hält Start-/Endzeit, Größe und Transkriptionsstatus jedes Segments, damit
+    die Warteschlange über Bereichsabfragen statt über einen Verzeichnisscan
+    befüllt werden kann. Der Index wird einmalig aus dem Dateisystem aufgebaut
+    und danach inkrementell gepflegt. Mehrere Prozesse (z.B. ein Recorder mit
+    --record-only und ein Prozess mit --transcribe-only) können ihn gleichzeitig nutzen.
+    """
+    def __init__(self, db_path, audio_dir, transcription_dir, logger=None, recording_timeout=RECORDING_TIMEOUT):
+        self.db_path = db_path
+        self.recording_timeout = recording_timeout
+        self.audio_dir = audio_dir
+        self.transcription_dir = transcription_dir
+        self.logger = logger
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Die Verbindung wird erst bei Bedarf geöffnet, damit sie nicht in
+        # geforkte Worker-Prozesse vererbt wird.
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS segments (
+                    name TEXT PRIMARY KEY,
+                    start_time TEXT NOT NULL,
+                    end_time TEXT,
+                    size INTEGER,
+                    state TEXT NOT NULL,
+                    updated REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_segments_state_start ON segments(state, start_time);
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(segments)")}
+            for column, kind in (("speech_seconds", "REAL"), ("skipped_seconds", "REAL"),
+                                 ("settings", "TEXT"), ("degraded", "INTEGER")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE segments ADD COLUMN {column} {kind}")
+            self._conn = conn
+        return self._conn
+
+    def _row_for_file(self, audio_file):
+        name = os.path.basename(audio_file)
+        parsed = parse_segment_filename(name)
+        if parsed:
+            _, start, end = parsed
+        else:
+            start = datetime.fromtimestamp(os.path.getmtime(audio_file))
+            end = None
+        if is_recording(audio_file, self.recording_timeout):
+            state = STATE_RECORDING
+        elif transcript_exists(self.transcription_dir, name):
+            state = STATE_TRANSCRIBED
+        else:
+            state = STATE_RECORDED
+        return (name,
+                start.strftime(TIMESTAMP_FORMAT),
+                end.strftime(TIMESTAMP_FORMAT) if end else None,
+                os.path.getsize(audio_file),
+                state,
+                time.time())
+
+    def _remove_empty(self, audio_file):
+        os.remove(audio_file)
+        if self.logger:
+            self.logger.info("Leere Datei gefunden und gelöscht: %s", audio_file)
+
+    def is_built(self):
+        with self._lock:
+            row = self._connection().execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+        return row is not None
+
+    def ensure_built(self):
+        """Baut den Index aus dem Dateisystem auf, falls das noch nie geschehen ist."""
+        if not self.is_built():
+            self.rebuild()
+
+    def rebuild(self):
+        """
+        Baut den Index vollständig aus audio/ und transkriptionen/ neu auf.
+
+        Leere Segmente werden dabei gelöscht, Einträge für nicht mehr vorhandene
+        Dateien entfernt. Zurückgestellte Segmente und die Einstellungen, mit denen
+        ein Segment transkribiert wurde, bleiben erhalten. Dateien ohne Endzeit im
+        Namen, die noch aufgenommen werden, erscheinen nicht in pending().
+        """
+        rows = []
+        for file in os.listdir(self.audio_dir):
+            if not file.endswith(AUDIO_EXTENSIONS):
+                continue
+            audio_file = os.path.join(self.audio_dir, file)
+            if os.path.getsize(audio_file) == 0:
+                self._remove_empty(audio_file)
+                continue
+            rows.append(self._row_for_file(audio_file))
+
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = {name: (state, settings, degraded) for name, state, settings, degraded
+                            in conn.execute("SELECT name, state, settings, degraded FROM segments")}
+                rows = [row[:4] + (STATE_DEFERRED,) + row[5:]
+                        if row[4] == STATE_RECORDED and previous.get(row[0], (None,))[0] == STATE_DEFERRED else row
+                        for row in rows]
+                conn.execute("DELETE FROM segments")
+                conn.executemany(f"INSERT INTO segments ({_ROW_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+                conn.executemany("UPDATE segments SET settings = ?, degraded = ? WHERE name = ? AND state = ?",
+                                 [(settings, degraded, name, STATE_TRANSCRIBED)
+                                  for name, (_, settings, degraded) in previous.items() if settings is not None])
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('built', ?)", (datetime.now().strftime(TIMESTAMP_FORMAT),))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if self.logger:
+            self.logger.info("Segment-Index mit %d Segmenten aufgebaut: %s", len(rows), self.db_path)
+
+    def add_segment(self, audio_file):
+        """
+        Nimmt ein fertiges Segment in den Index auf.
+
+        Returns:
+            bool: False, wenn das Segment leer war und gelöscht wurde, sonst True.
+        """
+        try:
+            if os.path.getsize(audio_file) == 0:
+                self._remove_empty(audio_file)
+                return False
+            row = self._row_for_file(audio_file)
+        except OSError:
+            return True
+        sender_start = parse_segment_filename(audio_file)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(f"INSERT OR REPLACE INTO segments ({_ROW_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", row)
+            if sender_start and sender_start[2] is not None:
+                # Der Eintrag der umbenannten Aufnahmedatei ist damit erledigt.
+                conn.execute("DELETE FROM segments WHERE name = ? AND state = ?",
+                             (f"{sender_start[0]}_{row[1]}{os.path.splitext(audio_file)[1]}", STATE_RECORDING))
+        return True
+
+    def mark_transcribed(self, audio_file, details=None):
+        """
+        Markiert ein Segment als transkribiert.
+
+        Args:
+            audio_file (str): Pfad des Segments.
+            details (dict, optional): Angaben des Speech-Gates (speech_seconds, skipped_seconds)
+                                      und die Einstellungen der Transkription (settings).
+        """
+        details = details or {}
+        settings = details.get("settings")
+        with self._lock:
+            self._connection().execute(
+                "UPDATE segments SET state = ?, updated = ?, speech_seconds = ?, skipped_seconds = ?, "
+                "settings = ?, degraded = ? WHERE name = ?",
+                (STATE_TRANSCRIBED, time.time(), details.get("speech_seconds"), details.get("skipped_seconds"),
+                 json.dumps(settings, sort_keys=True) if settings is not None else None,
+                 settings.get("level", 0) if settings else None,
+                 os.path.basename(audio_file)))
+
+    def mark_deferred(self, audio_file):
+        """
+        Stellt ein Segment zurück; die Live-Warteschlange übergeht es, ein Backfill
+        mit --transcribe-only holt es nach.
+        """
+        with self._lock:
+            self._connection().execute("UPDATE segments SET state = ?, updated = ? WHERE name = ?",
+                                       (STATE_DEFERRED, time.time(), os.path.basename(audio_file)))
+
+    def skipped_summary(self):
+        """
+        Summiert die vom Speech-Gate übersprungene Zeit.
+
+        Returns:
+            dict: segments, speech_seconds und skipped_seconds über alle Segmente mit Speech-Gate.
+        """
+        with self._lock:
+            segments, speech, skipped = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(speech_seconds), 0), COALESCE(SUM(skipped_seconds), 0) "
+                "FROM segments WHERE skipped_seconds IS NOT NULL").fetchone()
+        return {"segments": segments, "speech_seconds": speech, "skipped_seconds": skipped}
+
+    def pending(self, start=None, end=None, include_deferred=False):
+        """
+        Liefert alle noch nicht transkribierten Segmente, deren Startzeit in [start, end) liegt.
+
+        Args:
+            start (datetime, optional): Untere Grenze (inklusive).
+            end (datetime, optional): Obere Grenze (exklusive).
+            include_deferred (bool, optional): Auch vom Lastabwurf zurückgestellte Segmente.
+
+        Returns:
+            list: Tupel (audio_file, start_time) sortiert nach Startzeit.
+        """
+        self._settle_recordings()
+        states = [STATE_RECORDED, STATE_DEFERRED] if include_deferred else [STATE_RECORDED]
+        query = f"SELECT name, start_time FROM segments WHERE state IN ({', '.join('?' * len(states))})"
+        return self._range_query(query, states, start, end)
+
+    def _settle_recordings(self):
+        # Aufnahmen, deren Datei umbenannt wurde oder die seit recording_timeout ruht.
+        with self._lock:
+            names = [name for name, in self._connection().execute("SELECT name FROM segments WHERE state = ?",
+                                                                  (STATE_RECORDING,))]
+        for name in names:
+            audio_file = os.path.join(self.audio_dir, name)
+            if not os.path.exists(audio_file):
+                with self._lock:
+                    self._connection().execute("DELETE FROM segments WHERE name = ? AND state = ?", (name, STATE_RECORDING))
+            elif not is_recording(audio_file, self.recording_timeout):
+                if self.logger:
+                    self.logger.warning("Rest einer abgebrochenen Aufnahme wird transkribiert: %s", audio_file)
+                self.add_segment(audio_file)
+
+    def degraded(self, start=None, end=None):
+        """
+        Liefert Segmente, die unter Lastabwurf mit reduzierten Einstellungen transkribiert wurden.
+
+        Args:
+            start (datetime, optional): Untere Grenze (inklusive).
+            end (datetime, optional): Obere Grenze (exklusive).
+
+        Returns:
+            list: Tupel (audio_file, start_time) sortiert nach Startzeit.
+        """
+        query = "SELECT name, start_time FROM segments WHERE state = ? AND degraded > 0"
+        return self._range_query(query, [STATE_TRANSCRIBED], start, end)
+
+    def _range_query(self, query, params, start, end):
+        params = list(params)
+        if start is not None:
+            query += " AND start_time >= ?"
+            params.append(start.strftime(TIMESTAMP_FORMAT))
+        if end is not None:
+            query += " AND start_time < ?"
+            params.append(end.strftime(TIMESTAMP_FORMAT))
+        query += " ORDER BY start_time"
+        with self._lock:
+            rows = self._connection().execute(query, params).fetchall()
+        return [(os.path.join(self.audio_dir, name), datetime.strptime(start_time, TIMESTAMP_FORMAT))
+                for name, start_time in rows]
+
+    def compactable(self, extension=".mp3", transcribed_before=None):
+        """
+        Liefert transkribierte Segmente, die noch nicht verdichtet wurden.
+
+        Args:
+            extension (str, optional): Endung der unverdichteten Segmente. Standardmäßig ".mp3".
+            transcribed_before (float, optional): Nur Segmente, die vor diesem Zeitpunkt
+                                                  (time.time()) transkribiert wurden.
+
+        Returns:
+            list: Pfade der Segmente, die ältesten zuerst.
+        """
+        # Unter Lastabwurf transkribierte Segmente bleiben unverdichtet, bis sie nachgeholt sind.
+        query = "SELECT name FROM segments WHERE state = ? AND name LIKE ? AND COALESCE(degraded, 0) = 0"
+        params = [STATE_TRANSCRIBED, "%" + extension]
+        if transcribed_before is not None:
+            query += " AND updated < ?"
+            params.append(transcribed_before)
+        query += " ORDER BY start_time"
+        with self._lock:
+            rows = self._connection().execute(query, params).fetchall()
+        return [os.path.join(self.audio_dir, name) for name, in rows]
+
+    def replace_segment(self, old_file, new_file):
+        """
+        Ersetzt im Index ein Segment durch seine verdichtete Fassung; Zeiten und Status bleiben.
+
+        Args:
+            old_file (str): Pfad des ursprünglichen Segments.
+            new_file (str): Pfad der neuen Datei.
+        """
+        with self._lock:
+            self._connection().execute("UPDATE OR REPLACE segments SET name = ?, size = ? WHERE name = ?",
+                                       (os.path.basename(new_file), os.path.getsize(new_file), os.path.basename(old_file)))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,180 @@
+import csv
+import os
+import re
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+
+class ContinuousSegmenter:
+    """
+    Schneidet einen Stream mit einer einzigen, dauerhaft laufenden ffmpeg-Instanz.
+
+    ffmpeg schreibt die Segmente über den segment-Muxer als
+    <sender>_<start>.mp3 und meldet jedes abgeschlossene Segment als
+    CSV-Zeile (Dateiname,Start,Ende) auf stdout. Die Klasse wertet diese
+    Zeilen aus, benennt die Dateien in das Schema <sender>_<start>_<ende>.mp3
+    um und meldet echte Lücken in der Aufnahme mit Zeitstempeln.
+    """
+    def __init__(self, audio_dir, sender, segment_time, gap_tolerance=2.0, logger=None):
+        """
+        Args:
+            audio_dir (str): Verzeichnis, in das ffmpeg die Segmente schreibt.
+            sender (str): Name des Senders, Präfix der Dateinamen.
+            segment_time (int): Länge eines Segments in Sekunden.
+            gap_tolerance (float, optional): Ab wie vielen Sekunden fehlendem Audio
+                                             eine Lücke gemeldet wird. Standardmäßig 2.0.
+            logger (logging.Logger, optional): Logger für Lücken und Umbenennungen.
+        """
+        self.audio_dir = audio_dir
+        self.sender = sender
+        self.segment_time = segment_time
+        self.gap_tolerance = gap_tolerance
+        self.logger = logger
+        self.last_end = None
+        self.gaps = []
+        self._pending_start = None
+        self.progress = {}
+        self.stream_offset = 0.0
+        self.spans = {}
+        self._temp_pattern = re.compile(rf"^{re.escape(sender)}_(\d{{8}}_\d{{6}})\.mp3$")
+
+    def build_command(self, ffmpeg_path, stream_url, quality=None, reconnect_args=None, progress=False, extra_output=None):
+        """
+        Baut den ffmpeg-Aufruf für den segment-Muxer.
+
+        Args:
+            ffmpeg_path (str): Pfad zur ffmpeg-Binary.
+            stream_url (str): URL des Streams.
+            quality (str, optional): Bitrate für die Neukodierung, sonst wird der Stream kopiert.
+            reconnect_args (list, optional): Zusätzliche Eingabeoptionen (z.B. -reconnect).
+            progress (bool, optional): Lässt ffmpeg zusätzlich -progress-Zeilen (key=value)
+                                       auf stdout schreiben, etwa für eine Stillstandserkennung.
+            extra_output (list, optional): Optionen einer zweiten Ausgabe, die hinter den Segmenten angehängt wird.
+
+        Returns:
+            list: Die Kommandozeile.
+        """
+        output_pattern = os.path.join(self.audio_dir, f"{self.sender.replace('%', '%%')}_%Y%m%d_%H%M%S.mp3")
+        command = [ffmpeg_path, '-y']
+        if progress:
+            command.extend(['-progress', 'pipe:1', '-stats_period', '1'])
+        command.extend(reconnect_args or [])
+        command.extend(['-i', stream_url, '-map', '0:a'])
+        if quality is not None:
+            command.extend(['-c:a', 'libmp3lame', '-b:a', str(quality)])
+        else:
+            command.extend(['-c:a', 'copy'])
+        command.extend([
+            '-f', 'segment',
+            '-segment_time', str(self.segment_time),
+            '-segment_format', 'mp3',
+            '-reset_timestamps', '1',
+            '-strftime', '1',
+            '-segment_list', 'pipe:1',
+            '-segment_list_type', 'csv',
+            output_pattern,
+        ])
+        command.extend(extra_output or [])
+        return command
+
+    def handle_line(self, line, now=None):
+        """
+        Verarbeitet eine Zeile der Segmentliste.
+
+        Args:
+            line (str): CSV-Zeile von ffmpeg (Dateiname,Start,Ende) oder eine
+                        -progress-Zeile (key=value), die in self.progress landet.
+            now (datetime, optional): Zeitpunkt des Segmentendes. Standardmäßig datetime.now().
+
+        Returns:
+            str: Pfad des umbenannten Segments oder None, wenn die Zeile nicht verwertbar ist.
+        """
+        line = line.strip()
+        if not line:
+            return None
+        if "=" in line and "," not in line:
+            key, _, value = line.partition("=")
+            self.progress[key] = value
+            return None
+        try:
+            filename, start, end = next(csv.reader([line]))
+            audio_seconds = float(end) - float(start)
+        except (ValueError, StopIteration):
+            if self.logger:
+                self.logger.debug("Unbekannte Zeile vom Segmentierer ignoriert: %s", line)
+            return None
+
+        match = self._temp_pattern.match(os.path.basename(filename))
+        if not match:
+            return None
+
+        start_time = datetime.strptime(match.group(1), TIMESTAMP_FORMAT)
+        end_time = now or datetime.now()
+        temp_file = os.path.join(self.audio_dir, os.path.basename(filename))
+        return self._finalize(temp_file, start_time, end_time, audio_seconds)
+
+    def reset_stream(self):
+        """Setzt die Stream-Position zurück, wenn eine neue ffmpeg-Verbindung beginnt."""
+        self.stream_offset = 0.0
+        self.spans.clear()
+
+    def finalize_leftovers(self, now=None):
+        """
+        Stellt Segmente fertig, die ffmpeg nicht mehr melden konnte (z.B. nach einem Abbruch).
+
+        Als Ende wird der Zeitpunkt der letzten Änderung der Datei verwendet.
+
+        Returns:
+            list: Pfade der umbenannten Segmente.
+        """
+        finished = []
+        for file in sorted(os.listdir(self.audio_dir)):
+            match = self._temp_pattern.match(file)
+            if not match:
+                continue
+            temp_file = os.path.join(self.audio_dir, file)
+            start_time = datetime.strptime(match.group(1), TIMESTAMP_FORMAT)
+            end_time = datetime.fromtimestamp(os.path.getmtime(temp_file))
+            if end_time <= start_time:
+                end_time = now or datetime.now()
+            final_file = self._finalize(temp_file, start_time, end_time, None)
+            if final_file:
+                finished.append(final_file)
+        return finished
+
+    def _finalize(self, temp_file, start_time, end_time, audio_seconds):
+        if not os.path.exists(temp_file):
+            return None
+
+        self._check_gap(start_time, end_time, audio_seconds)
+
+        final_file = os.path.join(
+            self.audio_dir,
+            f"{self.sender}_{start_time.strftime(TIMESTAMP_FORMAT)}_{end_time.strftime(TIMESTAMP_FORMAT)}.mp3")
+        os.rename(temp_file, final_file)
+        self.last_end = end_time
+        # Lage des Segments im Audio der laufenden Verbindung, z.B. für den Streaming-Modus.
+        seconds = audio_seconds if audio_seconds is not None else (end_time - start_time).total_seconds()
+        self.spans[final_file] = (self.stream_offset, self.stream_offset + seconds)
+        self.stream_offset += seconds
+        return final_file
+
+    def _check_gap(self, start_time, end_time, audio_seconds):
+        if self.last_end is not None:
+            missing = (start_time - self.last_end).total_seconds()
+            if missing > self.gap_tolerance:
+                self._report_gap(self.last_end, start_time)
+
+        if audio_seconds is not None:
+            missing = (end_time - start_time).total_seconds() - audio_seconds
+            if missing > self.gap_tolerance:
+                self._report_gap(end_time - timedelta(seconds=missing), end_time)
+
+    def _report_gap(self, gap_start, gap_end):
+        self.gaps.append((gap_start, gap_end))
+        if self.logger:
+            self.logger.warning(
+                "Lücke in der Aufnahme von %s: %s bis %s (%.1f Sekunden)",
+                self.sender, gap_start.strftime(TIMESTAMP_FORMAT), gap_end.strftime(TIMESTAMP_FORMAT),
+                (gap_end - gap_start).total_seconds())
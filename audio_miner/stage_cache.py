@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+STAGE_DECODED = "decoded"
+STAGE_DIARIZATION = "diarization"
+STAGE_WHISPER = "whisper"
+STAGES = (STAGE_DECODED, STAGE_DIARIZATION, STAGE_WHISPER)
+
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """
+    Berechnet den SHA-256 des Dateiinhalts.
+
+    Args:
+        path (str): Pfad der Datei.
+
+    Returns:
+        str: Hex-Digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(content_hash, stage, params=None):
+    """
+    Schlüssel eines Stufenergebnisses aus Inhalts-Hash, Stufe und deren Parametern.
+
+    Args:
+        content_hash (str): SHA-256 der Audiodatei.
+        stage (str): Name der Stufe (decoded, diarization, whisper).
+        params (dict, optional): Alle Parameter, die das Ergebnis beeinflussen.
+
+    Returns:
+        str: Hex-Digest, der als Cache-Schlüssel dient.
+    """
+    payload = json.dumps([content_hash, stage, params or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StageCache:
+    """
+    Inhaltsadressierter Cache für die Zwischenergebnisse der Transkription.
+
+    Dekodiertes Audio wird als int16-.npy abgelegt (verlustfrei, da ffmpeg
+    16-Bit-PCM liefert), Diarisierung und Whisper-Ergebnisse als JSON. Ein
+    SQLite-Index (cache.db) hält Größe und letzten Zugriff jedes Eintrags;
+    überschreitet der Cache max_bytes, werden die am längsten nicht genutzten
+    Einträge gelöscht.
+    """
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir (str): Verzeichnis des Caches.
+            max_bytes (int, optional): Obergrenze der Cache-Größe. Standardmäßig 10 GiB.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._hashes = {}
+
+    def _connection(self):
+        # Eigene Verbindung je Prozess, damit geforkte Worker keine Verbindung teilen.
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(os.path.join(self.cache_dir, "cache.db"), timeout=30,
+                                   check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    stage TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def content_hash(self, path):
+        """
+        Inhalts-Hash einer Audiodatei, pro Pfad, Größe und Änderungszeit nur einmal berechnet.
+        """
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = self._hashes.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = file_hash(path)
+        self._hashes[path] = (signature, digest)
+        return digest
+
+    def _entry_path(self, stage, key):
+        extension = ".npy" if stage == STAGE_DECODED else ".json"
+        return os.path.join(self.cache_dir, stage, key[:2], key + extension)
+
+    def get(self, stage, key):
+        """
+        Liest ein Stufenergebnis.
+
+        Returns:
+            Das Ergebnis (numpy.ndarray für decoded, sonst JSON-Daten) oder None.
+        """
+        path = self._entry_path(stage, key)
+        try:
+            if stage == STAGE_DECODED:
+                value = np.load(path).astype(np.float32) / 32768.0
+            else:
+                with open(path, encoding="utf-8") as f:
+                    value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._connection().execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return value
+
+    def put(self, stage, key, value):
+        """Speichert ein Stufenergebnis atomar und hält die Größenobergrenze ein."""
+        path = self._entry_path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if stage == STAGE_DECODED:
+                    np.save(f, np.clip(np.round(value * 32768.0), -32768, 32767).astype(np.int16))
+                else:
+                    f.write(json.dumps(value).encode("utf-8"))
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self._lock:
+            self._connection().execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                                       (key, stage, os.path.relpath(path, self.cache_dir), os.path.getsize(path), time.time()))
+        self.evict()
+
+    def evict(self, max_bytes=None):
+        """
+        Löscht die am längsten nicht genutzten Einträge, bis der Cache unter max_bytes liegt.
+
+        Returns:
+            int: Anzahl der gelöschten Einträge.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        removed = 0
+        with self._lock:
+            conn = self._connection()
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= limit:
+                return 0
+            for key, path, size in conn.execute("SELECT key, path, size FROM entries ORDER BY last_access").fetchall():
+                if total <= limit:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, path))
+                except FileNotFoundError:
+                    pass
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+        return removed
+
+    def stats(self):
+        """
+        Returns:
+            dict: Je Stufe Anzahl und Größe der Einträge, dazu total und max_bytes.
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT stage, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY stage").fetchall()
+        stages = {stage: {"entries": count, "bytes": size} for stage, count, size in rows}
+        return {
+            "stages": stages,
+            "entries": sum(s["entries"] for s in stages.values()),
+            "bytes": sum(s["bytes"] for s in stages.values()),
+            "max_bytes": self.max_bytes,
+        }
+
+    def purge(self, stage=None):
+        """
+        Löscht alle Einträge oder nur die einer Stufe.
+
+        Returns:
+            int: Anzahl der gelöschten Einträge.
+        """
+        query = "SELECT key, path FROM entries"
+        params = ()
+        if stage is not None:
+            query += " WHERE stage = ?"
+            params = (stage,)
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(query, params).fetchall()
+            for key, path in rows:
+                try:
+                    os.remove(os.path.join(self.cache_dir, path))
+                except FileNotFoundError:
+                    pass
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _format_bytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+def cache_main(argv):
+    """
+    Unterbefehl "audio_miner cache": Cache anzeigen oder leeren.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="audio_miner cache")
+    parser.add_argument('action', choices=['stats', 'purge'],
+                        help='stats zeigt Einträge und Größe je Stufe, purge löscht Einträge.')
+    parser.add_argument('--cache-dir', required=True,
+                        help='Verzeichnis des Caches.')
+    parser.add_argument('--stage', choices=STAGES, default=None,
+                        help='Nur diese Stufe löschen (bei purge).')
+    args = parser.parse_args(argv)
+
+    cache = StageCache(args.cache_dir)
+    if args.action == "stats":
+        stats = cache.stats()
+        for stage in STAGES:
+            entry = stats["stages"].get(stage, {"entries": 0, "bytes": 0})
+            print(f"{stage:<12} {entry['entries']:>6} Einträge  {_format_bytes(entry['bytes']):>12}")
+        print(f"{'gesamt':<12} {stats['entries']:>6} Einträge  {_format_bytes(stats['bytes']):>12}")
+    else:
+        removed = cache.purge(args.stage)
+        print(f"{removed} Einträge gelöscht.")
+    cache.close()
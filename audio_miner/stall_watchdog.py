@@ -0,0 +1,332 @@
+import ctypes
+import itertools
+import logging
+import os
+import selectors
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    """
+    Minimale inotify-Anbindung über ctypes (nur Linux).
+
+    Beobachtet Verzeichnisse und liefert die Namen der Dateien, in die
+    geschrieben wurde.
+    """
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self):
+        # CDLL(None) liefert die Symbole des laufenden Prozesses, also auch der libc.
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 fehlgeschlagen")
+        self._dirs = {}
+        self._refcount = {}
+
+    def add_directory(self, directory):
+        if directory in self._refcount:
+            self._refcount[directory] += 1
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch für {directory} fehlgeschlagen")
+        self._dirs[wd] = directory
+        self._refcount[directory] = 1
+
+    def remove_directory(self, directory):
+        count = self._refcount.get(directory)
+        if count is None:
+            return
+        if count > 1:
+            self._refcount[directory] = count - 1
+            return
+        del self._refcount[directory]
+        for wd, d in list(self._dirs.items()):
+            if d == directory:
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self._dirs[wd]
+
+    def read_paths(self):
+        """Liest alle anstehenden Ereignisse und liefert die betroffenen Pfade."""
+        paths = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b"\0")
+                offset += _EVENT_HEADER.size + length
+                directory = self._dirs.get(wd)
+                if directory and name:
+                    paths.add(os.path.join(directory, os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Watch:
+    def __init__(self, handle, callback, stall_timeout):
+        self.handle = handle
+        self.callback = callback
+        self.stall_timeout = stall_timeout
+        self.last_activity = time.monotonic()
+        self.fired = False
+
+
+class _FileWatch(_Watch):
+    def __init__(self, handle, path, callback, stall_timeout):
+        super().__init__(handle, callback, stall_timeout)
+        self.path = os.path.abspath(path)
+        self.last_size = 0
+        self.inotify = False
+
+
+class _PipeWatch(_Watch):
+    def __init__(self, handle, pipe, callback, stall_timeout, on_line, on_eof):
+        super().__init__(handle, callback, stall_timeout)
+        self.pipe = pipe
+        self.on_line = on_line
+        self.on_eof = on_eof
+        self.buffer = b""
+
+
+class StallWatchdog(threading.Thread):
+    """
+    Ein gemeinsamer Thread, der alle laufenden Aufnahmen auf Stillstand überwacht.
+
+    Dateien werden per inotify beobachtet (Fallback: Polling der Dateigröße),
+    Pipes wie ffmpegs stdout über einen Selector. Wächst eine Datei bzw.
+    liefert eine Pipe länger als stall_timeout Sekunden keine Daten, wird der
+    Callback einmalig aufgerufen.
+    """
+    def __init__(self, poll_interval=1.0, use_inotify=True):
+        super().__init__(daemon=True, name="StallWatchdog")
+        self.poll_interval = poll_interval
+        self.running = True
+        self._watches = {}
+        self._handles = itertools.count(1)
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, "wakeup")
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+                self._selector.register(self.inotify.fd, selectors.EVENT_READ, "inotify")
+            except (OSError, AttributeError) as e:
+                logger.debug("inotify nicht verfügbar, verwende Polling: %s", e)
+                self.inotify = None
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_w, b"\0")
+        except OSError:
+            pass
+
+    def watch_file(self, path, callback, stall_timeout):
+        """
+        Überwacht eine Datei, die kontinuierlich wachsen soll.
+
+        Args:
+            path (str): Pfad der Datei (darf noch nicht existieren).
+            callback (callable): Wird aufgerufen, wenn die Datei stall_timeout Sekunden nicht wächst.
+            stall_timeout (float): Zeit ohne Wachstum in Sekunden.
+
+        Returns:
+            int: Handle für unwatch().
+        """
+        with self._lock:
+            watch = _FileWatch(next(self._handles), path, callback, stall_timeout)
+            if self.inotify:
+                try:
+                    self.inotify.add_directory(os.path.dirname(watch.path))
+                    watch.inotify = True
+                except OSError as e:
+                    logger.debug("inotify-Watch fehlgeschlagen, verwende Polling: %s", e)
+            self._watches[watch.handle] = watch
+        self._wakeup()
+        return watch.handle
+
+    def watch_pipe(self, pipe, callback=None, stall_timeout=None, on_line=None, on_eof=None):
+        """
+        Liest eine Pipe (z.B. ffmpegs stdout) und überwacht, ob noch Daten kommen.
+
+        Args:
+            pipe: Dateiobjekt oder Dateideskriptor der Pipe.
+            callback (callable, optional): Wird bei Stillstand aufgerufen.
+            stall_timeout (float, optional): Zeit ohne Daten in Sekunden, None deaktiviert die Prüfung.
+            on_line (callable, optional): Erhält jede vollständige Zeile (str).
+            on_eof (callable, optional): Wird aufgerufen, wenn die Pipe geschlossen wurde.
+
+        Returns:
+            int: Handle für unwatch().
+        """
+        with self._lock:
+            watch = _PipeWatch(next(self._handles), pipe, callback, stall_timeout, on_line, on_eof)
+            os.set_blocking(self._fileno(pipe), False)
+            self._selector.register(self._fileno(pipe), selectors.EVENT_READ, watch.handle)
+            self._watches[watch.handle] = watch
+        self._wakeup()
+        return watch.handle
+
+    def unwatch(self, handle):
+        with self._lock:
+            watch = self._watches.pop(handle, None)
+            if watch is None:
+                return
+            if isinstance(watch, _FileWatch) and watch.inotify:
+                self.inotify.remove_directory(os.path.dirname(watch.path))
+            if isinstance(watch, _PipeWatch):
+                self._unregister_pipe(watch)
+        self._wakeup()
+
+    def active_watches(self):
+        with self._lock:
+            return len(self._watches)
+
+    @staticmethod
+    def _fileno(pipe):
+        return pipe if isinstance(pipe, int) else pipe.fileno()
+
+    def _unregister_pipe(self, watch):
+        try:
+            self._selector.unregister(self._fileno(watch.pipe))
+        except (KeyError, ValueError):
+            pass
+
+    def _next_timeout(self, now):
+        timeout = None
+        polling = False
+        with self._lock:
+            for watch in self._watches.values():
+                if isinstance(watch, _FileWatch) and not watch.inotify:
+                    polling = True
+                if watch.stall_timeout is not None and not watch.fired:
+                    remaining = max(0.0, watch.last_activity + watch.stall_timeout - now)
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+        if polling:
+            timeout = self.poll_interval if timeout is None else min(timeout, self.poll_interval)
+        return timeout
+
+    def run(self):
+        while self.running:
+            events = self._selector.select(self._next_timeout(time.monotonic()))
+            now = time.monotonic()
+            for key, _ in events:
+                if key.data == "wakeup":
+                    try:
+                        while os.read(self._wakeup_r, 1024):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif key.data == "inotify":
+                    self._on_file_events(self.inotify.read_paths(), now)
+                else:
+                    self._on_pipe_readable(key.data, now)
+            self._poll_files(now)
+            self._check_stalls(now)
+
+    def _on_file_events(self, paths, now):
+        with self._lock:
+            for watch in self._watches.values():
+                if isinstance(watch, _FileWatch) and watch.path in paths:
+                    watch.last_activity = now
+
+    def _poll_files(self, now):
+        with self._lock:
+            watches = [w for w in self._watches.values() if isinstance(w, _FileWatch) and not w.inotify]
+        for watch in watches:
+            try:
+                size = os.path.getsize(watch.path)
+            except OSError:
+                continue
+            if size > watch.last_size:
+                watch.last_size = size
+                watch.last_activity = now
+
+    def _on_pipe_readable(self, handle, now):
+        with self._lock:
+            watch = self._watches.get(handle)
+        if watch is None:
+            return
+        try:
+            data = os.read(self._fileno(watch.pipe), 64 * 1024)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+
+        if not data:
+            with self._lock:
+                self._unregister_pipe(watch)
+                self._watches.pop(handle, None)
+            if watch.buffer and watch.on_line:
+                watch.on_line(watch.buffer.decode("utf-8", errors="replace"))
+            if watch.on_eof:
+                watch.on_eof()
+            return
+
+        watch.last_activity = now
+        if watch.on_line:
+            watch.buffer += data
+            *lines, watch.buffer = watch.buffer.split(b"\n")
+            for line in lines:
+                watch.on_line(line.decode("utf-8", errors="replace"))
+
+    def _check_stalls(self, now):
+        stalled = []
+        with self._lock:
+            for watch in self._watches.values():
+                if watch.stall_timeout is None or watch.fired:
+                    continue
+                if now - watch.last_activity >= watch.stall_timeout:
+                    watch.fired = True
+                    stalled.append(watch)
+        for watch in stalled:
+            try:
+                if watch.callback:
+                    watch.callback()
+            except Exception as e:
+                logger.error("Fehler im Watchdog-Callback: %s", e, exc_info=True)
+
+    def stop(self):
+        self.running = False
+        self._wakeup()
+
+
+_shared_watchdog = None
+_shared_lock = threading.Lock()
+
+
+def get_watchdog():
+    """
+    Liefert den gemeinsamen Watchdog des Prozesses und startet ihn bei Bedarf.
+    """
+    global _shared_watchdog
+    with _shared_lock:
+        if _shared_watchdog is None or not _shared_watchdog.is_alive():
+            _shared_watchdog = StallWatchdog()
+            _shared_watchdog.start()
+        return _shared_watchdog
@@ -0,0 +1,239 @@
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
+
+Word = namedtuple("Word", ["start", "end", "text"])
+
+
+def ffmpeg_pcm_output(fd):
+    """
+    Zusätzliche ffmpeg-Ausgabe, die den Stream als 16 kHz Mono-PCM (s16le) auf fd schreibt.
+
+    Args:
+        fd (int): Schreibende einer Pipe, die per pass_fds an ffmpeg vererbt wird.
+
+    Returns:
+        list: Die Ausgabeoptionen für die Kommandozeile.
+    """
+    return ['-map', '0:a', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', f'pipe:{fd}']
+
+
+def _normalize(text):
+    return re.sub(r"\W", "", text.lower())
+
+
+class LocalAgreement:
+    """
+    Bestätigt Wörter, sobald zwei aufeinanderfolgende Hypothesen übereinstimmen.
+
+    Whisper korrigiert das Ende eines Fensters oft noch, wenn mehr Audio
+    vorliegt. Als stabil gilt deshalb nur der gemeinsame Anfang der letzten
+    beiden Hypothesen hinter dem bereits bestätigten Text.
+    """
+    def __init__(self):
+        self.committed_until = 0.0
+        self.previous = []
+        self._tail = []
+
+    def insert(self, words):
+        """
+        Nimmt eine neue Hypothese auf.
+
+        Args:
+            words (list): Wörter mit absoluten Zeiten im Stream.
+
+        Returns:
+            list: Die neu bestätigten Wörter.
+        """
+        words = [w for w in words if w.start >= self.committed_until - 0.1]
+        # Am Fensteranfang wiederholt Whisper häufig die zuletzt bestätigten Wörter.
+        if words and self._tail and abs(words[0].start - self.committed_until) < 1.0:
+            for n in range(min(len(self._tail), len(words)), 0, -1):
+                if [_normalize(w.text) for w in self._tail[-n:]] == [_normalize(w.text) for w in words[:n]]:
+                    words = words[n:]
+                    break
+
+        commit = []
+        for new, old in zip(words, self.previous):
+            if _normalize(new.text) != _normalize(old.text):
+                break
+            commit.append(new)
+        self.previous = words[len(commit):]
+        self._accept(commit)
+        return commit
+
+    def flush(self):
+        """Bestätigt die letzte Hypothese vollständig (z.B. am Ende des Streams)."""
+        commit, self.previous = self.previous, []
+        self._accept(commit)
+        return commit
+
+    def _accept(self, commit):
+        if commit:
+            self.committed_until = commit[-1].end
+            self._tail = (self._tail + commit)[-5:]
+
+
+class StreamingSession:
+    """
+    Transkribiert einen laufenden PCM-Stream in überlappenden Fenstern.
+
+    Ein Lese-Thread hängt die Samples aus der Pipe an einen rollenden Puffer,
+    ein zweiter Thread transkribiert den Puffer, sobald step_seconds neues
+    Audio vorliegen, und meldet stabilen Text über on_commit. Bestätigtes
+    Audio wird vorne aus dem Puffer entfernt, sodass ein Fenster höchstens
+    max_window Sekunden lang wird.
+    """
+    def __init__(self, transcriber, pcm_fd, on_commit, step_seconds=2.0, max_window=30.0, trim_seconds=15.0, logger=None):
+        """
+        Args:
+            transcriber: Objekt mit transcribe_words(audio, initial_prompt=None).
+            pcm_fd (int): Lesendes Ende der PCM-Pipe.
+            on_commit (callable): Erhält (words, latency) für jeden bestätigten Abschnitt.
+            step_seconds (float, optional): Neues Audio je Transkriptionsdurchlauf. Standardmäßig 2.0.
+            max_window (float, optional): Maximale Fensterlänge in Sekunden. Standardmäßig 30.0.
+            trim_seconds (float, optional): Ab dieser Pufferlänge wird bestätigtes Audio verworfen.
+            logger (logging.Logger, optional): Logger für Fehler.
+        """
+        self.transcriber = transcriber
+        self.pcm_fd = pcm_fd
+        self.on_commit = on_commit
+        self.step_samples = int(step_seconds * SAMPLE_RATE)
+        self.max_window = max_window
+        self.trim_seconds = trim_seconds
+        self.logger = logger or logging.getLogger(__name__)
+        self.agreement = LocalAgreement()
+        self.latencies = deque(maxlen=100)
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._buffer_start = 0
+        self._total_samples = 0
+        self._arrivals = deque()
+        self._eof = False
+        self._committed_text = ""
+        self._cond = threading.Condition()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._worker = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def committed_until(self):
+        """Stream-Sekunde, bis zu der Text bestätigt ist."""
+        return self.agreement.committed_until
+
+    @property
+    def received_seconds(self):
+        return self._total_samples / SAMPLE_RATE
+
+    def start(self):
+        self._reader.start()
+        self._worker.start()
+
+    def join(self, timeout=None):
+        self._reader.join(timeout)
+        self._worker.join(timeout)
+
+    def latency_stats(self):
+        """
+        Ende-zu-Ende-Latenz vom Eintreffen des Audios bis zur Bestätigung des Textes.
+
+        Returns:
+            dict: last, mean und max in Sekunden über die letzten Abschnitte, oder {}.
+        """
+        if not self.latencies:
+            return {}
+        values = list(self.latencies)
+        return {"last": values[-1], "mean": sum(values) / len(values), "max": max(values)}
+
+    def _read(self):
+        remainder = b""
+        try:
+            while True:
+                data = os.read(self.pcm_fd, 64 * 1024)
+                if not data:
+                    break
+                data = remainder + data
+                usable = len(data) - len(data) % BYTES_PER_SAMPLE
+                remainder = data[usable:]
+                samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+                with self._cond:
+                    self._buffer = np.concatenate([self._buffer, samples])
+                    self._total_samples += len(samples)
+                    self._arrivals.append((self._total_samples, time.monotonic()))
+                    self._cond.notify()
+        except OSError as e:
+            self.logger.error("Fehler beim Lesen des PCM-Streams: %s", e)
+        finally:
+            os.close(self.pcm_fd)
+            with self._cond:
+                self._eof = True
+                self._cond.notify()
+
+    def _arrival_time(self, seconds):
+        sample = int(seconds * SAMPLE_RATE)
+        index = bisect.bisect_left(self._arrivals, (sample, 0.0))
+        if index >= len(self._arrivals):
+            return time.monotonic()
+        return self._arrivals[index][1]
+
+    def _run(self):
+        processed = 0
+        while True:
+            with self._cond:
+                while not self._eof and self._total_samples - processed < self.step_samples:
+                    self._cond.wait()
+                eof = self._eof
+                audio = self._buffer
+                offset = self._buffer_start / SAMPLE_RATE
+                processed = self._total_samples
+
+            if len(audio):
+                try:
+                    words = [Word(offset + start, offset + end, text)
+                             for start, end, text in self.transcriber.transcribe_words(audio, self._committed_text[-200:] or None)]
+                except Exception as e:
+                    self.logger.error("Fehler bei der Streaming-Transkription: %s", e, exc_info=True)
+                    words = []
+                commit = self.agreement.insert(words)
+                window = len(audio) / SAMPLE_RATE
+                if eof or window + self.step_samples / SAMPLE_RATE >= self.max_window:
+                    commit += self.agreement.flush()
+                self._emit(commit)
+                self._trim(offset + window)
+
+            if eof:
+                break
+
+    def _emit(self, commit):
+        if not commit:
+            return
+        now = time.monotonic()
+        with self._cond:
+            latency = max(0.0, now - self._arrival_time(commit[-1].end))
+        self.latencies.append(latency)
+        self._committed_text += "".join(w.text for w in commit)
+        try:
+            self.on_commit(commit, latency)
+        except Exception as e:
+            self.logger.error("Fehler bei der Ausgabe des Streaming-Textes: %s", e, exc_info=True)
+
+    def _trim(self, window_end):
+        # Bestätigtes Audio verwerfen; bei Musik oder Stille ohne Text den Puffer kappen.
+        cut = self.agreement.committed_until if window_end - self._buffer_start / SAMPLE_RATE > self.trim_seconds else 0.0
+        cut = max(cut, window_end - self.max_window + self.step_samples / SAMPLE_RATE)
+        cut_sample = int(cut * SAMPLE_RATE)
+        with self._cond:
+            if cut_sample <= self._buffer_start:
+                return
+            self._buffer = self._buffer[cut_sample - self._buffer_start:]
+            self._buffer_start = cut_sample
+            while len(self._arrivals) > 1 and self._arrivals[1][0] <= cut_sample:
+                self._arrivals.popleft()
@@ -0,0 +1,209 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from .segment_index import parse_segment_filename
+
+FORMAT_TXT = "txt"
+FORMAT_JSONL = "jsonl"
+FORMAT_PARQUET = "parquet"
+FORMATS = (FORMAT_TXT, FORMAT_JSONL, FORMAT_PARQUET)
+STRUCTURED_FORMATS = (FORMAT_JSONL, FORMAT_PARQUET)
+
+PYARROW_MISSING = "Für Parquet/Arrow wird pyarrow benötigt (pip install pyarrow)."
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+def _wall_clock(segment_start, seconds):
+    if segment_start is None or seconds is None:
+        return None
+    return (segment_start + timedelta(seconds=seconds)).isoformat(timespec="milliseconds")
+
+
+def build_records(sender, audio_file, transcription, details=None):
+    """
+    Baut die strukturierten Datensätze eines transkribierten Segments, einen je Abschnitt.
+
+    Mit details["segments"] (AudioTranscriber mit structured=True) enthalten die
+    Datensätze Konfidenz und Wortzeiten; sonst werden sie aus dem Ergebnis abgeleitet
+    (ohne Diarisierung dann ein Datensatz für das ganze Segment).
+
+    Args:
+        sender (str): Name des Senders.
+        audio_file (str): Pfad des Segments.
+        transcription (str | list): Ergebnis des Transcribers.
+        details (dict, optional): Angaben aus pop_details().
+
+    Returns:
+        list: Dictionaries mit station, file, segment_start, index, start, end, abs_start,
+              abs_end (Uhrzeit laut Dateiname), speaker, text, avg_logprob, no_speech_prob
+              words (word, start, end, probability; Zeiten in Sekunden ab Segmentbeginn) und
+              settings (model, diarize, beam_size und ggf. level des Lastabwurfs).
+    """
+    details = details or {}
+    settings = details.get("settings")
+    parsed = parse_segment_filename(audio_file)
+    segment_start = parsed[1] if parsed else None
+    pieces = details.get("segments")
+    if pieces is None:
+        if isinstance(transcription, str):
+            duration = details.get("duration")
+            if duration is None and parsed is not None and parsed[2] is not None:
+                duration = (parsed[2] - parsed[1]).total_seconds()
+            pieces = [{"start": 0.0, "end": duration, "text": transcription}] if transcription else []
+        else:
+            pieces = transcription
+
+    records = []
+    for index, piece in enumerate(pieces):
+        records.append({
+            "station": sender,
+            "file": os.path.basename(audio_file),
+            "segment_start": segment_start.isoformat() if segment_start else None,
+            "index": index,
+            "start": _round(piece["start"]),
+            "end": _round(piece["end"]),
+            "abs_start": _wall_clock(segment_start, piece["start"]),
+            "abs_end": _wall_clock(segment_start, piece["end"]),
+            "speaker": piece.get("speaker"),
+            "text": piece["text"],
+            "avg_logprob": piece.get("avg_logprob"),
+            "no_speech_prob": piece.get("no_speech_prob"),
+            "words": [{"word": word["word"], "start": _round(word["start"]), "end": _round(word["end"]),
+                       "probability": word.get("probability")} for word in piece.get("words") or []],
+            "settings": settings,
+        })
+    return records
+
+
+def write_jsonl(path, records):
+    """Schreibt die Datensätze als JSON-Zeilen; die Datei erscheint erst vollständig."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ImportError(PYARROW_MISSING) from None
+    return pyarrow
+
+
+def arrow_table(records):
+    """
+    Wandelt Datensätze aus build_records() in eine Arrow-Tabelle mit festem Schema.
+
+    Zeitpunkte werden zu Timestamps (ms), words zu einer Liste von Structs.
+    """
+    pa = _pyarrow()
+    word = pa.struct([("word", pa.string()), ("start", pa.float64()), ("end", pa.float64()),
+                      ("probability", pa.float64())])
+    schema = pa.schema([
+        ("station", pa.string()), ("file", pa.string()), ("segment_start", pa.timestamp("ms")),
+        ("index", pa.int32()), ("start", pa.float64()), ("end", pa.float64()),
+        ("abs_start", pa.timestamp("ms")), ("abs_end", pa.timestamp("ms")),
+        ("speaker", pa.string()), ("text", pa.string()),
+        ("avg_logprob", pa.float64()), ("no_speech_prob", pa.float64()),
+        ("words", pa.list_(word)),
+        ("settings", pa.struct([("model", pa.string()), ("diarize", pa.bool_()), ("beam_size", pa.int32()),
+                                ("level", pa.int32())])),
+    ])
+    timestamps = ("segment_start", "abs_start", "abs_end")
+    rows = [dict(record, **{key: datetime.fromisoformat(record[key]) if record[key] else None for key in timestamps})
+            for record in records]
+    return pa.Table.from_pylist(rows, schema=schema)
+
+
+def write_parquet(path, records):
+    """Schreibt die Datensätze als Parquet-Datei."""
+    pa = _pyarrow()
+    tmp_path = path + ".tmp"
+    pa.parquet.write_table(arrow_table(records), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_structured(base_path, formats, records):
+    """
+    Schreibt die Datensätze in allen strukturierten Formaten aus formats.
+
+    Args:
+        base_path (str): Pfad ohne Endung, z.B. transkriptionen/<segment>.
+        formats (tuple): Gewählte Ausgabeformate.
+        records (list): Datensätze aus build_records().
+    """
+    if FORMAT_JSONL in formats:
+        write_jsonl(base_path + ".jsonl", records)
+    if FORMAT_PARQUET in formats:
+        write_parquet(base_path + ".parquet", records)
+
+
+def _parse_time(value):
+    return datetime.strptime(value, "%Y%m%d_%H%M%S") if value else None
+
+
+def export_main(argv):
+    """
+    Unterbefehl "audio_miner export": JSONL-Transkripte eines Zeitraums in eine
+    spaltenorientierte Datei (Parquet, oder Arrow IPC bei .arrow/.feather) zusammenführen.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="audio_miner export")
+    parser.add_argument('--base-dir', default=os.getcwd(),
+                        help='Basisverzeichnis mit den Sender-Verzeichnissen.')
+    parser.add_argument('--sender', nargs='+', default=None,
+                        help='Nur diese Sender. Standard: alle im Basisverzeichnis.')
+    parser.add_argument('--start-time', default=None,
+                        help='Segmente ab dieser Startzeit (YYYYMMDD_HHMMSS).')
+    parser.add_argument('--end-time', default=None,
+                        help='Segmente vor dieser Startzeit (YYYYMMDD_HHMMSS).')
+    parser.add_argument('--output', required=True,
+                        help='Zieldatei (.parquet, .arrow oder .feather).')
+    args = parser.parse_args(argv)
+
+    try:
+        start, end = _parse_time(args.start_time), _parse_time(args.end_time)
+    except ValueError:
+        parser.error("Zeitangaben im Format YYYYMMDD_HHMMSS erwartet.")
+    try:
+        pa = _pyarrow()
+    except ImportError as e:
+        parser.error(str(e))
+
+    senders = args.sender or sorted(name for name in os.listdir(args.base_dir)
+                                    if os.path.isdir(os.path.join(args.base_dir, name)))
+    records = []
+    files = 0
+    for sender in senders:
+        transcription_dir = os.path.join(args.base_dir, sender, "transkriptionen")
+        if not os.path.isdir(transcription_dir):
+            continue
+        for name in sorted(os.listdir(transcription_dir)):
+            if not name.endswith(".jsonl"):
+                continue
+            parsed = parse_segment_filename(name[:-len(".jsonl")] + ".mp3")
+            if parsed is None or (start and parsed[1] < start) or (end and parsed[1] >= end):
+                continue
+            records.extend(read_jsonl(os.path.join(transcription_dir, name)))
+            files += 1
+
+    table = arrow_table(records)
+    if args.output.endswith((".arrow", ".feather")):
+        import pyarrow.feather
+        pyarrow.feather.write_feather(table, args.output)
+    else:
+        pa.parquet.write_table(table, args.output)
+    print(f"{len(records)} Abschnitte aus {files} Segmenten nach {args.output} exportiert.")
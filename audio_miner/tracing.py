@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from .segment_index import parse_segment_filename
+
+TRACE_FILE = "traces.jsonl"
+SLOWEST_TURNS = 5
+
+_write_lock = threading.Lock()
+
+
+def write_trace(path, trace):
+    """
+    Hängt einen Trace als JSON-Zeile an die Trace-Datei an.
+
+    Args:
+        path (str): Pfad der JSONL-Datei.
+        trace (dict): Der Trace eines Segments.
+    """
+    line = json.dumps(trace, ensure_ascii=False) + "\n"
+    with _write_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def build_trace(audio_file, details, timings):
+    """
+    Baut den Trace eines transkribierten Segments.
+
+    Args:
+        audio_file (str): Pfad des Segments.
+        details (dict): Angaben des Transcribers (stages, duration, turns, slowest_turns, settings).
+        timings (dict): Zeiten aus dem Recorder (queue_wait, transcribe, write).
+
+    Returns:
+        dict: Der Trace mit Audiodauer, Echtzeitfaktor, Zeit je Stufe und den langsamsten Turns.
+    """
+    details = details or {}
+    parsed = parse_segment_filename(audio_file)
+    audio_seconds = details.get("duration")
+    if audio_seconds is None and parsed is not None and parsed[2] is not None:
+        audio_seconds = (parsed[2] - parsed[1]).total_seconds()
+    wall = timings.get("transcribe")
+    stages = dict(details.get("stages", {}))
+    if "write" in timings:
+        stages["write"] = timings["write"]
+    return {
+        "file": os.path.basename(audio_file),
+        "sender": parsed[0] if parsed else None,
+        "segment_start": parsed[1].isoformat() if parsed else None,
+        "finished": datetime.now().isoformat(timespec="seconds"),
+        "audio_seconds": audio_seconds,
+        "wall_seconds": wall,
+        "rtf": wall / audio_seconds if wall is not None and audio_seconds else None,
+        "queue_wait_seconds": timings.get("queue_wait"),
+        "stages": stages,
+        "turns": details.get("turns", 0),
+        "slowest_turns": details.get("slowest_turns", []),
+        "settings": details.get("settings"),
+    }
+
+
+def read_traces(paths, start=None, end=None):
+    """
+    Liest Traces aus mehreren Dateien und filtert nach Segment-Startzeit in [start, end).
+
+    Returns:
+        list: Die Traces als Dictionaries.
+    """
+    traces = []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            continue
+        for line in lines:
+            try:
+                trace = json.loads(line)
+            except ValueError:
+                # Eine abgebrochene letzte Zeile nach einem Absturz.
+                continue
+            segment_start = datetime.fromisoformat(trace["segment_start"]) if trace.get("segment_start") else None
+            if start is not None and (segment_start is None or segment_start < start):
+                continue
+            if end is not None and (segment_start is None or segment_start >= end):
+                continue
+            traces.append(trace)
+    return traces
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(traces, top=5):
+    """
+    Fasst Traces zusammen.
+
+    Args:
+        traces (list): Traces aus read_traces().
+        top (int, optional): Anzahl der langsamsten Segmente und Turns. Standardmäßig 5.
+
+    Returns:
+        dict: files, audio_seconds, wall_seconds, rtf, queue_wait (mean, max), stages
+              (je Stufe total, mean, p95, max, share), slowest_files und slowest_turns.
+    """
+    stage_values = {}
+    for trace in traces:
+        for stage, seconds in trace.get("stages", {}).items():
+            stage_values.setdefault(stage, []).append(seconds)
+    stage_total = sum(sum(values) for values in stage_values.values())
+    stages = {
+        stage: {
+            "total": sum(values),
+            "mean": sum(values) / len(values),
+            "p95": _percentile(values, 0.95),
+            "max": max(values),
+            "share": sum(values) / stage_total if stage_total else 0.0,
+        }
+        for stage, values in sorted(stage_values.items(), key=lambda item: -sum(item[1]))
+    }
+    audio = sum(t.get("audio_seconds") or 0 for t in traces)
+    wall = sum(t.get("wall_seconds") or 0 for t in traces)
+    waits = [t["queue_wait_seconds"] for t in traces if t.get("queue_wait_seconds") is not None]
+    turns = [dict(turn, file=t["file"]) for t in traces for turn in t.get("slowest_turns", [])]
+    return {
+        "files": len(traces),
+        "audio_seconds": audio,
+        "wall_seconds": wall,
+        "rtf": wall / audio if audio else None,
+        "queue_wait": {"mean": sum(waits) / len(waits), "max": max(waits)} if waits else None,
+        "stages": stages,
+        "slowest_files": sorted(traces, key=lambda t: -(t.get("wall_seconds") or 0))[:top],
+        "slowest_turns": sorted(turns, key=lambda turn: -turn["seconds"])[:top],
+    }
+
+
+def _parse_time(value):
+    return datetime.strptime(value, "%Y%m%d_%H%M%S") if value else None
+
+
+def traces_main(argv):
+    """
+    Unterbefehl "audio_miner traces": Traces über einen Zeitraum zusammenfassen.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="audio_miner traces")
+    parser.add_argument('--base-dir', default=os.getcwd(),
+                        help='Basisverzeichnis mit den Sender-Verzeichnissen.')
+    parser.add_argument('--sender', nargs='+', default=None,
+                        help='Nur diese Sender. Standard: alle im Basisverzeichnis.')
+    parser.add_argument('--start-time', default=None,
+                        help='Segmente ab dieser Startzeit (YYYYMMDD_HHMMSS).')
+    parser.add_argument('--end-time', default=None,
+                        help='Segmente vor dieser Startzeit (YYYYMMDD_HHMMSS).')
+    parser.add_argument('--top', type=int, default=5,
+                        help='Anzahl der langsamsten Segmente und Turns. Standard: 5.')
+    parser.add_argument('--json', action='store_true',
+                        help='Zusammenfassung als JSON ausgeben.')
+    args = parser.parse_args(argv)
+
+    senders = args.sender or sorted(name for name in os.listdir(args.base_dir)
+                                    if os.path.isdir(os.path.join(args.base_dir, name)))
+    paths = [os.path.join(args.base_dir, sender, "transkriptionen", TRACE_FILE) for sender in senders]
+    try:
+        start, end = _parse_time(args.start_time), _parse_time(args.end_time)
+    except ValueError:
+        parser.error("Zeitangaben im Format YYYYMMDD_HHMMSS erwartet.")
+    summary = summarize(read_traces(paths, start, end), args.top)
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+    if not summary["files"]:
+        print("Keine Traces im gewählten Zeitraum.")
+        return
+    rtf = f"{summary['rtf']:.3f}" if summary["rtf"] is not None else "-"
+    print(f"{summary['files']} Segmente, {summary['audio_seconds'] / 3600:.1f} h Audio, "
+          f"{summary['wall_seconds'] / 3600:.1f} h Rechenzeit, Echtzeitfaktor {rtf}")
+    if summary["queue_wait"]:
+        print(f"Wartezeit in der Warteschlange: Mittel {summary['queue_wait']['mean']:.0f} s, "
+              f"Maximum {summary['queue_wait']['max']:.0f} s")
+    print(f"{'Stufe':<14} {'gesamt s':>10} {'Mittel s':>10} {'p95 s':>10} {'max s':>10} {'Anteil':>8}")
+    for stage, entry in summary["stages"].items():
+        print(f"{stage:<14} {entry['total']:>10.1f} {entry['mean']:>10.2f} {entry['p95']:>10.2f} "
+              f"{entry['max']:>10.2f} {entry['share']:>8.1%}")
+    print("Langsamste Segmente:")
+    for trace in summary["slowest_files"]:
+        print(f"  {trace['file']}: {trace.get('wall_seconds') or 0:.1f} s")
+    if summary["slowest_turns"]:
+        print("Langsamste Turns:")
+        for turn in summary["slowest_turns"]:
+            speaker = f" {turn['speaker']}" if turn.get("speaker") else ""
+            print(f"  {turn['file']}{speaker} {turn['start']:.1f}-{turn['end']:.1f}: {turn['seconds']:.1f} s")
@@ -0,0 +1,136 @@
+import gc
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Wird im Elternprozess vor dem Fork gesetzt. Die Worker erben das Objekt samt
+# geladener Modellgewichte per Copy-on-Write, ohne es erneut zu laden.
+_transcriber = None
+
+
+class WorkerPoolBroken(RuntimeError):
+    """
+    Ein Transkriptions-Worker ist abgestürzt.
+
+    Der Pool wird nicht neu geforkt: Im laufenden Prozess arbeiten dann bereits
+    Aufnahme-, Watchdog- und SQLite-Threads, deren Sperren ein fork() im
+    gesperrten Zustand in die neuen Worker kopieren könnte. Der Prozess muss
+    neu gestartet werden.
+    """
+
+
+def _init_worker(torch_threads, resources=None):
+    import torch
+    if resources is not None:
+        # Das Budget setzt Kerne, Priorität und torch-Threads.
+        resources.apply()
+        return
+    torch.set_num_threads(torch_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+
+def _call(method, args, kwargs, paths=()):
+    result = getattr(_transcriber, method)(*args, **kwargs)
+    pop_details = getattr(_transcriber, "pop_details", None)
+    details = {path: pop_details(path) for path in paths} if pop_details else {}
+    return result, details
+
+
+def _worker_info():
+    import torch
+    return os.getpid(), torch.get_num_threads()
+
+
+class ForkedTranscriberPool:
+    """
+    Verteilt Transkriptionen auf vorab geforkte Worker-Prozesse.
+
+    Der Elternprozess lädt die Modelle einmal, danach werden die Worker per
+    fork() gestartet und teilen sich die Gewichte Copy-on-Write. Jeder Worker
+    erhält einen festen Anteil der torch-Intra-Op-Threads. Die Klasse bietet
+    dieselben Methoden wie AudioTranscriber und kann ihn daher ersetzen.
+    """
+    def __init__(self, transcriber, workers, torch_threads=None, resources=None):
+        """
+        Args:
+            transcriber (AudioTranscriber): Der bereits geladene Transcriber.
+            workers (int): Anzahl der Worker-Prozesse.
+            torch_threads (int, optional): Intra-Op-Threads je Worker. Standardmäßig
+                                           die verfügbaren Kerne geteilt durch workers.
+            resources (ResourceBudget, optional): Pinnt die Worker auf die Transkriptions-Kerne
+                                                  und senkt ihre Priorität.
+        """
+        global _transcriber
+        _transcriber = transcriber
+        self.transcriber = transcriber
+        self.workers = workers
+        self.resources = resources
+        if resources is not None:
+            self.torch_threads = resources.torch_threads
+        else:
+            self.torch_threads = torch_threads or max(1, len(os.sched_getaffinity(0)) // workers)
+        self.broken = False
+        self._details = {}
+        self.executor = None
+        self._start_workers()
+
+    def __getattr__(self, name):
+        # Attribute wie token oder batch_size kommen vom geladenen Transcriber.
+        if name == "transcriber":
+            raise AttributeError(name)
+        return getattr(self.transcriber, name)
+
+    def _start_workers(self):
+        # Nach gc.freeze() fasst die Garbage Collection in den Workern die geerbten
+        # Objekte nicht mehr an, sodass deren Speicherseiten geteilt bleiben.
+        gc.freeze()
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(self.torch_threads, self.resources),
+        )
+        # Alle Worker sofort forken, solange der Elternprozess noch keine Arbeit verrichtet.
+        self.worker_info = [f.result() for f in [self.executor.submit(_worker_info) for _ in range(self.workers)]]
+        gc.unfreeze()
+        logger.info("%d Transkriptions-Worker gestartet (je %d torch-Threads).", self.workers, self.torch_threads)
+
+    def _submit(self, method, *args, paths=(), **kwargs):
+        if self.broken:
+            raise WorkerPoolBroken("Der Transkriptions-Worker-Pool ist nach einem Absturz nicht mehr verfügbar.")
+        try:
+            result, details = self.executor.submit(_call, method, args, kwargs, paths).result()
+        except BrokenProcessPool as e:
+            self.broken = True
+            logger.critical("Ein Transkriptions-Worker ist abgestürzt. Der Worker-Pool wird nicht neu geforkt, "
+                            "der Prozess muss neu gestartet werden.")
+            raise WorkerPoolBroken(f"Transkriptions-Worker abgestürzt: {e}") from e
+        # Details wie die vom Speech-Gate übersprungene Zeit entstehen im Worker
+        # und werden hier für pop_details() vorgehalten.
+        self._details.update({path: value for path, value in details.items() if value is not None})
+        return result
+
+    def transcribe_audio(self, audio_path, settings=None):
+        # settings (Lastabwurf) nur weitergeben, wenn gesetzt.
+        kwargs = {"settings": settings} if settings else {}
+        return self._submit("transcribe_audio", audio_path, paths=(audio_path,), **kwargs)
+
+    def transcribe_many(self, audio_paths, settings=None):
+        kwargs = {"settings": settings} if settings else {}
+        return self._submit("transcribe_many", audio_paths, paths=tuple(audio_paths), **kwargs)
+
+    def pop_details(self, audio_path):
+        return self._details.pop(audio_path, None)
+
+    def transcribe_words(self, audio, initial_prompt=None):
+        return self._submit("transcribe_words", audio, initial_prompt=initial_prompt)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
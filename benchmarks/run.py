@@ -0,0 +1,315 @@
+"""
+Durchsatz-Benchmarks für audio_miner.
+
+Läuft offline auf der CPU mit synthetischem Testaudio und misst Echtzeitfaktor,
+Spitzen-RSS und die Zeit je Verarbeitungsstufe. Jeder Fall läuft in einem
+eigenen Prozess, damit der Speicherbedarf nicht vom vorherigen Fall abhängt.
+
+    python -m benchmarks.run --output neu.json
+    python -m benchmarks.run --compare alt.json neu.json --threshold 0.1
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from benchmarks.synthetic import KINDS, generate, make_segment_tree, write_wav
+
+# Kennzahlen, bei denen ein höherer Wert schlechter ist.
+LOWER_IS_BETTER = ("rtf", "wall_seconds", "peak_rss_mb", "first_scan_seconds", "repeat_scan_seconds")
+# Kürzere Zeiten schwanken zu stark, um als Regression zu gelten.
+MIN_SECONDS = 0.05
+
+
+class StageTimer:
+    """Summiert die Laufzeit einzelner Methoden eines Objekts je Stufe."""
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    def wrap(self, obj, attribute, stage):
+        original = getattr(obj, attribute)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+
+        setattr(obj, attribute, timed)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux liefert KiB, macOS Bytes.
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def fixed_turns(audio, turn_seconds=10.0, sample_rate=16000):
+    """Feste Sprecherwechsel als Ersatz für PyAnnote, wenn kein Token vorliegt."""
+    duration = len(audio) / sample_rate
+    turns = []
+    start = 0.0
+    while start < duration:
+        end = min(duration, start + turn_seconds)
+        turns.append((start, end, f"SPEAKER_{len(turns) % 2:02d}"))
+        start = end
+    return turns
+
+
+def bench_transcription(case):
+    from audio_miner.audio_transcriber import AudioTranscriber
+
+    work_dir = tempfile.mkdtemp(prefix="audio_miner_bench_")
+    try:
+        path = os.path.join(work_dir, "bench.wav")
+        write_wav(path, generate(case["kind"], case["seconds"], case["sample_rate"], seed=case["seed"]), case["sample_rate"])
+
+        start = time.perf_counter()
+        transcriber = AudioTranscriber(whisper_model_size=case["model"], token=case.get("token"),
+                                       speech_gate=case.get("speech_gate", False))
+        model_load = time.perf_counter() - start
+
+        timer = StageTimer()
+        timer.wrap(transcriber, "_load_audio", "decode")
+        timer.wrap(transcriber, "_speech_regions", "speech_gate")
+        if case["path"] == "basic":
+            timer.wrap(transcriber.whisper_model, "transcribe", "whisper")
+            run = transcriber._transcribe_audio_basic
+        else:
+            if case.get("token") is None:
+                transcriber._diarize = fixed_turns
+            timer.wrap(transcriber, "_diarize", "diarization")
+            timer.wrap(transcriber, "_transcribe_segment", "whisper")
+            run = transcriber._transcribe_audio_diarization
+
+        start = time.perf_counter()
+        run(path)
+        wall = time.perf_counter() - start
+        return {
+            "audio_seconds": case["seconds"],
+            "wall_seconds": wall,
+            "rtf": wall / case["seconds"],
+            "model_load_seconds": model_load,
+            "stages": dict(timer.seconds),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        shutil.rmtree(work_dir)
+
+
+class _NoTranscriber:
+    """Platzhalter, damit der Recorder für die Warteschlangen-Messung kein Modell lädt."""
+    def transcribe_audio(self, audio_file):
+        raise RuntimeError("Im Benchmark wird nicht transkribiert.")
+
+
+def bench_queue_scan(case):
+    from audio_miner.main import RadioRecorder
+
+    base_dir = tempfile.mkdtemp(prefix="audio_miner_bench_")
+    try:
+        sender = "bench"
+        sender_dir = os.path.join(base_dir, sender)
+        pending = make_segment_tree(os.path.join(sender_dir, "audio"), os.path.join(sender_dir, "transkriptionen"),
+                                    sender, case["files"])
+        recorder = RadioRecorder(None, sender, base_dir=base_dir, transcribe_only=True, use_monitor=False,
+                                 transcriber=_NoTranscriber())
+        recorder.logger.setLevel(logging.WARNING)
+        timer = StageTimer()
+        timer.wrap(recorder.segment_index, "ensure_built", "index_build")
+        timer.wrap(recorder.segment_index, "pending", "index_query")
+
+        start = time.perf_counter()
+        recorder.check_and_queue_old_files(datetime.now())
+        first = time.perf_counter() - start
+        queued = recorder.segment_queue.qsize()
+        start = time.perf_counter()
+        recorder.check_and_queue_old_files(datetime.now())
+        repeat = time.perf_counter() - start
+        recorder.segment_index.close()
+        if queued != pending:
+            raise RuntimeError(f"{queued} statt {pending} Segmenten eingereiht.")
+        return {
+            "files": case["files"],
+            "queued": queued,
+            "first_scan_seconds": first,
+            "repeat_scan_seconds": repeat,
+            "stages": dict(timer.seconds),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        shutil.rmtree(base_dir)
+
+
+BENCHMARKS = {
+    "transcribe": bench_transcription,
+    "queue_scan": bench_queue_scan,
+}
+
+
+def build_cases(args):
+    cases = []
+    for seconds in args.lengths:
+        for sample_rate in args.sample_rates:
+            for kind in args.kinds:
+                cases.append({"name": f"basic/{kind}/{seconds:g}s/{sample_rate}Hz", "benchmark": "transcribe",
+                              "path": "basic", "kind": kind, "seconds": seconds, "sample_rate": sample_rate,
+                              "model": args.model, "seed": args.seed, "speech_gate": args.speech_gate})
+        cases.append({"name": f"diarization/mixed/{seconds:g}s/16000Hz", "benchmark": "transcribe",
+                      "path": "diarization", "kind": "mixed", "seconds": seconds, "sample_rate": 16000,
+                      "model": args.model, "seed": args.seed, "speech_gate": args.speech_gate, "token": args.token})
+    for files in args.queue_files:
+        cases.append({"name": f"queue_scan/{files}", "benchmark": "queue_scan", "files": files})
+    if args.only:
+        cases = [case for case in cases if any(pattern in case["name"] for pattern in args.only)]
+    return cases
+
+
+def _child(case, results):
+    try:
+        results.put(BENCHMARKS[case["benchmark"]](case))
+    except Exception as e:
+        results.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_case(case):
+    """Führt einen Fall in einem frisch gestarteten Prozess aus und liefert dessen Messwerte."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_child, args=(case, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def run_all(cases, log=print):
+    from audio_miner.version import __version__
+
+    report = {
+        "version": __version__,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": {},
+    }
+    for case in cases:
+        result = run_case(case)
+        parameters = {key: value for key, value in case.items() if key not in ("name", "token")}
+        if case.get("path") == "diarization":
+            parameters["diarization"] = "pyannote" if case.get("token") else "fixed-turns"
+        report["results"][case["name"]] = dict(result, parameters=parameters)
+        log(format_result(case["name"], result))
+    return report
+
+
+def format_result(name, result):
+    if "error" in result:
+        return f"{name:<40} FEHLER {result['error']}"
+    parts = []
+    if "rtf" in result:
+        parts.append(f"RTF {result['rtf']:.3f}")
+    if "first_scan_seconds" in result:
+        parts.append(f"erster Lauf {result['first_scan_seconds']:.3f} s, Wiederholung {result['repeat_scan_seconds']:.3f} s")
+    parts.append(f"RSS {result['peak_rss_mb']:.0f} MB")
+    parts.extend(f"{stage} {seconds:.2f} s" for stage, seconds in sorted(result["stages"].items()))
+    return f"{name:<40} " + ", ".join(parts)
+
+
+def _metrics(result):
+    metrics = {key: result[key] for key in LOWER_IS_BETTER if key in result}
+    metrics.update({f"stages.{stage}": seconds for stage, seconds in result.get("stages", {}).items()})
+    return metrics
+
+
+def compare(old, new, threshold=0.1):
+    """
+    Vergleicht zwei Berichte und liefert die Kennzahlen, die sich um mehr als threshold verschlechtert haben.
+
+    Args:
+        old (dict): Bericht der Vergleichsversion.
+        new (dict): Bericht der neuen Version.
+        threshold (float, optional): Erlaubte relative Verschlechterung. Standardmäßig 0.1 (10 %).
+
+    Returns:
+        list: Tupel (fall, kennzahl, alt, neu) je Regression.
+    """
+    regressions = []
+    for name, new_result in new["results"].items():
+        old_result = old["results"].get(name)
+        if old_result is None or "error" in old_result or "error" in new_result:
+            continue
+        old_metrics = _metrics(old_result)
+        for metric, value in _metrics(new_result).items():
+            before = old_metrics.get(metric)
+            if before is None or before <= 0:
+                continue
+            if metric != "peak_rss_mb" and max(before, value) < MIN_SECONDS:
+                continue
+            if value > before * (1 + threshold):
+                regressions.append((name, metric, before, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Durchsatz-Benchmarks mit synthetischem Audio (offline, CPU).")
+    parser.add_argument('--output', default=None,
+                        help='JSON-Datei für die Ergebnisse.')
+    parser.add_argument('--model', default="tiny",
+                        help='Whisper-Modell. Standard: tiny.')
+    parser.add_argument('--lengths', type=float, nargs='+', default=[30, 120],
+                        help='Längen des Testaudios in Sekunden. Standard: 30 120.')
+    parser.add_argument('--sample-rates', type=int, nargs='+', default=[8000, 16000, 44100],
+                        help='Abtastraten der Testdateien. Standard: 8000 16000 44100.')
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS),
+                        help='Arten von Testaudio. Standard: alle.')
+    parser.add_argument('--queue-files', type=int, nargs='+', default=[1000, 10000],
+                        help='Anzahl Segmentdateien für check_and_queue_old_files. Standard: 1000 10000.')
+    parser.add_argument('--speech-gate', action='store_true',
+                        help='Transkription mit Speech-Gate messen.')
+    parser.add_argument('--token', default=None,
+                        help='Huggingface Token; ohne Token ersetzen feste Sprecherwechsel die PyAnnote-Diarisierung.')
+    parser.add_argument('--only', nargs='+', default=None,
+                        help='Nur Fälle, deren Name einen der Texte enthält (z.B. queue_scan).')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Startwert für das Testaudio. Standard: 0.')
+    parser.add_argument('--compare', nargs=2, metavar=('ALT', 'NEU'), default=None,
+                        help='Zwei Ergebnisdateien vergleichen statt zu messen.')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Erlaubte relative Verschlechterung beim Vergleich. Standard: 0.1.')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            new = json.load(f)
+        regressions = compare(old, new, args.threshold)
+        for name, metric, before, value in regressions:
+            print(f"Regression {name} {metric}: {before:.3f} -> {value:.3f} (+{value / before - 1:.0%})")
+        if not regressions:
+            print(f"Keine Regression über {args.threshold:.0%} ({old['version']} -> {new['version']}).")
+        return 1 if regressions else 0
+
+    report = run_all(build_cases(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Ergebnisse gespeichert in: {args.output}")
+    return 1 if any("error" in result for result in report["results"].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
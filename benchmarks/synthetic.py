@@ -0,0 +1,118 @@
+import os
+import wave
+from datetime import datetime, timedelta
+
+import numpy as np
+
+KINDS = ("speech", "music", "silence", "mixed")
+
+
+def speech_like(seconds, sample_rate, rng):
+    """
+    Sprachähnliches Signal: Silben mit etwa 4 Hz aus stimmhaften Abschnitten
+    (Grundfrequenz mit Obertönen und leichtem Jitter) und stimmlosem Rauschen,
+    getrennt durch kurze Pausen.
+    """
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+    f0 = 120 + 30 * np.sin(2 * np.pi * 0.3 * t) + rng.normal(0, 2, n).cumsum() / np.sqrt(n)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    syllable = np.sin(2 * np.pi * 4 * t + rng.uniform(0, 2 * np.pi))
+    pauses = np.sin(2 * np.pi * 0.5 * t) > -0.6
+    signal = 0.25 * voiced * (syllable > 0) + 0.08 * rng.standard_normal(n) * (syllable <= -0.5)
+    return (signal * pauses).astype(np.float32)
+
+
+def music_like(seconds, sample_rate, rng):
+    """Musikähnliches Signal: Akkorde aus drei Tönen, die alle 250 ms wechseln."""
+    n = int(seconds * sample_rate)
+    note = int(0.25 * sample_rate)
+    t = np.arange(note) / sample_rate
+    envelope = np.minimum(1.0, np.linspace(4, 0.5, note))
+    parts = []
+    for _ in range(-(-n // note)):
+        root = 110 * 2 ** (rng.integers(0, 24) / 12)
+        chord = sum(np.sin(2 * np.pi * root * ratio * t) for ratio in (1.0, 1.26, 1.5))
+        parts.append(0.15 * chord * envelope)
+    return (np.concatenate(parts)[:n] + 0.005 * rng.standard_normal(n)).astype(np.float32)
+
+
+def silence(seconds, sample_rate, rng):
+    """Nahezu stilles Signal mit leichtem Grundrauschen."""
+    return (0.0005 * rng.standard_normal(int(seconds * sample_rate))).astype(np.float32)
+
+
+def generate(kind, seconds, sample_rate=16000, seed=0):
+    """
+    Erzeugt deterministisches Testaudio.
+
+    Args:
+        kind (str): speech, music, silence oder mixed (abwechselnd Musik, Sprache und Stille).
+        seconds (float): Länge in Sekunden.
+        sample_rate (int, optional): Abtastrate. Standardmäßig 16000.
+        seed (int, optional): Startwert des Zufallsgenerators.
+
+    Returns:
+        numpy.ndarray: Mono-Samples als float32 im Bereich [-1, 1].
+    """
+    rng = np.random.default_rng(seed)
+    if kind == "speech":
+        return speech_like(seconds, sample_rate, rng)
+    if kind == "music":
+        return music_like(seconds, sample_rate, rng)
+    if kind == "silence":
+        return silence(seconds, sample_rate, rng)
+    if kind != "mixed":
+        raise ValueError(f"Unbekannte Art von Testaudio: {kind}")
+    pattern = ((music_like, 0.3), (speech_like, 0.5), (silence, 0.2))
+    parts = []
+    remaining = seconds
+    while remaining > 0:
+        for generator, share in pattern:
+            length = min(remaining, max(1.0, seconds * share / 2))
+            if length > 0:
+                parts.append(generator(length, sample_rate, rng))
+            remaining -= length
+    n = int(seconds * sample_rate)
+    audio = np.concatenate(parts)[:n]
+    return np.pad(audio, (0, n - len(audio)))
+
+
+def write_wav(path, audio, sample_rate):
+    """Schreibt Mono-Audio als 16-Bit-WAV."""
+    samples = np.clip(np.round(audio * 32767), -32768, 32767).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+
+
+def make_segment_tree(audio_dir, transcription_dir, sender, count, segment_seconds=300, transcribed_every=2,
+                      start=datetime(2024, 1, 1)):
+    """
+    Legt count Segmentdateien im Namensschema des Recorders an.
+
+    Jedes transcribed_every-te Segment bekommt eine Transkription, die übrigen
+    gelten als unbearbeitet. Der Inhalt ist ein kurzer Platzhalter, da die
+    Warteschlange nur Namen und Größe auswertet.
+
+    Returns:
+        int: Anzahl der Segmente ohne Transkription.
+    """
+    os.makedirs(audio_dir, exist_ok=True)
+    os.makedirs(transcription_dir, exist_ok=True)
+    pending = 0
+    for i in range(count):
+        begin = start + timedelta(seconds=i * segment_seconds)
+        end = begin + timedelta(seconds=segment_seconds)
+        name = f"{sender}_{begin:%Y%m%d_%H%M%S}_{end:%Y%m%d_%H%M%S}"
+        with open(os.path.join(audio_dir, name + ".mp3"), "wb") as f:
+            f.write(b"\xff\xfb\x90\x00")
+        if transcribed_every and i % transcribed_every == 0:
+            with open(os.path.join(transcription_dir, name + ".txt"), "w", encoding="utf-8") as f:
+                f.write("text")
+        else:
+            pending += 1
+    return pending
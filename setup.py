@@ -7,7 +7,7 @@ setup(
     author_email='info@milchsack.com',
     description='A radio streaming and transcription application.',
     long_description=open('README.md').read(),
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     entry_points={
         'console_scripts': [
             'audio_miner=audio_miner.cli:main',
@@ -22,6 +22,9 @@ setup(
         'torchaudio',
         'pyannote.audio',
     ],
+    extras_require={
+        'parquet': ['pyarrow'],
+    },
     classifiers=[
         'Programming Language :: Python :: 3',
         'License :: OSI Approved :: MIT License',
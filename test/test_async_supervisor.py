@@ -0,0 +1,140 @@
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from audio_miner.async_supervisor import AsyncRecordingSupervisor, segment_timeout
+from audio_miner.main import RadioRecorder
+from audio_miner.segment_index import parse_segment_filename
+
+# Verhält sich wie ffmpeg mit segment-Muxer: schreibt Segmente, meldet sie als CSV auf stdout
+# und schließt bei SIGTERM das laufende Segment ab.
+FAKE_FFMPEG = f"""#!{sys.executable}
+import os, signal, sys, time
+from datetime import datetime, timedelta
+
+mode = os.environ.get("FAKE_FFMPEG", "segments")
+if mode == "fail":
+    sys.exit(1)
+if mode == "stall":
+    time.sleep(60)
+    sys.exit(0)
+
+pattern = next(arg for arg in sys.argv if "%Y" in arg)
+base = datetime.now().replace(microsecond=0)
+stopped = []
+signal.signal(signal.SIGTERM, lambda *args: stopped.append(True))
+
+
+def segment(index):
+    path = (base + timedelta(seconds=index)).strftime(pattern)
+    with open(path, "wb") as f:
+        f.write(b"m" * 100)
+    print("out_time_ms=1000000", flush=True)
+    print(f"{{os.path.basename(path)}},0.0,1.0", flush=True)
+
+
+for index in range(2):
+    segment(index)
+while not stopped:
+    print("progress=continue", flush=True)
+    time.sleep(0.05)
+segment(2)
+"""
+
+
+class TestAsyncRecordingSupervisor(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        self.ffmpeg = os.path.join(self.base_dir, "ffmpeg")
+        with open(self.ffmpeg, "w") as f:
+            f.write(FAKE_FFMPEG)
+        os.chmod(self.ffmpeg, os.stat(self.ffmpeg).st_mode | stat.S_IEXEC)
+
+    def recorders(self, count, **kwargs):
+        recorders = []
+        for index in range(count):
+            recorder = RadioRecorder("http://x", f"s{index}", segment_time=60, base_dir=self.base_dir, record_only=True,
+                                     continuous=True, ffmpeg_path=self.ffmpeg, **dict({"use_monitor": False}, **kwargs))
+            self.addCleanup(recorder.segment_index.close)
+            recorders.append(recorder)
+        return recorders
+
+    def start(self, supervisor):
+        thread = threading.Thread(target=supervisor.run, daemon=True)
+        thread.start()
+        return thread
+
+    def wait_for(self, condition, timeout=20):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("Bedingung nicht rechtzeitig erfüllt.")
+            time.sleep(0.05)
+
+    def finished(self, recorder):
+        return sorted(file for file in os.listdir(recorder.audio_dir)
+                      if parse_segment_filename(file) and parse_segment_filename(file)[2] is not None)
+
+    def test_records_segments_and_stops_gracefully(self):
+        recorders = self.recorders(3)
+        supervisor = AsyncRecordingSupervisor(recorders, start_spread=0.01)
+        thread = self.start(supervisor)
+        self.wait_for(lambda: all(len(self.finished(recorder)) >= 2 for recorder in recorders))
+
+        supervisor.stop()
+        thread.join(timeout=20)
+        self.assertFalse(thread.is_alive())
+        for recorder in recorders:
+            # Das bei SIGTERM abgeschlossene Segment ist ebenfalls fertig und im Index.
+            self.assertEqual(len(self.finished(recorder)), 3)
+            self.assertEqual(sorted(os.listdir(recorder.audio_dir)), self.finished(recorder))
+            self.assertEqual(len(recorder.segment_index.pending()), 3)
+        self.assertEqual(supervisor.restarts, {"s0": 0, "s1": 0, "s2": 0})
+
+    def test_failing_stream_is_restarted_with_backoff(self):
+        recorders = self.recorders(1)
+        supervisor = AsyncRecordingSupervisor(recorders, backoff_base=0.05, backoff_max=0.2)
+        with patch.dict(os.environ, {"FAKE_FFMPEG": "fail"}):
+            thread = self.start(supervisor)
+            self.wait_for(lambda: supervisor.restarts["s0"] >= 3)
+            supervisor.stop()
+            thread.join(timeout=20)
+        self.assertFalse(thread.is_alive())
+        self.assertLessEqual(supervisor.backoff(10), 0.2 * 1.2)
+        self.assertGreater(supervisor.backoff(3), supervisor.backoff(1))
+
+    def test_stalled_ffmpeg_is_killed_and_restarted(self):
+        recorders = self.recorders(1, use_monitor=True, stall_timeout=0.3)
+        supervisor = AsyncRecordingSupervisor(recorders, backoff_base=0.05)
+        with patch.dict(os.environ, {"FAKE_FFMPEG": "stall"}), patch("audio_miner.async_supervisor.TICK", 0.1):
+            thread = self.start(supervisor)
+            self.wait_for(lambda: supervisor.restarts["s0"] >= 1)
+            supervisor.stop()
+            thread.join(timeout=20)
+        self.assertFalse(thread.is_alive())
+
+    def test_thread_count_does_not_grow_with_streams(self):
+        before = threading.active_count()
+        recorders = self.recorders(20)
+        supervisor = AsyncRecordingSupervisor(recorders, io_threads=2, start_spread=0.01)
+        thread = self.start(supervisor)
+        self.wait_for(lambda: all(len(self.finished(recorder)) >= 2 for recorder in recorders), timeout=60)
+        # Schleife, zwei I/O-Threads und ggf. der Watchdog eines früheren Tests.
+        self.assertLessEqual(threading.active_count() - before, 4)
+        supervisor.stop()
+        thread.join(timeout=30)
+        self.assertFalse(thread.is_alive())
+
+    def test_segment_timeout_replaces_fixed_retry_budget(self):
+        self.assertAlmostEqual(segment_timeout(3600), 3600 * 1.05 + 15)
+
+
+if __name__ == "__main__":
+    unittest.main()
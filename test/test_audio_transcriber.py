@@ -1,5 +1,7 @@
 import unittest
 from unittest.mock import patch, MagicMock, mock_open
+from types import SimpleNamespace
+import numpy as np
 import torch
 
 from audio_miner.audio_transcriber import AudioTranscriber, save_results_to_file
@@ -11,18 +13,14 @@ class TestAudioTranscriber(unittest.TestCase):
 
         self.patcher_pipeline = patch('pyannote.audio.Pipeline.from_pretrained')
         self.patcher_whisper_load = patch('whisper.load_model')
-        self.patcher_torchaudio_load = patch('torchaudio.load')
-        self.patcher_torchaudio_save = patch('torchaudio.save')
-        self.patcher_os_remove = patch('os.remove')
+        self.patcher_load_audio = patch('whisper.load_audio')
         self.patcher_torch_cuda_is_available = patch('torch.cuda.is_available')
         self.patcher_torch_mps_is_available = patch('torch.backends.mps.is_available')
 
 
         self.mock_pipeline_from_pretrained = self.patcher_pipeline.start()
         self.mock_whisper_load_model = self.patcher_whisper_load.start()
-        self.mock_torchaudio_load = self.patcher_torchaudio_load.start()
-        self.mock_torchaudio_save = self.patcher_torchaudio_save.start()
-        self.mock_os_remove = self.patcher_os_remove.start()
+        self.mock_load_audio = self.patcher_load_audio.start()
         self.mock_torch_cuda_is_available = self.patcher_torch_cuda_is_available.start()
         self.mock_torch_mps_is_available = self.patcher_torch_mps_is_available.start()
 
@@ -32,9 +30,9 @@ class TestAudioTranscriber(unittest.TestCase):
         self.mock_whisper_model_instance = MagicMock()
         self.mock_whisper_load_model.return_value = self.mock_whisper_model_instance
 
-        self.dummy_waveform = torch.randn(1, 16000)
+        self.dummy_audio = np.random.randn(3 * 16000).astype(np.float32)
         self.dummy_sample_rate = 16000
-        self.mock_torchaudio_load.return_value = (self.dummy_waveform, self.dummy_sample_rate)
+        self.mock_load_audio.return_value = self.dummy_audio
 
         self.mock_torch_cuda_is_available.return_value = False
         self.mock_torch_mps_is_available.return_value = False
@@ -43,9 +41,7 @@ class TestAudioTranscriber(unittest.TestCase):
     def tearDown(self):
         self.patcher_pipeline.stop()
         self.patcher_whisper_load.stop()
-        self.patcher_torchaudio_load.stop()
-        self.patcher_torchaudio_save.stop()
-        self.patcher_os_remove.stop()
+        self.patcher_load_audio.stop()
         self.patcher_torch_cuda_is_available.stop()
         self.patcher_torch_mps_is_available.stop()
 
@@ -92,14 +88,16 @@ class TestAudioTranscriber(unittest.TestCase):
         audio_path = "dummy/audio.mp3"
         results = transcriber.transcribe_audio(audio_path)
 
-        self.mock_torchaudio_load.assert_called_once_with(audio_path)
-        self.mock_pipeline_instance.assert_called_once_with({
-            "waveform": self.dummy_waveform.to(transcriber.device),
-            "sample_rate": self.dummy_sample_rate
-        })
-        self.mock_torchaudio_save.assert_called_once()
+        self.mock_load_audio.assert_called_once_with(audio_path, sr=self.dummy_sample_rate)
+        self.mock_pipeline_instance.assert_called_once()
+        pipeline_input = self.mock_pipeline_instance.call_args[0][0]
+        self.assertEqual(pipeline_input["sample_rate"], self.dummy_sample_rate)
+        self.assertTrue(torch.equal(pipeline_input["waveform"], torch.from_numpy(self.dummy_audio).unsqueeze(0)))
+
         self.mock_whisper_model_instance.transcribe.assert_called_once()
-        self.mock_os_remove.assert_called_once()
+        segment = self.mock_whisper_model_instance.transcribe.call_args[0][0]
+        self.assertIsInstance(segment, np.ndarray)
+        np.testing.assert_array_equal(segment, self.dummy_audio[8000:40000])
 
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]["speaker"], "SPEAKER_01")
@@ -122,9 +120,7 @@ class TestAudioTranscriber(unittest.TestCase):
             results = transcriber.transcribe_audio(audio_path)
 
             mock_extract.assert_called_once()
-            self.mock_torchaudio_save.assert_not_called()
             self.mock_whisper_model_instance.transcribe.assert_not_called()
-            self.mock_os_remove.assert_not_called()
             self.assertEqual(len(results), 0)
 
 
@@ -144,7 +140,6 @@ class TestAudioTranscriber(unittest.TestCase):
 
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]["text"], "[Transkriptionsfehler]")
-        self.mock_os_remove.assert_called_once()
 
     def test_extract_segment(self):
         transcriber = AudioTranscriber(token=self.test_token)
@@ -162,6 +157,176 @@ class TestAudioTranscriber(unittest.TestCase):
         self.assertTrue(torch.equal(segment, expected_segment))
         self.assertEqual(segment.shape[1], expected_end_frame - expected_start_frame)
 
+    def test_extract_segment_from_decoded_audio(self):
+        transcriber = AudioTranscriber(token=self.test_token)
+        audio = np.arange(0, 100, dtype=np.float32)
+
+        segment = transcriber._extract_segment(audio, 10, 2.0, 5.0)
+
+        np.testing.assert_array_equal(segment, audio[20:50])
+        self.assertTrue(np.shares_memory(segment, audio))
+
+    def test_basic_transcription_decodes_once(self):
+        transcriber = AudioTranscriber(token=None)
+        self.mock_whisper_model_instance.transcribe.return_value = {"segments": [{"text": " Hallo "}, {"text": "Welt"}]}
+
+        result = transcriber.transcribe_audio("dummy/audio.mp3")
+
+        self.assertEqual(result, "Hallo\nWelt")
+        self.mock_load_audio.assert_called_once_with("dummy/audio.mp3", sr=self.dummy_sample_rate)
+        self.assertIs(self.mock_whisper_model_instance.transcribe.call_args[0][0], self.dummy_audio)
+
+# Tokens der gefälschten Dekodierung: Index in VOCAB für Text, ab TIMESTAMP_BEGIN Zeitstempel in 0,02-s-Schritten.
+VOCAB = []
+EOT = 50257
+TIMESTAMP_BEGIN = 50365
+
+
+def text_token(text):
+    VOCAB.append(text)
+    return len(VOCAB) - 1
+
+
+def timestamp(seconds):
+    return TIMESTAMP_BEGIN + round(seconds / 0.02)
+
+
+class FakeTokenizer:
+    eot = EOT
+    timestamp_begin = TIMESTAMP_BEGIN
+
+    def decode(self, tokens):
+        return "".join(VOCAB[token] for token in tokens)
+
+
+def decoding_result(text, avg_logprob=-0.2, no_speech_prob=0.01, compression_ratio=1.2, tokens=None, language="en"):
+    if tokens is None:
+        tokens = [timestamp(0.0), text_token(text), timestamp(1.0)]
+    return SimpleNamespace(text=text, avg_logprob=avg_logprob, no_speech_prob=no_speech_prob, compression_ratio=compression_ratio,
+                           tokens=list(tokens), language=language)
+
+
+class TestBatchedTranscription(unittest.TestCase):
+    def setUp(self):
+        patchers = {
+            "pipeline": patch('pyannote.audio.Pipeline.from_pretrained'),
+            "load_model": patch('whisper.load_model'),
+            "load_audio": patch('whisper.load_audio'),
+            "decode": patch('whisper.decode'),
+            "mel": patch('whisper.log_mel_spectrogram', side_effect=lambda audio, n_mels=80: torch.zeros(n_mels, 3000)),
+            "cuda": patch('torch.cuda.is_available', return_value=False),
+            "tokenizer": patch('whisper.tokenizer.get_tokenizer', return_value=FakeTokenizer()),
+        }
+        self.mocks = {name: p.start() for name, p in patchers.items()}
+        for p in patchers.values():
+            self.addCleanup(p.stop)
+
+        self.whisper_model = MagicMock()
+        self.whisper_model.dims.n_mels = 80
+        self.whisper_model.transcribe.return_value = {"text": " lang ", "segments": [{"start": 0.0, "end": 20.0, "text": " lang "}]}
+        self.mocks["load_model"].return_value = self.whisper_model
+        self.pipeline = MagicMock()
+        self.mocks["pipeline"].return_value = self.pipeline
+
+    def set_turns(self, turns):
+        tracks = []
+        for start, end, speaker in turns:
+            turn = MagicMock()
+            turn.start, turn.end = start, end
+            tracks.append((turn, None, speaker))
+        diarization = MagicMock()
+        diarization.itertracks.return_value = tracks
+        self.pipeline.return_value = diarization
+
+    def test_turns_are_decoded_in_batches(self):
+        self.mocks["load_audio"].return_value = np.zeros(60 * 16000, dtype=np.float32)
+        self.set_turns([(0.0, 2.0, "A"), (2.0, 4.0, "B"), (4.0, 6.0, "A"), (6.0, 50.0, "B")])
+        self.mocks["decode"].side_effect = [
+            [decoding_result(" eins "), decoding_result("zwei")],
+            [decoding_result("drei")],
+        ]
+        transcriber = AudioTranscriber(token="token", batch_size=2)
+
+        results = transcriber.transcribe_audio("dummy.mp3")
+
+        self.assertEqual(self.mocks["decode"].call_count, 2)
+        self.assertEqual(self.mocks["decode"].call_args_list[0][0][1].shape, (2, 80, 3000))
+        self.whisper_model.transcribe.assert_called_once()
+        self.assertEqual([(r["speaker"], r["start"], r["text"]) for r in results],
+                         [("A", 0.0, "eins"), ("B", 2.0, "zwei"), ("A", 4.0, "drei"), ("B", 6.0, "lang")])
+
+    def test_windows_of_several_files_share_batches(self):
+        self.mocks["load_audio"].side_effect = [np.zeros(45 * 16000, dtype=np.float32), np.zeros(10 * 16000, dtype=np.float32)]
+        self.mocks["decode"].side_effect = [
+            [decoding_result("a1"), decoding_result("b1")],
+            [decoding_result("a2")],
+        ]
+        transcriber = AudioTranscriber(token=None, batch_size=4)
+
+        results = transcriber.transcribe_many(["a.mp3", "b.mp3"])
+
+        # Die Fenster einer Datei folgen aufeinander; die ersten Fenster beider Dateien teilen sich einen Batch.
+        self.assertEqual(self.mocks["decode"].call_count, 2)
+        self.assertEqual(self.mocks["decode"].call_args_list[0][0][1].shape, (2, 80, 3000))
+        self.assertEqual(results, ["a1\na2", "b1"])
+
+    def test_next_window_starts_at_word_cut_by_window_end(self):
+        self.mocks["load_audio"].return_value = np.arange(40 * 16000, dtype=np.float32)
+        window_starts = []
+        self.mocks["mel"].side_effect = lambda audio, n_mels=80: (window_starts.append(int(audio[0])), torch.zeros(n_mels, 3000))[1]
+        self.mocks["decode"].side_effect = [
+            [decoding_result("", tokens=[timestamp(0.0), text_token(" eins"), timestamp(20.0),
+                                         timestamp(25.0), text_token(" Grenz")])],
+            [decoding_result("", tokens=[timestamp(0.0), text_token(" Grenzwort zwei"), timestamp(10.0)])],
+        ]
+        transcriber = AudioTranscriber(token=None, batch_size=2)
+
+        self.assertEqual(transcriber.transcribe_audio("a.mp3"), "eins\nGrenzwort zwei")
+        self.assertEqual(window_starts, [0, 25 * 16000])
+        self.assertEqual([(piece["start"], piece["end"]) for piece in transcriber.pop_details("a.mp3")["segments"]],
+                         [(0.0, 20.0), (25.0, 35.0)])
+
+    def test_uncertain_results_fall_back_to_transcribe(self):
+        self.mocks["load_audio"].return_value = np.zeros(20 * 16000, dtype=np.float32)
+        self.mocks["decode"].return_value = [decoding_result("la la la la", compression_ratio=3.0)]
+        transcriber = AudioTranscriber(token=None, batch_size=2)
+
+        self.assertEqual(transcriber.transcribe_audio("a.mp3"), "lang")
+        self.whisper_model.transcribe.assert_called_once()
+
+    def test_batched_windows_keep_word_timestamps(self):
+        self.mocks["load_audio"].return_value = np.zeros(40 * 16000, dtype=np.float32)
+        self.mocks["decode"].side_effect = [
+            [decoding_result(" Hallo Welt", tokens=[timestamp(0.0), text_token(" Hallo"), text_token(" Welt"), timestamp(2.0)])],
+            [decoding_result(" Tschüss", tokens=[timestamp(0.0), text_token(" Tschüss"), timestamp(1.0)])],
+        ]
+
+        def align(segments, **kwargs):
+            for segment in segments:
+                segment["words"] = [{"word": VOCAB[token], "start": index * 0.5 + 0.5, "end": index * 0.5 + 0.9,
+                                     "probability": 0.9} for index, token in enumerate(segment["tokens"])]
+
+        transcriber = AudioTranscriber(token=None, batch_size=2, structured=True)
+        with patch("whisper.timing.add_word_timestamps", side_effect=align) as add_word_timestamps:
+            self.assertEqual(transcriber.transcribe_audio("a.mp3"), "Hallo Welt\nTschüss")
+
+        self.assertEqual(add_word_timestamps.call_count, 2)
+        self.assertEqual(add_word_timestamps.call_args_list[1][1]["num_frames"], 1000)
+        self.whisper_model.transcribe.assert_not_called()
+        self.assertEqual([(piece["text"], piece["avg_logprob"], piece["words"]) for piece in transcriber.pop_details("a.mp3")["segments"]], [
+            ("Hallo Welt", -0.2, [{"word": "Hallo", "start": 0.5, "end": 0.9, "probability": 0.9},
+                                  {"word": "Welt", "start": 1.0, "end": 1.4, "probability": 0.9}]),
+            ("Tschüss", -0.2, [{"word": "Tschüss", "start": 30.5, "end": 30.9, "probability": 0.9}]),
+        ])
+
+    def test_silence_is_dropped(self):
+        self.mocks["load_audio"].return_value = np.zeros(20 * 16000, dtype=np.float32)
+        self.mocks["decode"].return_value = [decoding_result("Untertitel", avg_logprob=-1.5, no_speech_prob=0.9)]
+        transcriber = AudioTranscriber(token=None, batch_size=2)
+
+        self.assertEqual(transcriber.transcribe_audio("a.mp3"), "")
+
+
 class TestSaveResultsToFile(unittest.TestCase):
     @patch("builtins.open", new_callable=mock_open)
     def test_save_results(self, mock_file_open):
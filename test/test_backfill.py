@@ -0,0 +1,134 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from audio_miner.backfill import (Backfill, ProgressBar, MAX_ATTEMPTS, ORDER_NEWEST, ORDER_SHORTEST,
+                                  STATE_DONE, STATE_FAILED, in_shard, parse_shard)
+from audio_miner.main import RadioRecorder
+
+
+def segment(hour, minutes=60, sender="s"):
+    begin = datetime(2024, 1, 1, hour)
+    end = begin + timedelta(minutes=minutes)
+    return f"/audio/{sender}_{begin:%Y%m%d_%H%M%S}_{end:%Y%m%d_%H%M%S}.mp3", begin
+
+
+class TestShards(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for value in ("0/4", "5/4", "x", "1/2/3"):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_shards_partition_all_segments(self):
+        names = [f"s_20240101_{h:02d}0000.mp3" for h in range(24)]
+        owners = [[k for k in range(1, 4) if in_shard(name, (k, 3))] for name in names]
+        self.assertTrue(all(len(owner) == 1 for owner in owners))
+        self.assertTrue(all(in_shard(name, None) for name in names))
+
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "backfill.db")
+        self.candidates = [segment(8, 60), segment(9, 10), segment(10, 30)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def backfill(self, **kwargs):
+        return Backfill(self.db_path, stream=io.StringIO(), **kwargs)
+
+    def test_orders(self):
+        names = lambda paths: [os.path.basename(p)[11:13] for p in paths]
+        self.assertEqual(names(self.backfill().plan(self.candidates)), ["08", "09", "10"])
+        self.assertEqual(names(self.backfill(order=ORDER_NEWEST).plan(self.candidates)), ["10", "09", "08"])
+        self.assertEqual(names(self.backfill(order=ORDER_SHORTEST).plan(self.candidates)), ["09", "10", "08"])
+
+    def test_resume_after_crash(self):
+        backfill = self.backfill()
+        first, second, third = backfill.plan(self.candidates)
+        backfill.start(first)
+        backfill.complete(first)
+        backfill.start(second)
+        # Absturz: second bleibt "running", third wurde nie begonnen.
+        backfill.close()
+
+        resumed = self.backfill()
+        self.assertEqual(resumed.plan(self.candidates[1:]), [second, third])
+        self.assertEqual(resumed.counts(), {STATE_DONE: 1, "pending": 2})
+
+    def test_segment_is_skipped_after_repeated_crashes(self):
+        for _ in range(MAX_ATTEMPTS):
+            backfill = self.backfill()
+            planned = backfill.plan(self.candidates[:1])
+            self.assertEqual(len(planned), 1)
+            backfill.start(planned[0])
+            backfill.close()
+        self.assertEqual(self.backfill().plan(self.candidates[:1]), [])
+        self.assertEqual(self.backfill().counts(), {STATE_FAILED: 1})
+
+    def test_deleted_transcript_is_planned_again(self):
+        backfill = self.backfill()
+        path = backfill.plan(self.candidates[:1])[0]
+        backfill.start(path)
+        backfill.complete(path)
+        self.assertEqual(backfill.plan(self.candidates[:1]), [path])
+
+    def test_shard_plans_only_its_part(self):
+        candidates = [segment(h) for h in range(20)]
+        planned = [set(self.backfill(shard=(k, 2)).plan(candidates)) for k in (1, 2)]
+        self.assertFalse(planned[0] & planned[1])
+        self.assertEqual(planned[0] | planned[1], {path for path, _ in candidates})
+
+
+class TestProgressBar(unittest.TestCase):
+    def test_eta_from_audio_duration(self):
+        now = [0.0]
+        stream = io.StringIO()
+        bar = ProgressBar("Backfill", 3, 3 * 3600, stream=stream, clock=lambda: now[0])
+        self.assertIsNone(bar.eta())
+        now[0] = 600.0
+        bar.update(3600)
+        self.assertAlmostEqual(bar.eta(), 1200.0)
+        self.assertIn("1/3 Segmente", stream.getvalue())
+        self.assertIn("ETA 0:20:00", stream.getvalue())
+        self.assertTrue(stream.getvalue().endswith("\n"))
+
+
+class TestRecorderBackfill(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    @patch('audio_miner.main.AudioTranscriber')
+    def test_transcribe_only_uses_journal_order_and_records_progress(self, mock_audio_transcriber):
+        transcriber = MagicMock()
+        transcriber.transcribe_audio.return_value = "Text"
+        transcriber.pop_details.return_value = None
+        recorder = RadioRecorder(None, "s", base_dir=self.base_dir, transcribe_only=True, use_monitor=False,
+                                 transcriber=transcriber, backfill_order=ORDER_NEWEST)
+        recorder.backfill.stream = io.StringIO()
+        for h in (8, 9, 10):
+            with open(os.path.join(recorder.audio_dir, f"s_20240101_{h:02d}0000_20240101_{h + 1:02d}0000.mp3"), "wb") as f:
+                f.write(b"audio")
+
+        recorder.check_and_queue_old_files(datetime.now())
+        order = list(recorder.segment_queue.queue)
+        self.assertEqual([os.path.basename(f)[11:13] for f in order], ["10", "09", "08"])
+
+        recorder.process_segment(recorder.segment_queue.get())
+        self.assertEqual(recorder.backfill.counts(), {STATE_DONE: 1, "pending": 2})
+        self.assertIn("1/3 Segmente", recorder.backfill.progress.stream.getvalue())
+        recorder.backfill.close()
+        recorder.segment_index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from benchmarks.run import bench_queue_scan, compare, fixed_turns
+from benchmarks.synthetic import KINDS, generate, make_segment_tree
+
+
+class TestSyntheticAudio(unittest.TestCase):
+    def test_deterministic_lengths_and_range(self):
+        for kind in KINDS:
+            for sample_rate in (8000, 44100):
+                audio = generate(kind, 7.5, sample_rate, seed=3)
+                self.assertEqual(len(audio), int(7.5 * sample_rate))
+                self.assertLessEqual(np.abs(audio).max(), 1.0)
+                np.testing.assert_array_equal(audio, generate(kind, 7.5, sample_rate, seed=3))
+
+    def test_segment_tree(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        pending = make_segment_tree(os.path.join(tmp_dir, "audio"), os.path.join(tmp_dir, "transkriptionen"), "s", 5)
+
+        self.assertEqual(pending, 2)
+        self.assertEqual(len(os.listdir(os.path.join(tmp_dir, "audio"))), 5)
+        self.assertIn("s_20240101_000500_20240101_001000.mp3", os.listdir(os.path.join(tmp_dir, "audio")))
+
+
+class TestBenchmarkRunner(unittest.TestCase):
+    def test_queue_scan(self):
+        result = bench_queue_scan({"files": 20})
+        self.assertEqual(result["queued"], 10)
+        self.assertIn("index_build", result["stages"])
+
+    def test_fixed_turns(self):
+        self.assertEqual(fixed_turns(np.zeros(25 * 16000)),
+                         [(0.0, 10.0, "SPEAKER_00"), (10.0, 20.0, "SPEAKER_01"), (20.0, 25.0, "SPEAKER_00")])
+
+    def test_compare_flags_regressions_above_threshold(self):
+        old = {"results": {"basic/speech/30s/16000Hz": {"rtf": 0.20, "peak_rss_mb": 900, "stages": {"whisper": 5.0, "decode": 0.01}},
+                           "queue_scan/1000": {"error": "RuntimeError"}}}
+        new = {"results": {"basic/speech/30s/16000Hz": {"rtf": 0.25, "peak_rss_mb": 950, "stages": {"whisper": 5.2, "decode": 0.04}},
+                           "queue_scan/1000": {"first_scan_seconds": 1.0, "stages": {}}}}
+
+        self.assertEqual(compare(old, new, threshold=0.1), [("basic/speech/30s/16000Hz", "rtf", 0.20, 0.25)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from audio_miner.audio_transcriber import AudioTranscriber
+from audio_miner.checkpoint import Checkpoint, KIND_PIECES
+
+TURNS = [(0.0, 2.0, "SPEAKER_00"), (2.0, 4.0, "SPEAKER_01"), (4.0, 6.0, "SPEAKER_00"), (6.0, 8.0, "SPEAKER_01")]
+
+
+class Killed(BaseException):
+    """Steht für einen Abbruch des Prozesses (OOM, Neustart) mitten in der Datei."""
+
+
+class TestCheckpointFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.audio_file = os.path.join(self.tmp_dir, "s_20240101_100000_20240101_110000.mp3")
+        with open(self.audio_file, "wb") as f:
+            f.write(b"audio")
+        self.directory = os.path.join(self.tmp_dir, "checkpoints")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_entries_survive_reopen_and_truncated_line(self):
+        checkpoint = Checkpoint(self.directory, self.audio_file, {"model": "small"})
+        checkpoint.put(KIND_PIECES, (1.0000001, 2.0, "A"), {"text": "Hallo"})
+        with open(checkpoint.path, "a") as f:
+            f.write('{"kind": "pieces", "ke')
+        reopened = Checkpoint(self.directory, self.audio_file, {"model": "small"})
+        self.assertEqual(reopened.get(KIND_PIECES, (1.0, 2.0, "A")), {"text": "Hallo"})
+        self.assertEqual(len(reopened), 1)
+
+        # Die erste Einheit nach dem Fortsetzen darf nicht in der abgeschnittenen Zeile landen.
+        reopened.put(KIND_PIECES, (2.0, 3.0, "B"), {"text": "Welt"})
+        again = Checkpoint(self.directory, self.audio_file, {"model": "small"})
+        self.assertEqual(again.get(KIND_PIECES, (2.0, 3.0, "B")), {"text": "Welt"})
+        self.assertEqual(len(again), 2)
+
+    def test_changed_settings_or_audio_discard_entries(self):
+        Checkpoint(self.directory, self.audio_file, {"model": "small"}).put(KIND_PIECES, (0.0, 1.0), [])
+        self.assertEqual(len(Checkpoint(self.directory, self.audio_file, {"model": "turbo"})), 0)
+        Checkpoint(self.directory, self.audio_file, {"model": "small"}).put(KIND_PIECES, (0.0, 1.0), [])
+        with open(self.audio_file, "ab") as f:
+            f.write(b"more")
+        self.assertEqual(len(Checkpoint(self.directory, self.audio_file, {"model": "small"})), 0)
+
+    def test_discard_removes_file(self):
+        checkpoint = Checkpoint(self.directory, self.audio_file, {})
+        checkpoint.discard()
+        self.assertFalse(os.path.exists(checkpoint.path))
+
+
+class TestResume(unittest.TestCase):
+    def setUp(self):
+        patchers = [
+            patch('pyannote.audio.Pipeline.from_pretrained'),
+            patch('whisper.load_model'),
+            patch('whisper.load_audio', return_value=np.zeros(8 * 16000, dtype=np.float32)),
+            patch('torch.cuda.is_available', return_value=False),
+        ]
+        self.mocks = [p.start() for p in patchers]
+        for p in patchers:
+            self.addCleanup(p.stop)
+        self.whisper_model = MagicMock()
+        self.mocks[1].return_value = self.whisper_model
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.audio_file = os.path.join(self.tmp_dir, "s_20240101_100000_20240101_110000.mp3")
+        with open(self.audio_file, "wb") as f:
+            f.write(b"audio")
+        self.checkpoint_dir = os.path.join(self.tmp_dir, "checkpoints")
+        self.calls = []
+
+    def whisper(self, kill_at=None):
+        def transcribe(audio, **kwargs):
+            if len(self.calls) == kill_at:
+                raise Killed()
+            self.calls.append(len(audio))
+            return {"text": f" Turn {len(self.calls)}", "segments": []}
+        return transcribe
+
+    def transcriber(self, **kwargs):
+        transcriber = AudioTranscriber(token="t", checkpoint_dir=self.checkpoint_dir, **kwargs)
+        transcriber._diarize = MagicMock(return_value=list(TURNS))
+        return transcriber
+
+    def test_diarized_run_resumes_after_kill(self):
+        self.whisper_model.transcribe.side_effect = self.whisper(kill_at=2)
+        first = self.transcriber()
+        with self.assertRaises(Killed):
+            first.transcribe_audio(self.audio_file)
+        self.assertEqual(len(self.calls), 2)
+
+        self.whisper_model.transcribe.side_effect = self.whisper()
+        resumed = self.transcriber()
+        result = resumed.transcribe_audio(self.audio_file)
+
+        # Diarisierung und die ersten beiden Turns kommen aus dem Zwischenstand.
+        resumed._diarize.assert_not_called()
+        self.assertEqual(len(self.calls), 4)
+        self.assertEqual([r["text"] for r in result], ["Turn 1", "Turn 2", "Turn 3", "Turn 4"])
+        self.assertEqual([(r["start"], r["end"], r["speaker"]) for r in result], TURNS)
+        self.assertEqual(os.listdir(self.checkpoint_dir), [])
+
+    def test_batched_run_resumes_after_kill(self):
+        decoded = iter([[SimpleNamespace(text=" A", no_speech_prob=0.0, avg_logprob=-0.1, compression_ratio=1.0)] * 2])
+
+        def decode_batch(segments):
+            result = next(decoded, None)
+            if result is None:
+                raise Killed()
+            return result
+
+        first = self.transcriber(batch_size=2)
+        first._decode_batch = decode_batch
+        with self.assertRaises(Killed):
+            first.transcribe_audio(self.audio_file)
+
+        resumed = self.transcriber(batch_size=2)
+        resumed._decode_batch = MagicMock(return_value=[SimpleNamespace(
+            text=" B", no_speech_prob=0.0, avg_logprob=-0.1, compression_ratio=1.0)] * 2)
+        result = resumed.transcribe_audio(self.audio_file)
+        self.assertEqual([r["text"] for r in result], ["A", "A", "B", "B"])
+        resumed._decode_batch.assert_called_once()
+
+    def test_basic_run_resumes_window_by_window(self):
+        self.mocks[2].return_value = np.zeros(70 * 16000, dtype=np.float32)
+        prompts = []
+
+        def transcribe(audio, initial_prompt=None, kill_at=None, **kwargs):
+            if len(prompts) == kill_at:
+                raise Killed()
+            prompts.append(initial_prompt)
+            return {"text": "", "segments": [{"start": 0.0, "end": 10.0, "text": f" A{len(prompts)}"},
+                                             {"start": 10.0, "end": len(audio) / 16000, "text": f" B{len(prompts)}"}]}
+
+        self.whisper_model.transcribe.side_effect = lambda audio, **kwargs: transcribe(audio, kill_at=2, **kwargs)
+        with self.assertRaises(Killed):
+            AudioTranscriber(checkpoint_dir=self.checkpoint_dir).transcribe_audio(self.audio_file)
+
+        self.whisper_model.transcribe.reset_mock()
+        self.whisper_model.transcribe.side_effect = transcribe
+        result = AudioTranscriber(checkpoint_dir=self.checkpoint_dir).transcribe_audio(self.audio_file)
+
+        # Die Fenster ab 0 s und 10 s kommen aus dem Zwischenstand; das letzte, womöglich
+        # abgeschnittene Segment eines Fensters beginnt jeweils das nächste.
+        self.assertEqual(result, "A1\nA2\nA3\nA4\nA5\nB5")
+        self.assertEqual(prompts, [None, "A1", "A2", "A3", "A4"])
+        windows = [len(call.args[0]) / 16000 for call in self.whisper_model.transcribe.call_args_list]
+        self.assertEqual(windows, [30.0, 30.0, 30.0])
+        self.assertEqual(os.listdir(self.checkpoint_dir), [])
+
+    def test_without_checkpoint_dir_nothing_is_written(self):
+        self.whisper_model.transcribe.side_effect = self.whisper()
+        transcriber = AudioTranscriber(token="t")
+        transcriber._diarize = MagicMock(return_value=list(TURNS))
+        transcriber.transcribe_audio(self.audio_file)
+        self.assertFalse(os.path.exists(self.checkpoint_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
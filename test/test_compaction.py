@@ -0,0 +1,134 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from audio_miner.compaction import Compactor, compact_command
+from audio_miner.main import RadioRecorder
+from audio_miner.segment_index import SegmentIndex, find_audio_file, parse_segment_filename, transcript_exists
+
+NAME = "s_20240101_100000_20240101_110000"
+
+
+class FakeFfmpeg:
+    """Ersetzt subprocess.run: ffmpeg schreibt eine kleine Datei, ffprobe meldet Dauern."""
+    def __init__(self, source_duration=3600.0, target_duration=3600.2, returncode=0):
+        self.durations = {".mp3": source_duration, ".part": target_duration}
+        self.returncode = returncode
+        self.commands = []
+
+    def __call__(self, command, **kwargs):
+        self.commands.append((command, kwargs))
+        if os.path.basename(command[0]) == "ffprobe":
+            duration = self.durations[os.path.splitext(command[-1])[1]]
+            return subprocess.CompletedProcess(command, 0 if duration is not None else 1, stdout=f"{duration}\n")
+        if self.returncode == 0:
+            with open(command[-1], "wb") as f:
+                f.write(b"o" * 10)
+        return subprocess.CompletedProcess(command, self.returncode, stderr="")
+
+
+class TestCompactor(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.audio_dir = os.path.join(self.tmp_dir, "audio")
+        self.transcription_dir = os.path.join(self.tmp_dir, "transkriptionen")
+        os.makedirs(self.audio_dir)
+        os.makedirs(self.transcription_dir)
+        self.audio_file = os.path.join(self.audio_dir, NAME + ".mp3")
+        with open(self.audio_file, "wb") as f:
+            f.write(b"m" * 100)
+        with open(os.path.join(self.transcription_dir, NAME + ".txt"), "w") as f:
+            f.write("Text")
+        self.index = SegmentIndex(os.path.join(self.tmp_dir, "segments.db"), self.audio_dir, self.transcription_dir)
+        self.index.rebuild()
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def run_compactor(self, fake, **kwargs):
+        compactor = Compactor(self.index, ffmpeg_path="/usr/bin/ffmpeg", **kwargs)
+        compactor.ffprobe_path = "ffprobe"
+        with patch("audio_miner.compaction.subprocess.run", side_effect=fake):
+            return compactor.run_once()
+
+    def test_verified_segment_replaces_original(self):
+        self.assertEqual(self.run_compactor(FakeFfmpeg()), (1, 90))
+        opus = os.path.join(self.audio_dir, NAME + ".opus")
+        self.assertFalse(os.path.exists(self.audio_file))
+        self.assertEqual(find_audio_file(self.audio_dir, NAME + ".mp3"), opus)
+        self.assertTrue(transcript_exists(self.transcription_dir, opus))
+        self.assertEqual(parse_segment_filename(opus)[0], "s")
+        self.assertEqual(self.index.compactable(), [])
+        self.assertEqual(self.index.pending(), [])
+
+        # Auch nach einem Neuaufbau gilt das verdichtete Segment als transkribiert.
+        self.index.rebuild()
+        self.assertEqual(self.index.pending(), [])
+        self.assertEqual(self.index.compactable(), [])
+
+    def test_original_is_kept_when_verification_fails(self):
+        for fake in (FakeFfmpeg(target_duration=1800.0), FakeFfmpeg(target_duration=None), FakeFfmpeg(returncode=1)):
+            self.assertEqual(self.run_compactor(fake), (0, 0))
+            self.assertTrue(os.path.exists(self.audio_file))
+            self.assertEqual(os.listdir(self.audio_dir), [NAME + ".mp3"])
+        self.assertEqual(self.index.compactable(), [self.audio_file])
+
+    def test_untranscribed_segments_are_not_touched(self):
+        os.remove(os.path.join(self.transcription_dir, NAME + ".txt"))
+        self.index.rebuild()
+        fake = FakeFfmpeg()
+        self.assertEqual(self.run_compactor(fake), (0, 0))
+        self.assertEqual(fake.commands, [])
+
+    def test_rate_limit_and_niceness(self):
+        sleeps = []
+        fake = FakeFfmpeg()
+        self.run_compactor(fake, max_bytes_per_second=50, nice=7, sleep=sleeps.append, clock=lambda: 0.0)
+        self.assertEqual(sleeps, [2.0])
+        ffmpeg_kwargs = [kwargs for command, kwargs in fake.commands if command[0] == "/usr/bin/ffmpeg"][0]
+        with patch("os.nice") as nice:
+            ffmpeg_kwargs["preexec_fn"]()
+        nice.assert_called_once_with(7)
+
+    def test_command_is_mono_opus(self):
+        command = compact_command("ffmpeg", "in.mp3", "out.opus.part", "12k")
+        self.assertEqual(command[command.index("-ac") + 1], "1")
+        self.assertEqual(command[command.index("-c:a") + 1], "libopus")
+        self.assertEqual(command[command.index("-b:a") + 1], "12k")
+        self.assertEqual(command[-3:], ["-f", "opus", "out.opus.part"])
+
+
+class TestRecorderCompaction(unittest.TestCase):
+    def test_compaction_worker_compacts_transcribed_segments(self):
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        recorder = RadioRecorder(None, "s", base_dir=base_dir, use_monitor=False, transcribe_only=True,
+                                 transcriber=object(), compaction=True, compaction_nice=0)
+        self.addCleanup(recorder.segment_index.close)
+        self.addCleanup(recorder.backfill.close)
+        with open(os.path.join(recorder.audio_dir, NAME + ".mp3"), "wb") as f:
+            f.write(b"m" * 100)
+        with open(os.path.join(recorder.transcription_dir, NAME + ".txt"), "w") as f:
+            f.write("Text")
+        recorder.segment_index.rebuild()
+        recorder.compactor.ffprobe_path = "ffprobe"
+
+        with patch("audio_miner.compaction.subprocess.run", side_effect=FakeFfmpeg()):
+            recorder.compaction_worker(run_once=True)
+
+        self.assertEqual(os.listdir(recorder.audio_dir), [NAME + ".opus"])
+
+    def test_record_only_does_not_compact(self):
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        recorder = RadioRecorder("http://x", "s", base_dir=base_dir, use_monitor=False, record_only=True, compaction=True)
+        self.addCleanup(recorder.segment_index.close)
+        self.assertIsNone(recorder.compactor)
+
+
+if __name__ == "__main__":
+    unittest.main()
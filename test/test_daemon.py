@@ -0,0 +1,141 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from audio_miner.daemon import DaemonTranscriber, TranscriptionDaemon
+
+
+class FakeTranscriber:
+    whisper_model_size = "turbo"
+
+    def __init__(self):
+        self.calls = []
+        self.settings = []
+        self._details = {}
+        self._lock = threading.Lock()
+
+    def transcribe_audio(self, audio_path, settings=None):
+        with self._lock:
+            self.calls.append(audio_path)
+            self.settings.append(settings)
+        self._details[audio_path] = {"duration": 60.0}
+        return [{"speaker": "Sprecher", "start": 0.0, "end": 1.5, "text": os.path.basename(audio_path)}]
+
+    def transcribe_many(self, audio_paths, settings=None):
+        return [self.transcribe_audio(path, settings) for path in audio_paths]
+
+    def transcribe_words(self, audio, initial_prompt=None):
+        if len(audio) == 0:
+            raise ValueError("leeres Audio")
+        return [(0.0, len(audio) / 16000, f" {audio.dtype} {initial_prompt}")]
+
+    def pop_details(self, audio_path):
+        return self._details.pop(audio_path, None)
+
+
+class TestTranscriptionDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp.name, "daemon.sock")
+        self.transcriber = FakeTranscriber()
+        self.daemon = TranscriptionDaemon(self.transcriber, self.socket_path, fallback_model="base")
+        self.daemon.start()
+        self.thread = threading.Thread(target=self.daemon.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.client = DaemonTranscriber(self.socket_path, timeout=10)
+
+    def tearDown(self):
+        self.client.shutdown()
+        self.daemon.shutdown()
+        self.thread.join(timeout=5)
+        self.tmp.cleanup()
+
+    def test_transcribe_audio_returns_result_and_details(self):
+        path = os.path.join(self.tmp.name, "S_20240101_000000_20240101_000100.mp3")
+        result = self.client.transcribe_audio(path)
+        self.assertEqual(result[0]["text"], "S_20240101_000000_20240101_000100.mp3")
+        self.assertEqual(self.client.pop_details(path), {"duration": 60.0})
+        self.assertIsNone(self.client.pop_details(path))
+
+    def test_relative_paths_are_resolved_for_the_daemon(self):
+        result = self.client.transcribe_many(["a.mp3", "b.mp3"])
+        self.assertEqual([r[0]["text"] for r in result], ["a.mp3", "b.mp3"])
+        self.assertEqual(self.transcriber.calls, [os.path.abspath("a.mp3"), os.path.abspath("b.mp3")])
+        self.assertEqual(self.client.pop_details("a.mp3"), {"duration": 60.0})
+
+    def test_daemon_does_not_write_files_named_by_clients(self):
+        output = os.path.join(self.tmp.name, "out.txt")
+        response = self.daemon.handle({"method": "transcribe_audio", "args": ["/x.mp3"], "output": output})
+        self.assertEqual(response["result"][0]["text"], "x.mp3")
+        self.assertFalse(os.path.exists(output))
+
+    def test_clients_may_only_choose_configured_models(self):
+        self.client.transcribe_many(["a.mp3"], settings={"beam_size": 1, "diarize": False, "model": "base"})
+        self.client.transcribe_audio("b.mp3", settings={"model": "turbo"})
+        self.assertEqual(self.transcriber.settings, [{"beam_size": 1, "diarize": False, "model": "base"}, {"model": "turbo"}])
+
+        for settings in ({"model": "/tmp/fremd.pt"}, {"model": "large"}, {"language": "en"}):
+            with self.assertRaises(RuntimeError):
+                self.client.transcribe_audio("c.mp3", settings=settings)
+        with self.assertRaises(ValueError):
+            self.daemon.handle({"method": "transcribe_audio", "args": ["/c.mp3"], "kwargs": {"output": "/tmp/x"}})
+        self.assertEqual(len(self.transcriber.calls), 2)
+
+    def test_transcribe_words_sends_arrays(self):
+        words = self.client.transcribe_words(np.zeros(8000, dtype=np.float32), "Prompt")
+        self.assertEqual(words, [(0.0, 0.5, " float32 Prompt")])
+
+    def test_errors_are_raised_in_the_client(self):
+        with self.assertRaises(RuntimeError):
+            self.client.transcribe_words(np.zeros(0, dtype=np.float32))
+        # Die Verbindung bleibt nach einem Fehler nutzbar.
+        self.assertEqual(len(self.client.transcribe_audio("y.mp3")), 1)
+
+    def test_clients_in_several_threads_share_the_daemon(self):
+        results = {}
+
+        def worker(i):
+            results[i] = self.client.transcribe_audio(f"{i}.mp3")[0]["text"]
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {i: f"{i}.mp3" for i in range(4)})
+
+    def test_second_daemon_on_same_socket_is_refused(self):
+        with self.assertRaises(RuntimeError):
+            TranscriptionDaemon(FakeTranscriber(), self.socket_path).start()
+
+
+class TestDaemonConnection(unittest.TestCase):
+    def test_missing_daemon_raises_connection_error(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(ConnectionError):
+                DaemonTranscriber(os.path.join(tmp, "missing.sock"))
+
+    def test_stale_socket_is_replaced(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stale.sock")
+            stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale.bind(path)
+            stale.close()
+            daemon = TranscriptionDaemon(FakeTranscriber(), path)
+            daemon.start()
+            thread = threading.Thread(target=daemon.server.serve_forever, daemon=True)
+            thread.start()
+            client = DaemonTranscriber(path, timeout=10)
+            self.assertEqual(client.transcribe_audio("z.mp3")[0]["text"], "z.mp3")
+            client.shutdown()
+            daemon.shutdown()
+            thread.join(timeout=5)
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
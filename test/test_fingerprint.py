@@ -0,0 +1,174 @@
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+
+from audio_miner.audio_transcriber import AudioTranscriber
+from audio_miner.cli import main
+from audio_miner.fingerprint import FingerprintIndex, fingerprint, subtract_spans, FINGERPRINT_DB
+
+SR = 16000
+
+
+def tones(seconds, seed):
+    # Folge kurzer Töne mit zufälligen Frequenzen, wie Musik oder Werbung mit vielen Spektralspitzen.
+    rng = np.random.default_rng(seed)
+    t = np.arange(SR // 10) / SR
+    parts = []
+    for _ in range(int(seconds * 10)):
+        frequency = rng.uniform(200, 3500)
+        parts.append(0.3 * np.sin(2 * np.pi * frequency * t) + 0.1 * np.sin(2 * np.pi * 2 * frequency * t))
+    return np.concatenate(parts).astype(np.float32)
+
+
+AD = tones(20, seed=99)
+FIRST = np.concatenate([tones(10, seed=1), AD, tones(30, seed=2)])
+SECOND = np.concatenate([tones(35, seed=3), 0.7 * AD, tones(5, seed=4)])
+
+
+class FailingStatement:
+    # sqlite3.Connection lässt sich nicht patchen; Anweisungen mit prefix scheitern wie bei "database is locked".
+    def __init__(self, conn, prefix):
+        self.conn = conn
+        self.prefix = prefix
+
+    def execute(self, sql, *args):
+        if sql.startswith(self.prefix):
+            raise sqlite3.OperationalError("database is locked")
+        return self.conn.execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        if sql.startswith(self.prefix):
+            raise sqlite3.OperationalError("database is locked")
+        return self.conn.executemany(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+class TestFingerprintIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.index = FingerprintIndex(os.path.join(self.tmp_dir, FINGERPRINT_DB))
+        self.addCleanup(self.index.close)
+
+    def test_repeated_clip_is_found_at_new_position(self):
+        hashes, frames = fingerprint(FIRST)
+        self.index.add_clip("s_20240101_100000_20240101_110000.mp3", hashes, frames,
+                            [{"start": 11.0, "end": 29.0, "text": "Werbung"}, {"start": 40.0, "end": 50.0, "text": "Moderation"}], "small")
+
+        matches = self.index.match(*fingerprint(SECOND), "small")
+        self.assertEqual(len(matches), 1)
+        self.assertAlmostEqual(matches[0].offset, 25.0, delta=0.1)
+
+        pieces, spans = self.index.reuse(matches)
+        self.assertEqual([piece["text"] for piece in pieces], ["Werbung"])
+        self.assertAlmostEqual(pieces[0]["start"], 36.0, delta=0.1)
+        self.assertEqual(spans, [(pieces[0]["start"], pieces[0]["end"])])
+
+    def test_no_match_for_other_audio_or_profile(self):
+        hashes, frames = fingerprint(FIRST)
+        self.index.add_clip("a.mp3", hashes, frames, [], "small")
+
+        self.assertEqual(self.index.match(*fingerprint(tones(30, seed=7)), "small"), [])
+        self.assertEqual(self.index.match(*fingerprint(SECOND), "turbo"), [])
+
+    def test_failed_match_leaves_no_query_hashes(self):
+        hashes, frames = fingerprint(FIRST)
+        self.index.add_clip("a.mp3", hashes, frames, [], "small")
+        conn = self.index._connection()
+        self.index._conn = FailingStatement(conn, "SELECT")
+
+        with self.assertRaises(sqlite3.OperationalError):
+            self.index.match(*fingerprint(SECOND), "small")
+        self.index._conn = conn
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM query").fetchone()[0], 0)
+        self.assertEqual(len(self.index.match(*fingerprint(SECOND), "small")), 1)
+
+    def test_prune_keeps_used_clips(self):
+        hashes, frames = fingerprint(FIRST)
+        with patch("audio_miner.fingerprint.time.time", return_value=1000.0):
+            self.index.add_clip("a.mp3", hashes, frames, [], "small")
+            self.index.add_clip("b.mp3", *fingerprint(tones(30, seed=7)), [], "small")
+        self.index.reuse(self.index.match(*fingerprint(SECOND), "small"))
+
+        self.assertEqual(self.index.prune(), 1)
+        self.assertEqual(self.index.clip_count(), 1)
+
+    def test_failed_add_and_prune_leave_no_partial_clips(self):
+        hashes, frames = fingerprint(FIRST)
+        conn = self.index._connection()
+        self.index._conn = FailingStatement(conn, "INSERT INTO hashes")
+        with self.assertRaises(sqlite3.OperationalError):
+            self.index.add_clip("a.mp3", hashes, frames, [], "small")
+        self.index._conn = conn
+        self.assertEqual(self.index.clip_count(), 0)
+
+        self.index.add_clip("a.mp3", hashes, frames, [], "small")
+        hash_count = conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        self.index._conn = FailingStatement(conn, "DELETE FROM clips")
+        with self.assertRaises(sqlite3.OperationalError):
+            self.index.prune(retention=-1)
+        self.index._conn = conn
+        self.assertEqual(self.index.clip_count(), 1)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0], hash_count)
+
+    def test_subtract_spans(self):
+        self.assertEqual(subtract_spans([(0.0, 60.0)], [(10.0, 20.0), (50.0, 70.0)]),
+                         [(0.0, 10.0), (20.0, 50.0)])
+
+
+class TestFingerprintTranscription(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        patchers = {
+            "pipeline": patch('pyannote.audio.Pipeline.from_pretrained'),
+            "load_model": patch('whisper.load_model'),
+            "load_audio": patch('whisper.load_audio', side_effect=[FIRST, SECOND]),
+            "cuda": patch('torch.cuda.is_available', return_value=False),
+        }
+        self.mocks = {name: p.start() for name, p in patchers.items()}
+        for p in patchers.values():
+            self.addCleanup(p.stop)
+        self.whisper_model = MagicMock()
+        self.mocks["load_model"].return_value = self.whisper_model
+
+    def test_known_clip_skips_whisper_and_counts_per_station(self):
+        transcriber = AudioTranscriber(token=None, fingerprint_db=os.path.join(self.base_dir, FINGERPRINT_DB))
+        self.whisper_model.transcribe.return_value = {"segments": [
+            {"start": 0.0, "end": 10.0, "text": " Musik "},
+            {"start": 11.0, "end": 29.0, "text": " Werbung "},
+        ]}
+        self.assertEqual(transcriber.transcribe_audio("swr3_20240101_100000_20240101_110000.mp3"), "Musik\nWerbung")
+
+        self.whisper_model.transcribe.reset_mock()
+        self.whisper_model.transcribe.return_value = {"segments": []}
+        result = transcriber.transcribe_audio("swr3_20240101_110000_20240101_120000.mp3")
+
+        self.assertEqual(result, "Werbung")
+        total = sum(len(call[0][0]) for call in self.whisper_model.transcribe.call_args_list)
+        self.assertLess(total, 43 * SR)
+        details = transcriber.pop_details("swr3_20240101_110000_20240101_120000.mp3")
+        self.assertEqual(details["fingerprint_hits"], 1)
+        self.assertAlmostEqual(details["fingerprint_seconds"], 18.0, delta=0.1)
+
+        stats = transcriber.fingerprints.stats()["swr3"]
+        self.assertEqual((stats["segments"], stats["segments_with_hits"], stats["hit_rate"]), (2, 1, 0.5))
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main(["fingerprints", "stats", "--base-dir", self.base_dir])
+        self.assertIn("swr3", output.getvalue())
+        self.assertIn("50.0% mit Treffern", output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
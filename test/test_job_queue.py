@@ -0,0 +1,254 @@
+import multiprocessing
+import os
+import queue
+import shutil
+import socket
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import datetime
+
+from audio_miner.job_queue import (STATE_DONE, STATE_FAILED, STATE_LEASED, STATE_PENDING, JobQueue)
+from audio_miner.main import RadioRecorder
+
+
+def segment_name(hour):
+    return f"s_20240101_{hour:02d}0000_20240101_{hour + 1:02d}0000.mp3"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _consume(db_path, result):
+    jobs = JobQueue(db_path)
+    while True:
+        try:
+            audio_file = jobs.get_nowait()
+        except queue.Empty:
+            break
+        result.put(os.path.basename(audio_file))
+        jobs.complete(audio_file)
+    jobs.close()
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.audio_dir = os.path.join(self.tmp_dir, "audio")
+        os.makedirs(self.audio_dir)
+        self.db_path = os.path.join(self.tmp_dir, "jobs.db")
+        self.quarantine_dir = os.path.join(self.tmp_dir, "quarantine")
+        self.clock = Clock()
+
+    def queue(self, **kwargs):
+        jobs = JobQueue(self.db_path, quarantine_dir=self.quarantine_dir, clock=self.clock, **kwargs)
+        self.addCleanup(jobs.close)
+        return jobs
+
+    def segment(self, hour):
+        path = os.path.join(self.audio_dir, segment_name(hour))
+        with open(path, "wb") as f:
+            f.write(b"m")
+        return path
+
+    def test_fifo_lease_complete_and_deduplication(self):
+        jobs = self.queue()
+        first, second = self.segment(11), self.segment(10)
+        self.assertTrue(jobs.put(first))
+        self.assertTrue(jobs.put(second))
+        self.assertFalse(jobs.put(first))
+        self.assertEqual(jobs.qsize(), 2)
+        self.assertEqual(jobs.pending_seconds(), 7200)
+
+        self.assertEqual(jobs.get_nowait(), first)
+        self.assertEqual(jobs.counts(), {STATE_PENDING: 1, STATE_LEASED: 1})
+        jobs.complete(first)
+        self.assertFalse(jobs.put(second))
+        # Ein erledigter Auftrag kommt erneut an die Reihe, wenn er wieder eingereiht wird.
+        self.assertTrue(jobs.put(first))
+        self.assertEqual(jobs.lease(5), [first, second])
+        with self.assertRaises(queue.Empty):
+            jobs.get(timeout=0)
+
+    def test_wait_since_due_and_oldest_pending_job(self):
+        jobs = self.queue(backoff=60)
+        first, second = self.segment(11), self.segment(10)
+        jobs.put(first)
+        self.clock.now += 5
+        jobs.put(second)
+        self.assertEqual(jobs.oldest_pending(), second)
+        self.clock.now += 10
+
+        self.assertEqual(jobs.lease(1), [first])
+        self.assertEqual(jobs.wait_seconds(first), 15)
+        self.assertEqual(jobs.oldest_pending(), second)
+        # Nach einem Fehlversuch zählt die Wartezeit erst ab dem Ende des Backoffs.
+        jobs.fail(first, "Fehler")
+        self.assertIsNone(jobs.wait_seconds(first))
+        self.clock.now += 70
+        self.assertEqual(jobs.lease(2), [first, second])
+        self.assertEqual((jobs.wait_seconds(first), jobs.wait_seconds(second)), (10, 80))
+        self.assertIsNone(jobs.oldest_pending())
+
+    def test_failures_back_off_and_end_in_quarantine(self):
+        jobs = self.queue(max_attempts=2, backoff=60)
+        audio_file = self.segment(10)
+        jobs.put(audio_file)
+
+        self.assertFalse(jobs.fail(jobs.get_nowait(), RuntimeError("kaputt")))
+        self.assertEqual(jobs.qsize(), 0)
+        self.assertEqual(jobs.outstanding(), 1)
+        self.clock.now += 60
+        self.assertEqual(jobs.get_nowait(), audio_file)
+
+        self.assertTrue(jobs.fail(audio_file, RuntimeError("kaputt")))
+        self.assertFalse(os.path.exists(audio_file))
+        self.assertTrue(os.path.exists(os.path.join(self.quarantine_dir, segment_name(10))))
+        self.assertEqual(jobs.quarantined(), [(segment_name(10), 2, "kaputt")])
+        self.assertFalse(jobs.put(audio_file))
+
+        self.assertEqual(jobs.requeue(), 1)
+        self.assertTrue(os.path.exists(audio_file))
+        self.assertEqual(jobs.get_nowait(), audio_file)
+
+    def test_expired_lease_is_reclaimed_by_another_consumer(self):
+        crashed = JobQueue(self.db_path, clock=self.clock, lease_seconds=300)
+        audio_file = self.segment(10)
+        crashed.put(audio_file)
+        self.assertEqual(crashed.get_nowait(), audio_file)
+        crashed._stopped.set()
+
+        other = self.queue(lease_seconds=300, backoff=0)
+        self.assertEqual(other.lease(), [])
+        self.clock.now += 301
+        self.assertEqual(other.lease(), [audio_file])
+        # Der Absturz zählt als Versuch.
+        self.assertEqual(other._connection().execute("SELECT attempts FROM jobs").fetchone()[0], 2)
+
+    def test_lease_of_dead_process_is_reclaimed_immediately(self):
+        jobs = self.queue(backoff=0)
+        audio_file = self.segment(10)
+        jobs.put(audio_file)
+        dead = multiprocessing.get_context("fork").Process(target=lambda: None)
+        dead.start()
+        dead.join()
+        jobs._connection().execute("UPDATE jobs SET state = ?, owner = ?, lease_until = ?",
+                                   (STATE_LEASED, f"{socket.gethostname()}:{dead.pid}:x", self.clock.now + 300))
+        self.assertEqual(jobs.lease(), [audio_file])
+
+    def test_heartbeat_outlives_an_empty_lease_set(self):
+        jobs = self.queue(lease_seconds=0.3)
+        first, second = self.segment(10), self.segment(11)
+        jobs.put(first)
+        jobs.put(second)
+        jobs.complete(jobs.get_nowait())
+        heartbeat = jobs._heartbeat
+        # Länger als ein Verlängerungsintervall ohne gehaltenen Auftrag.
+        time.sleep(0.25)
+        self.assertTrue(heartbeat.is_alive())
+
+        self.assertEqual(jobs.get_nowait(), second)
+        self.assertIs(jobs._heartbeat, heartbeat)
+        self.clock.now += 100
+        time.sleep(0.25)
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT lease_until FROM jobs WHERE state = ?", (STATE_LEASED,)).fetchone()[0],
+                             self.clock.now + 0.3)
+        jobs.close()
+        self.assertFalse(heartbeat.is_alive())
+
+    def test_close_returns_held_jobs_without_counting_the_attempt(self):
+        jobs = JobQueue(self.db_path, clock=self.clock)
+        audio_file = self.segment(10)
+        jobs.put(audio_file)
+        jobs.get_nowait()
+        jobs.close()
+        reopened = self.queue()
+        self.assertEqual(reopened.counts(), {STATE_PENDING: 1})
+        self.assertEqual(reopened._connection().execute("SELECT attempts FROM jobs").fetchone()[0], 0)
+
+    def test_several_processes_consume_each_job_once(self):
+        jobs = self.queue()
+        names = [segment_name(hour) for hour in range(0, 20)]
+        for name in names:
+            jobs.put(os.path.join(self.audio_dir, name))
+        context = multiprocessing.get_context("fork")
+        result = context.Queue()
+        workers = [context.Process(target=_consume, args=(self.db_path, result)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        consumed = [result.get(timeout=30) for _ in names]
+        for worker in workers:
+            worker.join(timeout=30)
+        self.assertEqual(sorted(consumed), sorted(names))
+        self.assertEqual(jobs.counts(), {STATE_DONE: len(names)})
+
+
+class FailingTranscriber:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def transcribe_audio(self, audio_path):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("Dekodierfehler")
+        return "Text"
+
+
+class TestRecorderJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+
+    def create_recorder(self, stream_url, **kwargs):
+        recorder = RadioRecorder(stream_url, "s", base_dir=self.base_dir, use_monitor=False, job_queue=True,
+                                 poll_interval=0, **kwargs)
+        self.addCleanup(recorder.segment_index.close)
+        self.addCleanup(recorder.job_queue.close)
+        if recorder.backfill is not None:
+            self.addCleanup(recorder.backfill.close)
+        return recorder
+
+    def test_recording_process_enqueues_and_consumer_transcribes(self):
+        recording = self.create_recorder("http://x", record_only=True)
+        audio_file = os.path.join(recording.audio_dir, segment_name(10))
+        with open(audio_file, "wb") as f:
+            f.write(b"m")
+        recording._on_segment_finished(audio_file)
+        self.assertEqual(recording.job_queue.counts(), {STATE_PENDING: 1})
+
+        consumer = self.create_recorder(None, transcribe_only=True, transcriber=FailingTranscriber(failures=0))
+        consumer.transcription_worker()
+        with open(os.path.join(consumer.transcription_dir, segment_name(10)[:-4] + ".txt"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "Text")
+        self.assertEqual(consumer.job_queue.counts(), {STATE_DONE: 1})
+        # Nach einem Neustart wird das erledigte Segment nicht erneut eingereiht.
+        consumer.check_and_queue_old_files(datetime.now())
+        self.assertEqual(consumer.job_queue.counts(), {STATE_DONE: 1})
+
+    def test_failing_segment_is_retried_then_quarantined(self):
+        transcriber = FailingTranscriber(failures=10)
+        recorder = self.create_recorder(None, transcribe_only=True, transcriber=transcriber)
+        recorder.job_queue.backoff = 0
+        audio_file = os.path.join(recorder.audio_dir, segment_name(10))
+        with open(audio_file, "wb") as f:
+            f.write(b"m")
+        recorder.check_and_queue_old_files(datetime.now())
+
+        recorder.transcription_worker()
+
+        self.assertEqual(transcriber.calls, 3)
+        self.assertEqual(recorder.job_queue.counts(), {STATE_FAILED: 1})
+        self.assertEqual(os.listdir(os.path.join(self.base_dir, "s", "quarantine")), [segment_name(10)])
+
+
+if __name__ == "__main__":
+    unittest.main()
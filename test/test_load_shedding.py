@@ -0,0 +1,174 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from audio_miner.audio_transcriber import AudioTranscriber
+from audio_miner.load_shedding import (LEVEL_GREEDY, LEVEL_NO_DIARIZATION, LEVEL_NORMAL,
+                                       LEVEL_SMALL_MODEL, LoadShedder, parse_thresholds)
+from audio_miner.main import RadioRecorder
+from audio_miner.tracing import TRACE_FILE
+
+THRESHOLDS = (1000, 5000, 9000, 20000)
+
+
+def segment_name(hour):
+    return f"s_20240101_{hour:02d}0000_20240101_{hour + 1:02d}0000.mp3"
+
+
+class TestLoadShedder(unittest.TestCase):
+    def test_levels_follow_lag_with_hysteresis(self):
+        backlog = [0]
+        shedder = LoadShedder(lambda: backlog[0], thresholds=THRESHOLDS)
+        shedder.observe(3600, 3600)
+        self.assertEqual(shedder.update(), LEVEL_NORMAL)
+        backlog[0] = 9500
+        self.assertEqual(shedder.update(), LEVEL_SMALL_MODEL)
+        # Knapp unter der Schwelle bleibt die Stufe, erst deutlich darunter geht es zurück.
+        backlog[0] = 8000
+        self.assertEqual(shedder.update(), LEVEL_SMALL_MODEL)
+        backlog[0] = 2000
+        self.assertEqual(shedder.update(), LEVEL_GREEDY)
+        backlog[0] = 0
+        self.assertEqual(shedder.update(), LEVEL_NORMAL)
+
+    def test_real_time_factor_scales_lag(self):
+        shedder = LoadShedder(lambda: 1000, thresholds=THRESHOLDS)
+        shedder.observe(100, 600)
+        self.assertAlmostEqual(shedder.lag(), 6000)
+        self.assertEqual(shedder.update(), LEVEL_NO_DIARIZATION)
+
+    def test_settings_per_level(self):
+        shedder = LoadShedder(lambda: 0, fallback_model="tiny")
+        self.assertEqual(shedder.settings(LEVEL_NORMAL), {})
+        self.assertEqual(shedder.settings(LEVEL_GREEDY), {"beam_size": 1})
+        self.assertEqual(shedder.settings(LEVEL_SMALL_MODEL), {"beam_size": 1, "diarize": False, "model": "tiny"})
+
+    def test_parse_thresholds(self):
+        self.assertEqual(parse_thresholds("1,2,3,4"), (60, 120, 180, 240))
+        for value in ("1,2,3", "4,3,2,1", "a,b,c,d", "0,1,2,3"):
+            with self.assertRaises(ValueError):
+                parse_thresholds(value)
+
+
+class FakeTranscriber:
+    def __init__(self):
+        self.calls = []
+
+    def transcribe_audio(self, audio_path, settings=None):
+        self.calls.append((os.path.basename(audio_path), settings))
+        return "Text"
+
+    def pop_details(self, audio_path):
+        settings = dict({"model": "turbo", "diarize": False, "beam_size": 5}, **(self.calls[-1][1] or {}))
+        return {"settings": settings}
+
+
+class TestRecorderLoadShedding(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        self.transcriber = FakeTranscriber()
+        self.recorder = self.create_recorder("http://x", transcriber=self.transcriber, load_shedding=THRESHOLDS)
+        for hour in range(10, 14):
+            with open(os.path.join(self.recorder.audio_dir, segment_name(hour)), "wb") as f:
+                f.write(b"m")
+        self.recorder.segment_index.rebuild()
+
+    def create_recorder(self, stream_url, **kwargs):
+        recorder = RadioRecorder(stream_url, "s", base_dir=self.base_dir, use_monitor=False, **kwargs)
+        self.addCleanup(recorder.segment_index.close)
+        if recorder.backfill is not None:
+            self.addCleanup(recorder.backfill.close)
+        return recorder
+
+    def queue(self, *hours):
+        for hour in hours:
+            self.recorder._put_segment(os.path.join(self.recorder.audio_dir, segment_name(hour)))
+
+    def test_backlog_reduces_settings_and_records_them(self):
+        self.queue(10, 11)
+        self.recorder.process_segment(self.recorder.segment_queue.get())
+        self.assertEqual(self.transcriber.calls, [(segment_name(10), {"beam_size": 1, "diarize": False})])
+
+        self.recorder.load_shedder.rtf = 0.01
+        self.recorder.process_segment(self.recorder.segment_queue.get())
+        self.assertEqual(self.transcriber.calls[-1], (segment_name(11), None))
+
+        with open(os.path.join(self.recorder.transcription_dir, TRACE_FILE), encoding="utf-8") as f:
+            traces = [json.loads(line) for line in f]
+        self.assertEqual([trace["settings"]["level"] for trace in traces], [LEVEL_NO_DIARIZATION, LEVEL_NORMAL])
+        degraded = self.recorder.segment_index.degraded()
+        self.assertEqual([os.path.basename(audio_file) for audio_file, _ in degraded], [segment_name(10)])
+
+    def test_deepest_level_defers_segments(self):
+        self.queue(10, 11, 12, 13)
+        self.recorder.load_shedder.rtf = 2.0
+        self.recorder.process_segment(self.recorder.segment_queue.get())
+        self.assertEqual(self.transcriber.calls, [])
+        self.assertEqual(len(self.recorder.queued_files), 3)
+
+        # Die Live-Warteschlange übergeht das Segment, der Backfill holt es nach.
+        self.assertEqual(len(self.recorder.segment_index.pending()), 3)
+        self.assertEqual(len(self.recorder.segment_index.pending(include_deferred=True)), 4)
+        self.recorder.segment_index.rebuild()
+        self.assertEqual(len(self.recorder.segment_index.pending()), 3)
+
+    def test_upgrade_degraded_requeues_reduced_transcripts(self):
+        self.queue(10)
+        self.recorder.process_segment(self.recorder.segment_queue.get())
+        self.assertEqual(self.transcriber.calls[-1][1], {"beam_size": 1})
+        self.recorder.segment_index.rebuild()
+
+        backfill = self.create_recorder(None, transcribe_only=True, transcriber=self.transcriber, upgrade_degraded=True)
+        backfill.check_and_queue_old_files(datetime.now())
+        queued = [os.path.basename(audio_file) for audio_file in list(backfill.segment_queue.queue)]
+        self.assertEqual(queued, [segment_name(hour) for hour in range(10, 14)])
+
+        backfill.process_segment(backfill.segment_queue.get())
+        self.assertEqual(self.transcriber.calls[-1], (segment_name(10), None))
+        self.assertEqual(backfill.segment_index.degraded(), [])
+
+
+class TestTranscriberSettings(unittest.TestCase):
+    def setUp(self):
+        patchers = [
+            patch('pyannote.audio.Pipeline.from_pretrained'),
+            patch('whisper.load_model'),
+            patch('whisper.load_audio', return_value=np.zeros(8 * 16000, dtype=np.float32)),
+            patch('torch.cuda.is_available', return_value=False),
+        ]
+        self.mocks = [p.start() for p in patchers]
+        for p in patchers:
+            self.addCleanup(p.stop)
+        self.models = {}
+        self.mocks[1].side_effect = lambda size, **kwargs: self.models.setdefault(size, MagicMock(name=size))
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.audio_file = os.path.join(tmp_dir, segment_name(10))
+        with open(self.audio_file, "wb") as f:
+            f.write(b"audio")
+
+    def test_reduced_settings_skip_diarization_and_use_fallback_model(self):
+        transcriber = AudioTranscriber(token="t", fallback_model="base")
+        transcriber._diarize = MagicMock()
+        self.assertEqual(set(self.models), {"small", "base"})
+        self.models["base"].transcribe.return_value = {"text": " Hallo", "segments": [{"start": 0.0, "end": 1.0, "text": " Hallo"}]}
+
+        result = transcriber.transcribe_audio(self.audio_file, settings={"beam_size": 1, "diarize": False, "model": "base"})
+
+        self.assertEqual(result, "Hallo")
+        transcriber._diarize.assert_not_called()
+        self.models["small"].transcribe.assert_not_called()
+        self.assertEqual(self.models["base"].transcribe.call_args.kwargs["beam_size"], 1)
+        self.assertEqual(transcriber.pop_details(self.audio_file)["settings"],
+                         {"model": "base", "diarize": False, "beam_size": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
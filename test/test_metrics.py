@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import urllib.error
+import urllib.request
+from unittest.mock import patch, MagicMock
+
+from audio_miner.cli import main
+from audio_miner.main import RadioRecorder
+from audio_miner.metrics import (Counter, Gauge, Histogram, Registry, REGISTRY, STAGE_DURATION, TRANSCRIPTION_RTF,
+                                 WATCHDOG_KILLS, RECORDED_BYTES, segment_seconds, start_metrics_server)
+
+
+class TestRegistry(unittest.TestCase):
+    def test_text_format(self):
+        registry = Registry()
+        counter = registry.register(Counter("jobs_total", "Jobs.", ["sender"]))
+        gauge = registry.register(Gauge("depth", "Tiefe.", ["sender"]))
+        histogram = registry.register(Histogram("duration_seconds", "Dauer.", ["stage"], buckets=(1, 10)))
+        counter.inc(sender='a"b')
+        counter.inc(2, sender='a"b')
+        gauge.set(4, sender="x")
+        histogram.observe(0.5, stage="whisper")
+        histogram.observe(5.0, stage="whisper")
+
+        text = registry.exposition()
+        self.assertIn("# TYPE jobs_total counter\njobs_total{sender=\"a\\\"b\"} 3\n", text)
+        self.assertIn('depth{sender="x"} 4\n', text)
+        self.assertIn('duration_seconds_bucket{stage="whisper",le="1.0"} 1\n', text)
+        self.assertIn('duration_seconds_bucket{stage="whisper",le="+Inf"} 2\n', text)
+        self.assertIn('duration_seconds_sum{stage="whisper"} 5.5\n', text)
+        with self.assertRaises(ValueError):
+            counter.inc(-1, sender="a")
+
+    def test_http_endpoint(self):
+        registry = Registry()
+        registry.register(Gauge("up", "Läuft.")).set(1)
+        server = start_metrics_server(0, registry=registry)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        with urllib.request.urlopen(url + "/metrics") as response:
+            self.assertTrue(response.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+            self.assertIn("up 1\n", response.read().decode("utf-8"))
+        with self.assertRaises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/anderes")
+
+    def test_segment_seconds(self):
+        self.assertEqual(segment_seconds("/a/s_20240101_100000_20240101_110000.mp3"), 3600.0)
+        self.assertIsNone(segment_seconds("s_20240101_100000.mp3"))
+
+
+class TestRecorderMetrics(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        patcher = patch('audio_miner.main.AudioTranscriber')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.recorder = RadioRecorder(None, "metrik", base_dir=self.base_dir, use_monitor=False)
+        self.addCleanup(self.recorder.segment_index.close)
+
+    def test_queue_depth_and_age(self):
+        self.recorder._queue_segment_for_transcription(os.path.join(self.recorder.audio_dir, "metrik_20240101_100000_20240101_110000.mp3"))
+
+        text = REGISTRY.exposition()
+        self.assertIn('audio_miner_segment_queue_depth{sender="metrik"} 1\n', text)
+        age = [line for line in text.splitlines() if line.startswith('audio_miner_segment_queue_oldest_age_seconds{sender="metrik"}')]
+        self.assertGreater(float(age[0].split()[-1]), 3600)
+        self.assertIn('audio_miner_disk_free_bytes{sender="metrik"}', text)
+
+    def test_queue_age_and_wait_with_job_queue(self):
+        recorder = RadioRecorder(None, "jobs", base_dir=self.base_dir, use_monitor=False, job_queue=True)
+        self.addCleanup(recorder.segment_index.close)
+        self.addCleanup(recorder.job_queue.close)
+        audio_file = os.path.join(recorder.audio_dir, "jobs_20240101_100000_20240101_110000.mp3")
+        with open(audio_file, "wb") as f:
+            f.write(b"audio")
+        recorder.job_queue.put(audio_file)
+
+        age = [line for line in REGISTRY.exposition().splitlines()
+               if line.startswith('audio_miner_segment_queue_oldest_age_seconds{sender="jobs"}')]
+        self.assertGreater(float(age[0].split()[-1]), 3600)
+
+        recorder.job_queue.clock = lambda: time.time() + 30
+        self.assertEqual(recorder.segment_queue.get_nowait(), audio_file)
+        recorder.transcriber.transcribe_audio.return_value = "Hallo"
+        with patch.object(recorder, "_save_transcription") as save:
+            recorder.process_segment(audio_file)
+        self.assertGreaterEqual(save.call_args[0][2]["queue_wait"], 30)
+
+    def test_transcription_stages_and_rtf(self):
+        audio_file = os.path.join(self.recorder.audio_dir, "metrik_20240101_100000_20240101_100100.mp3")
+        with open(audio_file, "wb") as f:
+            f.write(b"audio")
+        self.recorder.segment_index.add_segment(audio_file)
+        self.recorder._queue_segment_for_transcription(audio_file)
+        self.recorder.segment_queue.get()
+        self.recorder.transcriber.transcribe_audio.return_value = "Hallo"
+        self.recorder.transcriber.pop_details.return_value = {"stages": {"decode": 0.2, "whisper": 3.0}}
+        before = STAGE_DURATION.value(stage="whisper")
+
+        with patch('audio_miner.main.time.monotonic', side_effect=[100.0, 106.0]):
+            self.recorder.process_segment(audio_file)
+
+        count, total = STAGE_DURATION.value(stage="whisper")
+        self.assertEqual((count - before[0], total - before[1]), (1, 3.0))
+        self.assertEqual(TRANSCRIPTION_RTF.value(sender="metrik"), 0.1)
+
+    def test_watchdog_kill_and_recorded_bytes(self):
+        self.recorder._on_stream_stalled(MagicMock())
+        self.assertEqual(WATCHDOG_KILLS.value(sender="metrik"), 1)
+
+        audio_file = os.path.join(self.recorder.audio_dir, "metrik_20240101_100000_20240101_100100.mp3")
+        with open(audio_file, "wb") as f:
+            f.write(b"x" * 1000)
+        self.recorder._count_recorded_bytes(audio_file)
+        self.assertEqual(RECORDED_BYTES.value(sender="metrik"), 1000)
+
+
+
+class TestMetricsCli(unittest.TestCase):
+    def test_server_starts_after_recorder(self):
+        calls = MagicMock()
+        with patch('audio_miner.main.RadioRecorder', calls.recorder), \
+                patch('audio_miner.metrics.start_metrics_server', calls.start_metrics_server):
+            main(["--sender", "s", "--transcribe-only", "--transcription-workers", "2", "--metrics-port", "9123"])
+        self.assertEqual([name for name, _, _ in calls.mock_calls],
+                         ["recorder", "start_metrics_server", "recorder().run"])
+
+    def test_stations_server_starts_after_recorder(self):
+        calls = MagicMock()
+        with patch('audio_miner.multi_station.load_stations'), \
+                patch('audio_miner.multi_station.MultiStationRecorder', calls.recorder), \
+                patch('audio_miner.metrics.start_metrics_server', calls.start_metrics_server):
+            main(["--stations", "sender.json", "--metrics-port", "9123"])
+        self.assertEqual([name for name, _, _ in calls.mock_calls],
+                         ["recorder", "start_metrics_server", "recorder().run"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import json
+import os
+import queue
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+from audio_miner.multi_station import load_stations, TranscriptionPool, MultiStationRecorder
+
+
+def make_recorder(sender, files):
+    recorder = MagicMock()
+    recorder.sender = sender
+    recorder.verbose = False
+    recorder.batch_size = 1
+    recorder.segment_queue = queue.Queue()
+    for f in files:
+        recorder.segment_queue.put(f)
+    return recorder
+
+
+class TestLoadStations(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, data):
+        path = os.path.join(self.tmp_dir, "stations.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        return path
+
+    def test_load_valid_list(self):
+        path = self.write([{"sender": "swr3", "stream_url": "http://a"}, {"sender": "wdr2", "stream_url": "http://b", "segment_time": 300}])
+        stations = load_stations(path)
+        self.assertEqual([s["sender"] for s in stations], ["swr3", "wdr2"])
+
+    def test_unknown_key_raises(self):
+        path = self.write([{"sender": "swr3", "url": "http://a"}])
+        with self.assertRaises(ValueError):
+            load_stations(path)
+
+    def test_duplicate_sender_raises(self):
+        path = self.write([{"sender": "swr3"}, {"sender": "swr3"}])
+        with self.assertRaises(ValueError):
+            load_stations(path)
+
+
+class TestTranscriptionPool(unittest.TestCase):
+    def test_round_robin_across_stations(self):
+        """Ein Sender mit großem Rückstand darf die anderen nicht aushungern."""
+        busy = make_recorder("busy", ["b1", "b2", "b3"])
+        quiet = make_recorder("quiet", ["q1"])
+        pool = TranscriptionPool([busy, quiet])
+
+        order = []
+        for _ in range(4):
+            recorder, audio_file = pool.next_segment()
+            order.append(audio_file)
+
+        self.assertEqual(order, ["b1", "q1", "b2", "b3"])
+        self.assertEqual(pool.next_segment(), (None, None))
+
+    def test_batches_are_drained_per_station_in_turn(self):
+        busy = make_recorder("busy", ["b1", "b2", "b3"])
+        quiet = make_recorder("quiet", ["q1"])
+        busy.batch_size = quiet.batch_size = 2
+        pool = TranscriptionPool([busy, quiet])
+
+        batches = [pool.next_batch() for _ in range(4)]
+        self.assertEqual([(recorder.sender if recorder else None, files) for recorder, files in batches],
+                         [("busy", ["b1", "b2"]), ("quiet", ["q1"]), ("busy", ["b3"]), (None, [])])
+
+    def test_worker_transcribes_batches_with_process_segments(self):
+        recorder = make_recorder("a", ["1", "2", "3"])
+        recorder.batch_size = 3
+        pool = TranscriptionPool([recorder], poll_interval=0)
+        recorder.process_segments.side_effect = lambda files: setattr(pool, "running", False)
+        pool.running = True
+        pool.worker()
+        recorder.process_segments.assert_called_once_with(["1", "2", "3"])
+        recorder.process_segment.assert_not_called()
+        self.assertEqual(pool.active, 0)
+
+    def test_backlog_per_station(self):
+        pool = TranscriptionPool([make_recorder("a", ["1", "2"]), make_recorder("b", [])])
+        self.assertEqual(pool.backlog(), {"a": 2, "b": 0})
+        self.assertFalse(pool.is_idle())
+
+
+class TestMultiStationRecorder(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    @patch('audio_miner.multi_station.AudioTranscriber')
+    def test_single_shared_transcriber(self, mock_audio_transcriber):
+        stations = [{"sender": "swr3", "stream_url": "http://a"}, {"sender": "wdr2", "stream_url": "http://b", "segment_time": 300}]
+        multi = MultiStationRecorder(stations, base_dir=self.base_dir, segment_time=60)
+
+        mock_audio_transcriber.assert_called_once()
+        self.assertEqual(len(multi.recorders), 2)
+        self.assertIs(multi.recorders[0].transcriber, multi.recorders[1].transcriber)
+        self.assertEqual(multi.recorders[0].segment_time, 60)
+        self.assertEqual(multi.recorders[1].segment_time, 300)
+        self.assertIsNotNone(multi.pool)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,11 +36,15 @@ class TestRadioRecorder(unittest.TestCase):
         """Testet die Transkription einer Datei."""
         mock_transcribe_result = {"segments": [{"text": "Hallo Welt"}]}
 
-        with patch.object(self.recorder.transcriber.whisper_model, 'transcribe', return_value=mock_transcribe_result) as mock_whisper_model_transcribe:
+        decoded_audio = MagicMock()
+
+        with patch.object(self.recorder.transcriber.whisper_model, 'transcribe', return_value=mock_transcribe_result) as mock_whisper_model_transcribe, \
+                patch("whisper.load_audio", return_value=decoded_audio) as mock_load_audio:
             result = self.recorder.transcribe_audio("test.mp3")
 
             self.assertEqual(result, "Hallo Welt")
-            mock_whisper_model_transcribe.assert_called_once_with("test.mp3", task="transcribe", beam_size=5)
+            mock_load_audio.assert_called_once_with("test.mp3", sr=16000)
+            mock_whisper_model_transcribe.assert_called_once_with(decoded_audio, task="transcribe", beam_size=5)
 
     @patch("audio_miner.main.RadioRecorder.transcribe_audio")
     @patch("builtins.open", new_callable=mock_open)
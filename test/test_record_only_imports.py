@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+HEAVY_MODULES = ("torch", "torchaudio", "whisper", "pyannote")
+
+SCRIPT = """
+import sys
+from audio_miner.main import RadioRecorder
+from audio_miner.multi_station import MultiStationRecorder
+
+recorder = RadioRecorder("http://example.com", "ImportTest", base_dir=sys.argv[1], record_only=True, use_monitor=False)
+assert recorder.transcriber is None
+stations = MultiStationRecorder([{"sender": "ImportMulti", "stream_url": "http://example.com"}],
+                                base_dir=sys.argv[1], record_only=True)
+assert stations.transcriber is None
+print(",".join(name for name in MODULES if name in sys.modules))
+"""
+
+
+class TestRecordOnlyImports(unittest.TestCase):
+    def test_record_only_does_not_load_model_stack(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as base_dir:
+            result = subprocess.run([sys.executable, "-c", SCRIPT.replace("MODULES", repr(HEAVY_MODULES)), base_dir],
+                                    cwd=root, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_cli_import_does_not_load_model_stack(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        script = f"import sys, audio_miner.cli; print(','.join(n for n in {HEAVY_MODULES} if n in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,7 @@ from datetime import datetime
 import os
 
 from audio_miner.main import RadioRecorder
+from audio_miner.stage_cache import DEFAULT_MAX_BYTES
 
 class TestRadioRecorder(unittest.TestCase):
 
@@ -146,5 +147,28 @@ class TestRadioRecorder(unittest.TestCase):
             self.assertIsNone(result)
             self.assertTrue(mock_logger_error.called)
 
+    @patch('audio_miner.main.AudioTranscriber')
+    def test_transcription_worker_batches_waiting_segments(self, mock_audio_transcriber):
+        recorder = RadioRecorder(self.stream_url, self.sender, self.segment_time,
+                                 self.base_dir, use_monitor=False, batch_size=2)
+        mock_audio_transcriber.assert_called_once_with(whisper_model_size="turbo", token=None, batch_size=2, speech_gate=False,
+                                                       cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+                                                       fingerprint_db=None, structured=False, checkpoint_dir=None,
+                                                       fallback_model=None)
+        recorder.transcriber.transcribe_many.return_value = ["eins", "zwei"]
+        for name in ("a.mp3", "b.mp3", "c.mp3"):
+            recorder._queue_segment_for_transcription(name)
+
+        recorder.running = False
+        recorder.transcription_worker(run_once=True)
+
+        recorder.transcriber.transcribe_many.assert_called_once_with(["a.mp3", "b.mp3"])
+        self.assertEqual(recorder.queued_files, {"c.mp3"})
+        for name, text in (("a.txt", "eins"), ("b.txt", "zwei")):
+            path = os.path.join(recorder.transcription_dir, name)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), text)
+            os.remove(path)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+from audio_miner.main import RadioRecorder
+from audio_miner.resources import ResourceBudget, available_cpus
+from audio_miner.worker_pool import ForkedTranscriberPool
+
+
+def segment_name(hour):
+    return f"s_20240101_{hour:02d}0000_20240101_{hour + 1:02d}0000.mp3"
+
+
+def thread_state():
+    return sorted(os.sched_getaffinity(0)), os.getpriority(os.PRIO_PROCESS, 0)
+
+
+def in_thread(target):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(target()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class TestResourceBudget(unittest.TestCase):
+    def test_cores_are_split_between_recording_and_transcription(self):
+        budget = ResourceBudget(reserve_recording_cores=1, cpus=[0, 1, 2, 3])
+        self.assertEqual(budget.recording_cpus, [0])
+        self.assertEqual(budget.transcription_cpus, [1, 2, 3])
+        self.assertEqual(budget.torch_threads, 3)
+        self.assertEqual(ResourceBudget(1, cpus=[0, 1, 2, 3, 4], workers=2).torch_threads, 2)
+        self.assertEqual(ResourceBudget(1, cpus=[0, 1, 2, 3], workers=8).torch_threads, 1)
+        self.assertEqual(ResourceBudget(1, cpus=[0, 1, 2, 3], torch_threads=6).torch_threads, 6)
+
+    def test_invalid_budgets_are_rejected(self):
+        for kwargs in ({"reserve_recording_cores": 4}, {"reserve_recording_cores": -1}, {"transcription_nice": 20},
+                       {"transcription_nice": -5}):
+            with self.assertRaises(ValueError):
+                ResourceBudget(cpus=[0, 1, 2, 3], **kwargs)
+
+    def test_apply_lowers_priority_of_calling_thread_only(self):
+        before = thread_state()
+        budget = ResourceBudget(transcription_nice=5)
+        self.assertEqual(in_thread(lambda: (budget.apply(), budget.apply(), thread_state())[2])[1], before[1] + 5)
+        self.assertEqual(thread_state(), before)
+
+    @unittest.skipUnless(len(available_cpus()) >= 2, "Benötigt mindestens zwei Kerne.")
+    def test_apply_pins_calling_thread_to_transcription_cores(self):
+        before = thread_state()
+        budget = ResourceBudget(reserve_recording_cores=1)
+        self.assertEqual(in_thread(lambda: (budget.apply(), thread_state())[1])[0], budget.transcription_cpus)
+        self.assertEqual(thread_state(), before)
+
+
+class FakeTranscriber:
+    token = None
+    batch_size = 1
+
+    def __init__(self):
+        self.states = []
+
+    def transcribe_audio(self, audio_path):
+        self.states.append(thread_state())
+        return "Text"
+
+
+def _worker_state():
+    return thread_state()
+
+
+class TestTranscriptionBudget(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+
+    def test_forked_workers_apply_budget(self):
+        budget = ResourceBudget(transcription_nice=3, workers=2)
+        pool = ForkedTranscriberPool(FakeTranscriber(), workers=2, resources=budget)
+        self.addCleanup(pool.shutdown)
+        self.assertEqual(pool.torch_threads, budget.torch_threads)
+        priority = os.getpriority(os.PRIO_PROCESS, 0)
+        cpus, nice = pool.executor.submit(_worker_state).result()
+        self.assertEqual(nice, priority + 3)
+        self.assertEqual(cpus, budget.transcription_cpus)
+
+    def test_recorder_transcribes_within_budget_and_records_without(self):
+        transcriber = FakeTranscriber()
+        recorder = RadioRecorder(None, "s", base_dir=self.base_dir, use_monitor=False, transcribe_only=True,
+                                 transcriber=transcriber, poll_interval=0, transcription_nice=4)
+        self.addCleanup(recorder.segment_index.close)
+        self.addCleanup(recorder.backfill.close)
+        with open(os.path.join(recorder.audio_dir, segment_name(10)), "wb") as f:
+            f.write(b"m")
+        priority = os.getpriority(os.PRIO_PROCESS, 0)
+        recorder.check_and_queue_old_files(datetime.now())
+
+        thread = threading.Thread(target=recorder._transcription_thread)
+        thread.start()
+        thread.join(timeout=30)
+        self.assertEqual([nice for _, nice in transcriber.states], [priority + 4])
+        self.assertEqual(os.getpriority(os.PRIO_PROCESS, 0), priority)
+
+        recording = RadioRecorder("http://x", "r", base_dir=self.base_dir, use_monitor=False, record_only=True,
+                                  transcription_nice=4)
+        self.addCleanup(recording.segment_index.close)
+        self.assertIsNone(recording.resources)
+
+
+if __name__ == "__main__":
+    unittest.main()
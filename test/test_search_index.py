@@ -0,0 +1,131 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from audio_miner.main import RadioRecorder
+from audio_miner.search_index import SEARCH_DB, SearchIndex, parse_transcript_text, search_main
+from audio_miner.structured_output import FORMAT_JSONL, build_records, write_jsonl
+
+NAME_A = "a_20240101_100000_20240101_110000.mp3"
+NAME_B = "b_20240102_100000_20240102_110000.mp3"
+
+
+class TestParseTranscript(unittest.TestCase):
+    def test_diarized_and_plain_lines(self):
+        pieces = parse_transcript_text("[SPEAKER_00 | 1.50-3.00] Guten Morgen\n\nEinfacher Text\n")
+        self.assertEqual(pieces[0], {"speaker": "SPEAKER_00", "start": 1.5, "end": 3.0, "text": "Guten Morgen"})
+        self.assertEqual(pieces[1], {"speaker": None, "start": None, "end": None, "text": "Einfacher Text"})
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index = SearchIndex(os.path.join(self.tmp_dir, SEARCH_DB))
+        self.index.add("a", NAME_A, build_records("a", NAME_A, [
+            {"speaker": "SPEAKER_00", "start": 0.0, "end": 5.0, "text": "Die Nachrichten am Morgen"},
+            {"speaker": "SPEAKER_01", "start": 125.0, "end": 130.0, "text": "Das Wetter wird sonnig"},
+        ]))
+        self.index.add("b", NAME_B, build_records("b", NAME_B, [
+            {"speaker": "SPEAKER_00", "start": 60.0, "end": 62.0, "text": "Wetterbericht für Köln"},
+        ]))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_hit_carries_file_and_offset(self):
+        hit, = self.index.search("wetter")
+        self.assertEqual((hit["station"], hit["file"], hit["offset"]), ("a", NAME_A, 125.0))
+        self.assertEqual(hit["time"], "2024-01-01T10:02:05")
+        self.assertEqual(hit["snippet"], "Das [Wetter] wird sonnig")
+
+    def test_prefix_diacritics_and_punctuation(self):
+        self.assertEqual(len(self.index.search("wetter*")), 2)
+        self.assertEqual(len(self.index.search("koln")), 1)
+        self.assertEqual(self.index.search('"Köln" -'), self.index.search("köln"))
+        self.assertEqual(self.index.search("nachrichten wetter"), [])
+
+    def test_station_and_time_filters(self):
+        self.assertEqual([h["station"] for h in self.index.search("wetter*", stations=["b"])], ["b"])
+        hits = self.index.search("wetter*", start=datetime(2024, 1, 2), end=datetime(2024, 1, 3))
+        self.assertEqual([h["file"] for h in hits], [NAME_B])
+        self.assertEqual([h["file"] for h in self.index.search("wetter*")], [NAME_B, NAME_A])
+
+    def test_add_replaces_previous_pieces(self):
+        self.index.add("a", NAME_A, build_records("a", NAME_A, "Nur noch Musik"))
+        self.assertEqual(self.index.search("wetter"), [])
+        hit, = self.index.search("musik")
+        self.assertEqual((hit["offset"], hit["time"]), (0.0, "2024-01-01T10:00:00"))
+
+
+class TestUpdateFromFiles(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        for sender, name in (("a", NAME_A), ("b", NAME_B)):
+            os.makedirs(os.path.join(self.base_dir, sender, "transkriptionen"))
+        self.txt = os.path.join(self.base_dir, "a", "transkriptionen", NAME_A[:-4] + ".txt")
+        with open(self.txt, "w", encoding="utf-8") as f:
+            f.write("[SPEAKER_00 | 12.00-14.00] Verkehrsmeldung auf der A1")
+        write_jsonl(os.path.join(self.base_dir, "b", "transkriptionen", NAME_B[:-4] + ".jsonl"),
+                    build_records("b", NAME_B, [{"speaker": None, "start": 3.0, "end": 4.0, "text": "Verkehr frei"}]))
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    def run_search(self, *argv):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            search_main(["--base-dir", self.base_dir, *argv])
+        return out.getvalue()
+
+    def test_only_new_or_changed_transcripts_are_indexed(self):
+        index = SearchIndex(os.path.join(self.base_dir, SEARCH_DB))
+        self.addCleanup(index.close)
+        self.assertEqual(index.update_from_files(self.base_dir), 2)
+        self.assertEqual(index.update_from_files(self.base_dir), 0)
+        with open(self.txt, "w", encoding="utf-8") as f:
+            f.write("[SPEAKER_00 | 12.00-14.00] Stau auf der A1")
+        os.utime(self.txt, (time.time() + 10, time.time() + 10))
+        self.assertEqual(index.update_from_files(self.base_dir), 1)
+        self.assertEqual([h["offset"] for h in index.search("verkehr*")], [3.0])
+
+    def test_cli_prints_audio_file_and_offset(self):
+        self.assertIn("2 Transkripte", self.run_search("--update"))
+        hit = json.loads(self.run_search("verkehrsmeldung", "--json").splitlines()[0])
+        self.assertEqual(hit["audio_file"], os.path.join(self.base_dir, "a", "audio", NAME_A))
+        self.assertEqual(hit["offset"], 12.0)
+        self.assertIn(f"a {NAME_A} @ 0:00:12 SPEAKER_00", self.run_search("verkehr*", "--sender", "a"))
+
+
+class TestRecorderSearchIndex(unittest.TestCase):
+    def test_transcription_is_indexed_when_written(self):
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        transcriber = MagicMock()
+        transcriber.transcribe_audio.return_value = "Hallo Welt"
+        transcriber.pop_details.return_value = {"segments": [{"start": 7.0, "end": 9.0, "text": "Hallo Welt"}]}
+        recorder = RadioRecorder(None, "a", base_dir=base_dir, use_monitor=False, transcriber=transcriber,
+                                 output_formats=(FORMAT_JSONL,), search_index=True)
+        self.addCleanup(recorder.segment_index.close)
+        self.addCleanup(recorder.search_index.close)
+        audio_file = os.path.join(recorder.audio_dir, NAME_A)
+        with open(audio_file, "wb") as f:
+            f.write(b"audio")
+        recorder._queue_segment_for_transcription(audio_file)
+
+        recorder.transcription_worker(run_once=True)
+
+        hit, = recorder.search_index.search("welt")
+        self.assertEqual((hit["file"], hit["offset"]), (NAME_A, 7.0))
+        self.assertEqual(recorder.search_index.update_from_files(base_dir), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
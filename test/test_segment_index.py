@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from audio_miner.segment_index import SegmentIndex, parse_segment_filename
+from audio_miner.main import RadioRecorder
+
+
+class TestParseSegmentFilename(unittest.TestCase):
+    def test_final_name(self):
+        self.assertEqual(parse_segment_filename("/x/swr3_20240101_100000_20240101_110000.mp3"),
+                         ("swr3", datetime(2024, 1, 1, 10), datetime(2024, 1, 1, 11)))
+
+    def test_temp_name_and_sender_with_underscore(self):
+        self.assertEqual(parse_segment_filename("wdr_2_20240101_100000.mp3"),
+                         ("wdr_2", datetime(2024, 1, 1, 10), None))
+
+    def test_foreign_name(self):
+        self.assertIsNone(parse_segment_filename("old_file.mp3"))
+
+
+class TestSegmentIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.audio_dir = os.path.join(self.tmp_dir, "audio")
+        self.transcription_dir = os.path.join(self.tmp_dir, "transkriptionen")
+        os.makedirs(self.audio_dir)
+        os.makedirs(self.transcription_dir)
+        self.index = SegmentIndex(os.path.join(self.tmp_dir, "segments.db"), self.audio_dir, self.transcription_dir)
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def make_segment(self, name, content=b"audio", transcribed=False):
+        path = os.path.join(self.audio_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        if transcribed:
+            with open(os.path.join(self.transcription_dir, name.replace(".mp3", ".txt")), "w") as f:
+                f.write("text")
+        return path
+
+    def test_rebuild_from_disk(self):
+        first = self.make_segment("s_20240101_100000_20240101_110000.mp3")
+        self.make_segment("s_20240101_110000_20240101_120000.mp3", transcribed=True)
+        empty = self.make_segment("s_20240101_120000_20240101_130000.mp3", content=b"")
+
+        self.assertFalse(self.index.is_built())
+        self.index.ensure_built()
+
+        self.assertTrue(self.index.is_built())
+        self.assertEqual(self.index.pending(), [(first, datetime(2024, 1, 1, 10))])
+        self.assertFalse(os.path.exists(empty))
+
+    def test_incremental_updates_and_range_queries(self):
+        self.index.ensure_built()
+        paths = [self.make_segment(f"s_20240101_{h:02d}0000_20240101_{h + 1:02d}0000.mp3") for h in (8, 9, 10)]
+        for path in paths:
+            self.assertTrue(self.index.add_segment(path))
+        self.index.mark_transcribed(paths[0])
+
+        pending = [p for p, _ in self.index.pending(start=datetime(2024, 1, 1, 8), end=datetime(2024, 1, 1, 10))]
+        self.assertEqual(pending, [paths[1]])
+        self.assertEqual([p for p, _ in self.index.pending()], paths[1:])
+
+    def test_speech_gate_details(self):
+        self.index.ensure_built()
+        path = self.make_segment("s_20240101_100000_20240101_110000.mp3")
+        self.index.add_segment(path)
+        self.index.mark_transcribed(path, {"speech_seconds": 600.0, "skipped_seconds": 3000.0})
+
+        self.assertEqual(self.index.skipped_summary(),
+                         {"segments": 1, "speech_seconds": 600.0, "skipped_seconds": 3000.0})
+
+    def test_segment_in_progress_is_not_pending(self):
+        temp = self.make_segment("s_20240101_110000.mp3")
+        self.index.ensure_built()
+        self.assertEqual(self.index.pending(), [])
+
+        final = os.path.join(self.audio_dir, "s_20240101_110000_20240101_120000.mp3")
+        os.rename(temp, final)
+        self.index.add_segment(final)
+        self.assertEqual(self.index.pending(), [(final, datetime(2024, 1, 1, 11))])
+        rows = self.index._connection().execute("SELECT name FROM segments").fetchall()
+        self.assertEqual(rows, [("s_20240101_110000_20240101_120000.mp3",)])
+
+    def test_leftover_of_aborted_recording_is_pending(self):
+        leftover = self.make_segment("s_20240101_100000.mp3")
+        os.utime(leftover, (time.time() - 4000,) * 2)
+        recording = self.make_segment("s_20240101_110000.mp3")
+        self.index.ensure_built()
+        self.assertEqual(self.index.pending(include_deferred=True), [(leftover, datetime(2024, 1, 1, 10))])
+
+        # Bricht die laufende Aufnahme später ab, wird auch sie nach recording_timeout transkribiert.
+        os.utime(recording, (time.time() - 4000,) * 2)
+        self.assertEqual(self.index.pending(), [(leftover, datetime(2024, 1, 1, 10)),
+                                                (recording, datetime(2024, 1, 1, 11))])
+
+    def test_empty_segment_is_not_indexed(self):
+        path = self.make_segment("s_20240101_100000_20240101_110000.mp3", content=b"")
+        self.assertFalse(self.index.add_segment(path))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.index.pending(), [])
+
+
+class TestQueueFromIndex(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    @patch('audio_miner.main.AudioTranscriber')
+    def test_transcribe_only_range_without_directory_scan(self, mock_audio_transcriber):
+        recorder = RadioRecorder(None, "s", base_dir=self.base_dir, transcribe_only=True,
+                                 start_time_str="20240101_090000", end_time_str="20240101_110000", use_monitor=False)
+        for h in (8, 9, 10, 11):
+            with open(os.path.join(recorder.audio_dir, f"s_20240101_{h:02d}0000_20240101_{h + 1:02d}0000.mp3"), "wb") as f:
+                f.write(b"audio")
+
+        recorder.check_and_queue_old_files(datetime.now())
+        self.assertEqual(sorted(os.path.basename(f) for f in recorder.queued_files),
+                         ["s_20240101_090000_20240101_100000.mp3", "s_20240101_100000_20240101_110000.mp3"])
+
+        with patch('audio_miner.main.os.listdir') as mock_listdir, \
+                patch('audio_miner.segment_index.os.listdir') as mock_index_listdir:
+            recorder.check_and_queue_old_files(datetime.now())
+            mock_listdir.assert_not_called()
+            mock_index_listdir.assert_not_called()
+        self.assertEqual(recorder.segment_queue.qsize(), 2)
+        recorder.segment_index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
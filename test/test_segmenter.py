@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+from audio_miner.segmenter import ContinuousSegmenter
+from audio_miner.main import RadioRecorder
+
+
+class TestContinuousSegmenter(unittest.TestCase):
+    def setUp(self):
+        self.audio_dir = tempfile.mkdtemp()
+        self.segmenter = ContinuousSegmenter(self.audio_dir, "swr3", 300)
+
+    def tearDown(self):
+        shutil.rmtree(self.audio_dir)
+
+    def touch(self, name):
+        path = os.path.join(self.audio_dir, name)
+        with open(path, "wb") as f:
+            f.write(b"\xff\xfb")
+        return path
+
+    def test_build_command_uses_segment_muxer(self):
+        command = self.segmenter.build_command("ffmpeg", "http://stream", quality="64k")
+        self.assertIn("segment", command)
+        self.assertEqual(command[command.index("-segment_time") + 1], "300")
+        self.assertEqual(command[command.index("-segment_list") + 1], "pipe:1")
+        self.assertEqual(command[command.index("-b:a") + 1], "64k")
+        self.assertTrue(command[-1].endswith("swr3_%Y%m%d_%H%M%S.mp3"))
+
+    def test_handle_line_renames_segment(self):
+        self.touch("swr3_20240101_100000.mp3")
+        final_file = self.segmenter.handle_line("swr3_20240101_100000.mp3,0.000000,300.000000\n",
+                                                now=datetime(2024, 1, 1, 10, 5, 0))
+
+        self.assertEqual(final_file, os.path.join(self.audio_dir, "swr3_20240101_100000_20240101_100500.mp3"))
+        self.assertTrue(os.path.exists(final_file))
+        self.assertEqual(self.segmenter.gaps, [])
+
+    def test_gap_between_segments_is_reported(self):
+        self.touch("swr3_20240101_100000.mp3")
+        self.touch("swr3_20240101_100530.mp3")
+        self.segmenter.handle_line("swr3_20240101_100000.mp3,0.0,300.0", now=datetime(2024, 1, 1, 10, 5, 0))
+        self.segmenter.handle_line("swr3_20240101_100530.mp3,0.0,300.0", now=datetime(2024, 1, 1, 10, 10, 30))
+
+        self.assertEqual(self.segmenter.gaps, [(datetime(2024, 1, 1, 10, 5, 0), datetime(2024, 1, 1, 10, 5, 30))])
+
+    def test_missing_audio_inside_segment_is_reported(self):
+        self.touch("swr3_20240101_100000.mp3")
+        self.segmenter.handle_line("swr3_20240101_100000.mp3,0.0,240.0", now=datetime(2024, 1, 1, 10, 5, 0))
+
+        self.assertEqual(len(self.segmenter.gaps), 1)
+        gap_start, gap_end = self.segmenter.gaps[0]
+        self.assertEqual((gap_end - gap_start).total_seconds(), 60)
+
+    def test_progress_lines_are_collected(self):
+        command = self.segmenter.build_command("ffmpeg", "http://stream", progress=True)
+        self.assertEqual(command[command.index("-progress") + 1], "pipe:1")
+
+        self.assertIsNone(self.segmenter.handle_line("total_size=48000\n"))
+        self.assertIsNone(self.segmenter.handle_line("progress=continue"))
+        self.assertEqual(self.segmenter.progress, {"total_size": "48000", "progress": "continue"})
+
+    def test_finalize_leftovers(self):
+        path = self.touch("swr3_20240101_100000.mp3")
+        self.touch("other_20240101_100000.mp3")
+        os.utime(path, (datetime(2024, 1, 1, 10, 2, 0).timestamp(),) * 2)
+
+        finished = self.segmenter.finalize_leftovers()
+
+        self.assertEqual(finished, [os.path.join(self.audio_dir, "swr3_20240101_100000_20240101_100200.mp3")])
+        self.assertTrue(os.path.exists(os.path.join(self.audio_dir, "other_20240101_100000.mp3")))
+
+
+class TestRecordContinuous(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    @patch('audio_miner.main.subprocess.Popen')
+    @patch('audio_miner.main.AudioTranscriber')
+    def test_segments_are_queued_while_ffmpeg_keeps_running(self, mock_audio_transcriber, mock_popen):
+        recorder = RadioRecorder("http://test", "swr3", segment_time=300, base_dir=self.base_dir,
+                                 use_monitor=False, continuous=True)
+        with open(os.path.join(recorder.audio_dir, "swr3_20240101_100000.mp3"), "wb") as f:
+            f.write(b"\xff\xfb")
+
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b"swr3_20240101_100000.mp3,0.0,300.0\n")
+        os.close(write_fd)
+        process = MagicMock()
+        process.stdout = os.fdopen(read_fd, "rb")
+        mock_popen.return_value = process
+
+        with patch.object(recorder, "check_and_queue_old_files"):
+            recorder._record_continuous()
+
+        mock_popen.assert_called_once()
+        self.assertEqual(recorder.segment_queue.qsize(), 1)
+        queued = recorder.segment_queue.get_nowait()
+        self.assertTrue(os.path.basename(queued).startswith("swr3_20240101_100000_"))
+        self.assertTrue(os.path.exists(queued))
+
+    @patch('audio_miner.main.AudioTranscriber')
+    def test_segment_in_progress_is_not_queued(self, mock_audio_transcriber):
+        recorder = RadioRecorder("http://test", "swr3", segment_time=300, base_dir=self.base_dir,
+                                 use_monitor=False, continuous=True)
+        finished = os.path.join(recorder.audio_dir, "swr3_20240101_100000_20240101_100500.mp3")
+        for path in (finished, os.path.join(recorder.audio_dir, "swr3_20240101_100500.mp3")):
+            with open(path, "wb") as f:
+                f.write(b"\xff\xfb")
+
+        recorder._on_segment_finished(finished)
+
+        self.assertEqual(list(recorder.segment_queue.queue), [finished])
+        recorder.segment_index.close()
+
+    @patch('audio_miner.main.AudioTranscriber')
+    def test_leftover_of_crashed_legacy_recording_is_queued(self, mock_audio_transcriber):
+        recorder = RadioRecorder("http://test", "swr3", segment_time=300, base_dir=self.base_dir, use_monitor=False)
+        self.addCleanup(recorder.segment_index.close)
+        leftover = os.path.join(recorder.audio_dir, "swr3_20240101_100000.mp3")
+        with open(leftover, "wb") as f:
+            f.write(b"\xff\xfb")
+        os.utime(leftover, (time.time() - recorder._get_timeout() - 1,) * 2)
+
+        recorder.check_and_queue_old_files(datetime.now())
+
+        self.assertEqual(list(recorder.segment_queue.queue), [leftover])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+
+from audio_miner.audio_transcriber import AudioTranscriber
+from audio_miner.speech_gate import SpeechGate, concatenate_regions, map_to_original
+
+SR = 16000
+
+
+def music(seconds, seed=0):
+    t = np.arange(int(seconds * SR)) / SR
+    noise = np.random.default_rng(seed).standard_normal(len(t))
+    return (0.3 * (np.sin(2 * np.pi * 220 * t) + 0.5 * np.sin(2 * np.pi * 330 * t)) + 0.02 * noise).astype(np.float32)
+
+
+def speech(seconds, seed=1):
+    # Silben mit 4 Hz: stimmhafte und stimmlose Abschnitte, dazwischen Pausen.
+    t = np.arange(int(seconds * SR)) / SR
+    noise = np.random.default_rng(seed).standard_normal(len(t))
+    syllable = np.sin(2 * np.pi * 4 * t)
+    voiced = 0.4 * np.sin(2 * np.pi * 150 * t) * (syllable > 0)
+    unvoiced = 0.1 * noise * (syllable <= 0)
+    return ((voiced + unvoiced) * (np.sin(2 * np.pi * 2 * t) > 0.2)).astype(np.float32)
+
+
+class TestSpeechGate(unittest.TestCase):
+    def test_music_speech_silence(self):
+        audio = np.concatenate([music(10), speech(10), np.zeros(5 * SR, dtype=np.float32), music(10)])
+        regions = SpeechGate().speech_regions(audio)
+
+        self.assertEqual(len(regions), 1)
+        start, end = regions[0]
+        self.assertLessEqual(start, 10.0)
+        self.assertGreaterEqual(end, 20.0)
+        self.assertLess(end - start, 12.0)
+
+    def test_music_only(self):
+        self.assertEqual(SpeechGate().speech_regions(music(30)), [])
+
+    def test_map_back_splits_at_region_boundary(self):
+        audio = np.arange(20 * SR, dtype=np.float32)
+        speech_audio, offsets = concatenate_regions(audio, [(2.0, 5.0), (10.0, 12.0)])
+
+        self.assertEqual(len(speech_audio), 5 * SR)
+        self.assertEqual(speech_audio[3 * SR], audio[10 * SR])
+        self.assertEqual(map_to_original(offsets, 1.0, 4.0), [(3.0, 5.0), (10.0, 11.0)])
+
+
+class TestGatedTranscription(unittest.TestCase):
+    def setUp(self):
+        patchers = {
+            "pipeline": patch('pyannote.audio.Pipeline.from_pretrained'),
+            "load_model": patch('whisper.load_model'),
+            "load_audio": patch('whisper.load_audio'),
+            "cuda": patch('torch.cuda.is_available', return_value=False),
+        }
+        self.mocks = {name: p.start() for name, p in patchers.items()}
+        for p in patchers.values():
+            self.addCleanup(p.stop)
+
+        self.whisper_model = MagicMock()
+        self.whisper_model.transcribe.return_value = {"text": " Hallo ", "segments": [{"text": " Hallo "}]}
+        self.mocks["load_model"].return_value = self.whisper_model
+        self.pipeline = MagicMock()
+        self.mocks["pipeline"].return_value = self.pipeline
+        self.mocks["load_audio"].return_value = np.concatenate([music(20), speech(10), music(20)])
+
+    def test_only_speech_reaches_whisper(self):
+        transcriber = AudioTranscriber(token=None, speech_gate=True)
+
+        self.assertEqual(transcriber.transcribe_audio("a.mp3"), "Hallo")
+
+        self.whisper_model.transcribe.assert_called_once()
+        self.assertLess(len(self.whisper_model.transcribe.call_args[0][0]), 13 * SR)
+        details = transcriber.pop_details("a.mp3")
+        self.assertGreater(details["skipped_seconds"], 35)
+        self.assertAlmostEqual(details["speech_seconds"] + details["skipped_seconds"], 50.0)
+        self.assertIsNone(transcriber.pop_details("a.mp3"))
+
+    def test_diarization_times_refer_to_original(self):
+        turn = MagicMock()
+        turn.start, turn.end = 1.0, 3.0
+        diarization = MagicMock()
+        diarization.itertracks.return_value = [(turn, None, "SPEAKER_00")]
+        self.pipeline.return_value = diarization
+        transcriber = AudioTranscriber(token="token", speech_gate=True)
+
+        results = transcriber.transcribe_audio("a.mp3")
+
+        waveform = self.pipeline.call_args[0][0]["waveform"]
+        self.assertLess(waveform.shape[-1], 13 * SR)
+        start, end = transcriber.speech_gate.speech_regions(self.mocks["load_audio"].return_value)[0]
+        self.assertEqual(len(results), 1)
+        self.assertAlmostEqual(results[0]["start"], start + 1.0)
+        self.assertAlmostEqual(results[0]["end"], start + 3.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+
+from audio_miner.audio_transcriber import AudioTranscriber
+from audio_miner.cli import main
+from audio_miner.stage_cache import StageCache, stage_key, STAGE_DECODED, STAGE_DIARIZATION, STAGE_WHISPER
+
+
+class TestStageCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_decoded_audio_roundtrip_is_lossless(self):
+        cache = StageCache(self.cache_dir)
+        audio = np.array([-32768, -1, 0, 1, 32767], dtype=np.int16).astype(np.float32) / 32768.0
+        cache.put(STAGE_DECODED, "a" * 64, audio)
+
+        np.testing.assert_array_equal(cache.get(STAGE_DECODED, "a" * 64), audio)
+        self.assertIsNone(cache.get(STAGE_DECODED, "b" * 64))
+
+    def test_key_depends_on_params(self):
+        self.assertEqual(stage_key("h", STAGE_WHISPER, {"model": "small", "beam": 5}),
+                         stage_key("h", STAGE_WHISPER, {"beam": 5, "model": "small"}))
+        self.assertNotEqual(stage_key("h", STAGE_WHISPER, {"model": "small"}),
+                            stage_key("h", STAGE_WHISPER, {"model": "turbo"}))
+
+    def test_lru_eviction(self):
+        cache = StageCache(self.cache_dir, max_bytes=250)
+        with patch("audio_miner.stage_cache.time.time", side_effect=[1, 2, 3, 4, 5]):
+            cache.put(STAGE_WHISPER, "1" * 64, "x" * 100)
+            cache.put(STAGE_WHISPER, "2" * 64, "x" * 100)
+            cache.get(STAGE_WHISPER, "1" * 64)
+            cache.put(STAGE_WHISPER, "3" * 64, "x" * 100)
+
+        self.assertIsNotNone(cache.get(STAGE_WHISPER, "1" * 64))
+        self.assertIsNone(cache.get(STAGE_WHISPER, "2" * 64))
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_purge_and_cli(self):
+        cache = StageCache(self.cache_dir)
+        cache.put(STAGE_WHISPER, "1" * 64, "text")
+        cache.put(STAGE_DIARIZATION, "2" * 64, [[0.0, 1.0, "A"]])
+        cache.close()
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main(["cache", "stats", "--cache-dir", self.cache_dir])
+            main(["cache", "purge", "--cache-dir", self.cache_dir, "--stage", "whisper"])
+        self.assertIn("gesamt", output.getvalue())
+        self.assertIn("1 Einträge gelöscht.", output.getvalue())
+        self.assertEqual(StageCache(self.cache_dir).stats()["stages"], {STAGE_DIARIZATION: {"entries": 1, "bytes": 17}})
+
+
+class TestCachedTranscription(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.cache_dir = os.path.join(self.tmp_dir, "cache")
+        self.audio_path = os.path.join(self.tmp_dir, "s_20240101_100000_20240101_110000.mp3")
+        with open(self.audio_path, "wb") as f:
+            f.write(b"mp3-inhalt")
+
+        patchers = {
+            "pipeline": patch('pyannote.audio.Pipeline.from_pretrained'),
+            "load_model": patch('whisper.load_model'),
+            "load_audio": patch('whisper.load_audio', return_value=np.zeros(4 * 16000, dtype=np.float32)),
+            "cuda": patch('torch.cuda.is_available', return_value=False),
+        }
+        self.mocks = {name: p.start() for name, p in patchers.items()}
+        for p in patchers.values():
+            self.addCleanup(p.stop)
+
+        self.whisper_model = MagicMock()
+        self.whisper_model.transcribe.return_value = {"text": " Hallo "}
+        self.mocks["load_model"].return_value = self.whisper_model
+        self.pipeline = MagicMock()
+        turn = MagicMock()
+        turn.start, turn.end = 0.5, 2.5
+        self.pipeline.return_value.itertracks.return_value = [(turn, None, "SPEAKER_00")]
+        self.mocks["pipeline"].return_value = self.pipeline
+
+    def test_repeat_run_and_model_switch(self):
+        first = AudioTranscriber("small", token="token", cache_dir=self.cache_dir).transcribe_audio(self.audio_path)
+        self.assertEqual(first, [{"speaker": "SPEAKER_00", "start": 0.5, "end": 2.5, "text": "Hallo"}])
+
+        self.mocks["load_audio"].reset_mock()
+        self.pipeline.reset_mock()
+        self.whisper_model.transcribe.reset_mock()
+        again = AudioTranscriber("small", token="token", cache_dir=self.cache_dir).transcribe_audio(self.audio_path)
+        self.assertEqual(again, first)
+        self.mocks["load_audio"].assert_not_called()
+        self.pipeline.assert_not_called()
+        self.whisper_model.transcribe.assert_not_called()
+
+        self.whisper_model.transcribe.return_value = {"text": " Hallo Welt "}
+        other = AudioTranscriber("turbo", token="token", cache_dir=self.cache_dir).transcribe_audio(self.audio_path)
+        self.assertEqual(other[0]["text"], "Hallo Welt")
+        self.mocks["load_audio"].assert_not_called()
+        self.pipeline.assert_not_called()
+        self.whisper_model.transcribe.assert_called_once()
+
+    def test_errors_are_not_cached(self):
+        self.whisper_model.transcribe.side_effect = Exception("kaputt")
+        transcriber = AudioTranscriber("small", token="token", cache_dir=self.cache_dir)
+        self.assertEqual(transcriber.transcribe_audio(self.audio_path)[0]["text"], "[Transkriptionsfehler]")
+
+        self.whisper_model.transcribe.side_effect = None
+        self.assertEqual(transcriber.transcribe_audio(self.audio_path)[0]["text"], "Hallo")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from audio_miner.stall_watchdog import StallWatchdog
+
+
+class TestStallWatchdog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def start_watchdog(self, **kwargs):
+        watchdog = StallWatchdog(poll_interval=0.05, **kwargs)
+        watchdog.start()
+        self.addCleanup(watchdog.join)
+        self.addCleanup(watchdog.stop)
+        return watchdog
+
+    def check_growing_file(self, watchdog):
+        path = os.path.join(self.tmp_dir, "s_20240101_100000.mp3")
+        stalled = threading.Event()
+        handle = watchdog.watch_file(path, stalled.set, stall_timeout=0.5)
+
+        with open(path, "wb") as f:
+            for _ in range(8):
+                f.write(b"\xff" * 100)
+                f.flush()
+                time.sleep(0.1)
+            self.assertFalse(stalled.is_set())
+            self.assertTrue(stalled.wait(2))
+
+        watchdog.unwatch(handle)
+        self.assertEqual(watchdog.active_watches(), 0)
+
+    def test_stall_detected_with_inotify(self):
+        watchdog = self.start_watchdog()
+        if watchdog.inotify is None:
+            self.skipTest("inotify nicht verfügbar")
+        self.check_growing_file(watchdog)
+
+    def test_stall_detected_with_polling(self):
+        self.check_growing_file(self.start_watchdog(use_inotify=False))
+
+    def test_one_thread_for_many_files(self):
+        watchdog = self.start_watchdog()
+        threads_before = threading.active_count()
+        handles = [watchdog.watch_file(os.path.join(self.tmp_dir, f"{i}.mp3"), lambda: None, 60) for i in range(50)]
+        self.assertEqual(threading.active_count(), threads_before)
+        for handle in handles:
+            watchdog.unwatch(handle)
+
+    def test_pipe_lines_and_stall(self):
+        watchdog = self.start_watchdog()
+        read_fd, write_fd = os.pipe()
+        lines = []
+        stalled = threading.Event()
+        eof = threading.Event()
+        watchdog.watch_pipe(read_fd, stalled.set, 0.5, on_line=lines.append, on_eof=eof.set)
+
+        os.write(write_fd, b"out_time_us=1000000\nprogress=cont")
+        os.write(write_fd, b"inue\ns_20240101_100000.mp3,0.0,60.0\n")
+        self.assertTrue(stalled.wait(2))
+        os.close(write_fd)
+        self.assertTrue(eof.wait(2))
+        os.close(read_fd)
+
+        self.assertEqual(lines, ["out_time_us=1000000", "progress=continue", "s_20240101_100000.mp3,0.0,60.0"])
+        self.assertEqual(watchdog.active_watches(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+
+from audio_miner.main import RadioRecorder
+from audio_miner.streaming import LocalAgreement, StreamingSession, Word, SAMPLE_RATE
+
+
+def words(*items):
+    return [Word(start, start + 0.5, text) for start, text in items]
+
+
+class SecondCounter:
+    """Fake-Transcriber: jede Sekunde Audio enthält ihre Nummer als Samplewert und ergibt ein Wort."""
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe_words(self, audio, initial_prompt=None):
+        self.calls += 1
+        values = np.round(audio * 32768 / 100).astype(int)
+        bounds = [0] + list(np.flatnonzero(np.diff(values)) + 1) + [len(values)]
+        return [(start / SAMPLE_RATE, end / SAMPLE_RATE, f" w{values[start]}") for start, end in zip(bounds, bounds[1:])]
+
+
+class TestLocalAgreement(unittest.TestCase):
+    def test_commits_common_prefix_of_two_hypotheses(self):
+        agreement = LocalAgreement()
+        self.assertEqual(agreement.insert(words((0, " Guten"), (1, " Mor"))), [])
+        commit = agreement.insert(words((0, " guten"), (1, " Morgen"), (2, " zusammen")))
+        self.assertEqual([w.text for w in commit], [" guten"])
+        self.assertEqual(agreement.committed_until, 0.5)
+
+        commit = agreement.insert(words((0, " Guten"), (1, " Morgen"), (2, " zusammen.")))
+        self.assertEqual([w.text for w in commit], [" Morgen", " zusammen."])
+        self.assertEqual([w.text for w in agreement.flush()], [])
+
+    def test_flush_commits_pending_hypothesis(self):
+        agreement = LocalAgreement()
+        agreement.insert(words((0, " Hallo"), (1, " Welt")))
+        self.assertEqual([w.text for w in agreement.flush()], [" Hallo", " Welt"])
+        self.assertEqual(agreement.committed_until, 1.5)
+
+
+class TestStreamingSession(unittest.TestCase):
+    def test_stream_is_committed_in_order(self):
+        read_fd, write_fd = os.pipe()
+        committed = []
+        transcriber = SecondCounter()
+        session = StreamingSession(transcriber, read_fd, lambda ws, latency: committed.extend(ws),
+                                   step_seconds=1.0, max_window=4.0, trim_seconds=2.0)
+        session.start()
+
+        writer = os.fdopen(write_fd, "wb")
+        for second in range(8):
+            writer.write(np.full(SAMPLE_RATE, second * 100, dtype="<i2").tobytes())
+            writer.flush()
+        writer.close()
+        session.join(timeout=10)
+
+        self.assertEqual([w.text for w in committed], [f" w{i}" for i in range(8)])
+        self.assertEqual([w.start for w in committed], list(range(8)))
+        self.assertGreater(transcriber.calls, 1)
+        self.assertIn("mean", session.latency_stats())
+
+
+class TestRecorderStreaming(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    @patch('audio_miner.main.AudioTranscriber')
+    def test_segment_transcript_written_from_live_text(self, mock_audio_transcriber):
+        recorder = RadioRecorder("http://test", "swr3", segment_time=10, base_dir=self.base_dir,
+                                 use_monitor=False, streaming=True)
+        self.assertTrue(recorder.continuous)
+        audio_file = os.path.join(recorder.audio_dir, "swr3_20240101_100000_20240101_100010.mp3")
+        with open(audio_file, "wb") as f:
+            f.write(b"\xff\xfb")
+        recorder.segmenter.spans[audio_file] = (0.0, 10.0)
+        recorder.streaming_session = MagicMock(committed_until=0.0)
+
+        with patch.object(recorder, "check_and_queue_old_files"):
+            recorder._on_segment_finished(audio_file)
+        self.assertIn(audio_file, recorder.queued_files)
+        self.assertEqual(recorder.segment_queue.qsize(), 0)
+
+        recorder.streaming_session.committed_until = 11.0
+        recorder._on_stream_commit([Word(1, 2, " Hallo"), Word(9, 10, " Welt"), Word(10.5, 11, " danach")], 1.5)
+
+        with open(os.path.join(recorder.transcription_dir, "swr3_20240101_100000_20240101_100010.txt"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "Hallo Welt")
+        with open(os.path.join(recorder.transcription_dir, "live.txt"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "Hallo Welt danach\n")
+        self.assertNotIn(audio_file, recorder.queued_files)
+        self.assertEqual(recorder.segment_index.pending(), [])
+        recorder.segment_index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+
+from audio_miner.audio_transcriber import AudioTranscriber, turn_fields
+from audio_miner.fingerprint import _shift
+from audio_miner.main import RadioRecorder
+from audio_miner.segment_index import transcript_exists
+from audio_miner.structured_output import FORMAT_JSONL, FORMAT_PARQUET, build_records, read_jsonl, write_structured
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+NAME = "s_20240101_100000_20240101_100020.mp3"
+
+WHISPER_RESULT = {"text": " Hallo Welt. Tschüss ", "segments": [
+    {"start": 0.0, "end": 2.0, "text": " Hallo Welt.", "avg_logprob": -0.2, "no_speech_prob": 0.1,
+     "words": [{"word": " Hallo", "start": 0.0, "end": 0.8, "probability": 0.9},
+               {"word": " Welt.", "start": 0.9, "end": 2.0, "probability": 0.8}]},
+    {"start": 2.0, "end": 6.0, "text": " Tschüss", "avg_logprob": -0.5, "no_speech_prob": 0.4,
+     "words": [{"word": " Tschüss", "start": 2.5, "end": 3.0, "probability": 0.7}]},
+]}
+
+
+class TestRecords(unittest.TestCase):
+    def test_turn_fields_weight_by_duration_and_shift_words(self):
+        fields = turn_fields(WHISPER_RESULT["segments"], 10.0)
+        self.assertAlmostEqual(fields["avg_logprob"], (-0.2 * 2 - 0.5 * 4) / 6)
+        self.assertAlmostEqual(fields["no_speech_prob"], (0.1 * 2 + 0.4 * 4) / 6)
+        self.assertEqual([(w["word"], w["start"]) for w in fields["words"]],
+                         [("Hallo", 10.0), ("Welt.", 10.9), ("Tschüss", 12.5)])
+        self.assertEqual(turn_fields([{"start": 0.0, "end": 1.0, "text": "x"}], 0.0),
+                         {"avg_logprob": None, "no_speech_prob": None, "words": []})
+
+    def test_records_carry_wall_clock_times(self):
+        segments = [{"speaker": "SPEAKER_00", "start": 61.5, "end": 63.25, "text": "Hallo",
+                     "avg_logprob": -0.3, "no_speech_prob": 0.05,
+                     "words": [{"word": "Hallo", "start": 61.5, "end": 62.0, "probability": 0.9}]}]
+        record, = build_records("s", "/x/" + NAME, "ignoriert", {"segments": segments})
+        self.assertEqual(record["station"], "s")
+        self.assertEqual(record["segment_start"], "2024-01-01T10:00:00")
+        self.assertEqual(record["abs_start"], "2024-01-01T10:01:01.500")
+        self.assertEqual(record["abs_end"], "2024-01-01T10:01:03.250")
+        self.assertEqual(record["speaker"], "SPEAKER_00")
+        self.assertEqual(record["avg_logprob"], -0.3)
+        self.assertEqual(record["words"][0]["word"], "Hallo")
+
+    def test_records_without_segment_details(self):
+        record, = build_records("s", NAME, "Ganzer Text")
+        self.assertEqual((record["start"], record["end"], record["text"]), (0.0, 20.0, "Ganzer Text"))
+        self.assertIsNone(record["avg_logprob"])
+        records = build_records("s", NAME, [{"speaker": "A", "start": 0.0, "end": 1.0, "text": "a"},
+                                            {"speaker": "B", "start": 1.0, "end": 2.0, "text": "b"}])
+        self.assertEqual([(r["index"], r["speaker"], r["words"]) for r in records], [(0, "A", []), (1, "B", [])])
+        self.assertEqual(build_records("s", NAME, ""), [])
+
+    def test_fingerprint_reuse_shifts_words(self):
+        piece = {"start": 1.0, "end": 2.0, "text": "x", "words": [{"word": "x", "start": 1.2, "end": 1.8}]}
+        shifted = _shift(piece, 100.0)
+        self.assertEqual((shifted["start"], shifted["words"][0]["start"]), (101.0, 101.2))
+        self.assertEqual(piece["words"][0]["start"], 1.2)
+
+
+class TestStructuredTranscription(unittest.TestCase):
+    def setUp(self):
+        patchers = {
+            "load_model": patch('whisper.load_model'),
+            "load_audio": patch('whisper.load_audio', return_value=np.zeros(20 * 16000, dtype=np.float32)),
+            "cuda": patch('torch.cuda.is_available', return_value=False),
+        }
+        self.mocks = {name: p.start() for name, p in patchers.items()}
+        for p in patchers.values():
+            self.addCleanup(p.stop)
+        self.whisper_model = MagicMock()
+        self.whisper_model.transcribe.return_value = WHISPER_RESULT
+        self.mocks["load_model"].return_value = self.whisper_model
+
+    def test_basic_path_keeps_text_and_adds_segments(self):
+        transcriber = AudioTranscriber(structured=True)
+        self.assertEqual(transcriber.transcribe_audio(NAME), "Hallo Welt.\nTschüss")
+        self.assertTrue(self.whisper_model.transcribe.call_args.kwargs["word_timestamps"])
+        segments = transcriber.pop_details(NAME)["segments"]
+        self.assertEqual([s["text"] for s in segments], ["Hallo Welt.", "Tschüss"])
+        self.assertEqual(segments[1]["avg_logprob"], -0.5)
+        self.assertEqual([w["word"] for w in segments[0]["words"]], ["Hallo", "Welt."])
+
+    def test_plain_transcriber_is_unchanged(self):
+        transcriber = AudioTranscriber()
+        transcriber.transcribe_audio(NAME)
+        self.assertNotIn("word_timestamps", self.whisper_model.transcribe.call_args.kwargs)
+        segments = transcriber.pop_details(NAME)["segments"]
+        self.assertEqual(segments[0], {"start": 0.0, "end": 2.0, "text": "Hallo Welt."})
+
+    def test_recorder_writes_jsonl_instead_of_txt(self):
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        recorder = RadioRecorder(None, "s", base_dir=base_dir, use_monitor=False, output_formats=(FORMAT_JSONL,))
+        self.addCleanup(recorder.segment_index.close)
+        audio_file = os.path.join(recorder.audio_dir, NAME)
+        with open(audio_file, "wb") as f:
+            f.write(b"audio")
+        recorder._queue_segment_for_transcription(audio_file)
+
+        recorder.transcription_worker(run_once=True)
+
+        base = os.path.join(recorder.transcription_dir, NAME[:-len(".mp3")])
+        self.assertFalse(os.path.exists(base + ".txt"))
+        records = read_jsonl(base + ".jsonl")
+        self.assertEqual([r["abs_start"] for r in records], ["2024-01-01T10:00:00.000", "2024-01-01T10:00:02.000"])
+        self.assertEqual(records[0]["words"][1], {"word": "Welt.", "start": 0.9, "end": 2.0, "probability": 0.8})
+        self.assertTrue(transcript_exists(recorder.transcription_dir, audio_file))
+
+        recorder.segment_index.rebuild()
+        self.assertEqual(recorder.segment_index.pending(), [])
+
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow nicht installiert")
+class TestParquet(unittest.TestCase):
+    def test_parquet_roundtrip(self):
+        import pyarrow.parquet as pq
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        records = build_records("s", NAME, "", {"segments": [
+            {"start": 0.0, "end": 2.0, "text": "Hallo", "avg_logprob": -0.2, "no_speech_prob": 0.1,
+             "words": [{"word": "Hallo", "start": 0.0, "end": 0.8, "probability": 0.9}]}]})
+        base = os.path.join(tmp_dir, "seg")
+        write_structured(base, (FORMAT_PARQUET,), records)
+        table = pq.read_table(base + ".parquet")
+        self.assertEqual(table.column("text").to_pylist(), ["Hallo"])
+        self.assertEqual(table.column("abs_start").to_pylist(), [datetime(2024, 1, 1, 10)])
+        self.assertEqual(table.column("words").to_pylist()[0][0]["word"], "Hallo")
+
+
+if __name__ == "__main__":
+    unittest.main()
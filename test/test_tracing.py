@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+
+from audio_miner.audio_transcriber import AudioTranscriber
+from audio_miner.cli import main
+from audio_miner.main import RadioRecorder
+from audio_miner.tracing import TRACE_FILE, build_trace, read_traces, summarize, write_trace
+
+
+def trace(name, wall, whisper, decode=1.0):
+    return build_trace(name, {"duration": 3600.0, "stages": {"whisper": whisper, "decode": decode}, "turns": 2,
+                              "slowest_turns": [{"start": 0.0, "end": 5.0, "speaker": "SPEAKER_00", "seconds": whisper}]},
+                       {"transcribe": wall, "queue_wait": 10.0})
+
+
+class TestTraceSummary(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, TRACE_FILE)
+
+    def test_time_range_and_aggregation(self):
+        write_trace(self.path, trace("s_20240101_100000_20240101_110000.mp3", 600.0, 500.0))
+        write_trace(self.path, trace("s_20240101_110000_20240101_120000.mp3", 2400.0, 2300.0))
+        write_trace(self.path, trace("s_20240102_100000_20240102_110000.mp3", 100.0, 90.0))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"abgebrochen')
+
+        traces = read_traces([self.path], start=datetime(2024, 1, 1), end=datetime(2024, 1, 2))
+        summary = summarize(traces, top=1)
+
+        self.assertEqual(summary["files"], 2)
+        self.assertAlmostEqual(summary["rtf"], 3000.0 / 7200.0)
+        self.assertEqual(list(summary["stages"]), ["whisper", "decode"])
+        self.assertEqual(summary["stages"]["whisper"]["max"], 2300.0)
+        self.assertEqual([t["file"] for t in summary["slowest_files"]], ["s_20240101_110000_20240101_120000.mp3"])
+        self.assertEqual(summary["slowest_turns"][0]["seconds"], 2300.0)
+
+    def test_traces_command(self):
+        sender_dir = os.path.join(self.tmp_dir, "s", "transkriptionen")
+        os.makedirs(sender_dir)
+        write_trace(os.path.join(sender_dir, TRACE_FILE), trace("s_20240101_100000_20240101_110000.mp3", 600.0, 500.0))
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main(["traces", "--base-dir", self.tmp_dir, "--start-time", "20240101_000000"])
+        self.assertIn("1 Segmente", output.getvalue())
+        self.assertIn("whisper", output.getvalue())
+        self.assertIn("SPEAKER_00 0.0-5.0", output.getvalue())
+
+
+class TestTranscriptionTrace(unittest.TestCase):
+    def setUp(self):
+        patchers = {
+            "pipeline": patch('pyannote.audio.Pipeline.from_pretrained'),
+            "load_model": patch('whisper.load_model'),
+            "load_audio": patch('whisper.load_audio', return_value=np.zeros(20 * 16000, dtype=np.float32)),
+            "cuda": patch('torch.cuda.is_available', return_value=False),
+        }
+        self.mocks = {name: p.start() for name, p in patchers.items()}
+        for p in patchers.values():
+            self.addCleanup(p.stop)
+        whisper_model = MagicMock()
+        whisper_model.transcribe.return_value = {"text": " Hallo "}
+        self.mocks["load_model"].return_value = whisper_model
+        turns = []
+        for start, end, speaker in [(0.0, 5.0, "SPEAKER_00"), (5.0, 12.0, "SPEAKER_01"), (12.0, 20.0, "SPEAKER_00")]:
+            turn = MagicMock()
+            turn.start, turn.end = start, end
+            turns.append((turn, None, speaker))
+        self.mocks["pipeline"].return_value.return_value.itertracks.return_value = turns
+
+    def test_diarization_details(self):
+        transcriber = AudioTranscriber(token="token")
+        transcriber.transcribe_audio("a.mp3")
+
+        details = transcriber.pop_details("a.mp3")
+        self.assertEqual(details["duration"], 20.0)
+        self.assertEqual(details["turns"], 3)
+        self.assertEqual(len(details["slowest_turns"]), 3)
+        self.assertEqual(set(details["stages"]), {"decode", "diarization", "whisper"})
+
+    def test_recorder_writes_trace(self):
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        recorder = RadioRecorder(None, "s", base_dir=base_dir, use_monitor=False, token="token")
+        self.addCleanup(recorder.segment_index.close)
+        audio_file = os.path.join(recorder.audio_dir, "s_20240101_100000_20240101_100020.mp3")
+        with open(audio_file, "wb") as f:
+            f.write(b"audio")
+        recorder._queue_segment_for_transcription(audio_file)
+
+        recorder.transcription_worker(run_once=True)
+
+        with open(os.path.join(recorder.transcription_dir, TRACE_FILE), encoding="utf-8") as f:
+            written = [json.loads(line) for line in f]
+        self.assertEqual(len(written), 1)
+        self.assertEqual(written[0]["file"], os.path.basename(audio_file))
+        self.assertEqual(written[0]["audio_seconds"], 20.0)
+        self.assertEqual(written[0]["turns"], 3)
+        self.assertIn("write", written[0]["stages"])
+        self.assertGreaterEqual(written[0]["queue_wait_seconds"], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
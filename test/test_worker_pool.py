@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from audio_miner.job_queue import STATE_PENDING, JobQueue
+from audio_miner.main import RadioRecorder
+
+from audio_miner.worker_pool import ForkedTranscriberPool, WorkerPoolBroken
+
+
+class FakeTranscriber:
+    token = None
+    batch_size = 1
+
+    def __init__(self):
+        # Steht für die im Elternprozess geladenen Modellgewichte.
+        self.weights = bytearray(1024 * 1024)
+
+    def transcribe_audio(self, audio_path):
+        if audio_path == "crash.mp3":
+            os._exit(1)
+        return f"{audio_path}:{os.getpid()}:{len(self.weights)}"
+
+    def transcribe_many(self, audio_paths):
+        return [self.transcribe_audio(p) for p in audio_paths]
+
+    def pop_details(self, audio_path):
+        return {"skipped_seconds": 1.0, "pid": os.getpid()}
+
+
+class TestForkedTranscriberPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = ForkedTranscriberPool(FakeTranscriber(), workers=2, torch_threads=1)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_workers_are_forked_with_thread_share(self):
+        pids = {pid for pid, _ in self.pool.worker_info}
+        self.assertNotIn(os.getpid(), pids)
+        self.assertTrue(all(threads == 1 for _, threads in self.pool.worker_info))
+
+    def test_transcription_runs_in_worker(self):
+        path, pid, size = self.pool.transcribe_audio("a.mp3").split(":")
+        self.assertEqual(path, "a.mp3")
+        self.assertNotEqual(int(pid), os.getpid())
+        self.assertEqual(int(size), 1024 * 1024)
+
+    def test_transcribe_many_and_attributes(self):
+        results = self.pool.transcribe_many(["a.mp3", "b.mp3"])
+        self.assertEqual([r.split(":")[0] for r in results], ["a.mp3", "b.mp3"])
+        self.assertIsNone(self.pool.token)
+        self.assertEqual(self.pool.batch_size, 1)
+
+    def test_details_come_back_from_worker(self):
+        self.pool.transcribe_audio("a.mp3")
+        details = self.pool.pop_details("a.mp3")
+        self.assertEqual(details["skipped_seconds"], 1.0)
+        self.assertNotEqual(details["pid"], os.getpid())
+        self.assertIsNone(self.pool.pop_details("a.mp3"))
+
+    def test_crashed_worker_is_not_reforked(self):
+        executor = self.pool.executor
+        with self.assertRaises(WorkerPoolBroken):
+            self.pool.transcribe_audio("crash.mp3")
+        # Ein erneuter fork() des inzwischen mehrfädigen Prozesses könnte gesperrte Locks erben.
+        with self.assertRaises(WorkerPoolBroken):
+            self.pool.transcribe_audio("a.mp3")
+        self.assertIs(self.pool.executor, executor)
+
+
+class BrokenPool:
+    def transcribe_audio(self, audio_path):
+        raise WorkerPoolBroken("abgestürzt")
+
+
+class TestRecorderWithBrokenPool(unittest.TestCase):
+    def test_segment_is_returned_without_counting_an_attempt(self):
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        recorder = RadioRecorder(None, "s", base_dir=base_dir, use_monitor=False, transcribe_only=True, job_queue=True,
+                                 transcriber=BrokenPool(), poll_interval=0)
+        self.addCleanup(recorder.segment_index.close)
+        self.addCleanup(recorder.backfill.close)
+        with open(os.path.join(recorder.audio_dir, "s_20240101_100000_20240101_110000.mp3"), "wb") as f:
+            f.write(b"m")
+        recorder.check_and_queue_old_files(datetime.now())
+
+        recorder.transcription_worker()
+        self.assertTrue(recorder.worker_pool_broken)
+        recorder.job_queue.close()
+        reopened = JobQueue(recorder.job_queue.db_path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.counts(), {STATE_PENDING: 1})
+
+
+if __name__ == '__main__':
+    unittest.main()